@@ -0,0 +1,12 @@
+"""
+API Dependencies
+
+Dependencias compartidas por los endpoints.
+
+- get_db: Sesión de escritura (commit al terminar el request)
+- get_read_db: Sesión de solo lectura para endpoints GET
+"""
+
+from app.db.session import get_db, get_read_db
+
+__all__ = ["get_db", "get_read_db"]
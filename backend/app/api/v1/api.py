@@ -0,0 +1,24 @@
+"""
+API v1 Router
+
+Agrupa los routers de endpoints bajo settings.API_V1_PREFIX.
+
+Holdings y transactions siguen servidos por los endpoints mock de
+main.py hasta que sus routers estén implementados.
+"""
+
+from fastapi import APIRouter
+
+from app.api.v1.endpoints import portfolios, prices
+
+api_router = APIRouter()
+api_router.include_router(
+    portfolios.router,
+    prefix="/portfolios",
+    tags=["portfolios"]
+)
+api_router.include_router(
+    prices.router,
+    prefix="/prices",
+    tags=["prices"]
+)
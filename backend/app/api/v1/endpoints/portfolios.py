@@ -9,17 +9,25 @@ Principios aplicados:
 - Error Handling: Respuestas HTTP apropiadas
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import date, datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
-from app.api.deps import get_db
+from app.api.deps import get_db, get_read_db
 from app.services.portfolio_service import PortfolioService
+from app.services.snapshot_service import PortfolioSnapshotService
+from app.services.valuation_state import valuation_state
 from app.schemas.portfolio import (
-    Portfolio,
     PortfolioCreate,
+    PortfolioResponse,
+    PortfolioReturnsResponse,
+    PortfolioSnapshotPoint,
+    PortfolioSnapshotsResponse,
+    PortfolioSummary,
     PortfolioUpdate,
-    PortfolioWithHoldings
+    PortfolioValueHistoryResponse,
+    PortfolioValuePoint
 )
 
 router = APIRouter()
@@ -27,7 +35,7 @@ router = APIRouter()
 
 @router.post(
     "/",
-    response_model=Portfolio,
+    response_model=PortfolioResponse,
     status_code=status.HTTP_201_CREATED,
     summary="Crear portafolio",
     description="Crea un nuevo portafolio de inversión"
@@ -35,7 +43,7 @@ router = APIRouter()
 async def create_portfolio(
     portfolio_data: PortfolioCreate,
     db: AsyncSession = Depends(get_db)
-) -> Portfolio:
+) -> PortfolioResponse:
     """
     Crea un nuevo portafolio.
     
@@ -57,15 +65,15 @@ async def create_portfolio(
 
 @router.get(
     "/",
-    response_model=List[Portfolio],
+    response_model=List[PortfolioResponse],
     summary="Listar portafolios",
     description="Obtiene lista de todos los portafolios"
 )
 async def list_portfolios(
     skip: int = 0,
     limit: int = 100,
-    db: AsyncSession = Depends(get_db)
-) -> List[Portfolio]:
+    db: AsyncSession = Depends(get_read_db)
+) -> List[PortfolioResponse]:
     """
     Obtiene lista de portafolios con paginación.
     
@@ -73,27 +81,56 @@ async def list_portfolios(
     - **limit**: Máximo número de registros (default: 100)
     """
     service = PortfolioService(db)
-    portfolios = await service.get_all_portfolios(skip, limit)
+    portfolios = await service.get_all_portfolios(
+        skip, limit, with_holdings=True
+    )
     return portfolios
 
 
+@router.get(
+    "/valuations",
+    response_model=List[PortfolioSummary],
+    summary="Valuar portafolios",
+    description="Valor actual de muchos portafolios en una pasada"
+)
+async def list_portfolio_valuations(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=10000),
+    active_only: bool = True,
+    db: AsyncSession = Depends(get_read_db)
+) -> List[PortfolioSummary]:
+    """
+    Valúa una página de portafolios con sus precios actuales.
+    
+    Los precios de todos los activos se leen una sola vez y los totales
+    se agregan en una reducción por portafolio: el número de queries no
+    crece con **limit**.
+    
+    - **skip**: Número de registros a saltar (default: 0)
+    - **limit**: Máximo número de portafolios (default: 1000)
+    - **active_only**: Solo portafolios activos (default: true)
+    """
+    service = PortfolioService(db)
+    return await service.get_portfolio_summaries(skip, limit, active_only)
+
+
 @router.get(
     "/{portfolio_id}",
-    response_model=Portfolio,
+    response_model=PortfolioResponse,
     summary="Obtener portafolio",
     description="Obtiene un portafolio específico por ID"
 )
 async def get_portfolio(
     portfolio_id: int,
-    db: AsyncSession = Depends(get_db)
-) -> Portfolio:
+    db: AsyncSession = Depends(get_read_db)
+) -> PortfolioResponse:
     """
     Obtiene detalles de un portafolio específico.
     
     - **portfolio_id**: ID del portafolio
     """
     service = PortfolioService(db)
-    portfolio = await service.get_portfolio(portfolio_id)
+    portfolio = await service.get_portfolio(portfolio_id, with_holdings=True)
     
     if not portfolio:
         raise HTTPException(
@@ -106,7 +143,7 @@ async def get_portfolio(
 
 @router.patch(
     "/{portfolio_id}",
-    response_model=Portfolio,
+    response_model=PortfolioResponse,
     summary="Actualizar portafolio",
     description="Actualiza un portafolio existente"
 )
@@ -114,7 +151,7 @@ async def update_portfolio(
     portfolio_id: int,
     portfolio_data: PortfolioUpdate,
     db: AsyncSession = Depends(get_db)
-) -> Portfolio:
+) -> PortfolioResponse:
     """
     Actualiza campos de un portafolio.
     
@@ -169,7 +206,8 @@ async def delete_portfolio(
 )
 async def get_portfolio_summary(
     portfolio_id: int,
-    db: AsyncSession = Depends(get_db)
+    include_holdings: bool = True,
+    db: AsyncSession = Depends(get_read_db)
 ) -> dict:
     """
     Obtiene resumen completo del portafolio.
@@ -180,7 +218,13 @@ async def get_portfolio_summary(
     - Comparación con targets
     - Ganancias/pérdidas
     
+    Totales y distribución salen del estado de valuación en memoria (sin
+    recalcular desde la DB); solo las filas por holding consultan
+    holdings y precios.
+    
     - **portfolio_id**: ID del portafolio
+    - **include_holdings**: Incluir las filas por holding (default: true);
+      false deja el resumen sin consultas de valuación
     """
     service = PortfolioService(db)
     portfolio = await service.get_portfolio(portfolio_id)
@@ -191,13 +235,202 @@ async def get_portfolio_summary(
             detail=f"Portafolio con ID {portfolio_id} no encontrado"
         )
     
-    # TODO: Implementar cálculos completos
+    totals = (await service.get_current_totals([portfolio.id]))[portfolio.id]
+    target = portfolio.target_distribution
+    holdings = []
+    if include_holdings:
+        valuation = await service.get_valuation(portfolio.id)
+        holdings = [
+            holding.model_dump()
+            for holding in service.holding_responses(valuation)
+        ]
+    
     return {
         "portfolio_id": portfolio.id,
         "name": portfolio.name,
-        "total_value_usd": 0,
-        "total_value_mxn": 0,
-        "total_gain_loss": 0,
-        "distribution": {},
-        "target_distribution": portfolio.target_distribution
+        "total_value_usd": totals.total_value_usd,
+        "total_value_mxn": totals.total_value_mxn,
+        "total_invested_usd": totals.total_cost_usd,
+        "total_gain_loss": totals.total_gain_loss_usd,
+        "total_gain_loss_percent": totals.total_gain_loss_percent,
+        "exchange_rate": valuation_state.exchange_rate,
+        "distribution": totals.distribution,
+        "target_distribution": target,
+        "distribution_drift": {
+            ticker: round(totals.distribution.get(ticker, 0.0) - percent, 2)
+            for ticker, percent in target.items()
+        },
+        "unpriced": totals.unpriced,
+        "holdings": holdings,
     }
+
+
+@router.get(
+    "/{portfolio_id}/history",
+    response_model=PortfolioValueHistoryResponse,
+    summary="Obtener histórico de valor",
+    description="Serie de valor del portafolio en USD, reducida con LTTB"
+)
+async def get_portfolio_value_history(
+    portfolio_id: int,
+    days: int = Query(30, ge=1, le=36500),
+    start_date: datetime | None = None,
+    end_date: datetime | None = None,
+    max_points: int | None = Query(None, ge=2, le=5000),
+    db: AsyncSession = Depends(get_read_db)
+) -> PortfolioValueHistoryResponse:
+    """
+    Obtiene la serie de valor del portafolio para gráficas.
+    
+    Valúa los holdings actuales con el cierre de las velas de cada
+    activo y reduce la serie a **max_points** puntos con LTTB, que
+    conserva los picos y valles visibles.
+    
+    - **portfolio_id**: ID del portafolio
+    - **days**: Número de días de histórico (default: 30), si no se
+      proporciona start_date
+    - **start_date / end_date**: Rango explícito (opcional)
+    - **max_points**: Presupuesto de puntos (default: configuración)
+    """
+    if end_date is None:
+        end_date = datetime.utcnow()
+    if start_date is None:
+        start_date = end_date - timedelta(days=days)
+    if start_date > end_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start_date debe ser anterior a end_date"
+        )
+    
+    service = PortfolioService(db)
+    portfolio = await service.get_portfolio(portfolio_id)
+    
+    if not portfolio:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Portafolio con ID {portfolio_id} no encontrado"
+        )
+    
+    history = await service.get_value_history(
+        portfolio_id, start_date, end_date, max_points
+    )
+    return PortfolioValueHistoryResponse(
+        portfolio_id=portfolio_id,
+        interval=history.resolution,
+        start_date=start_date,
+        end_date=end_date,
+        count=len(history.points),
+        source_count=history.source_count,
+        tickers=history.tickers,
+        points=[
+            PortfolioValuePoint(timestamp=timestamp, value_usd=value)
+            for timestamp, value in history.points
+        ]
+    )
+
+
+@router.get(
+    "/{portfolio_id}/snapshots",
+    response_model=PortfolioSnapshotsResponse,
+    summary="Obtener snapshots diarios de valor",
+    description="Valor diario (NAV) precalculado del portafolio"
+)
+async def get_portfolio_snapshots(
+    portfolio_id: int,
+    days: int = Query(365, ge=1, le=36500),
+    start_date: date | None = None,
+    end_date: date | None = None,
+    max_points: int | None = Query(None, ge=2, le=5000),
+    db: AsyncSession = Depends(get_read_db)
+) -> PortfolioSnapshotsResponse:
+    """
+    Obtiene el valor diario del portafolio para gráficas de largo plazo.
+    
+    Lee los snapshots que escribe el job diario (y el backfill desde
+    transacciones) con una sola consulta de rango; a diferencia de
+    /history, cada día se valúa con las posiciones que había ese día.
+    
+    - **portfolio_id**: ID del portafolio
+    - **days**: Número de días de histórico (default: 365), si no se
+      proporciona start_date
+    - **start_date / end_date**: Rango explícito de días (opcional)
+    - **max_points**: Presupuesto de puntos (default: configuración)
+    """
+    if end_date is None:
+        end_date = datetime.utcnow().date()
+    if start_date is None:
+        start_date = end_date - timedelta(days=days)
+    if start_date > end_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start_date debe ser anterior a end_date"
+        )
+    
+    portfolio = await PortfolioService(db).get_portfolio(portfolio_id)
+    
+    if not portfolio:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Portafolio con ID {portfolio_id} no encontrado"
+        )
+    
+    history = await PortfolioSnapshotService(db).get_history(
+        portfolio_id, start_date, end_date, max_points
+    )
+    return PortfolioSnapshotsResponse(
+        portfolio_id=portfolio_id,
+        start_date=start_date,
+        end_date=end_date,
+        count=len(history.points),
+        source_count=history.source_count,
+        points=[
+            PortfolioSnapshotPoint.model_validate(row)
+            for row in history.points
+        ]
+    )
+
+
+@router.get(
+    "/{portfolio_id}/returns",
+    response_model=PortfolioReturnsResponse,
+    summary="Obtener rendimiento TWR / XIRR",
+    description="Rendimiento ponderado por tiempo y por dinero en un rango"
+)
+async def get_portfolio_returns(
+    portfolio_id: int,
+    start_date: date | None = None,
+    end_date: date | None = None,
+    db: AsyncSession = Depends(get_read_db)
+) -> PortfolioReturnsResponse:
+    """
+    Calcula el rendimiento del portafolio desde sus snapshots diarios.
+    
+    - **TWR**: encadena los rendimientos diarios sin el efecto de las
+      aportaciones y retiros (compara la inversión, no el ahorro)
+    - **XIRR**: tasa anual de los flujos reales del inversionista
+    
+    El resultado de cada rango se memoriza hasta que cambian las
+    transacciones o snapshots del portafolio.
+    
+    - **portfolio_id**: ID del portafolio
+    - **start_date**: Primer día (default: desde el inicio)
+    - **end_date**: Último día (default: hoy)
+    """
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start_date debe ser anterior a end_date"
+        )
+    
+    portfolio = await PortfolioService(db).get_portfolio(portfolio_id)
+    
+    if not portfolio:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Portafolio con ID {portfolio_id} no encontrado"
+        )
+    
+    returns = await PortfolioSnapshotService(db).get_returns(
+        portfolio_id, start_date, end_date
+    )
+    return PortfolioReturnsResponse.model_validate(returns)
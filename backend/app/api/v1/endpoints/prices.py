@@ -9,16 +9,108 @@ Principios aplicados:
 - Caching: Respuestas cacheables
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+import csv
+import io
+import json
+from dataclasses import asdict
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Dict
+from typing import AsyncIterator, Dict, Optional
 from decimal import Decimal
 
-from app.api.deps import get_db
+from app.api.deps import get_db, get_read_db
+from app.providers.single_flight import price_flight
+from app.schemas.price import (
+    ExchangeRateTableResponse,
+    PriceCandle,
+    PriceCandleHistoryResponse,
+)
+from app.services.fx_rates import fx_rates
+from app.services.price_cache import price_cache
+from app.services.price_history_service import (
+    PriceHistoryService,
+    decode_history_cursor,
+    encode_history_cursor,
+)
+from app.services.price_scheduler import price_scheduler
 from app.services.price_service import PriceService
+from app.services.ticker_registry import ticker_registry
 
 router = APIRouter()
 
+# Columnas de la exportación de ticks (NDJSON y CSV)
+HISTORY_EXPORT_COLUMNS = (
+    "cursor",
+    "id",
+    "timestamp",
+    "price_usd",
+    "price_mxn",
+    "exchange_rate",
+    "volume_24h",
+    "market_cap",
+    "source",
+)
+
+HISTORY_EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _export_record(row) -> dict:
+    """Fila de prices -> dict serializable (Decimal como string)"""
+    def text_or_none(value):
+        return None if value is None else str(value)
+    
+    return {
+        "cursor": encode_history_cursor(row.timestamp, row.id),
+        "id": row.id,
+        "timestamp": row.timestamp.isoformat(),
+        "price_usd": text_or_none(row.price_usd),
+        "price_mxn": text_or_none(row.price_mxn),
+        "exchange_rate": text_or_none(row.exchange_rate),
+        "volume_24h": text_or_none(row.volume_24h),
+        "market_cap": text_or_none(row.market_cap),
+        "source": row.source,
+    }
+
+
+async def _stream_history_export(
+    db: AsyncSession,
+    ticker: str,
+    output: str,
+    start_date: Optional[datetime],
+    end_date: datetime,
+    cursor: Optional[str],
+    limit: Optional[int]
+) -> AsyncIterator[bytes]:
+    """
+    Cuerpo de la exportación: un bloque de bytes por chunk de filas.
+    
+    Usa la sesión del request: la dependencia get_read_db (con yield) se
+    cierra después de enviar la respuesta completa, así que sigue
+    abierta mientras se transmite y el export ocupa una sola conexión.
+    """
+    if output == "csv":
+        yield (",".join(HISTORY_EXPORT_COLUMNS) + "\r\n").encode()
+    
+    service = PriceHistoryService(db)
+    async for chunk in service.stream_ticks(
+        ticker, start_date, end_date, cursor, limit
+    ):
+        records = [_export_record(row) for row in chunk]
+        if output == "csv":
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=HISTORY_EXPORT_COLUMNS)
+            writer.writerows(records)
+            yield buffer.getvalue().encode()
+        else:
+            yield "".join(
+                json.dumps(record) + "\n" for record in records
+            ).encode()
+
 
 @router.get(
     "/latest",
@@ -28,14 +120,15 @@ router = APIRouter()
 )
 async def get_latest_prices(
     tickers: str | None = None,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Dict[str, Decimal]:
     """
     Obtiene precios actuales de los activos.
     
     - **tickers**: Lista de tickers separados por coma (opcional)
       Ejemplo: VOO,VGT,BTC,ETH
-      Si no se proporciona, retorna todos los activos soportados.
+      Si no se proporciona, retorna todos los activos en holdings y
+      transacciones.
     
     Returns:
         Dict con ticker: precio en USD
@@ -82,9 +175,10 @@ async def refresh_prices(
     Actualiza precios obteniendo datos frescos de las APIs.
     
     Este endpoint:
-    1. Obtiene precios actuales de Yahoo Finance y CoinGecko
-    2. Almacena los precios en la base de datos
-    3. Retorna número de precios actualizados
+    1. Obtiene en paralelo tipo de cambio, precios de Yahoo Finance y
+       CoinGecko, con un deadline global
+    2. Almacena los precios que llegaron a tiempo en la base de datos
+    3. Retorna número de precios actualizados y tiempos por provider
     
     - **tickers**: Lista de tickers separados por coma (opcional)
     
@@ -96,6 +190,16 @@ async def refresh_prices(
     {
         "status": "success",
         "prices_updated": 4,
+        "exchange_rate": 18.42,
+        "duration_seconds": 1.214,
+        "providers": {
+            "exchangerate-api": {"provider": "exchangerate-api", "status": "ok",
+                                 "duration_seconds": 0.311, "fetched": 1, "error": null},
+            "yahoo_finance": {"provider": "yahoo_finance", "status": "ok",
+                              "duration_seconds": 1.198, "fetched": 2, "error": null},
+            "coingecko": {"provider": "coingecko", "status": "ok",
+                          "duration_seconds": 0.402, "fetched": 2, "error": null}
+        },
         "timestamp": "2025-10-28T14:30:00"
     }
     ```
@@ -108,13 +212,17 @@ async def refresh_prices(
         ticker_list = [t.strip().upper() for t in tickers.split(",")]
     
     try:
-        from datetime import datetime
-        
-        count = await service.fetch_and_store_prices(ticker_list)
+        report = await service.fetch_and_store_prices(ticker_list)
         
         return {
             "status": "success",
-            "prices_updated": count,
+            "prices_updated": report.stored_count,
+            "exchange_rate": report.exchange_rate,
+            "duration_seconds": report.duration_seconds,
+            "providers": {
+                name: asdict(timing)
+                for name, timing in report.providers.items()
+            },
             "timestamp": datetime.utcnow().isoformat()
         }
     except Exception as e:
@@ -124,6 +232,134 @@ async def refresh_prices(
         )
 
 
+@router.get(
+    "/refresh/status",
+    response_model=dict,
+    summary="Estado del refresh automático",
+    description="Última ejecución, duración y fallos de cada job de refresh"
+)
+async def get_refresh_status() -> dict:
+    """
+    Obtiene el estado del scheduler de refresh de precios.
+    
+    Por cada clase de activo (crypto, stock) incluye última ejecución,
+    duración, precios almacenados, fallos y próxima ejecución. También
+    incluye el presupuesto restante de cada provider.
+    """
+    return price_scheduler.status()
+
+
+@router.get(
+    "/metrics",
+    response_model=dict,
+    summary="Métricas de obtención de precios",
+    description="Contadores de requests a providers y llamadas coalescidas"
+)
+async def get_price_metrics() -> dict:
+    """
+    Obtiene métricas del proceso para la obtención de precios.
+    
+    - **single_flight.calls**: Llamadas recibidas por el servicio
+    - **single_flight.executions**: Requests externas realmente ejecutadas
+    - **single_flight.coalesced**: Llamadas que esperaron una request en vuelo
+    - **cache.hits / stale_hits / misses**: Lecturas del cache de precios
+    - **ticker_registry**: Tickers en el universo, recargas e invalidaciones
+    - **fx_rates**: Tabla de tipos de cambio vigente, fetches y lecturas
+    
+    Ejemplo de respuesta:
+    ```json
+    {
+        "single_flight": {
+            "name": "prices",
+            "calls": 120,
+            "executions": 8,
+            "coalesced": 112,
+            "in_flight": 0
+        },
+        "cache": {
+            "entries": 4,
+            "hits": 950,
+            "stale_hits": 42,
+            "misses": 8,
+            "revalidating": 0
+        },
+        "ticker_registry": {
+            "tickers": 4,
+            "loaded_at": "2025-10-28T14:30:00",
+            "loads": 3,
+            "invalidations": 2
+        }
+    }
+    ```
+    """
+    return {
+        "single_flight": price_flight.stats(),
+        "cache": price_cache.stats(),
+        "ticker_registry": ticker_registry.stats(),
+        "fx_rates": fx_rates.stats()
+    }
+
+
+@router.get(
+    "/exchange-rates",
+    response_model=ExchangeRateTableResponse,
+    summary="Tipos de cambio",
+    description="Tipos de cambio de una moneda contra otras (tabla vigente)"
+)
+async def get_exchange_rates(
+    base: str = Query("USD", min_length=3, max_length=3),
+    currencies: str | None = Query(
+        None, description="Monedas separadas por coma (default: todas)"
+    ),
+    db: AsyncSession = Depends(get_db)
+) -> ExchangeRateTableResponse:
+    """
+    Tipos de cambio de `base` contra cada moneda.
+    
+    Todas las bases salen de la misma tabla (tipos cruzados): consultar
+    MXN, EUR o MXN/EUR no gasta cuota adicional del provider.
+    
+    - **base**: Moneda base (ej: USD, MXN, EUR)
+    - **currencies**: Ej: "MXN,EUR" (opcional)
+    
+    Ejemplo de respuesta:
+    ```json
+    {
+        "base": "MXN",
+        "source": "exchangerate-api",
+        "timestamp": "2025-10-28T00:00:01",
+        "fetched_at": "2025-10-28T14:30:00",
+        "rates": {"USD": 0.0543, "EUR": 0.0468}
+    }
+    ```
+    """
+    matrix = await PriceService(db).get_exchange_rates()
+    if matrix is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Tipos de cambio no disponibles"
+        )
+    
+    currency_list = None
+    if currencies:
+        currency_list = [c.strip().upper() for c in currencies.split(",")]
+    try:
+        rates = matrix.rates_from(base, currency_list)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    
+    return ExchangeRateTableResponse(
+        base=base.upper(),
+        source=matrix.source,
+        timestamp=matrix.timestamp,
+        fetched_at=fx_rates.fetched_at,
+        rates=rates
+    )
+
+
 @router.get(
     "/{ticker}",
     response_model=dict,
@@ -132,12 +368,12 @@ async def refresh_prices(
 )
 async def get_ticker_price(
     ticker: str,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> dict:
     """
     Obtiene precio actual de un ticker específico.
     
-    - **ticker**: Symbol del activo (VOO, VGT, BTC, ETH)
+    - **ticker**: Symbol del activo (ej: VOO, VGT, BTC, ETH)
     
     Returns:
         Dict con información del precio
@@ -147,7 +383,7 @@ async def get_ticker_price(
     {
         "ticker": "VOO",
         "price_usd": 523.18,
-        "source": "yahoo",
+        "source": "yahoo_finance",
         "timestamp": "2025-10-28T14:30:00"
     }
     ```
@@ -156,21 +392,19 @@ async def get_ticker_price(
     ticker = ticker.upper()
     
     try:
-        price = await service.get_current_price(ticker)
+        quote = await service.get_current_quote(ticker)
         
-        if price is None:
+        if quote is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Precio no disponible para {ticker}"
             )
         
-        from datetime import datetime
-        
         return {
             "ticker": ticker,
-            "price_usd": float(price),
-            "source": "yahoo" if ticker in ["VOO", "VGT"] else "coingecko",
-            "timestamp": datetime.utcnow().isoformat()
+            "price_usd": quote.price_usd,
+            "source": quote.source,
+            "timestamp": quote.timestamp.isoformat()
         }
     except HTTPException:
         raise
@@ -183,21 +417,128 @@ async def get_ticker_price(
 
 @router.get(
     "/history/{ticker}",
-    response_model=list,
+    response_model=PriceCandleHistoryResponse,
     summary="Obtener histórico de precios",
-    description="Obtiene histórico de precios para un ticker"
+    description=(
+        "Obtiene histórico de precios en velas OHLC (json) o exporta los "
+        "ticks crudos en streaming (ndjson, csv)"
+    )
 )
 async def get_price_history(
     ticker: str,
-    days: int = 30,
-    db: AsyncSession = Depends(get_db)
-) -> list:
+    days: int = Query(30, ge=1, le=36500),
+    start_date: datetime | None = None,
+    end_date: datetime | None = None,
+    interval: str | None = Query(None, pattern="^(1h|1d|1w|1m)$"),
+    max_points: int | None = Query(None, ge=2, le=5000),
+    output: str = Query("json", alias="format", pattern="^(json|ndjson|csv)$"),
+    cursor: str | None = None,
+    limit: int | None = Query(None, ge=1),
+    db: AsyncSession = Depends(get_read_db)
+):
     """
-    Obtiene histórico de precios.
+    Obtiene histórico de precios en velas OHLC.
+    
+    La resolución (1h, 1d, 1w, 1m) es la más fina cuyo número de velas
+    en el rango cabe en **max_points** por el factor de oversampling, y
+    las velas se reducen a **max_points** con LTTB (conserva los picos
+    visibles): 5 años con max_points=500 se sirven con 500 de las ~1826
+    velas diarias en lugar de decenas de miles de ticks.
     
     - **ticker**: Symbol del activo
-    - **days**: Número de días de histórico (default: 30)
+    - **days**: Número de días de histórico (default: 30), si no se
+      proporciona start_date
+    - **start_date / end_date**: Rango explícito (opcional)
+    - **interval**: Resolución mínima (opcional)
+    - **max_points**: Presupuesto de puntos (default: configuración)
+    - **format**: json (velas), ndjson o csv (ticks crudos en streaming)
+    - **cursor**: Solo ndjson/csv. Campo `cursor` de la última fila
+      recibida; la exportación sigue después de ella
+    - **limit**: Solo ndjson/csv. Máximo de filas (default: todo el rango)
     
-    TODO: Implementar query a base de datos
+    Con ndjson/csv los ticks se leen con un cursor del servidor y se
+    envían por chunks conforme se leen, en orden (timestamp, id): una
+    exportación de varios años corre en memoria constante. Para paginar,
+    pedir con **limit** y repetir con el **cursor** de la última fila.
+    Sin start_date se aplica **days**, salvo al reanudar con cursor.
+    
+    Ejemplo de fila ndjson:
+    ```json
+    {"cursor": "MjAyNS0xMC0yOFQxNDozMDowMHw0Mg", "id": 42,
+     "timestamp": "2025-10-28T14:30:00", "price_usd": "523.18",
+     "price_mxn": "9636.97", "exchange_rate": "18.4200",
+     "volume_24h": null, "market_cap": null, "source": "yahoo_finance"}
+    ```
+    
+    Ejemplo de respuesta:
+    ```json
+    {
+        "ticker": "VOO",
+        "interval": "1d",
+        "start_date": "2020-10-28T14:30:00",
+        "end_date": "2025-10-28T14:30:00",
+        "count": 500,
+        "source_count": 1827,
+        "candles": [
+            {"bucket_start": "2020-10-28T00:00:00", "open_usd": 301.2,
+             "high_usd": 305.9, "low_usd": 298.4, "close_usd": 304.1,
+             "tick_count": 35}
+        ]
+    }
+    ```
     """
-    return []
+    if end_date is None:
+        end_date = datetime.utcnow()
+    if start_date is None and (output == "json" or cursor is None):
+        start_date = end_date - timedelta(days=days)
+    if start_date is not None and start_date > end_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start_date debe ser anterior a end_date"
+        )
+    
+    ticker = ticker.upper()
+    
+    if output != "json":
+        if cursor is not None:
+            try:
+                decode_history_cursor(cursor)
+            except ValueError as e:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=str(e)
+                )
+        headers = {}
+        if output == "csv":
+            headers["Content-Disposition"] = (
+                f'attachment; filename="{ticker}_prices.csv"'
+            )
+        return StreamingResponse(
+            _stream_history_export(
+                db, ticker, output, start_date, end_date, cursor, limit
+            ),
+            media_type=HISTORY_EXPORT_MEDIA_TYPES[output],
+            headers=headers
+        )
+    
+    service = PriceHistoryService(db)
+    
+    try:
+        resolution, candles, source_count = await service.get_candles(
+            ticker, start_date, end_date, interval, max_points
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error obteniendo histórico: {str(e)}"
+        )
+    
+    return PriceCandleHistoryResponse(
+        ticker=ticker,
+        interval=resolution,
+        start_date=start_date,
+        end_date=end_date,
+        count=len(candles),
+        source_count=source_count,
+        candles=[PriceCandle.model_validate(candle) for candle in candles]
+    )
@@ -0,0 +1,52 @@
+"""
+Backfill de snapshots diarios de valor por portfolio
+
+Reconstruye portfolio_snapshots desde transactions y las velas diarias
+de prices, un portfolio a la vez (una pasada vectorizada y un commit por
+portfolio), hasta el día anterior a hoy. Los snapshots existentes de
+esos días se reemplazan.
+
+Uso (desde backend/):
+    python -m app.commands.backfill_snapshots
+    python -m app.commands.backfill_snapshots --portfolio 3 --portfolio 7
+    python -m app.commands.backfill_snapshots --only-if-empty
+"""
+
+import argparse
+import asyncio
+from dataclasses import asdict
+
+from app.db.session import AsyncSessionLocal, close_db, init_db
+from app.services.snapshot_service import PortfolioSnapshotService
+
+
+async def main(portfolio_ids: list[int] | None, only_if_empty: bool) -> None:
+    await init_db()
+    try:
+        async with AsyncSessionLocal() as db:
+            report = await PortfolioSnapshotService(db).backfill(
+                portfolio_ids, only_if_empty=only_if_empty
+            )
+    finally:
+        await close_db()
+    
+    for name, value in asdict(report).items():
+        print(f"{name}: {value}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--portfolio",
+        type=int,
+        action="append",
+        dest="portfolio_ids",
+        help="ID de portfolio a reconstruir (repetible; default: todos)"
+    )
+    parser.add_argument(
+        "--only-if-empty",
+        action="store_true",
+        help="No hacer nada si ya hay snapshots"
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.portfolio_ids, args.only_if_empty))
@@ -36,17 +36,98 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str = "sqlite+aiosqlite:///./portfolio_tracker.db"
+    DATABASE_ECHO: bool = False  # Log de cada sentencia SQL
+    
+    # SQLite: "development" (una conexión compartida) o "production"
+    # (WAL, pool de lectura read-only y un solo writer serializado)
+    SQLITE_PROFILE: str = "development"
+    SQLITE_READ_POOL_SIZE: int = 8
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_CACHE_SIZE_KIB: int = 65536
+    SQLITE_MMAP_SIZE_BYTES: int = 268435456
+    
+    # PostgreSQL (asyncpg): pool de conexiones compartido por lecturas y
+    # escrituras; prices se particiona por mes
+    DATABASE_POOL_SIZE: int = 10
+    DATABASE_MAX_OVERFLOW: int = 20
+    DATABASE_POOL_TIMEOUT_SECONDS: float = 30.0
+    DATABASE_POOL_RECYCLE_SECONDS: int = 1800
+    PRICE_PARTITION_MONTHS_AHEAD: int = 3
     
     # Price Updates
-    PRICE_UPDATE_INTERVAL_MINUTES: int = 60
+    PRICE_UPDATE_INTERVAL_MINUTES: int = 60  # Stocks / ETFs
+    PRICE_UPDATE_INTERVAL_CRYPTO_MINUTES: int = 15
+    PRICE_UPDATE_JITTER_SECONDS: int = 30
+    PRICE_REFRESH_DEADLINE_SECONDS: float = 20.0
     ENABLE_AUTO_PRICE_UPDATES: bool = True
     
+    # Cache de último precio (TTL por clase de activo, stale-while-revalidate)
+    PRICE_CACHE_TTL_CRYPTO_SECONDS: int = 60
+    PRICE_CACHE_TTL_STOCK_SECONDS: int = 300
+    
+    # Historial de precios (velas OHLC 1h/1d/1w/1m)
+    PRICE_HISTORY_MAX_POINTS: int = 500
+    # Velas leídas por punto antes de reducir con LTTB (1 = sin LTTB)
+    PRICE_HISTORY_LTTB_OVERSAMPLING: int = 10
+    PRICE_ROLLUP_BACKFILL_BATCH_SIZE: int = 50000
+    
+    # Retención de ticks crudos (se compactan en velas diarias; 0 = nunca)
+    PRICE_RETENTION_DAYS: int = 0
+    PRICE_RETENTION_BATCH_SIZE: int = 5000
+    PRICE_RETENTION_PAUSE_SECONDS: float = 0.05
+    PRICE_RETENTION_RECLAIM: str = "incremental"  # none, incremental, full
+    
+    # Archivo columnar de ticks (.npy con memory map); 0 = sin export periódico
+    PRICE_ARCHIVE_DIR: str = "data/price_archive"
+    PRICE_ARCHIVE_INTERVAL_HOURS: int = 0
+    
+    # Universo de tickers (holdings + transactions), se invalida en escrituras
+    TICKER_REGISTRY_TTL_SECONDS: int = 600
+    
+    # Índice as-of en memoria: segundos antes de releer los ticks nuevos
+    ASOF_INDEX_REFRESH_SECONDS: int = 60
+    
+    # Totales de portfolios en memoria: recarga completa cada N segundos
+    VALUATION_STATE_TTL_SECONDS: int = 300
+    
+    # Snapshots diarios de valor (NAV) por portfolio; 0 = sin job periódico
+    PORTFOLIO_SNAPSHOT_INTERVAL_HOURS: int = 24
+    
+    # Rendimientos (TWR/XIRR) memorizados por portfolio y rango
+    RETURNS_CACHE_TTL_SECONDS: int = 3600
+    RETURNS_CACHE_MAX_ENTRIES: int = 10000
+    
     # External APIs
     COINGECKO_API_URL: str = "https://api.coingecko.com/api/v3"
     COINGECKO_API_KEY: str | None = None
     EXCHANGE_RATE_API_URL: str = "https://api.exchangerate-api.com/v4/latest"
     EXCHANGE_RATE_API_KEY: str | None = None
     
+    # Tabla de tipos de cambio (todas las monedas de la base) en memoria
+    EXCHANGE_RATE_BASE: str = "USD"
+    EXCHANGE_RATE_CACHE_SECONDS: int = 1800
+    
+    # Rate limits de providers (tier gratuito)
+    COINGECKO_RATE_LIMIT_PER_MINUTE: int = 50
+    YAHOO_FINANCE_RATE_LIMIT_PER_HOUR: int = 2000
+    EXCHANGE_RATE_MONTHLY_QUOTA: int = 1500
+    RATE_LIMIT_STATE_DIR: str = "data"
+    
+    # HTTP Client Pool (compartido por todos los providers)
+    HTTP_POOL_MAX_CONNECTIONS: int = 100
+    HTTP_POOL_MAX_CONNECTIONS_PER_HOST: int = 10
+    HTTP_DNS_CACHE_TTL_SECONDS: int = 300
+    HTTP_KEEPALIVE_TIMEOUT_SECONDS: float = 30.0
+    
+    # Yahoo Finance (yfinance es síncrono, corre en thread pool acotado)
+    YAHOO_FINANCE_MAX_WORKERS: int = 4
+    
+    # CoinGecko (catálogo local de coin ids y batches de /simple/price)
+    COINGECKO_CATALOG_PATH: str = "data/coingecko_catalog.json"
+    COINGECKO_CATALOG_TTL_HOURS: int = 24
+    COINGECKO_IDS_PER_REQUEST: int = 250
+    COINGECKO_MAX_CONCURRENT_REQUESTS: int = 3
+    
     # Logging
     LOG_LEVEL: str = "INFO"
     LOG_FILE: str = "logs/app.log"
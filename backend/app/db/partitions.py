@@ -0,0 +1,219 @@
+"""
+Price Partitions (PostgreSQL)
+
+En PostgreSQL la tabla prices está particionada por rango mensual de
+timestamp: una partición prices_yYYYYmMM por mes más una partición
+DEFAULT que recibe cualquier fila cuyo mes aún no tiene partición.
+
+Principios aplicados:
+- Performance: La retención hace DROP de particiones completas en lugar
+  de DELETE fila por fila, y las queries por rango de fechas solo leen
+  las particiones del rango (partition pruning)
+- Fault Tolerance: Una inserción nunca falla por falta de partición; las
+  filas que caen en DEFAULT se mueven a su mes en el siguiente
+  mantenimiento
+- Separation of Concerns: Solo DDL; las queries de PriceRepository son
+  las mismas en SQLite y PostgreSQL
+"""
+
+import re
+from datetime import datetime
+from typing import Iterable, Optional, Union
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.models.price import Price
+
+logger = get_logger(__name__)
+
+PARENT_TABLE = Price.__tablename__
+DEFAULT_PARTITION = f"{PARENT_TABLE}_default"
+_PARTITION_NAME = re.compile(rf"^{PARENT_TABLE}_y(\d{{4}})m(\d{{2}})$")
+
+
+def month_start(timestamp: datetime) -> datetime:
+    """Primer instante del mes que contiene `timestamp`"""
+    return timestamp.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    """Inicio del mes desplazado `months` meses (acepta negativos)"""
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month: datetime) -> str:
+    """Nombre de la partición mensual (ej: prices_y2025m01)"""
+    return f"{PARENT_TABLE}_y{month.year:04d}m{month.month:02d}"
+
+
+class PricePartitionManager:
+    """
+    Crea y elimina particiones mensuales de prices.
+    
+    Opera sobre una AsyncConnection o AsyncSession de PostgreSQL y no
+    hace commit: el caller controla la transacción.
+    """
+    
+    def __init__(self, db: Union[AsyncConnection, AsyncSession]):
+        """
+        Args:
+            db: Conexión o sesión async de PostgreSQL
+        """
+        self.db = db
+    
+    async def list_partitions(self) -> dict[datetime, str]:
+        """
+        Particiones mensuales existentes.
+        
+        Returns:
+            Dict inicio de mes -> nombre de la partición
+        """
+        result = await self.db.execute(
+            text(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+                "WHERE parent.relname = :parent"
+            ),
+            {"parent": PARENT_TABLE}
+        )
+        partitions = {}
+        for (name,) in result.all():
+            match = _PARTITION_NAME.match(name)
+            if match:
+                month = datetime(int(match.group(1)), int(match.group(2)), 1)
+                partitions[month] = name
+        return partitions
+    
+    async def ensure_default(self) -> None:
+        """Crea la partición DEFAULT si no existe"""
+        await self.db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} "
+            f"PARTITION OF {PARENT_TABLE} DEFAULT"
+        ))
+    
+    async def ensure_months(self, months: Iterable[datetime]) -> list[str]:
+        """
+        Crea las particiones faltantes de los meses indicados.
+        
+        Args:
+            months: Fechas dentro de cada mes requerido
+        
+        Returns:
+            Nombres de las particiones creadas
+        """
+        existing = await self.list_partitions()
+        created = []
+        for month in sorted({month_start(m) for m in months}):
+            if month in existing:
+                continue
+            await self._create_partition(month)
+            created.append(partition_name(month))
+        return created
+    
+    async def ensure_upcoming(
+        self,
+        months_ahead: Optional[int] = None,
+        now: Optional[datetime] = None
+    ) -> list[str]:
+        """
+        Mantenimiento: particiones del mes actual y los siguientes, y de
+        cada mes con filas en DEFAULT (ingesta histórica o un mes que
+        llegó antes que su partición).
+        
+        Args:
+            months_ahead: Meses a crear por adelantado (default: settings)
+            now: Fecha de referencia (default: ahora UTC)
+        
+        Returns:
+            Nombres de las particiones creadas
+        """
+        if months_ahead is None:
+            months_ahead = settings.PRICE_PARTITION_MONTHS_AHEAD
+        current = month_start(now or datetime.utcnow())
+        
+        await self.ensure_default()
+        result = await self.db.execute(text(
+            f"SELECT DISTINCT date_trunc('month', timestamp) "
+            f"FROM {DEFAULT_PARTITION}"
+        ))
+        months = [month for (month,) in result.all()]
+        months += [add_months(current, i) for i in range(months_ahead + 1)]
+        
+        created = await self.ensure_months(months)
+        if created:
+            logger.info(
+                "Price partitions created",
+                extra={"partitions": created}
+            )
+        return created
+    
+    async def drop_partitions_before(self, cutoff: datetime) -> list[str]:
+        """
+        Elimina las particiones mensuales que terminan antes del corte.
+        
+        Solo meses completos: las filas del mes del corte (y las de
+        DEFAULT) quedan para el DELETE por chunks de la retención.
+        
+        Args:
+            cutoff: Las filas con timestamp < cutoff están fuera de retención
+        
+        Returns:
+            Nombres de las particiones eliminadas
+        """
+        dropped = []
+        for month, name in sorted((await self.list_partitions()).items()):
+            if add_months(month, 1) > cutoff:
+                continue
+            await self.db.execute(text(f"DROP TABLE {name}"))
+            dropped.append(name)
+        return dropped
+    
+    async def _create_partition(self, month: datetime) -> None:
+        """
+        Crea la partición de un mes.
+        
+        PostgreSQL rechaza la partición si DEFAULT ya tiene filas de ese
+        rango; en ese caso DEFAULT se desprende, las filas se mueven a la
+        partición nueva y DEFAULT se vuelve a adjuntar, todo en la misma
+        transacción.
+        """
+        name = partition_name(month)
+        lower = month.strftime("%Y-%m-%d %H:%M:%S")
+        upper = add_months(month, 1).strftime("%Y-%m-%d %H:%M:%S")
+        create = text(
+            f"CREATE TABLE {name} PARTITION OF {PARENT_TABLE} "
+            f"FOR VALUES FROM ('{lower}') TO ('{upper}')"
+        )
+        in_range = f"timestamp >= '{lower}' AND timestamp < '{upper}'"
+        
+        has_rows = await self.db.scalar(text(
+            f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE {in_range})"
+        ))
+        if not has_rows:
+            await self.db.execute(create)
+            return
+        
+        columns = ", ".join(column.name for column in Price.__table__.columns)
+        await self.db.execute(text(
+            f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {DEFAULT_PARTITION}"
+        ))
+        await self.db.execute(create)
+        moved = await self.db.execute(text(
+            f"INSERT INTO {name} ({columns}) "
+            f"SELECT {columns} FROM {DEFAULT_PARTITION} WHERE {in_range}"
+        ))
+        await self.db.execute(text(
+            f"DELETE FROM {DEFAULT_PARTITION} WHERE {in_range}"
+        ))
+        await self.db.execute(text(
+            f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION "
+            f"{DEFAULT_PARTITION} DEFAULT"
+        ))
+        logger.info(
+            f"Filas movidas de {DEFAULT_PARTITION} a {name}: {moved.rowcount}"
+        )
@@ -10,12 +10,15 @@ Principios aplicados:
 """
 
 from typing import AsyncGenerator
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
     AsyncSession,
     create_async_engine,
     async_sessionmaker
 )
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
 
 from app.core.config import settings
 from app.core.logging import get_logger
@@ -23,23 +26,114 @@ from app.core.logging import get_logger
 logger = get_logger(__name__)
 
 
-# Configuración del engine
-# Para SQLite usamos StaticPool para evitar threading issues
-# En producción con PostgreSQL, usar QueuePool
-engine_kwargs = {}
-if settings.DATABASE_URL.startswith("sqlite"):
-    engine_kwargs["connect_args"] = {"check_same_thread": False}
-    engine_kwargs["poolclass"] = StaticPool
+def _sqlite_pragmas(read_only: bool) -> list[str]:
+    """PRAGMAs por conexión del perfil de producción de SQLite"""
+    pragmas = [
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}",
+        f"PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE_KIB}",
+        f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE_BYTES}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only=ON")
+    else:
+        # Solo aplica a DBs nuevas; permite PRAGMA incremental_vacuum
+        pragmas.insert(0, "PRAGMA auto_vacuum=INCREMENTAL")
+    return pragmas
 
-# Crear engine async
-engine = create_async_engine(
+
+def _apply_pragmas(engine: AsyncEngine, pragmas: list[str]) -> None:
+    """Ejecuta los PRAGMAs en cada conexión nueva del engine"""
+    @event.listens_for(engine.sync_engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+
+def create_engines(
+    database_url: str,
+    sqlite_profile: str = "development",
+    echo: bool = False
+) -> tuple[AsyncEngine, AsyncEngine]:
+    """
+    Crea los engines de escritura y lectura.
+    
+    - SQLite development: un engine con StaticPool (una conexión
+      compartida) que sirve lecturas y escrituras
+    - SQLite production: journal WAL; un writer con una sola conexión
+      (las escrituras se serializan en el pool) y un pool de lectores
+      read-only que leen concurrentemente sin bloquear al writer
+    - PostgreSQL (asyncpg): un engine con QueuePool para ambos, de
+      tamaño configurable y pre_ping para descartar conexiones muertas
+    
+    Args:
+        database_url: URL async de SQLAlchemy
+        sqlite_profile: development o production
+        echo: Log de sentencias SQL
+    
+    Returns:
+        Tupla (writer_engine, reader_engine)
+    """
+    url = make_url(database_url)
+    if url.get_backend_name() != "sqlite":
+        engine = create_async_engine(
+            database_url,
+            echo=echo,
+            pool_size=settings.DATABASE_POOL_SIZE,
+            max_overflow=settings.DATABASE_MAX_OVERFLOW,
+            pool_timeout=settings.DATABASE_POOL_TIMEOUT_SECONDS,
+            pool_recycle=settings.DATABASE_POOL_RECYCLE_SECONDS,
+            pool_pre_ping=True,
+        )
+        return engine, engine
+    
+    in_memory = url.database in (None, "", ":memory:")
+    if sqlite_profile != "production" or in_memory:
+        if sqlite_profile == "production":
+            logger.warning("SQLite en memoria: se ignora el perfil production")
+        # Una conexión compartida: evita threading issues en desarrollo
+        engine = create_async_engine(
+            database_url,
+            echo=echo,
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+        )
+        return engine, engine
+    
+    writer = create_async_engine(
+        database_url,
+        echo=echo,
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+    )
+    _apply_pragmas(writer, _sqlite_pragmas(read_only=False))
+    
+    reader = create_async_engine(
+        database_url,
+        echo=echo,
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=settings.SQLITE_READ_POOL_SIZE,
+        max_overflow=0,
+    )
+    _apply_pragmas(reader, _sqlite_pragmas(read_only=True))
+    
+    return writer, reader
+
+
+# Engine de escritura (ingesta, endpoints que modifican) y de lectura
+# (endpoints GET). Fuera del perfil production de SQLite son el mismo.
+engine, read_engine = create_engines(
     settings.DATABASE_URL,
-    echo=settings.DEBUG,  # Log SQL queries en desarrollo
-    future=True,
-    **engine_kwargs
+    sqlite_profile=settings.SQLITE_PROFILE,
+    echo=settings.DATABASE_ECHO,
 )
 
-# Session factory
+# Session factories
 AsyncSessionLocal = async_sessionmaker(
     engine,
     class_=AsyncSession,
@@ -48,6 +142,14 @@ AsyncSessionLocal = async_sessionmaker(
     autoflush=False,
 )
 
+AsyncReadSessionLocal = async_sessionmaker(
+    read_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+    autocommit=False,
+    autoflush=False,
+)
+
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """
@@ -81,20 +183,42 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             logger.debug("Database session closed")
 
 
+async def get_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency provider de solo lectura para endpoints GET.
+    
+    Usa el pool de lectores: en el perfil production de SQLite varias
+    lecturas corren en paralelo con la ingesta. Nunca hace commit.
+    
+    Yields:
+        AsyncSession de solo lectura
+    """
+    async with AsyncReadSessionLocal() as session:
+        try:
+            yield session
+        finally:
+            await session.rollback()
+            await session.close()
+
+
 async def init_db() -> None:
     """
     Inicializa la base de datos.
     
-    Crea todas las tablas definidas en los modelos.
+    Crea todas las tablas definidas en los modelos y, en PostgreSQL,
+    las particiones mensuales de prices del mes actual en adelante.
     Solo usar en desarrollo - en producción usar Alembic migrations.
     """
     from app.db.base import Base
+    from app.db.partitions import PricePartitionManager
     # Importar todos los modelos para que SQLAlchemy los registre
     from app.models import portfolio, holding, transaction, price  # noqa
     
     async with engine.begin() as conn:
         logger.info("Creating database tables...")
         await conn.run_sync(Base.metadata.create_all)
+        if conn.dialect.name == "postgresql":
+            await PricePartitionManager(conn).ensure_upcoming()
         logger.info("Database tables created successfully")
 
 
@@ -106,4 +230,6 @@ async def close_db() -> None:
     """
     logger.info("Closing database connections...")
     await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
     logger.info("Database connections closed")
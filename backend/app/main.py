@@ -1,16 +1,85 @@
 ﻿# Portfolio Tracker - Backend API
 # Version minima funcional con endpoints mock
 
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.api.v1.api import api_router
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.providers.http_client import http_pool
+from app.providers.yahoo_finance import (
+    shutdown_executor as shutdown_yfinance,
+    start_executor as start_yfinance,
+)
+
+logger = get_logger(__name__)
+
+
+async def warm_price_cache() -> None:
+    """
+    Carga el ultimo precio persistido de cada ticker en el cache.
+    
+    Best effort: si la base de datos aun no existe la app arranca igual
+    y el cache se llena con el primer fetch.
+    """
+    try:
+        from app.db.session import AsyncSessionLocal
+        from app.services.price_service import PriceService
+        
+        async with AsyncSessionLocal() as db:
+            count = await PriceService(db).warm_cache()
+        logger.info(f"Cache de precios precargado con {count} tickers")
+    except Exception as e:
+        logger.warning(f"No se pudo precargar el cache de precios: {e}")
+
+
+def start_price_scheduler():
+    """
+    Arranca el refresh periodico de precios si esta habilitado.
+    
+    Returns:
+        Scheduler arrancado o None
+    """
+    if not settings.ENABLE_AUTO_PRICE_UPDATES:
+        return None
+    
+    try:
+        from app.services.price_scheduler import price_scheduler
+        
+        price_scheduler.start()
+        return price_scheduler
+    except Exception as e:
+        logger.warning(f"No se pudo arrancar el scheduler de precios: {e}")
+        return None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Recursos compartidos ligados al ciclo de vida de la app"""
+    # Startup: pool HTTP compartido por los price providers y threads de yfinance
+    await http_pool.start()
+    start_yfinance()
+    await warm_price_cache()
+    scheduler = start_price_scheduler()
+    yield
+    # Shutdown: detener refresh, cerrar conexiones keep-alive y threads de yfinance
+    if scheduler is not None:
+        scheduler.shutdown()
+    await http_pool.close()
+    shutdown_yfinance()
+
+
 # Crear aplicacion FastAPI
 app = FastAPI(
     title="Portfolio Tracker API",
     description="Sistema profesional de tracking de inversiones",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # Configurar CORS
@@ -27,6 +96,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Routers de la API v1 (portfolios, prices)
+app.include_router(api_router, prefix=settings.API_V1_PREFIX)
+
 # ============================================
 # ENDPOINTS
 # ============================================
@@ -50,53 +122,6 @@ async def root():
         "health": "/health"
     }
 
-# ============================================
-# PORTFOLIOS ENDPOINTS
-# ============================================
-
-@app.get("/api/v1/portfolios")
-async def list_portfolios():
-    """Lista todos los portfolios (mock data)"""
-    return [
-        {
-            "id": 1,
-            "name": "Portfolio Principal",
-            "description": "Mi portafolio de inversiones",
-            "target_voo_percent": 40.0,
-            "target_vgt_percent": 30.0,
-            "target_btc_percent": 20.0,
-            "target_eth_percent": 10.0,
-            "created_at": "2025-01-01T00:00:00",
-            "updated_at": "2025-01-01T00:00:00"
-        },
-        {
-            "id": 2,
-            "name": "Portfolio Agresivo",
-            "description": "Portfolio con mayor riesgo",
-            "target_voo_percent": 20.0,
-            "target_vgt_percent": 30.0,
-            "target_btc_percent": 30.0,
-            "target_eth_percent": 20.0,
-            "created_at": "2025-01-01T00:00:00",
-            "updated_at": "2025-01-01T00:00:00"
-        }
-    ]
-
-@app.get("/api/v1/portfolios/{portfolio_id}")
-async def get_portfolio(portfolio_id: int):
-    """Obtiene un portfolio especifico por ID"""
-    return {
-        "id": portfolio_id,
-        "name": "Portfolio Principal",
-        "description": "Mi portafolio de inversiones",
-        "target_voo_percent": 40.0,
-        "target_vgt_percent": 30.0,
-        "target_btc_percent": 20.0,
-        "target_eth_percent": 10.0,
-        "created_at": "2025-01-01T00:00:00",
-        "updated_at": "2025-01-01T00:00:00"
-    }
-
 # ============================================
 # HOLDINGS ENDPOINTS
 # ============================================
@@ -152,41 +177,6 @@ async def list_holdings(portfolio_id: int = None):
     
     return holdings
 
-# ============================================
-# PRICES ENDPOINTS
-# ============================================
-
-@app.get("/api/v1/prices/latest")
-async def get_latest_prices():
-    """Obtiene precios actuales de todos los activos (mock data)"""
-    return {
-        "VOO": 470.50,
-        "VGT": 510.25,
-        "BTC": 45000.00,
-        "ETH": 2500.00,
-        "timestamp": "2025-10-31T14:00:00"
-    }
-
-@app.get("/api/v1/prices/{ticker}")
-async def get_price(ticker: str):
-    """Obtiene precio actual de un ticker especifico"""
-    prices = {
-        "VOO": 470.50,
-        "VGT": 510.25,
-        "BTC": 45000.00,
-        "ETH": 2500.00
-    }
-    
-    price = prices.get(ticker.upper())
-    if not price:
-        return {"error": f"Ticker {ticker} no encontrado"}
-    
-    return {
-        "ticker": ticker.upper(),
-        "price": price,
-        "timestamp": "2025-10-31T14:00:00"
-    }
-
 # ============================================
 # ANALYTICS ENDPOINTS
 # ============================================
@@ -7,19 +7,22 @@ Uso:
     from app.models import Portfolio, Holding, Price, Transaction
 """
 
-from app.models.portfolio import Portfolio, Holding
-from app.models.price import Price, ExchangeRate, PriceCalculator
+from app.models.portfolio import Portfolio, PortfolioSnapshot
+from app.models.holding import Holding
+from app.models.price import Price, LatestPrice, PriceRollup, ExchangeRate
 from app.models.transaction import Transaction, TransactionType, TransactionHelper
 
 __all__ = [
     # Portfolio models
     "Portfolio",
+    "PortfolioSnapshot",
     "Holding",
     
     # Price models
     "Price",
+    "LatestPrice",
+    "PriceRollup",
     "ExchangeRate",
-    "PriceCalculator",
     
     # Transaction models
     "Transaction",
@@ -8,8 +8,20 @@ Principios aplicados:
 - Rich Domain Model: Lógica de negocio en el modelo
 """
 
-from sqlalchemy import Column, String, Text, Boolean
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Date,
+    DateTime,
+    ForeignKey,
+    Integer,
+    Numeric,
+    String,
+    Text,
+    UniqueConstraint,
+)
 from sqlalchemy.orm import relationship
+from datetime import datetime
 
 from app.db.base import Base, PKMixin, TimestampMixin
 
@@ -29,6 +41,7 @@ class Portfolio(Base, PKMixin, TimestampMixin):
         target_eth_percent: Porcentaje objetivo para ETH
         holdings: Relación con holdings
         transactions: Relación con transacciones
+        snapshots: Relación con valores diarios (NAV)
     """
     
     __tablename__ = "portfolios"
@@ -100,6 +113,13 @@ class Portfolio(Base, PKMixin, TimestampMixin):
         doc="Transacciones de este portafolio"
     )
     
+    snapshots = relationship(
+        "PortfolioSnapshot",
+        back_populates="portfolio",
+        cascade="all, delete-orphan",
+        doc="Valor diario precalculado de este portafolio"
+    )
+    
     def __repr__(self) -> str:
         return f"<Portfolio(id={self.id}, name='{self.name}', active={self.is_active})>"
     
@@ -117,3 +137,106 @@ class Portfolio(Base, PKMixin, TimestampMixin):
             "BTC": float(self.target_btc_percent),
             "ETH": float(self.target_eth_percent),
         }
+
+
+class PortfolioSnapshot(Base, PKMixin):
+    """
+    Valor de un portafolio al cierre de un día (NAV).
+    
+    Lo escriben el job diario y el backfill con el mismo replay de
+    transacciones y velas diarias (el job valúa el día con los últimos
+    precios y rellena los días que faltan desde el último snapshot),
+    para que las gráficas de valor sean una consulta de rango sobre
+    (portfolio_id, snapshot_date).
+    
+    Attributes:
+        portfolio_id: ID del portafolio
+        snapshot_date: Día (UTC) del valor
+        value_usd: Valor de mercado de las posiciones en USD
+        value_mxn: Valor en MXN (None sin tipo de cambio)
+        invested_usd: Aportaciones netas acumuladas hasta ese día
+        net_flow_usd: Aportaciones netas del día (compras - ventas)
+        holdings_count: Activos con cantidad > 0
+        source: daily o backfill
+    """
+    
+    __tablename__ = "portfolio_snapshots"
+    
+    portfolio_id = Column(
+        ForeignKey("portfolios.id", ondelete="CASCADE"),
+        nullable=False,
+        doc="ID del portafolio"
+    )
+    
+    snapshot_date = Column(
+        Date,
+        nullable=False,
+        doc="Día (UTC) del valor"
+    )
+    
+    value_usd = Column(
+        Numeric(precision=20, scale=2),
+        nullable=False,
+        doc="Valor de mercado en USD"
+    )
+    
+    value_mxn = Column(
+        Numeric(precision=20, scale=2),
+        nullable=True,
+        doc="Valor de mercado en MXN"
+    )
+    
+    invested_usd = Column(
+        Numeric(precision=20, scale=2),
+        nullable=False,
+        default=0,
+        doc="Aportaciones netas acumuladas en USD"
+    )
+    
+    net_flow_usd = Column(
+        Numeric(precision=20, scale=2),
+        nullable=False,
+        default=0,
+        doc="Aportaciones netas del día en USD"
+    )
+    
+    holdings_count = Column(
+        Integer,
+        nullable=False,
+        default=0,
+        doc="Activos con cantidad > 0"
+    )
+    
+    source = Column(
+        String(20),
+        nullable=False,
+        doc="Origen: daily o backfill"
+    )
+    
+    created_at = Column(
+        DateTime,
+        default=datetime.utcnow,
+        nullable=False,
+        doc="Cuándo se escribió el snapshot"
+    )
+    
+    portfolio = relationship(
+        "Portfolio",
+        back_populates="snapshots"
+    )
+    
+    __table_args__ = (
+        # Un valor por día; también sirve de índice para leer un rango
+        # de días de un portafolio
+        UniqueConstraint(
+            'portfolio_id',
+            'snapshot_date',
+            name='uq_portfolio_snapshot_date'
+        ),
+    )
+    
+    def __repr__(self) -> str:
+        return (
+            f"<PortfolioSnapshot(portfolio_id={self.portfolio_id}, "
+            f"date={self.snapshot_date}, value=${self.value_usd})>"
+        )
@@ -5,12 +5,25 @@ Almacena historial de precios de todos los activos.
 
 Principios aplicados:
 - Single Responsibility: Solo estructura de precios históricos
-- Time Series Optimization: Índices optimizados para queries temporales
+- Time Series Optimization: Índices optimizados para queries temporales;
+  en PostgreSQL prices se particiona por mes (ver app.db.partitions)
 """
 
 from decimal import Decimal
 from datetime import datetime
-from sqlalchemy import Column, String, Numeric, DateTime, Index, UniqueConstraint
+from sqlalchemy import (
+    DDL,
+    Column,
+    Integer,
+    String,
+    Numeric,
+    DateTime,
+    Index,
+    PrimaryKeyConstraint,
+    UniqueConstraint,
+    event,
+)
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.sql import func
 
 from app.db.base import Base, PKMixin
@@ -103,6 +116,8 @@ class Price(Base, PKMixin):
             'timestamp',
             name='uq_ticker_timestamp'
         ),
+        # PostgreSQL: particionada por rango mensual de timestamp
+        {"postgresql_partition_by": "RANGE (timestamp)"},
     )
     
     def __repr__(self) -> str:
@@ -146,3 +161,285 @@ class Price(Base, PKMixin):
             source=source,
             **kwargs
         )
+
+
+@compiles(PrimaryKeyConstraint, "postgresql")
+def _compile_primary_key(constraint, compiler, **kw):
+    """
+    En PostgreSQL toda PK de una tabla particionada debe incluir la
+    columna de partición: prices usa PRIMARY KEY (id, timestamp). El ORM
+    sigue identificando filas solo por id (SERIAL, único de todos modos).
+    """
+    ddl = compiler.visit_primary_key_constraint(constraint, **kw)
+    if constraint.table is Price.__table__:
+        ddl = ddl.replace("PRIMARY KEY (id)", "PRIMARY KEY (id, timestamp)")
+    return ddl
+
+
+# Partición DEFAULT: ninguna inserción falla por falta de partición del
+# mes; PricePartitionManager mueve esas filas a su partición mensual
+event.listen(
+    Price.__table__,
+    "after_create",
+    DDL(
+        "CREATE TABLE IF NOT EXISTS prices_default "
+        "PARTITION OF prices DEFAULT"
+    ).execute_if(dialect="postgresql")
+)
+
+
+class LatestPrice(Base):
+    """
+    Último precio conocido por ticker (tabla materializada).
+    
+    Se mantiene con upsert en la misma transacción que el INSERT a
+    prices, de modo que leer el precio actual no depende del tamaño
+    del histórico.
+    
+    Attributes:
+        ticker: Symbol del activo (primary key)
+        price_id: ID del snapshot en prices
+        price_usd, price_mxn, exchange_rate, volume_24h, market_cap,
+        source, timestamp: Copia del snapshot más reciente
+    """
+    
+    __tablename__ = "latest_prices"
+    
+    ticker = Column(
+        String(20),
+        primary_key=True,
+        doc="Symbol del activo"
+    )
+    
+    price_id = Column(
+        Integer,
+        nullable=True,
+        doc="ID del snapshot en prices"
+    )
+    
+    price_usd = Column(
+        Numeric(precision=20, scale=2),
+        nullable=False,
+        doc="Precio en USD"
+    )
+    
+    price_mxn = Column(
+        Numeric(precision=20, scale=2),
+        nullable=True,
+        doc="Precio en MXN"
+    )
+    
+    exchange_rate = Column(
+        Numeric(precision=10, scale=4),
+        nullable=True,
+        doc="Tipo de cambio USD/MXN"
+    )
+    
+    volume_24h = Column(
+        Numeric(precision=30, scale=2),
+        nullable=True,
+        doc="Volumen de trading 24h"
+    )
+    
+    market_cap = Column(
+        Numeric(precision=30, scale=2),
+        nullable=True,
+        doc="Market capitalization (crypto)"
+    )
+    
+    source = Column(
+        String(50),
+        nullable=False,
+        doc="Fuente del precio (yahoo, coingecko)"
+    )
+    
+    timestamp = Column(
+        DateTime,
+        nullable=False,
+        doc="Momento del precio"
+    )
+    
+    def __repr__(self) -> str:
+        return (
+            f"<LatestPrice(ticker='{self.ticker}', "
+            f"price=${self.price_usd}, "
+            f"timestamp={self.timestamp})>"
+        )
+
+
+class PriceRollup(Base, PKMixin):
+    """
+    Vela OHLC de un ticker en una resolución (1h, 1d, 1w, 1m).
+    
+    Se mantiene incrementalmente al ingerir ticks: cada batch se agrega
+    por bucket y se fusiona con la vela existente (high/low por máximo y
+    mínimo, open/close por el tick más antiguo/reciente).
+    
+    Attributes:
+        ticker: Symbol del activo
+        resolution: 1h, 1d, 1w (semana ISO, inicia lunes) o 1m (mes)
+        bucket_start: Inicio del bucket (UTC)
+        open_usd, high_usd, low_usd, close_usd: OHLC en USD
+        open_at, close_at: Timestamps del primer y último tick
+        tick_count: Ticks agregados en la vela
+    """
+    
+    __tablename__ = "price_rollups"
+    
+    ticker = Column(
+        String(20),
+        nullable=False,
+        doc="Symbol del activo"
+    )
+    
+    resolution = Column(
+        String(4),
+        nullable=False,
+        doc="Resolución: 1h, 1d, 1w, 1m"
+    )
+    
+    bucket_start = Column(
+        DateTime,
+        nullable=False,
+        doc="Inicio del bucket"
+    )
+    
+    # OHLC
+    open_usd = Column(
+        Numeric(precision=20, scale=2),
+        nullable=False,
+        doc="Precio del primer tick del bucket"
+    )
+    
+    high_usd = Column(
+        Numeric(precision=20, scale=2),
+        nullable=False,
+        doc="Precio máximo del bucket"
+    )
+    
+    low_usd = Column(
+        Numeric(precision=20, scale=2),
+        nullable=False,
+        doc="Precio mínimo del bucket"
+    )
+    
+    close_usd = Column(
+        Numeric(precision=20, scale=2),
+        nullable=False,
+        doc="Precio del último tick del bucket"
+    )
+    
+    open_at = Column(
+        DateTime,
+        nullable=False,
+        doc="Timestamp del primer tick"
+    )
+    
+    close_at = Column(
+        DateTime,
+        nullable=False,
+        doc="Timestamp del último tick"
+    )
+    
+    tick_count = Column(
+        Integer,
+        nullable=False,
+        default=0,
+        doc="Ticks agregados"
+    )
+    
+    __table_args__ = (
+        # Una vela por (ticker, resolución, bucket); también sirve de
+        # índice para leer un rango de velas de un ticker
+        UniqueConstraint(
+            'ticker',
+            'resolution',
+            'bucket_start',
+            name='uq_rollup_ticker_resolution_bucket'
+        ),
+    )
+    
+    def __repr__(self) -> str:
+        return (
+            f"<PriceRollup(ticker='{self.ticker}', "
+            f"resolution='{self.resolution}', "
+            f"bucket_start={self.bucket_start}, "
+            f"close=${self.close_usd})>"
+        )
+
+
+class ExchangeRate(Base, PKMixin):
+    """
+    Tipo de cambio de una moneda contra otra en un snapshot.
+    
+    Cada consulta al provider trae la tabla completa de una moneda base
+    (USD contra ~160 monedas) y se guarda como un snapshot: una fila por
+    moneda destino, todas con el mismo timestamp.
+    
+    Attributes:
+        from_currency: Moneda base (ISO 4217, ej: USD)
+        to_currency: Moneda destino (ej: MXN)
+        rate: Unidades de to_currency por 1 from_currency
+        source: Provider que publicó la tabla
+        timestamp: Momento de la tabla según el provider
+        created_at: Momento en que se guardó
+    """
+    
+    __tablename__ = "exchange_rates"
+    
+    from_currency = Column(
+        String(3),
+        nullable=False,
+        doc="Moneda base"
+    )
+    
+    to_currency = Column(
+        String(3),
+        nullable=False,
+        doc="Moneda destino"
+    )
+    
+    rate = Column(
+        Numeric(precision=24, scale=10),
+        nullable=False,
+        doc="Unidades de to_currency por 1 from_currency"
+    )
+    
+    source = Column(
+        String(50),
+        nullable=False,
+        doc="Provider de la tabla"
+    )
+    
+    timestamp = Column(
+        DateTime,
+        nullable=False,
+        doc="Momento de la tabla según el provider"
+    )
+    
+    created_at = Column(
+        DateTime,
+        default=datetime.utcnow,
+        nullable=False,
+        server_default=func.now(),
+        doc="Momento en que se guardó el snapshot"
+    )
+    
+    __table_args__ = (
+        # Un snapshot no se guarda dos veces si el provider no publicó
+        # una tabla nueva; también sirve para el as-of de un par
+        UniqueConstraint(
+            'from_currency',
+            'to_currency',
+            'timestamp',
+            name='uq_exchange_rate_pair_timestamp'
+        ),
+        # Último snapshot de una moneda base
+        Index('ix_exchange_rate_from_timestamp', 'from_currency', 'timestamp'),
+    )
+    
+    def __repr__(self) -> str:
+        return (
+            f"<ExchangeRate({self.from_currency}/{self.to_currency}="
+            f"{self.rate}, timestamp={self.timestamp})>"
+        )
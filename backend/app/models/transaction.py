@@ -23,7 +23,7 @@ from sqlalchemy import (
     Enum as SQLEnum,
 )
 from sqlalchemy.orm import relationship
-from app.core.database import Base
+from app.db.base import Base
 
 
 class TransactionType(str, Enum):
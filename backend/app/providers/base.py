@@ -9,11 +9,23 @@ Principios aplicados:
 - Strategy Pattern: Diferentes estrategias para obtener precios
 """
 
+import asyncio
 from abc import ABC, abstractmethod
 from typing import Optional, List
 from dataclasses import dataclass
 from datetime import datetime
 
+import aiohttp
+
+from app.providers.http_client import HTTPClientPool, http_pool
+from app.providers.rate_limiter import (
+    QuotaExceededError,
+    RateBudget,
+    RateLimit,
+    TokenBucketRateLimiter,
+    get_rate_limiter,
+)
+
 
 @dataclass
 class PriceData:
@@ -37,6 +49,33 @@ class ExchangeRateData:
     timestamp: datetime
 
 
+@dataclass
+class ExchangeRateSnapshot:
+    """Tabla completa de tipos de cambio de una moneda base"""
+    base: str
+    rates: dict[str, float]
+    source: str
+    timestamp: datetime
+    stored_at: Optional[datetime] = None
+    
+    def get(self, to_currency: str) -> Optional[ExchangeRateData]:
+        """Tipo de cambio base -> to_currency (None si no está en la tabla)"""
+        to_currency = to_currency.upper()
+        if to_currency == self.base:
+            rate = 1.0
+        elif to_currency in self.rates:
+            rate = self.rates[to_currency]
+        else:
+            return None
+        return ExchangeRateData(
+            from_currency=self.base,
+            to_currency=to_currency,
+            rate=rate,
+            source=self.source,
+            timestamp=self.timestamp
+        )
+
+
 class IPriceProvider(ABC):
     """
     Interface para price providers.
@@ -94,12 +133,49 @@ class IPriceProvider(ABC):
 class BaseProvider(IPriceProvider):
     """
     Implementación base con utilidades comunes.
+    
+    Cada subclase declara su RATE_LIMIT; todas las instancias de un mismo
+    provider comparten el token bucket del proceso.
     """
     
-    def __init__(self, timeout: int = 10, max_retries: int = 3):
+    # Rate limit del provider (None = sin límite)
+    RATE_LIMIT: Optional[RateLimit] = None
+    
+    def __init__(
+        self,
+        timeout: int = 10,
+        max_retries: int = 3,
+        pool: Optional[HTTPClientPool] = None
+    ):
+        """
+        Args:
+            timeout: Timeout total por request en segundos
+            max_retries: Intentos máximos por request
+            pool: Pool HTTP a usar (default: pool compartido del proceso)
+        """
         self.timeout = timeout
         self.max_retries = max_retries
-        self._session = None
+        self._pool = pool or http_pool
+        self.rate_limiter: Optional[TokenBucketRateLimiter] = (
+            get_rate_limiter(self.name, self.RATE_LIMIT)
+            if self.RATE_LIMIT else None
+        )
+    
+    async def _throttle(self, tokens: int = 1) -> None:
+        """
+        Espera turno en el rate limiter del provider.
+        
+        Raises:
+            QuotaExceededError: Si la cuota mensual está agotada
+        """
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire(tokens)
+    
+    def rate_budget(self) -> Optional[RateBudget]:
+        """Presupuesto de requests restante (None si no hay límite)"""
+        if self.rate_limiter is None:
+            return None
+        return self.rate_limiter.budget()
     
     async def _make_request(
         self,
@@ -110,28 +186,43 @@ class BaseProvider(IPriceProvider):
         """
         Hace una request HTTP con retry logic.
         
+        Usa la sesión compartida del pool para reutilizar conexiones
+        (keep-alive) entre requests y entre intentos. Cada intento pasa
+        por el rate limiter; un 429 pausa el bucket para todos los callers.
+        
         Returns:
             JSON response o None si falla
         """
-        import aiohttp
-        import asyncio
+        session = self._pool.get_session()
         
         for attempt in range(self.max_retries):
             try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(
-                        url,
-                        params=params,
-                        headers=headers,
-                        timeout=aiohttp.ClientTimeout(total=self.timeout)
-                    ) as response:
-                        if response.status == 200:
-                            return await response.json()
-                        elif response.status == 429:  # Rate limit
-                            wait_time = 2 ** attempt  # Exponential backoff
-                            await asyncio.sleep(wait_time)
+                await self._throttle()
+            except QuotaExceededError as e:
+                print(f"Error in {self.name}: {str(e)}")
+                return None
+            
+            try:
+                async with session.get(
+                    url,
+                    params=params,
+                    headers=headers,
+                    timeout=aiohttp.ClientTimeout(total=self.timeout)
+                ) as response:
+                    if response.status == 200:
+                        return await response.json()
+                    elif response.status == 429:  # Rate limit
+                        retry_after = response.headers.get("Retry-After", "")
+                        wait_time = (
+                            float(retry_after) if retry_after.isdigit()
+                            else 2 ** attempt  # Exponential backoff
+                        )
+                        if self.rate_limiter is not None:
+                            self.rate_limiter.pause(wait_time)
                         else:
-                            return None
+                            await asyncio.sleep(wait_time)
+                    else:
+                        return None
             except (aiohttp.ClientError, asyncio.TimeoutError) as e:
                 if attempt == self.max_retries - 1:
                     print(f"Error in {self.name}: {str(e)}")
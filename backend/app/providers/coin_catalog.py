@@ -0,0 +1,170 @@
+"""
+CoinGecko Coin Catalog
+
+Índice local symbol -> coin id de CoinGecko, persistido en disco y
+refrescado periódicamente.
+
+Principios aplicados:
+- Caching: El catálogo completo se descarga como máximo una vez por TTL
+- Fault Tolerance: Si el refresh falla se sigue usando la copia anterior
+- Single Responsibility: Solo resolución de símbolos, no precios
+"""
+
+import asyncio
+import json
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from app.core.config import settings
+
+
+# Firma de la función que hace GET a CoinGecko (BaseProvider._make_request)
+Fetcher = Callable[..., Awaitable[Optional[object]]]
+
+
+class CoinCatalog:
+    """
+    Catálogo de monedas de CoinGecko.
+    
+    Muchos símbolos están repetidos (tokens bridged, forks, memecoins).
+    Para resolver colisiones se usa el ranking por market cap de
+    /coins/markets: gana la moneda con mayor capitalización. Los símbolos
+    que no aparecen en el ranking se toman de /coins/list solo si son únicos.
+    """
+    
+    # Espera mínima entre intentos fallidos de refresh
+    RETRY_INTERVAL = timedelta(minutes=5)
+    
+    def __init__(
+        self,
+        path: str,
+        ttl_hours: int = 24,
+        ranked_pages: int = 4
+    ):
+        """
+        Args:
+            path: Archivo JSON donde se persiste el índice
+            ttl_hours: Horas antes de considerar el catálogo viejo
+            ranked_pages: Páginas de 250 monedas de /coins/markets a usar
+        """
+        self.path = Path(path)
+        self.ttl = timedelta(hours=ttl_hours)
+        self.ranked_pages = ranked_pages
+        self._symbols: dict[str, str] = {}
+        self._fetched_at: Optional[datetime] = None
+        self._retry_at: Optional[datetime] = None
+        self._lock = asyncio.Lock()
+    
+    @property
+    def is_loaded(self) -> bool:
+        """True si hay un índice disponible (aunque esté viejo)"""
+        return bool(self._symbols)
+    
+    @property
+    def is_stale(self) -> bool:
+        """True si el índice no existe o superó el TTL"""
+        if self._fetched_at is None:
+            return True
+        return datetime.utcnow() - self._fetched_at > self.ttl
+    
+    def resolve(self, ticker: str) -> Optional[str]:
+        """Convierte un símbolo a coin id, o None si no se conoce"""
+        return self._symbols.get(ticker.upper().strip())
+    
+    def _load_from_disk(self) -> None:
+        """Carga el índice persistido si existe"""
+        if not self.path.exists():
+            return
+        
+        try:
+            payload = json.loads(self.path.read_text(encoding="utf-8"))
+            self._symbols = payload["symbols"]
+            self._fetched_at = datetime.fromisoformat(payload["fetched_at"])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error loading CoinGecko catalog: {str(e)}")
+    
+    def _save_to_disk(self) -> None:
+        """Persiste el índice en disco"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {
+            "fetched_at": self._fetched_at.isoformat(),
+            "symbols": self._symbols,
+        }
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(payload), encoding="utf-8")
+        tmp_path.replace(self.path)
+    
+    async def _download(self, fetch: Fetcher, base_url: str) -> dict[str, str]:
+        """Construye el índice symbol -> id desde la API"""
+        symbols: dict[str, str] = {}
+        
+        # 1. Monedas rankeadas por market cap (resuelven colisiones)
+        for page in range(1, self.ranked_pages + 1):
+            markets = await fetch(
+                f"{base_url}/coins/markets",
+                params={
+                    "vs_currency": "usd",
+                    "order": "market_cap_desc",
+                    "per_page": 250,
+                    "page": page,
+                }
+            )
+            if not markets:
+                break
+            for coin in markets:
+                symbols.setdefault(coin["symbol"].upper(), coin["id"])
+        
+        # 2. Resto del catálogo, solo símbolos sin ambigüedad
+        coins = await fetch(f"{base_url}/coins/list") or []
+        candidates: dict[str, list[str]] = {}
+        for coin in coins:
+            candidates.setdefault(coin["symbol"].upper(), []).append(coin["id"])
+        for symbol, ids in candidates.items():
+            if symbol not in symbols and len(ids) == 1:
+                symbols[symbol] = ids[0]
+        
+        return symbols
+    
+    async def ensure_fresh(self, fetch: Fetcher, base_url: str) -> None:
+        """
+        Garantiza un índice vigente.
+        
+        Carga desde disco la primera vez y solo descarga de la API si el
+        índice venció. Llamadas concurrentes esperan un único refresh.
+        """
+        if not self.is_stale:
+            return
+        
+        async with self._lock:
+            if self._fetched_at is None:
+                self._load_from_disk()
+            if not self.is_stale:
+                return
+            # Evitar reintentar en cada request si la API está caída
+            if self._retry_at and datetime.utcnow() < self._retry_at:
+                return
+            
+            try:
+                symbols = await self._download(fetch, base_url)
+            except Exception as e:
+                print(f"Error refreshing CoinGecko catalog: {str(e)}")
+                symbols = {}
+            
+            if not symbols:
+                self._retry_at = datetime.utcnow() + self.RETRY_INTERVAL
+                return
+            
+            self._symbols = symbols
+            self._fetched_at = datetime.utcnow()
+            try:
+                self._save_to_disk()
+            except OSError as e:
+                print(f"Error saving CoinGecko catalog: {str(e)}")
+
+
+# Catálogo por proceso, compartido por todas las instancias del provider
+coin_catalog = CoinCatalog(
+    path=settings.COINGECKO_CATALOG_PATH,
+    ttl_hours=settings.COINGECKO_CATALOG_TTL_HOURS,
+)
@@ -4,9 +4,12 @@ CoinGecko Provider
 Obtiene precios de criptomonedas desde CoinGecko API.
 """
 
+import asyncio
 from typing import Optional, List
 from datetime import datetime
-from app.providers.base import BaseProvider, PriceData
+from app.core.config import settings
+from app.providers.base import BaseProvider, PriceData, RateLimit
+from app.providers.coin_catalog import CoinCatalog, coin_catalog
 
 
 class CoinGeckoProvider(BaseProvider):
@@ -16,12 +19,20 @@ class CoinGeckoProvider(BaseProvider):
     Soporta:
     - Bitcoin, Ethereum, y +13,000 cryptos
     
+    Los símbolos se resuelven con un catálogo local (ver CoinCatalog);
+    los batches grandes se parten en chunks que se piden en paralelo.
+    
     Rate Limits: 50 requests/min (free tier)
     """
     
     BASE_URL = "https://api.coingecko.com/api/v3"
     
-    # Mapeo de tickers a IDs de CoinGecko
+    RATE_LIMIT = RateLimit(
+        requests=settings.COINGECKO_RATE_LIMIT_PER_MINUTE,
+        period_seconds=60
+    )
+    
+    # Overrides explícitos: tienen prioridad sobre el catálogo
     TICKER_TO_ID = {
         "BTC": "bitcoin",
         "ETH": "ethereum",
@@ -35,35 +46,60 @@ class CoinGeckoProvider(BaseProvider):
         "AVAX": "avalanche-2",
     }
     
+    def __init__(
+        self,
+        catalog: Optional[CoinCatalog] = None,
+        ids_per_request: int = settings.COINGECKO_IDS_PER_REQUEST,
+        max_concurrent_requests: int = settings.COINGECKO_MAX_CONCURRENT_REQUESTS,
+        **kwargs
+    ):
+        """
+        Args:
+            catalog: Catálogo symbol -> id (default: catálogo del proceso)
+            ids_per_request: Máximo de ids por llamada a /simple/price
+            max_concurrent_requests: Chunks en vuelo simultáneamente
+        """
+        super().__init__(**kwargs)
+        self.catalog = catalog or coin_catalog
+        self.ids_per_request = ids_per_request
+        self.max_concurrent_requests = max_concurrent_requests
+    
     @property
     def name(self) -> str:
         return "coingecko"
     
-    def _get_coin_id(self, ticker: str) -> str:
-        """Convierte ticker a CoinGecko ID"""
-        ticker_upper = ticker.upper()
-        return self.TICKER_TO_ID.get(ticker_upper, ticker.lower())
-    
-    async def get_price(self, ticker: str, asset_type: str) -> Optional[PriceData]:
-        """Obtiene precio de CoinGecko"""
-        coin_id = self._get_coin_id(ticker)
+    def _get_coin_id(self, ticker: str) -> Optional[str]:
+        """
+        Convierte ticker a CoinGecko ID.
         
-        url = f"{self.BASE_URL}/simple/price"
-        params = {
-            "ids": coin_id,
-            "vs_currencies": "usd",
-            "include_market_cap": "true",
-            "include_24hr_vol": "true",
-            "include_24hr_change": "true"
-        }
+        Orden: overrides -> catálogo -> ticker.lower() (solo si el
+        catálogo no está disponible). Retorna None si no se conoce.
+        """
+        ticker_upper = ticker.upper().strip()
+        if ticker_upper in self.TICKER_TO_ID:
+            return self.TICKER_TO_ID[ticker_upper]
         
-        data = await self._make_request(url, params=params)
+        if self.catalog.is_loaded:
+            return self.catalog.resolve(ticker_upper)
         
-        if not data or coin_id not in data:
-            return None
-        
-        coin_data = data[coin_id]
+        return ticker.lower()
+    
+    async def _resolve_ids(self, tickers: List[str]) -> dict[str, str]:
+        """Resuelve tickers a coin ids, refrescando el catálogo si venció"""
+        if any(t.upper().strip() not in self.TICKER_TO_ID for t in tickers):
+            await self.catalog.ensure_fresh(self._make_request, self.BASE_URL)
         
+        resolved = {}
+        for ticker in tickers:
+            coin_id = self._get_coin_id(ticker)
+            if coin_id is None:
+                print(f"Unknown CoinGecko symbol: {ticker}")
+                continue
+            resolved[ticker.upper()] = coin_id
+        return resolved
+    
+    def _to_price_data(self, ticker: str, coin_data: dict) -> PriceData:
+        """Convierte la respuesta de /simple/price a PriceData"""
         return PriceData(
             ticker=ticker.upper(),
             price_usd=float(coin_data.get("usd", 0)),
@@ -74,11 +110,64 @@ class CoinGeckoProvider(BaseProvider):
             change_24h_percent=float(coin_data.get("usd_24h_change", 0))
         )
     
+    async def _fetch_simple_prices(self, coin_ids: List[str]) -> dict:
+        """
+        Pide /simple/price en chunks de `ids_per_request` ids.
+        
+        Los chunks corren en paralelo (acotados por un semáforo); cada
+        request espera turno en el token bucket del provider.
+        """
+        unique_ids = list(dict.fromkeys(coin_ids))
+        chunks = [
+            unique_ids[i:i + self.ids_per_request]
+            for i in range(0, len(unique_ids), self.ids_per_request)
+        ]
+        semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+        
+        async def fetch_chunk(chunk: List[str]) -> Optional[dict]:
+            async with semaphore:
+                return await self._make_request(
+                    f"{self.BASE_URL}/simple/price",
+                    params={
+                        "ids": ",".join(chunk),
+                        "vs_currencies": "usd",
+                        "include_market_cap": "true",
+                        "include_24hr_vol": "true",
+                        "include_24hr_change": "true"
+                    }
+                )
+        
+        responses = await asyncio.gather(
+            *(fetch_chunk(chunk) for chunk in chunks),
+            return_exceptions=True
+        )
+        
+        data = {}
+        for response in responses:
+            if isinstance(response, dict):
+                data.update(response)
+        return data
+    
+    async def get_price(self, ticker: str, asset_type: str) -> Optional[PriceData]:
+        """Obtiene precio de CoinGecko"""
+        coin_ids = await self._resolve_ids([ticker])
+        coin_id = coin_ids.get(ticker.upper())
+        
+        if coin_id is None:
+            return None
+        
+        data = await self._fetch_simple_prices([coin_id])
+        
+        if coin_id not in data:
+            return None
+        
+        return self._to_price_data(ticker, data[coin_id])
+    
     async def get_multiple_prices(
         self,
         tickers: List[tuple[str, str]]
     ) -> List[PriceData]:
-        """Obtiene múltiples precios en una sola request"""
+        """Obtiene múltiples precios en el mínimo de requests posible"""
         # Extraer solo tickers de crypto
         crypto_tickers = [t for t, at in tickers if at == "crypto"]
         
@@ -86,38 +175,18 @@ class CoinGeckoProvider(BaseProvider):
             return []
         
         # Convertir a IDs
-        coin_ids = [self._get_coin_id(t) for t in crypto_tickers]
-        
-        url = f"{self.BASE_URL}/simple/price"
-        params = {
-            "ids": ",".join(coin_ids),
-            "vs_currencies": "usd",
-            "include_market_cap": "true",
-            "include_24hr_vol": "true",
-            "include_24hr_change": "true"
-        }
+        coin_ids = await self._resolve_ids(crypto_tickers)
         
-        data = await self._make_request(url, params=params)
+        data = await self._fetch_simple_prices(list(coin_ids.values()))
         
         if not data:
             return []
         
-        results = []
-        for ticker in crypto_tickers:
-            coin_id = self._get_coin_id(ticker)
-            if coin_id in data:
-                coin_data = data[coin_id]
-                results.append(PriceData(
-                    ticker=ticker.upper(),
-                    price_usd=float(coin_data.get("usd", 0)),
-                    source=self.name,
-                    timestamp=datetime.utcnow(),
-                    volume=float(coin_data.get("usd_24h_vol", 0)),
-                    market_cap=float(coin_data.get("usd_market_cap", 0)),
-                    change_24h_percent=float(coin_data.get("usd_24h_change", 0))
-                ))
-        
-        return results
+        return [
+            self._to_price_data(ticker, data[coin_id])
+            for ticker, coin_id in coin_ids.items()
+            if coin_id in data
+        ]
     
     async def is_available(self) -> bool:
         """Verifica si CoinGecko está disponible"""
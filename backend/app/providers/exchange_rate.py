@@ -1,12 +1,19 @@
 """
 Exchange Rate Provider
 
-Obtiene tasas de cambio USD/MXN.
+Obtiene tasas de cambio. Cada request trae la tabla completa de una
+moneda base; get_rates la conserva entera para no gastar cuota por par.
 """
 
 from typing import Optional
 from datetime import datetime
-from app.providers.base import BaseProvider, ExchangeRateData
+from app.core.config import settings
+from app.providers.base import (
+    BaseProvider,
+    ExchangeRateData,
+    ExchangeRateSnapshot,
+    RateLimit,
+)
 
 
 class ExchangeRateProvider(BaseProvider):
@@ -18,35 +25,61 @@ class ExchangeRateProvider(BaseProvider):
     
     BASE_URL = "https://api.exchangerate-api.com/v4/latest"
     
+    # La cuota mensual es el límite real; el bucket solo evita ráfagas
+    RATE_LIMIT = RateLimit(
+        requests=10,
+        period_seconds=60,
+        monthly_quota=settings.EXCHANGE_RATE_MONTHLY_QUOTA
+    )
+    
     @property
     def name(self) -> str:
         return "exchangerate-api"
     
-    async def get_rate(
-        self,
-        from_currency: str = "USD",
-        to_currency: str = "MXN"
-    ) -> Optional[ExchangeRateData]:
-        """Obtiene exchange rate USD/MXN"""
-        url = f"{self.BASE_URL}/{from_currency}"
+    async def get_rates(self, base: str = "USD") -> Optional[ExchangeRateSnapshot]:
+        """
+        Obtiene la tabla completa de tipos de cambio de una moneda base.
         
-        data = await self._make_request(url)
+        Un solo request (una unidad de cuota) para todas las monedas.
         
-        if not data or "rates" not in data:
-            return None
+        Returns:
+            ExchangeRateSnapshot con timestamp de la última actualización
+            del provider, o None si falla
+        """
+        base = base.upper()
+        data = await self._make_request(f"{self.BASE_URL}/{base}")
         
-        rates = data["rates"]
-        if to_currency not in rates:
+        if not data or "rates" not in data:
             return None
         
-        return ExchangeRateData(
-            from_currency=from_currency,
-            to_currency=to_currency,
-            rate=float(rates[to_currency]),
+        # La tabla se publica pocas veces al día: time_last_updated
+        # identifica la versión y evita guardar la misma dos veces
+        updated = data.get("time_last_updated")
+        timestamp = (
+            datetime.utcfromtimestamp(updated)
+            if isinstance(updated, (int, float))
+            else datetime.utcnow()
+        )
+        return ExchangeRateSnapshot(
+            base=base,
+            rates={
+                currency.upper(): float(rate)
+                for currency, rate in data["rates"].items()
+                if currency.upper() != base and rate
+            },
             source=self.name,
-            timestamp=datetime.utcnow()
+            timestamp=timestamp
         )
     
+    async def get_rate(
+        self,
+        from_currency: str = "USD",
+        to_currency: str = "MXN"
+    ) -> Optional[ExchangeRateData]:
+        """Obtiene un exchange rate (descarga la tabla de from_currency)"""
+        snapshot = await self.get_rates(from_currency)
+        return snapshot.get(to_currency) if snapshot else None
+    
     async def get_price(self, ticker: str, asset_type: str):
         """No implementado - este provider solo hace exchange rates"""
         return None
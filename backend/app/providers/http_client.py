@@ -0,0 +1,98 @@
+"""
+HTTP Client Pool
+
+Mantiene una única aiohttp.ClientSession compartida por todos los providers.
+
+Principios aplicados:
+- Resource Management: Una sesión por proceso, ligada al lifespan de la app
+- Performance: Keep-alive, DNS cache y límites de conexiones por host
+- Dependency Injection: Los providers reciben el pool, no crean sesiones
+"""
+
+from typing import Optional
+
+import aiohttp
+
+from app.core.config import settings
+
+
+class HTTPClientPool:
+    """
+    Pool de conexiones HTTP compartido.
+    
+    Crear una ClientSession por request obliga a un handshake TCP+TLS
+    nuevo en cada llamada. Este pool reutiliza las conexiones abiertas
+    hacia CoinGecko, exchangerate-api, etc.
+    
+    Uso:
+        await http_pool.start()          # startup de FastAPI
+        session = http_pool.get_session()
+        await http_pool.close()          # shutdown de FastAPI
+    """
+    
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_connections_per_host: int = 10,
+        dns_cache_ttl: int = 300,
+        keepalive_timeout: float = 30.0,
+    ):
+        """
+        Args:
+            max_connections: Límite total de conexiones abiertas
+            max_connections_per_host: Límite de conexiones por host
+            dns_cache_ttl: Segundos que se cachea la resolución DNS
+            keepalive_timeout: Segundos que una conexión ociosa sigue abierta
+        """
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+    
+    @property
+    def is_open(self) -> bool:
+        """True si hay una sesión activa"""
+        return self._session is not None and not self._session.closed
+    
+    def _create_session(self) -> aiohttp.ClientSession:
+        """Crea la sesión con el connector configurado"""
+        connector = aiohttp.TCPConnector(
+            limit=self.max_connections,
+            limit_per_host=self.max_connections_per_host,
+            ttl_dns_cache=self.dns_cache_ttl,
+            use_dns_cache=True,
+            keepalive_timeout=self.keepalive_timeout,
+        )
+        return aiohttp.ClientSession(connector=connector)
+    
+    async def start(self) -> None:
+        """Abre la sesión compartida (idempotente)."""
+        if not self.is_open:
+            self._session = self._create_session()
+    
+    def get_session(self) -> aiohttp.ClientSession:
+        """
+        Retorna la sesión compartida.
+        
+        Si la app no llamó start() (scripts, tests), la sesión se crea
+        bajo demanda. Debe llamarse desde un event loop activo.
+        """
+        if not self.is_open:
+            self._session = self._create_session()
+        return self._session
+    
+    async def close(self) -> None:
+        """Cierra la sesión y libera las conexiones del pool."""
+        if self.is_open:
+            await self._session.close()
+        self._session = None
+
+
+# Pool por proceso, configurado desde settings
+http_pool = HTTPClientPool(
+    max_connections=settings.HTTP_POOL_MAX_CONNECTIONS,
+    max_connections_per_host=settings.HTTP_POOL_MAX_CONNECTIONS_PER_HOST,
+    dns_cache_ttl=settings.HTTP_DNS_CACHE_TTL_SECONDS,
+    keepalive_timeout=settings.HTTP_KEEPALIVE_TIMEOUT_SECONDS,
+)
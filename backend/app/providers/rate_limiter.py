@@ -0,0 +1,273 @@
+"""
+Provider Rate Limiting
+
+Token bucket por provider con cola FIFO y cuota mensual opcional.
+
+Principios aplicados:
+- Fairness: Los callers esperan en orden de llegada en lugar de fallar
+- Budgeting: El presupuesto restante es consultable (scheduler de refresh)
+- Single Responsibility: Solo control de tasa, no lógica HTTP
+"""
+
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from app.core.config import settings
+
+
+class QuotaExceededError(Exception):
+    """La cuota mensual del provider se agotó"""
+    pass
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """
+    Configuración de rate limit de un provider.
+    
+    Attributes:
+        requests: Requests permitidas por periodo
+        period_seconds: Duración del periodo
+        burst: Tamaño del bucket (default: requests)
+        monthly_quota: Límite de requests por mes calendario (UTC)
+    """
+    requests: int
+    period_seconds: float
+    burst: Optional[int] = None
+    monthly_quota: Optional[int] = None
+
+
+@dataclass
+class RateBudget:
+    """Presupuesto disponible de un provider"""
+    provider: str
+    tokens_available: float
+    capacity: int
+    refill_per_second: float
+    quota_limit: Optional[int] = None
+    quota_used: Optional[int] = None
+    quota_remaining: Optional[int] = None
+    quota_resets_at: Optional[datetime] = None
+    
+    def seconds_until(self, tokens: float = 1) -> float:
+        """Segundos hasta tener `tokens` disponibles en el bucket"""
+        missing = tokens - self.tokens_available
+        if missing <= 0:
+            return 0.0
+        return missing / self.refill_per_second
+
+
+class MonthlyQuota:
+    """
+    Contador de requests por mes calendario.
+    
+    Se persiste en disco para sobrevivir reinicios del proceso.
+    """
+    
+    def __init__(self, limit: int, state_path: Optional[Path] = None):
+        self.limit = limit
+        self.state_path = state_path
+        self._month = self._current_month()
+        self.used = 0
+        self._load()
+    
+    @staticmethod
+    def _current_month() -> str:
+        return datetime.utcnow().strftime("%Y-%m")
+    
+    def _load(self) -> None:
+        if not self.state_path or not self.state_path.exists():
+            return
+        try:
+            state = json.loads(self.state_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            print(f"Error loading quota state {self.state_path}: {str(e)}")
+            return
+        if state.get("month") == self._month:
+            self.used = int(state.get("used", 0))
+    
+    def _save(self) -> None:
+        if not self.state_path:
+            return
+        try:
+            self.state_path.parent.mkdir(parents=True, exist_ok=True)
+            self.state_path.write_text(
+                json.dumps({"month": self._month, "used": self.used}),
+                encoding="utf-8"
+            )
+        except OSError as e:
+            print(f"Error saving quota state {self.state_path}: {str(e)}")
+    
+    def _roll(self) -> None:
+        """Reinicia el contador al cambiar de mes"""
+        month = self._current_month()
+        if month != self._month:
+            self._month = month
+            self.used = 0
+    
+    @property
+    def remaining(self) -> int:
+        self._roll()
+        return max(self.limit - self.used, 0)
+    
+    @property
+    def resets_at(self) -> datetime:
+        """Inicio del siguiente mes (UTC)"""
+        year, month = map(int, self._month.split("-"))
+        if month == 12:
+            return datetime(year + 1, 1, 1)
+        return datetime(year, month + 1, 1)
+    
+    def consume(self, amount: int = 1) -> None:
+        """
+        Descuenta requests de la cuota.
+        
+        Raises:
+            QuotaExceededError: Si no queda cuota para este mes
+        """
+        if self.remaining < amount:
+            raise QuotaExceededError(
+                f"Monthly quota of {self.limit} requests exhausted "
+                f"until {self.resets_at.isoformat()}"
+            )
+        self.used += amount
+        self._save()
+
+
+class TokenBucketRateLimiter:
+    """
+    Token bucket asíncrono con reservas.
+    
+    Cada caller reserva sus tokens al llegar (el saldo puede quedar
+    negativo por las reservas pendientes) y duerme fuera de cualquier
+    lock hasta que le toca, de modo que una ráfaga de requests se
+    distribuye en el tiempo en orden de llegada en lugar de recibir
+    errores 429 del provider. Reservar no tiene await: es atómico dentro
+    del event loop.
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        limit: RateLimit,
+        state_dir: Optional[str] = None
+    ):
+        self.name = name
+        self.capacity = limit.burst or limit.requests
+        self.refill_per_second = limit.requests / limit.period_seconds
+        self._tokens = float(self.capacity)
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+        
+        self.quota: Optional[MonthlyQuota] = None
+        if limit.monthly_quota:
+            state_path = (
+                Path(state_dir) / f"{name}_quota.json" if state_dir else None
+            )
+            self.quota = MonthlyQuota(limit.monthly_quota, state_path)
+    
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._updated_at
+        self._tokens = min(
+            self.capacity,
+            self._tokens + elapsed * self.refill_per_second
+        )
+        self._updated_at = now
+    
+    async def acquire(self, tokens: int = 1) -> None:
+        """
+        Reserva `tokens` y espera hasta que el bucket los cubra.
+        
+        Una request más cara que la capacidad del bucket se reserva por
+        partes de `capacity` tokens, esperando cada una antes de reservar
+        la siguiente: se cobra completa, y quien llega mientras tanto
+        intercala su reserva entre las partes y espera a lo más lo que
+        tarda en llenarse el bucket, no la request completa.
+        
+        Raises:
+            QuotaExceededError: Si la cuota mensual está agotada
+        """
+        if self.quota is not None and self.quota.remaining < tokens:
+            self.quota.consume(tokens)  # Lanza QuotaExceededError
+        
+        remaining = tokens
+        while remaining > 0:
+            part = min(remaining, self.capacity)
+            try:
+                await self._wait(self._reserve(part))
+            except asyncio.CancelledError:
+                # Tokens reservados que no se van a usar
+                self._tokens += part
+                raise
+            remaining -= part
+        
+        if self.quota is not None:
+            self.quota.consume(tokens)
+    
+    def _reserve(self, tokens: int) -> float:
+        """Descuenta `tokens` y retorna los segundos hasta poder usarlos"""
+        self._refill()
+        self._tokens -= tokens
+        wait = -self._tokens / self.refill_per_second
+        return max(wait, self._blocked_until - time.monotonic(), 0.0)
+    
+    async def _wait(self, seconds: float) -> None:
+        """Duerme `seconds` y además cualquier pausa iniciada mientras"""
+        await asyncio.sleep(seconds)
+        while (delay := self._blocked_until - time.monotonic()) > 0:
+            await asyncio.sleep(delay)
+    
+    def pause(self, seconds: float) -> None:
+        """
+        Bloquea el bucket `seconds` segundos (ej: tras un 429).
+        
+        Todos los callers en espera respetan la pausa; las reservas
+        pendientes (saldo negativo) se conservan.
+        """
+        self._blocked_until = max(
+            self._blocked_until,
+            time.monotonic() + seconds
+        )
+        self._tokens = min(self._tokens, 0.0)
+    
+    def budget(self) -> RateBudget:
+        """Snapshot del presupuesto disponible"""
+        self._refill()
+        budget = RateBudget(
+            provider=self.name,
+            tokens_available=round(self._tokens, 3),
+            capacity=self.capacity,
+            refill_per_second=self.refill_per_second,
+        )
+        if self.quota is not None:
+            budget.quota_limit = self.quota.limit
+            budget.quota_remaining = self.quota.remaining
+            budget.quota_used = self.quota.used
+            budget.quota_resets_at = self.quota.resets_at
+        return budget
+
+
+# Registro por proceso: las instancias de un provider comparten limiter
+_limiters: dict[str, TokenBucketRateLimiter] = {}
+
+
+def get_rate_limiter(name: str, limit: RateLimit) -> TokenBucketRateLimiter:
+    """Retorna el limiter del provider, creándolo la primera vez"""
+    if name not in _limiters:
+        _limiters[name] = TokenBucketRateLimiter(
+            name,
+            limit,
+            state_dir=settings.RATE_LIMIT_STATE_DIR
+        )
+    return _limiters[name]
+
+
+def get_rate_budgets() -> dict[str, RateBudget]:
+    """Presupuesto de todos los providers que ya hicieron requests"""
+    return {name: limiter.budget() for name, limiter in _limiters.items()}
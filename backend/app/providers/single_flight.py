@@ -0,0 +1,72 @@
+"""
+Single-Flight Request Coalescing
+
+Evita fetches duplicados: llamadas concurrentes con la misma key esperan
+una sola request en vuelo y comparten su resultado.
+
+Principios aplicados:
+- Performance: Una request externa por key, sin importar cuántos callers
+- Observability: Contadores de llamadas ejecutadas vs coalescidas
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    """
+    Coalescing de llamadas asíncronas por key.
+    
+    Uso:
+        flight = SingleFlight("prices")
+        price = await flight.do(
+            ("coingecko", "BTC"),
+            lambda: provider.get_price("BTC", "crypto")
+        )
+    """
+    
+    def __init__(self, name: str):
+        self.name = name
+        self._in_flight: dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+    
+    async def do(
+        self,
+        key: Hashable,
+        factory: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """
+        Ejecuta `factory()` o se une a la ejecución en vuelo para `key`.
+        
+        El task compartido se protege con asyncio.shield: si un caller se
+        cancela (ej: el cliente HTTP cerró la conexión) los demás siguen
+        esperando el mismo resultado.
+        """
+        self.calls += 1
+        task = self._in_flight.get(key)
+        
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(factory())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+        
+        return await asyncio.shield(task)
+    
+    def stats(self) -> dict:
+        """Métricas acumuladas desde el arranque del proceso"""
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight),
+        }
+
+
+# Coalescing de precios por (provider, ticker) compartido por el proceso
+price_flight = SingleFlight("prices")
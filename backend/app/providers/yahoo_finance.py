@@ -2,12 +2,62 @@
 Yahoo Finance Provider
 
 Obtiene precios de stocks y ETFs desde Yahoo Finance API.
+
+yfinance es una librería síncrona: todas las llamadas se ejecutan en un
+thread pool acotado para no bloquear el event loop de uvicorn.
 """
 
+import asyncio
+import math
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, List
 from datetime import datetime
 import yfinance as yf
-from app.providers.base import BaseProvider, PriceData
+from app.core.config import settings
+from app.providers.base import BaseProvider, PriceData, RateLimit
+
+
+# Thread pool compartido por proceso para trabajo bloqueante de yfinance;
+# se crea en el startup de la app (o en el primer uso) y se descarta en
+# el shutdown, así un segundo lifespan del mismo proceso crea otro
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def start_executor() -> ThreadPoolExecutor:
+    """Crea el thread pool de yfinance si no existe. Idempotente."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.YAHOO_FINANCE_MAX_WORKERS,
+            thread_name_prefix="yfinance"
+        )
+    return _executor
+
+
+def shutdown_executor() -> None:
+    """Libera los threads de yfinance. Llamar en el shutdown de la app."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _clean(value) -> Optional[float]:
+    """Convierte a float descartando None/NaN"""
+    if value is None:
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) else value
+
+
+def _change_percent(price: float, previous_close: Optional[float]) -> Optional[float]:
+    """Cambio porcentual contra el cierre anterior"""
+    if not previous_close:
+        return None
+    return (price - previous_close) / previous_close * 100
 
 
 class YahooFinanceProvider(BaseProvider):
@@ -21,42 +71,133 @@ class YahooFinanceProvider(BaseProvider):
     Rate Limits: ~2000 requests/hora
     """
     
+    RATE_LIMIT = RateLimit(
+        requests=settings.YAHOO_FINANCE_RATE_LIMIT_PER_HOUR,
+        period_seconds=3600,
+        burst=50
+    )
+    
     @property
     def name(self) -> str:
         return "yahoo_finance"
     
-    async def get_price(self, ticker: str, asset_type: str) -> Optional[PriceData]:
-        """Obtiene precio de Yahoo Finance"""
+    async def _run_blocking(self, func, *args, cost: int = 1):
+        """
+        Ejecuta una llamada síncrona de yfinance en el thread pool.
+        
+        Args:
+            cost: Requests a Yahoo que implica la llamada (para el rate limiter)
+        """
+        await self._throttle(cost)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(start_executor(), func, *args)
+    
+    def _fetch_quote(self, ticker: str) -> Optional[PriceData]:
+        """
+        Cotización individual (bloqueante).
+        
+        Usa `fast_info` (un solo request al endpoint de chart) en lugar de
+        `info`, que hace scraping de varios módulos de quoteSummary.
+        """
+        stock = yf.Ticker(ticker)
+        
         try:
-            # yfinance es síncrono, pero es rápido
-            stock = yf.Ticker(ticker)
-            info = stock.info
+            fast = stock.fast_info
+            price = _clean(fast.last_price)
+            volume = _clean(fast.last_volume)
+            market_cap = _clean(fast.market_cap)
+            previous_close = _clean(fast.previous_close)
+        except Exception:
+            price = volume = market_cap = previous_close = None
+        
+        if not price:
+            # Fallback: usar history
+            hist = stock.history(period="5d")
+            if hist.empty:
+                return None
             
-            if not info or 'regularMarketPrice' not in info:
-                # Fallback: usar history
-                hist = stock.history(period="1d")
-                if hist.empty:
-                    return None
-                
-                price = float(hist['Close'].iloc[-1])
-                volume = float(hist['Volume'].iloc[-1]) if 'Volume' in hist else None
+            price = _clean(hist['Close'].iloc[-1])
+            volume = _clean(hist['Volume'].iloc[-1]) if 'Volume' in hist else None
+            previous_close = (
+                _clean(hist['Close'].iloc[-2]) if len(hist) > 1 else None
+            )
+        
+        if not price or price <= 0:
+            return None
+        
+        return PriceData(
+            ticker=ticker.upper(),
+            price_usd=price,
+            source=self.name,
+            timestamp=datetime.utcnow(),
+            volume=volume,
+            market_cap=market_cap,
+            change_24h_percent=_change_percent(price, previous_close)
+        )
+    
+    def _download_batch(self, symbols: List[str]) -> List[PriceData]:
+        """
+        Descarga velas diarias de todos los símbolos en una sola llamada
+        a `yf.download` (bloqueante).
+        """
+        data = yf.download(
+            tickers=" ".join(symbols),
+            period="5d",
+            interval="1d",
+            group_by="ticker",
+            auto_adjust=False,
+            # Sin threads propios: el worker del pool es el único thread,
+            # así YAHOO_FINANCE_MAX_WORKERS acota las descargas en paralelo
+            threads=False,
+            progress=False
+        )
+        
+        if data is None or data.empty:
+            return []
+        
+        multi = getattr(data.columns, "nlevels", 1) > 1
+        now = datetime.utcnow()
+        results = []
+        
+        for symbol in symbols:
+            if multi:
+                if symbol not in data.columns.get_level_values(0):
+                    continue
+                frame = data[symbol]
             else:
-                price = float(info.get('regularMarketPrice', 0))
-                volume = float(info.get('volume', 0)) if 'volume' in info else None
+                frame = data
             
-            if price <= 0:
-                return None
+            frame = frame.dropna(subset=["Close"])
+            if frame.empty:
+                continue
             
-            return PriceData(
-                ticker=ticker.upper(),
+            price = _clean(frame["Close"].iloc[-1])
+            if not price or price <= 0:
+                continue
+            
+            previous_close = (
+                _clean(frame["Close"].iloc[-2]) if len(frame) > 1 else None
+            )
+            volume = (
+                _clean(frame["Volume"].iloc[-1]) if "Volume" in frame else None
+            )
+            
+            results.append(PriceData(
+                ticker=symbol,
                 price_usd=price,
                 source=self.name,
-                timestamp=datetime.utcnow(),
+                timestamp=now,
                 volume=volume,
                 market_cap=None,
-                change_24h_percent=None
-            )
+                change_24h_percent=_change_percent(price, previous_close)
+            ))
         
+        return results
+    
+    async def get_price(self, ticker: str, asset_type: str) -> Optional[PriceData]:
+        """Obtiene precio de Yahoo Finance"""
+        try:
+            return await self._run_blocking(self._fetch_quote, ticker)
         except Exception as e:
             print(f"Error fetching {ticker} from Yahoo Finance: {str(e)}")
             return None
@@ -65,20 +206,43 @@ class YahooFinanceProvider(BaseProvider):
         self,
         tickers: List[tuple[str, str]]
     ) -> List[PriceData]:
-        """Obtiene múltiples precios en paralelo"""
-        import asyncio
+        """
+        Obtiene múltiples precios con una sola descarga batch.
         
-        tasks = [
-            self.get_price(ticker, asset_type)
+        Los símbolos que no vengan en el batch se reintentan de forma
+        individual (también en el thread pool).
+        """
+        symbols = list(dict.fromkeys(
+            self._normalize_ticker(ticker, asset_type)
             for ticker, asset_type in tickers
-        ]
+        ))
         
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        if not symbols:
+            return []
+        
+        try:
+            # yf.download hace un request por símbolo
+            results = await self._run_blocking(
+                self._download_batch, symbols, cost=len(symbols)
+            )
+        except Exception as e:
+            print(f"Error in Yahoo Finance batch download: {str(e)}")
+            results = []
+        
+        found = {result.ticker for result in results}
+        missing = [symbol for symbol in symbols if symbol not in found]
+        
+        if missing:
+            fallback = await asyncio.gather(
+                *(self.get_price(symbol, "stock") for symbol in missing),
+                return_exceptions=True
+            )
+            results.extend(
+                result for result in fallback
+                if isinstance(result, PriceData)
+            )
         
-        return [
-            result for result in results
-            if isinstance(result, PriceData) and result is not None
-        ]
+        return results
     
     async def is_available(self) -> bool:
         """Verifica si Yahoo Finance está disponible"""
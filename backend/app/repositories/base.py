@@ -12,8 +12,9 @@ Principios aplicados:
 
 from typing import Generic, TypeVar, Type, Optional, List, Any
 from sqlalchemy import select, update, delete, func
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.core.database import Base
+from app.db.base import Base
 
 ModelType = TypeVar("ModelType", bound=Base)
 
@@ -36,6 +37,30 @@ class BaseRepository(Generic[ModelType]):
         self.model = model
         self.db = db
     
+    @property
+    def dialect_name(self) -> str:
+        """Dialecto de la base de datos de la sesión (sqlite, postgresql)"""
+        return self.db.get_bind().dialect.name
+    
+    def _upsert_insert(self, table: Any = None):
+        """
+        INSERT del dialecto activo, con soporte de ON CONFLICT.
+        
+        Args:
+            table: Modelo o tabla destino (default: self.model)
+        
+        Raises:
+            NotImplementedError: Si el dialecto no soporta ON CONFLICT
+        """
+        target = table if table is not None else self.model
+        if self.dialect_name == "postgresql":
+            return postgresql.insert(target)
+        if self.dialect_name == "sqlite":
+            return sqlite.insert(target)
+        raise NotImplementedError(
+            f"Upsert no soportado para el dialecto {self.dialect_name}"
+        )
+    
     async def get_by_id(self, id: int) -> Optional[ModelType]:
         """Obtiene un registro por ID"""
         stmt = select(self.model).where(self.model.id == id)
@@ -4,11 +4,12 @@ Portfolio Repository
 Maneja acceso a datos de portfolios y holdings.
 """
 
-from typing import Optional, List
-from sqlalchemy import select
+from typing import Optional, List, Sequence
+from sqlalchemy import Float, cast, select
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
-from app.models import Portfolio, Holding
+from app.models import Portfolio, Holding, LatestPrice
 from app.repositories.base import BaseRepository
 
 
@@ -38,6 +39,14 @@ class PortfolioRepository(BaseRepository[Portfolio]):
         result = await self.db.execute(stmt)
         return list(result.scalars().all())
     
+    async def get_ids(self, active_only: bool = False) -> List[int]:
+        """IDs de portfolios ordenados, sin cargar los objetos"""
+        stmt = select(Portfolio.id).order_by(Portfolio.id)
+        if active_only:
+            stmt = stmt.where(Portfolio.is_active == True)
+        result = await self.db.execute(stmt)
+        return list(result.scalars().all())
+    
     async def get_by_name(self, name: str) -> Optional[Portfolio]:
         """Busca portfolio por nombre"""
         stmt = select(Portfolio).where(Portfolio.name == name)
@@ -66,6 +75,73 @@ class HoldingRepository(BaseRepository[Holding]):
         result = await self.db.execute(stmt)
         return result.scalar_one_or_none()
     
+    async def get_with_latest_prices(
+        self,
+        portfolio_ids: Sequence[int]
+    ) -> List[Row]:
+        """
+        Holdings con cantidad > 0 de los portfolios y el último precio de
+        cada ticker, en una sola query (LEFT JOIN latest_prices).
+        
+        Returns:
+            Filas (Holding, price_usd, exchange_rate, price_timestamp);
+            las columnas de precio son None si el ticker no tiene precio
+        """
+        stmt = (
+            select(
+                Holding,
+                LatestPrice.price_usd,
+                LatestPrice.exchange_rate,
+                LatestPrice.timestamp.label("price_timestamp")
+            )
+            .outerjoin(LatestPrice, LatestPrice.ticker == Holding.ticker)
+            .where(
+                Holding.portfolio_id.in_(portfolio_ids),
+                Holding.quantity > 0
+            )
+            .order_by(Holding.portfolio_id, Holding.ticker)
+        )
+        result = await self.db.execute(stmt)
+        return list(result.all())
+    
+    async def get_positions(
+        self,
+        portfolio_ids: Optional[Sequence[int]] = None
+    ) -> List[Row]:
+        """
+        Columnas para valuar los holdings con cantidad > 0 de muchos
+        portfolios, sin construir objetos Holding ni Decimals.
+        
+        Args:
+            portfolio_ids: Portfolios a leer (None = todos)
+        
+        Returns:
+            Filas (portfolio_id, ticker, quantity, average_buy_price)
+        """
+        stmt = (
+            select(
+                Holding.portfolio_id,
+                Holding.ticker,
+                # Floats del driver: sin construir un Decimal por celda
+                cast(Holding.quantity, Float).label("quantity"),
+                cast(Holding.average_buy_price, Float).label(
+                    "average_buy_price"
+                )
+            )
+            .where(Holding.quantity > 0)
+            .order_by(Holding.portfolio_id, Holding.ticker)
+        )
+        if portfolio_ids is not None:
+            stmt = stmt.where(Holding.portfolio_id.in_(portfolio_ids))
+        result = await self.db.execute(stmt)
+        return list(result.all())
+    
+    async def get_distinct_assets(self) -> List[tuple[str, str]]:
+        """Pares (ticker, asset_type) distintos en todos los portfolios"""
+        stmt = select(Holding.ticker, Holding.asset_type).distinct()
+        result = await self.db.execute(stmt)
+        return [tuple(row) for row in result.all()]
+    
     async def update_quantity(
         self,
         holding_id: int,
@@ -4,12 +4,22 @@ Price Repository
 Maneja acceso a datos de precios y exchange rates con optimizaciones para time-series.
 """
 
-from datetime import datetime, timedelta
-from typing import Optional, List
-from sqlalchemy import select, desc, and_
+from datetime import datetime
+from decimal import Decimal
+from typing import AsyncIterator, Optional, List, Sequence
+from sqlalchemy import select, desc, and_, literal, or_
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.models import Price, ExchangeRate
+from app.models import Price, LatestPrice, ExchangeRate
+from app.providers.base import ExchangeRateSnapshot
 from app.repositories.base import BaseRepository
+from app.repositories.rollup_repository import PriceRollupRepository
+
+
+# Claves de session.info con los cambios a latest_prices de la transacción;
+# los caches en memoria los aplican en after_commit
+LATEST_PRICES_WRITTEN = "latest_prices_written"
+LATEST_PRICES_REBUILT = "latest_prices_rebuilt"
 
 
 class PriceRepository(BaseRepository[Price]):
@@ -18,41 +28,225 @@ class PriceRepository(BaseRepository[Price]):
     def __init__(self, db: AsyncSession):
         super().__init__(Price, db)
     
-    async def get_latest_price(self, ticker: str) -> Optional[Price]:
-        """Obtiene el precio más reciente de un ticker"""
-        stmt = (
-            select(Price)
-            .where(Price.ticker == ticker.upper())
-            .order_by(desc(Price.timestamp))
-            .limit(1)
+    # Columnas que se sobrescriben en upsert con on_conflict="update"
+    UPSERT_UPDATE_COLUMNS = (
+        "price_usd",
+        "price_mxn",
+        "exchange_rate",
+        "volume_24h",
+        "market_cap",
+        "source",
+    )
+    
+    async def bulk_upsert(
+        self,
+        rows: Sequence[dict],
+        on_conflict: str = "nothing",
+        batch_size: int = 1000
+    ) -> List[Row]:
+        """
+        Inserta snapshots de precios con INSERT multi-row.
+        
+        En la misma transacción actualiza latest_prices y las velas OHLC
+        (price_rollups) con las filas realmente escritas.
+        
+        Los conflictos con uq_ticker_timestamp no abortan el batch:
+        se ignoran (on_conflict="nothing") o sobrescriben el precio
+        existente (on_conflict="update"). Funciona en SQLite y PostgreSQL.
+        
+        No hace commit: el caller controla la transacción.
+        
+        Args:
+            rows: Dicts con columnas de Price (ticker, price_usd, source,
+                timestamp y opcionales)
+            on_conflict: "nothing" o "update"
+            batch_size: Filas por sentencia INSERT
+        
+        Returns:
+            Filas (id, ticker, timestamp, price_usd) realmente escritas
+        """
+        if on_conflict not in ("nothing", "update"):
+            raise ValueError(f"on_conflict inválido: {on_conflict}")
+        
+        columns = [
+            c.name for c in Price.__table__.columns if c.name != "id"
+        ]
+        now = datetime.utcnow()
+        
+        stmt = self._upsert_insert()
+        if on_conflict == "update":
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["ticker", "timestamp"],
+                set_={
+                    column: stmt.excluded[column]
+                    for column in self.UPSERT_UPDATE_COLUMNS
+                }
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(
+                index_elements=["ticker", "timestamp"]
+            )
+        # Con RETURNING, SQLAlchemy agrupa los parámetros en INSERTs
+        # multi-row ("insertmanyvalues") y reutiliza la sentencia compilada
+        stmt = stmt.returning(
+            Price.id, Price.ticker, Price.timestamp, Price.price_usd
         )
-        result = await self.db.execute(stmt)
-        return result.scalar_one_or_none()
+        
+        written: List[Row] = []
+        for start in range(0, len(rows), batch_size):
+            # Todas las filas deben tener las mismas columnas
+            batch = [
+                {column: row.get(column) for column in columns}
+                for row in rows[start:start + batch_size]
+            ]
+            for values in batch:
+                if values["timestamp"] is None:
+                    values["timestamp"] = now
+            
+            result = await self.db.execute(
+                stmt.execution_options(insertmanyvalues_page_size=batch_size),
+                batch
+            )
+            written.extend(result.all())
+        
+        await self._upsert_latest(rows, written)
+        await PriceRollupRepository(self.db).apply_ticks(written)
+        return written
     
-    async def get_latest_prices(self, tickers: List[str]) -> List[Price]:
-        """Obtiene precios más recientes de múltiples tickers"""
-        # Subquery para obtener timestamp más reciente por ticker
+    async def _upsert_latest(
+        self,
+        rows: Sequence[dict],
+        written: Sequence[Row]
+    ) -> None:
+        """
+        Actualiza latest_prices con el snapshot más reciente escrito.
+        
+        Corre en la misma transacción que el INSERT a prices. Un snapshot
+        más viejo que el actual (ej: backfill) no sobrescribe la fila.
+        """
+        price_ids = {(row.ticker, row.timestamp): row.id for row in written}
+        
+        latest: dict[str, dict] = {}
+        for row in rows:
+            key = (row["ticker"], row["timestamp"])
+            if key not in price_ids:
+                continue
+            current = latest.get(row["ticker"])
+            if current is None or current["timestamp"] < row["timestamp"]:
+                latest[row["ticker"]] = {
+                    "ticker": row["ticker"],
+                    "price_id": price_ids[key],
+                    "price_usd": row["price_usd"],
+                    "price_mxn": row.get("price_mxn"),
+                    "exchange_rate": row.get("exchange_rate"),
+                    "volume_24h": row.get("volume_24h"),
+                    "market_cap": row.get("market_cap"),
+                    "source": row["source"],
+                    "timestamp": row["timestamp"],
+                }
+        
+        if not latest:
+            return
+        
+        stmt = self._upsert_insert(LatestPrice).values(list(latest.values()))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["ticker"],
+            set_={
+                column.name: stmt.excluded[column.name]
+                for column in LatestPrice.__table__.columns
+                if column.name != "ticker"
+            },
+            where=LatestPrice.timestamp <= stmt.excluded.timestamp
+        )
+        await self.db.execute(stmt)
+        
+        staged = self.db.info.setdefault(LATEST_PRICES_WRITTEN, {})
+        for ticker, values in latest.items():
+            current = staged.get(ticker)
+            if current is None or current["timestamp"] <= values["timestamp"]:
+                staged[ticker] = values
+    
+    async def rebuild_latest_prices(self) -> int:
+        """
+        Reconstruye latest_prices desde el histórico completo.
+        
+        Solo para inicializar la tabla en bases de datos existentes; no
+        hace commit.
+        
+        Returns:
+            Número de tickers cargados
+        """
         latest_timestamps = (
             select(
                 Price.ticker,
                 func.max(Price.timestamp).label('max_timestamp')
             )
-            .where(Price.ticker.in_([t.upper() for t in tickers]))
             .group_by(Price.ticker)
             .subquery()
         )
+        snapshots = select(
+            Price.ticker,
+            Price.id,
+            Price.price_usd,
+            Price.price_mxn,
+            Price.exchange_rate,
+            Price.volume_24h,
+            Price.market_cap,
+            Price.source,
+            Price.timestamp
+        ).join(
+            latest_timestamps,
+            and_(
+                Price.ticker == latest_timestamps.c.ticker,
+                Price.timestamp == latest_timestamps.c.max_timestamp
+            )
+        )
         
-        # Join para obtener precios con timestamp más reciente
-        stmt = (
-            select(Price)
-            .join(
-                latest_timestamps,
-                and_(
-                    Price.ticker == latest_timestamps.c.ticker,
-                    Price.timestamp == latest_timestamps.c.max_timestamp
-                )
+        await self.db.execute(delete(LatestPrice))
+        self.db.info[LATEST_PRICES_REBUILT] = True
+        await self.db.execute(
+            LatestPrice.__table__.insert().from_select(
+                [
+                    "ticker",
+                    "price_id",
+                    "price_usd",
+                    "price_mxn",
+                    "exchange_rate",
+                    "volume_24h",
+                    "market_cap",
+                    "source",
+                    "timestamp",
+                ],
+                snapshots
             )
         )
+        return await self.db.scalar(select(func.count()).select_from(LatestPrice))
+    
+    async def get_latest_price(self, ticker: str) -> Optional[LatestPrice]:
+        """Obtiene el precio más reciente de un ticker"""
+        rows = await self.get_latest_prices([ticker])
+        return rows[0] if rows else None
+    
+    async def get_latest_prices(
+        self,
+        tickers: Optional[List[str]] = None
+    ) -> List[LatestPrice]:
+        """
+        Obtiene precios más recientes de múltiples tickers.
+        
+        Lee la tabla materializada latest_prices (una fila por ticker),
+        sin importar el tamaño del histórico.
+        
+        Args:
+            tickers: Tickers a buscar (None = todos los tickers con precio)
+        """
+        # latest_prices se escribe con upserts Core, que no pasan por el
+        # identity map: refrescar los objetos ya cargados en la sesión
+        stmt = select(LatestPrice).execution_options(populate_existing=True)
+        if tickers is not None:
+            stmt = stmt.where(
+                LatestPrice.ticker.in_([t.upper() for t in tickers])
+            )
         
         result = await self.db.execute(stmt)
         return list(result.scalars().all())
@@ -76,13 +270,199 @@ class PriceRepository(BaseRepository[Price]):
         result = await self.db.execute(stmt)
         return list(result.scalars().all())
     
-    async def delete_old_prices(self, days: int = 365) -> int:
-        """Elimina precios más antiguos que X días"""
-        cutoff_date = datetime.utcnow() - timedelta(days=days)
-        stmt = delete(Price).where(Price.timestamp < cutoff_date)
+    @staticmethod
+    def _history_filters(
+        stmt,
+        ticker: str,
+        start_date: Optional[datetime],
+        end_date: Optional[datetime],
+        after: Optional[tuple[datetime, int]]
+    ):
+        """Filtros de rango y keyset (timestamp, id) del historial"""
+        stmt = stmt.where(Price.ticker == ticker.upper())
+        
+        if start_date:
+            stmt = stmt.where(Price.timestamp >= start_date)
+        if end_date:
+            stmt = stmt.where(Price.timestamp <= end_date)
+        if after is not None:
+            after_timestamp, after_id = after
+            # El >= acota el rango del índice (ticker, timestamp)
+            stmt = stmt.where(
+                Price.timestamp >= after_timestamp,
+                or_(
+                    Price.timestamp > after_timestamp,
+                    Price.id > after_id
+                )
+            )
+        return stmt
+    
+    async def count_price_history(
+        self,
+        ticker: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        after: Optional[tuple[datetime, int]] = None
+    ) -> int:
+        """Número de ticks que entregaría stream_price_history"""
+        stmt = self._history_filters(
+            select(func.count()).select_from(Price),
+            ticker, start_date, end_date, after
+        )
+        return await self.db.scalar(stmt)
+    
+    async def stream_price_history(
+        self,
+        ticker: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        after: Optional[tuple[datetime, int]] = None,
+        limit: Optional[int] = None,
+        chunk_size: int = 1000
+    ) -> AsyncIterator[List[Row]]:
+        """
+        Ticks de un ticker en orden (timestamp, id), por chunks.
+        
+        Lee con un cursor del lado del servidor: la memoria es de un
+        chunk sin importar el tamaño del rango. La paginación es por
+        keyset sobre (timestamp, id), así que reanudar desde cualquier
+        fila cuesta lo mismo que empezar.
+        
+        Args:
+            ticker: Symbol del activo
+            start_date: Fecha inicial (incluida)
+            end_date: Fecha final (incluida)
+            after: (timestamp, id) de la última fila ya entregada
+            limit: Máximo de filas (None = todo el rango)
+            chunk_size: Filas por chunk
+        
+        Yields:
+            Listas de filas (id, timestamp, price_usd, price_mxn,
+            exchange_rate, volume_24h, market_cap, source)
+        """
+        stmt = self._history_filters(
+            select(
+                Price.id,
+                Price.timestamp,
+                Price.price_usd,
+                Price.price_mxn,
+                Price.exchange_rate,
+                Price.volume_24h,
+                Price.market_cap,
+                Price.source
+            ),
+            ticker, start_date, end_date, after
+        )
+        
+        stmt = stmt.order_by(Price.timestamp, Price.id)
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        
+        result = await self.db.stream(
+            stmt.execution_options(yield_per=chunk_size)
+        )
+        async for partition in result.partitions():
+            yield partition
+    
+    async def stream_price_points(
+        self,
+        ticker: str,
+        after_id: int = 0,
+        chunk_size: int = 10000
+    ) -> AsyncIterator[List[Row]]:
+        """
+        Ticks de un ticker con id > after_id, por chunks.
+        
+        Keyset sobre id (no sobre timestamp): un tick insertado tarde
+        con timestamp anterior a los ya leídos también se entrega.
+        
+        Yields:
+            Listas de filas (id, timestamp, price_usd) en orden
+            (timestamp, id)
+        """
+        stmt = (
+            select(Price.id, Price.timestamp, Price.price_usd)
+            .where(Price.ticker == ticker.upper(), Price.id > after_id)
+            .order_by(Price.timestamp, Price.id)
+        )
+        result = await self.db.stream(
+            stmt.execution_options(yield_per=chunk_size)
+        )
+        async for partition in result.partitions():
+            yield partition
+    
+    async def get_ticks_between(
+        self,
+        start: datetime,
+        end: datetime
+    ) -> List[Row]:
+        """
+        Ticks de todos los tickers en [start, end).
+        
+        Returns:
+            Filas (id, ticker, timestamp, price_usd)
+        """
+        stmt = select(
+            Price.id, Price.ticker, Price.timestamp, Price.price_usd
+        ).where(Price.timestamp >= start, Price.timestamp < end)
         result = await self.db.execute(stmt)
-        await self.db.flush()
-        return result.rowcount
+        return list(result.all())
+    
+    async def get_first_timestamp(self, ticker: str) -> Optional[datetime]:
+        """Timestamp del tick más antiguo de un ticker (None si no hay)"""
+        stmt = select(func.min(Price.timestamp)).where(
+            Price.ticker == ticker.upper()
+        )
+        return await self.db.scalar(stmt)
+    
+    async def get_first_tick_at(
+        self,
+        start: Optional[datetime],
+        end: datetime
+    ) -> Optional[datetime]:
+        """Timestamp del primer tick en [start, end) (None si no hay)"""
+        stmt = select(func.min(Price.timestamp)).where(Price.timestamp < end)
+        if start is not None:
+            stmt = stmt.where(Price.timestamp >= start)
+        return await self.db.scalar(stmt)
+    
+    async def delete_old_prices(
+        self,
+        cutoff: datetime,
+        after_id: int = 0,
+        limit: int = 5000
+    ) -> tuple[int, int]:
+        """
+        Elimina un chunk acotado de precios anteriores a `cutoff`.
+        
+        Recorre por keyset sobre id: el caller repite con el último id
+        retornado hasta que no se elimine nada, haciendo commit entre
+        chunks para no retener el lock de escritura. No hace commit.
+        
+        Args:
+            cutoff: Se eliminan precios con timestamp < cutoff
+            after_id: Último id del chunk anterior
+            limit: Filas máximas por chunk
+        
+        Returns:
+            Tupla (filas eliminadas, último id del chunk)
+        """
+        stmt = (
+            select(Price.id)
+            .where(Price.id > after_id, Price.timestamp < cutoff)
+            .order_by(Price.id)
+            .limit(limit)
+        )
+        ids = list((await self.db.execute(stmt)).scalars().all())
+        if not ids:
+            return 0, after_id
+        
+        result = await self.db.execute(
+            delete(Price)
+            .where(Price.id.in_(ids))
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount, ids[-1]
 
 
 class ExchangeRateRepository(BaseRepository[ExchangeRate]):
@@ -108,6 +488,128 @@ class ExchangeRateRepository(BaseRepository[ExchangeRate]):
         )
         result = await self.db.execute(stmt)
         return result.scalar_one_or_none()
+    
+    async def store_snapshot(self, snapshot: ExchangeRateSnapshot) -> int:
+        """
+        Guarda una tabla del provider: una fila por moneda destino.
+        
+        Una tabla ya guardada (mismo timestamp) se ignora. No hace commit.
+        
+        Returns:
+            Filas insertadas
+        """
+        now = datetime.utcnow()
+        rows = [
+            {
+                "from_currency": snapshot.base,
+                "to_currency": currency,
+                "rate": Decimal(str(rate)),
+                "source": snapshot.source,
+                "timestamp": snapshot.timestamp,
+                "created_at": now,
+            }
+            for currency, rate in snapshot.rates.items()
+        ]
+        if not rows:
+            return 0
+        
+        stmt = self._upsert_insert().on_conflict_do_nothing(
+            index_elements=["from_currency", "to_currency", "timestamp"]
+        ).returning(ExchangeRate.id)
+        result = await self.db.execute(stmt, rows)
+        return len(result.all())
+    
+    async def get_latest_snapshot(
+        self,
+        from_currency: str = "USD"
+    ) -> Optional[ExchangeRateSnapshot]:
+        """Tabla más reciente guardada de una moneda base"""
+        latest = (
+            select(func.max(ExchangeRate.timestamp))
+            .where(ExchangeRate.from_currency == from_currency)
+            .scalar_subquery()
+        )
+        stmt = select(ExchangeRate).where(
+            ExchangeRate.from_currency == from_currency,
+            ExchangeRate.timestamp == latest
+        )
+        rates = list((await self.db.execute(stmt)).scalars().all())
+        if not rates:
+            return None
+        return ExchangeRateSnapshot(
+            base=from_currency,
+            rates={rate.to_currency: float(rate.rate) for rate in rates},
+            source=rates[0].source,
+            timestamp=rates[0].timestamp,
+            stored_at=max(rate.created_at for rate in rates)
+        )
+    
+    async def stream_rate_points(
+        self,
+        from_currency: str = "USD",
+        to_currency: str = "MXN",
+        after_id: int = 0,
+        chunk_size: int = 10000
+    ) -> AsyncIterator[List[Row]]:
+        """
+        Serie de un par con id > after_id, por chunks.
+        
+        Yields:
+            Listas de filas (id, timestamp, rate) en orden de id
+        """
+        stmt = (
+            select(ExchangeRate.id, ExchangeRate.timestamp, ExchangeRate.rate)
+            .where(
+                ExchangeRate.from_currency == from_currency,
+                ExchangeRate.to_currency == to_currency,
+                ExchangeRate.id > after_id
+            )
+            .order_by(ExchangeRate.id)
+        )
+        result = await self.db.stream(
+            stmt.execution_options(yield_per=chunk_size)
+        )
+        async for partition in result.partitions():
+            yield partition
+    
+    async def backfill_from_prices(self) -> int:
+        """
+        Copia a exchange_rates el USD/MXN registrado en cada tick de
+        prices (historial previo a los snapshots). Un valor por
+        timestamp; los ticks guardados sin tipo de cambio (NULL) no
+        aportan. No hace commit.
+        
+        Returns:
+            Filas insertadas
+        """
+        ticks = (
+            select(
+                literal("USD"),
+                literal("MXN"),
+                func.max(Price.exchange_rate),
+                literal("prices"),
+                Price.timestamp,
+                # Cada tipo de cambio se obtuvo al momento del tick
+                Price.timestamp.label("created_at"),
+            )
+            .where(Price.exchange_rate.is_not(None))
+            .group_by(Price.timestamp)
+        )
+        stmt = self._upsert_insert().from_select(
+            [
+                "from_currency",
+                "to_currency",
+                "rate",
+                "source",
+                "timestamp",
+                "created_at",
+            ],
+            ticks
+        ).on_conflict_do_nothing(
+            index_elements=["from_currency", "to_currency", "timestamp"]
+        )
+        result = await self.db.execute(stmt)
+        return result.rowcount
 
 
 from sqlalchemy import delete, func
@@ -0,0 +1,284 @@
+"""
+Price Rollup Repository
+
+Velas OHLC por resolución, mantenidas incrementalmente desde los ticks.
+"""
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Iterable, List, Optional, Sequence
+from sqlalchemy import Float, cast, select, delete, func, case
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import Price, PriceRollup
+from app.repositories.base import BaseRepository
+
+
+# Resoluciones de menor a mayor
+RESOLUTIONS = ("1h", "1d", "1w", "1m")
+
+# Duración aproximada de cada bucket (1m = mes promedio)
+RESOLUTION_SECONDS = {
+    "1h": 3600,
+    "1d": 86400,
+    "1w": 7 * 86400,
+    "1m": 2629746,
+}
+
+
+def bucket_start(timestamp: datetime, resolution: str) -> datetime:
+    """Inicio del bucket de `resolution` que contiene `timestamp`"""
+    if resolution == "1h":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    day = timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    if resolution == "1d":
+        return day
+    if resolution == "1w":
+        return day - timedelta(days=day.weekday())
+    if resolution == "1m":
+        return day.replace(day=1)
+    raise ValueError(f"Resolución inválida: {resolution}")
+
+
+def next_bucket_start(timestamp: datetime, resolution: str) -> datetime:
+    """Primer inicio de bucket de `resolution` en o después de `timestamp`"""
+    start = bucket_start(timestamp, resolution)
+    if start == timestamp:
+        return start
+    if resolution == "1m":
+        return (start + timedelta(days=32)).replace(day=1)
+    return start + timedelta(seconds=RESOLUTION_SECONDS[resolution])
+
+
+class PriceRollupRepository(BaseRepository[PriceRollup]):
+    """Repository para PriceRollup"""
+    
+    def __init__(self, db: AsyncSession):
+        super().__init__(PriceRollup, db)
+    
+    def _greatest(self, a, b):
+        if self.dialect_name == "postgresql":
+            return func.greatest(a, b)
+        return func.max(a, b)  # max() escalar de SQLite
+    
+    def _least(self, a, b):
+        if self.dialect_name == "postgresql":
+            return func.least(a, b)
+        return func.min(a, b)  # min() escalar de SQLite
+    
+    async def apply_ticks(
+        self,
+        ticks: Iterable[Row],
+        resolutions: Sequence[str] = RESOLUTIONS,
+        replace: bool = False
+    ) -> int:
+        """
+        Fusiona ticks en las velas de cada resolución.
+        
+        Los ticks se agregan primero en memoria por bucket y luego se
+        hace un upsert por vela. El merge es conmutativo, así que el
+        orden de llegada de los ticks no importa. Un tick reescrito
+        (upsert con on_conflict="update") cuenta como un tick nuevo.
+        
+        Con replace=True las velas se sobrescriben en lugar de fusionarse:
+        el caller debe pasar todos los ticks de cada bucket.
+        
+        No hace commit: el caller controla la transacción.
+        
+        Args:
+            ticks: Filas con ticker, timestamp y price_usd
+            resolutions: Resoluciones a actualizar
+            replace: Sobrescribir las velas existentes
+        
+        Returns:
+            Número de velas insertadas o actualizadas
+        """
+        candles: dict[tuple[str, str, datetime], dict] = {}
+        for tick in ticks:
+            price = Decimal(str(tick.price_usd))
+            for resolution in resolutions:
+                key = (
+                    tick.ticker,
+                    resolution,
+                    bucket_start(tick.timestamp, resolution)
+                )
+                candle = candles.get(key)
+                if candle is None:
+                    candles[key] = {
+                        "ticker": tick.ticker,
+                        "resolution": resolution,
+                        "bucket_start": key[2],
+                        "open_usd": price,
+                        "high_usd": price,
+                        "low_usd": price,
+                        "close_usd": price,
+                        "open_at": tick.timestamp,
+                        "close_at": tick.timestamp,
+                        "tick_count": 1,
+                    }
+                    continue
+                if tick.timestamp < candle["open_at"]:
+                    candle["open_usd"] = price
+                    candle["open_at"] = tick.timestamp
+                if tick.timestamp >= candle["close_at"]:
+                    candle["close_usd"] = price
+                    candle["close_at"] = tick.timestamp
+                candle["high_usd"] = max(candle["high_usd"], price)
+                candle["low_usd"] = min(candle["low_usd"], price)
+                candle["tick_count"] += 1
+        
+        if not candles:
+            return 0
+        
+        stmt = self._upsert_insert()
+        excluded = stmt.excluded
+        if replace:
+            await self.db.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=["ticker", "resolution", "bucket_start"],
+                    set_={
+                        column: excluded[column]
+                        for column in (
+                            "open_usd", "high_usd", "low_usd", "close_usd",
+                            "open_at", "close_at", "tick_count",
+                        )
+                    }
+                ),
+                list(candles.values())
+            )
+            return len(candles)
+        
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["ticker", "resolution", "bucket_start"],
+            set_={
+                "open_usd": case(
+                    (excluded.open_at < PriceRollup.open_at, excluded.open_usd),
+                    else_=PriceRollup.open_usd
+                ),
+                "open_at": self._least(PriceRollup.open_at, excluded.open_at),
+                "close_usd": case(
+                    (excluded.close_at >= PriceRollup.close_at, excluded.close_usd),
+                    else_=PriceRollup.close_usd
+                ),
+                "close_at": self._greatest(
+                    PriceRollup.close_at, excluded.close_at
+                ),
+                "high_usd": self._greatest(
+                    PriceRollup.high_usd, excluded.high_usd
+                ),
+                "low_usd": self._least(PriceRollup.low_usd, excluded.low_usd),
+                "tick_count": PriceRollup.tick_count + excluded.tick_count,
+            }
+        )
+        await self.db.execute(stmt, list(candles.values()))
+        return len(candles)
+    
+    async def get_rollups(
+        self,
+        ticker: str,
+        resolution: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> List[PriceRollup]:
+        """Velas de un ticker ordenadas por bucket"""
+        stmt = select(PriceRollup).where(
+            PriceRollup.ticker == ticker.upper(),
+            PriceRollup.resolution == resolution
+        )
+        
+        if start_date:
+            stmt = stmt.where(
+                PriceRollup.bucket_start >= bucket_start(start_date, resolution)
+            )
+        if end_date:
+            stmt = stmt.where(PriceRollup.bucket_start <= end_date)
+        
+        stmt = stmt.order_by(PriceRollup.bucket_start)
+        result = await self.db.execute(stmt)
+        return list(result.scalars().all())
+    
+    async def get_close_series(
+        self,
+        tickers: Sequence[str],
+        resolution: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> List[Row]:
+        """
+        Cierres de varios tickers en una query.
+        
+        Returns:
+            Filas (ticker, bucket_start, close_usd) ordenadas por ticker
+            y bucket, con close_usd float
+        """
+        stmt = select(
+            PriceRollup.ticker,
+            PriceRollup.bucket_start,
+            # Floats del driver: sin construir un Decimal por celda
+            cast(PriceRollup.close_usd, Float).label("close_usd")
+        ).where(
+            PriceRollup.ticker.in_([t.upper() for t in tickers]),
+            PriceRollup.resolution == resolution
+        )
+        
+        if start_date:
+            stmt = stmt.where(
+                PriceRollup.bucket_start >= bucket_start(start_date, resolution)
+            )
+        if end_date:
+            stmt = stmt.where(PriceRollup.bucket_start <= end_date)
+        
+        stmt = stmt.order_by(PriceRollup.ticker, PriceRollup.bucket_start)
+        result = await self.db.execute(stmt)
+        return list(result.all())
+    
+    async def has_rollups(self) -> bool:
+        """True si existe al menos una vela"""
+        stmt = select(PriceRollup.id).limit(1)
+        return await self.db.scalar(stmt) is not None
+    
+    async def delete_rollups(
+        self,
+        resolutions: Sequence[str] = RESOLUTIONS,
+        start: Optional[datetime] = None
+    ) -> int:
+        """Elimina las velas de las resoluciones indicadas (solo >= start)"""
+        stmt = delete(PriceRollup).where(
+            PriceRollup.resolution.in_(resolutions)
+        )
+        if start is not None:
+            stmt = stmt.where(PriceRollup.bucket_start >= start)
+        result = await self.db.execute(stmt)
+        return result.rowcount
+    
+    async def get_first_bucket_start(self, resolution: str) -> Optional[datetime]:
+        """Inicio de la vela más vieja de una resolución (None si no hay)"""
+        stmt = select(func.min(PriceRollup.bucket_start)).where(
+            PriceRollup.resolution == resolution
+        )
+        return await self.db.scalar(stmt)
+    
+    async def get_tick_chunk(
+        self,
+        after_id: int,
+        max_id: int,
+        limit: int
+    ) -> List[Row]:
+        """
+        Siguiente chunk de ticks de prices por keyset sobre id.
+        
+        Returns:
+            Filas (id, ticker, timestamp, price_usd) con after_id < id <= max_id
+        """
+        stmt = (
+            select(Price.id, Price.ticker, Price.timestamp, Price.price_usd)
+            .where(Price.id > after_id, Price.id <= max_id)
+            .order_by(Price.id)
+            .limit(limit)
+        )
+        result = await self.db.execute(stmt)
+        return list(result.all())
+    
+    async def get_max_tick_id(self) -> int:
+        """Mayor id en prices (0 si está vacía)"""
+        return await self.db.scalar(select(func.max(Price.id))) or 0
@@ -0,0 +1,160 @@
+"""
+Portfolio Snapshot Repository
+
+Valor diario precalculado (NAV) de cada portfolio.
+"""
+
+from datetime import date
+from typing import Dict, List, Optional, Sequence
+from sqlalchemy import Float, Select, cast, delete, func, select
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import PortfolioSnapshot
+from app.repositories.base import BaseRepository
+
+
+class PortfolioSnapshotRepository(BaseRepository[PortfolioSnapshot]):
+    """Repository para PortfolioSnapshot"""
+    
+    # Columnas que reescribe un upsert sobre (portfolio_id, snapshot_date)
+    UPSERT_UPDATE_COLUMNS = (
+        "value_usd",
+        "value_mxn",
+        "invested_usd",
+        "net_flow_usd",
+        "holdings_count",
+        "source",
+        "created_at",
+    )
+    
+    def __init__(self, db: AsyncSession):
+        super().__init__(PortfolioSnapshot, db)
+    
+    async def upsert_many(self, rows: Sequence[dict]) -> int:
+        """
+        Inserta o reemplaza snapshots por (portfolio_id, snapshot_date).
+        
+        Las filas se envían como executemany: SQLAlchemy las agrupa en
+        INSERTs multi-row sin pasar el límite de parámetros del driver.
+        No hace commit: el caller controla la transacción.
+        
+        Args:
+            rows: Dicts con todas las columnas del snapshot
+        
+        Returns:
+            Filas escritas
+        """
+        if not rows:
+            return 0
+        
+        stmt = self._upsert_insert()
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["portfolio_id", "snapshot_date"],
+            set_={
+                column: stmt.excluded[column]
+                for column in self.UPSERT_UPDATE_COLUMNS
+            }
+        )
+        await self.db.execute(stmt, list(rows))
+        return len(rows)
+    
+    async def get_range(
+        self,
+        portfolio_id: int,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None
+    ) -> List[Row]:
+        """
+        Snapshots de un portfolio en un rango de días, en una query sobre
+        el índice único (portfolio_id, snapshot_date).
+        
+        Returns:
+            Filas (snapshot_date, value_usd, value_mxn, invested_usd,
+            net_flow_usd, holdings_count) ordenadas por día, con floats
+        """
+        stmt = self._select_rows(portfolio_id)
+        if start_date:
+            stmt = stmt.where(PortfolioSnapshot.snapshot_date >= start_date)
+        if end_date:
+            stmt = stmt.where(PortfolioSnapshot.snapshot_date <= end_date)
+        
+        stmt = stmt.order_by(PortfolioSnapshot.snapshot_date)
+        result = await self.db.execute(stmt)
+        return list(result.all())
+    
+    async def get_latest_before(
+        self,
+        portfolio_id: int,
+        before: date
+    ) -> Optional[Row]:
+        """
+        Último snapshot de un portfolio con snapshot_date < before, aunque
+        falten días entre él y before.
+        
+        Returns:
+            Fila con las columnas de get_range, o None si no hay
+        """
+        stmt = (
+            self._select_rows(portfolio_id)
+            .where(PortfolioSnapshot.snapshot_date < before)
+            .order_by(PortfolioSnapshot.snapshot_date.desc())
+            .limit(1)
+        )
+        result = await self.db.execute(stmt)
+        return result.first()
+    
+    async def get_last_dates(
+        self,
+        portfolio_ids: Sequence[int]
+    ) -> Dict[int, date]:
+        """
+        Día del último snapshot de cada portfolio, en una query agrupada.
+        
+        Returns:
+            Dict portfolio_id -> último snapshot_date (sin entrada si el
+            portfolio no tiene snapshots)
+        """
+        if not portfolio_ids:
+            return {}
+        stmt = (
+            select(
+                PortfolioSnapshot.portfolio_id,
+                func.max(PortfolioSnapshot.snapshot_date)
+            )
+            .where(PortfolioSnapshot.portfolio_id.in_(portfolio_ids))
+            .group_by(PortfolioSnapshot.portfolio_id)
+        )
+        result = await self.db.execute(stmt)
+        return dict(result.all())
+    
+    async def has_snapshots(self) -> bool:
+        """True si existe al menos un snapshot"""
+        stmt = select(PortfolioSnapshot.id).limit(1)
+        return await self.db.scalar(stmt) is not None
+    
+    async def delete_by_portfolio(
+        self,
+        portfolio_id: int,
+        before: Optional[date] = None
+    ) -> int:
+        """Elimina los snapshots de un portfolio (solo días < before)"""
+        stmt = delete(PortfolioSnapshot).where(
+            PortfolioSnapshot.portfolio_id == portfolio_id
+        )
+        if before is not None:
+            stmt = stmt.where(PortfolioSnapshot.snapshot_date < before)
+        result = await self.db.execute(stmt)
+        return result.rowcount
+    
+    @staticmethod
+    def _select_rows(portfolio_id: int) -> Select:
+        """Columnas de get_range para los snapshots de un portfolio"""
+        return select(
+            PortfolioSnapshot.snapshot_date,
+            # Floats del driver: sin construir un Decimal por celda
+            cast(PortfolioSnapshot.value_usd, Float).label("value_usd"),
+            cast(PortfolioSnapshot.value_mxn, Float).label("value_mxn"),
+            cast(PortfolioSnapshot.invested_usd, Float).label("invested_usd"),
+            cast(PortfolioSnapshot.net_flow_usd, Float).label("net_flow_usd"),
+            PortfolioSnapshot.holdings_count
+        ).where(PortfolioSnapshot.portfolio_id == portfolio_id)
@@ -4,7 +4,8 @@ Transaction Repository
 
 from datetime import datetime
 from typing import List, Optional
-from sqlalchemy import select, and_, desc
+from sqlalchemy import select, and_, desc, or_
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.models import Transaction, TransactionType
 from app.repositories.base import BaseRepository
@@ -49,3 +50,53 @@ class TransactionRepository(BaseRepository[Transaction]):
         )
         result = await self.db.execute(stmt)
         return list(result.scalars().all())
+    
+    async def get_distinct_assets(self) -> List[tuple[str, str]]:
+        """Pares (ticker, asset_type) distintos en todas las transacciones"""
+        stmt = select(Transaction.ticker, Transaction.asset_type).distinct()
+        result = await self.db.execute(stmt)
+        return [tuple(row) for row in result.all()]
+    
+    async def get_missing_exchange_rate(
+        self,
+        portfolio_id: Optional[int] = None
+    ) -> List[Transaction]:
+        """Transacciones sin exchange_rate o sin total_value_mxn"""
+        stmt = select(Transaction).where(
+            or_(
+                Transaction.exchange_rate.is_(None),
+                Transaction.total_value_mxn.is_(None)
+            )
+        )
+        
+        if portfolio_id is not None:
+            stmt = stmt.where(Transaction.portfolio_id == portfolio_id)
+        
+        stmt = stmt.order_by(Transaction.transaction_date)
+        result = await self.db.execute(stmt)
+        return list(result.scalars().all())
+    
+    async def get_events(self, portfolio_id: int) -> List[Row]:
+        """
+        Columnas para reconstruir posiciones y flujos de un portfolio, sin
+        construir objetos Transaction.
+        
+        Returns:
+            Filas (ticker, transaction_type, quantity, price_per_unit,
+            total_value, fee, transaction_date) ordenadas por fecha
+        """
+        stmt = (
+            select(
+                Transaction.ticker,
+                Transaction.transaction_type,
+                Transaction.quantity,
+                Transaction.price_per_unit,
+                Transaction.total_value,
+                Transaction.fee,
+                Transaction.transaction_date
+            )
+            .where(Transaction.portfolio_id == portfolio_id)
+            .order_by(Transaction.transaction_date, Transaction.id)
+        )
+        result = await self.db.execute(stmt)
+        return list(result.all())
@@ -9,9 +9,9 @@ Principios aplicados:
 - API Documentation: Schemas auto-documentan la API
 """
 
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional, List
-from pydantic import BaseModel, Field, validator, ConfigDict
+from pydantic import AliasChoices, BaseModel, Field, validator, ConfigDict
 
 
 # ============================================================================
@@ -98,6 +98,14 @@ class HoldingResponse(HoldingBase):
     created_at: datetime
     updated_at: datetime
     
+    # El modelo guarda el costo promedio como average_buy_price
+    average_cost: float = Field(
+        ...,
+        gt=0,
+        validation_alias=AliasChoices("average_cost", "average_buy_price"),
+        description="Precio promedio de compra en USD"
+    )
+    
     # Campos calculados (agregados por el servicio)
     current_price: Optional[float] = Field(
         None,
@@ -231,6 +239,88 @@ class PortfolioSummary(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class PortfolioValuePoint(BaseModel):
+    """Valor del portfolio al cierre de un bucket"""
+    
+    timestamp: datetime
+    value_usd: float
+
+
+class PortfolioValueHistoryResponse(BaseModel):
+    """Serie de valor del portfolio para gráficas"""
+    
+    portfolio_id: int
+    interval: str = Field(..., pattern="^(1h|1d|1w|1m)$")
+    start_date: datetime
+    end_date: datetime
+    count: int
+    source_count: int = Field(
+        ..., description="Puntos en el rango antes del downsampling LTTB"
+    )
+    tickers: List[str] = Field(description="Activos con precio en el rango")
+    points: List[PortfolioValuePoint]
+
+
+class PortfolioSnapshotPoint(BaseModel):
+    """Valor del portfolio al cierre de un día (snapshot precalculado)"""
+    
+    snapshot_date: date
+    value_usd: float
+    value_mxn: Optional[float]
+    invested_usd: float = Field(description="Aportaciones netas acumuladas")
+    net_flow_usd: float = Field(description="Aportaciones netas del día")
+    holdings_count: int
+    
+    model_config = ConfigDict(from_attributes=True)
+
+
+class PortfolioSnapshotsResponse(BaseModel):
+    """Serie diaria de valor del portfolio desde portfolio_snapshots"""
+    
+    portfolio_id: int
+    start_date: date
+    end_date: date
+    count: int
+    source_count: int = Field(
+        ..., description="Días en el rango antes del downsampling LTTB"
+    )
+    points: List[PortfolioSnapshotPoint]
+
+
+class PortfolioReturnsResponse(BaseModel):
+    """Rendimiento del portfolio en un rango de días"""
+    
+    portfolio_id: int
+    start_date: Optional[date] = Field(
+        None, description="Primer día con snapshot del rango"
+    )
+    end_date: Optional[date] = Field(
+        None, description="Último día con snapshot del rango"
+    )
+    days: int
+    start_value_usd: Optional[float] = Field(
+        None, description="Valor al cierre del día anterior al rango"
+    )
+    end_value_usd: Optional[float]
+    net_flow_usd: Optional[float] = Field(
+        None, description="Aportaciones netas dentro del rango"
+    )
+    gain_usd: Optional[float] = Field(
+        None, description="Valor final - inicial - aportaciones"
+    )
+    twr_percent: Optional[float] = Field(
+        None, description="Rendimiento ponderado por tiempo del rango"
+    )
+    twr_annualized_percent: Optional[float] = Field(
+        None, description="TWR anualizado (rangos de un año o más)"
+    )
+    xirr_percent: Optional[float] = Field(
+        None, description="Tasa interna de retorno anual de los flujos"
+    )
+    
+    model_config = ConfigDict(from_attributes=True)
+
+
 # ============================================================================
 # BULK OPERATIONS
 # ============================================================================
@@ -5,7 +5,7 @@ Schemas Pydantic para prices y exchange rates.
 """
 
 from datetime import datetime
-from typing import Optional, List
+from typing import Dict, Optional, List
 from pydantic import BaseModel, Field, ConfigDict
 
 
@@ -66,6 +66,15 @@ class ExchangeRateResponse(ExchangeRateBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class ExchangeRateTableResponse(BaseModel):
+    """Tipos de cambio de una moneda contra otras (tabla vigente)"""
+    base: str
+    source: str
+    timestamp: datetime = Field(..., description="Publicación de la tabla")
+    fetched_at: datetime = Field(..., description="Obtención del provider")
+    rates: Dict[str, float]
+
+
 class PriceHistoryRequest(BaseModel):
     """Request para obtener historial de precios"""
     ticker: str
@@ -81,3 +90,28 @@ class PriceHistoryResponse(BaseModel):
     start_date: datetime
     end_date: datetime
     count: int
+
+
+class PriceCandle(BaseModel):
+    """Vela OHLC de un bucket"""
+    bucket_start: datetime
+    open_usd: float
+    high_usd: float
+    low_usd: float
+    close_usd: float
+    tick_count: int
+    
+    model_config = ConfigDict(from_attributes=True)
+
+
+class PriceCandleHistoryResponse(BaseModel):
+    """Historial de precios en velas OHLC de una resolución"""
+    ticker: str
+    interval: str = Field(..., pattern="^(1h|1d|1w|1m)$")
+    start_date: datetime
+    end_date: datetime
+    count: int
+    source_count: int = Field(
+        ..., description="Velas en el rango antes del downsampling LTTB"
+    )
+    candles: List[PriceCandle]
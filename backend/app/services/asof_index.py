@@ -0,0 +1,469 @@
+"""
+As-Of Index
+
+Último precio de un ticker (o tipo de cambio USD/XXX) en o antes de un
+instante T: "¿a cuánto estaba VOO el día de esta transacción?".
+
+Cada serie es un par de arrays ordenados por timestamp (epoch int64 en
+microsegundos y float64) y se resuelve con búsqueda binaria. Se carga la
+primera vez que se consulta (del archivo columnar si existe, más los
+ticks de prices posteriores; los tipos de cambio de exchange_rates) y
+después solo se leen las filas nuevas por keyset sobre id.
+
+Principios aplicados:
+- Performance: Un batch de miles de pares (ticker, T) se resuelve con un
+  searchsorted por ticker, sin una query por par
+- Lazy Loading: Solo viven en memoria los tickers que alguien consulta
+- Consistency: Un commit que inserta en prices o exchange_rates marca
+  las series para leer las filas nuevas; uno que sobrescribe o elimina
+  filas las descarta. Las escrituras de otros procesos se ven a lo más
+  ASOF_INDEX_REFRESH_SECONDS después
+"""
+
+import asyncio
+import math
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql.dml import OnConflictDoUpdate as PgDoUpdate
+from sqlalchemy.dialects.sqlite.dml import OnConflictDoUpdate as SqliteDoUpdate
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.models.price import ExchangeRate, Price
+from app.repositories.price_repository import (
+    ExchangeRateRepository,
+    PriceRepository,
+)
+from app.services.price_archive import PriceArchive
+
+logger = get_logger(__name__)
+
+# Modelos cuyas escrituras cambian las series
+_TRACKED_MODELS = (Price, ExchangeRate)
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+_NAT = np.iinfo(np.int64).min
+
+# Cambios pendientes en la sesión: "append" (solo INSERTs nuevos) o
+# "reload" (UPDATE/DELETE/upsert que sobrescribe)
+_DIRTY_KEY = "asof_index_dirty"
+
+
+def to_epoch_us(timestamps: Iterable[datetime], count: int = -1) -> np.ndarray:
+    """Timestamps naive (UTC) -> array int64 de microsegundos"""
+    return np.fromiter(
+        ((timestamp - _EPOCH) // _MICROSECOND for timestamp in timestamps),
+        dtype=np.int64,
+        count=count
+    )
+
+
+@dataclass(frozen=True)
+class AsOfPoint:
+    """Valor vigente en un instante y el timestamp desde el que rige"""
+    timestamp: datetime
+    value: float
+    
+    def to_decimal(self, places: int = 2) -> Decimal:
+        return Decimal(f"{self.value:.{places}f}")
+
+
+@dataclass
+class AsOfBatch:
+    """
+    Resultado de un batch, alineado posición a posición con las consultas.
+    
+    values es NaN y timestamps es NaT donde no hay valor en o antes de T.
+    """
+    values: np.ndarray
+    timestamps: np.ndarray
+    
+    def __len__(self) -> int:
+        return len(self.values)
+    
+    @property
+    def found(self) -> np.ndarray:
+        """Máscara booleana de las consultas resueltas"""
+        return ~np.isnan(self.values)
+    
+    def to_decimals(self, places: int = 2) -> list[Optional[Decimal]]:
+        """Valores como Decimal redondeado (None si no hay valor)"""
+        return [
+            None if math.isnan(value) else Decimal(f"{value:.{places}f}")
+            for value in self.values.tolist()
+        ]
+
+
+class _Series:
+    """Arrays ordenados de una serie y su estado de carga"""
+    
+    __slots__ = ("timestamp_us", "values", "max_id", "checked_at", "stale")
+    
+    def __init__(self):
+        self.timestamp_us = np.empty(0, dtype=np.int64)
+        self.values = np.empty(0, dtype=np.float64)
+        self.max_id = 0
+        self.checked_at = 0.0
+        self.stale = True
+    
+    def extend(
+        self,
+        timestamp_us: list[np.ndarray],
+        values: list[np.ndarray],
+        dedupe: bool = False
+    ) -> None:
+        """
+        Agrega puntos manteniendo el orden por timestamp.
+        
+        Con dedupe se conserva solo el primer punto de cada racha de
+        valores iguales: el as-of de cualquier T no cambia.
+        """
+        if not timestamp_us:
+            return
+        ts = np.concatenate([self.timestamp_us, *timestamp_us])
+        vals = np.concatenate([self.values, *values])
+        # Lo normal es que los ticks nuevos sean posteriores: sin sort
+        if len(ts) > 1 and (np.diff(ts) < 0).any():
+            order = np.argsort(ts, kind="stable")
+            ts, vals = ts[order], vals[order]
+        if dedupe and len(vals) > 1:
+            keep = np.empty(len(vals), dtype=bool)
+            keep[0] = True
+            np.not_equal(vals[1:], vals[:-1], out=keep[1:])
+            ts, vals = ts[keep], vals[keep]
+        self.timestamp_us, self.values = ts, vals
+    
+    def resolve(
+        self,
+        query_us: np.ndarray,
+        max_age_us: Optional[int] = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        As-of vectorizado: último punto con timestamp <= cada consulta.
+        
+        Returns:
+            (values float64 con NaN, timestamps int64 con NaT)
+        """
+        if not len(self.timestamp_us):
+            return (
+                np.full(len(query_us), np.nan),
+                np.full(len(query_us), _NAT, dtype=np.int64),
+            )
+        position = np.searchsorted(self.timestamp_us, query_us, side="right") - 1
+        found = position >= 0
+        position = position.clip(0)
+        stamps = self.timestamp_us[position]
+        if max_age_us is not None:
+            found &= query_us - stamps <= max_age_us
+        return (
+            np.where(found, self.values[position], np.nan),
+            np.where(found, stamps, _NAT),
+        )
+
+
+class AsOfIndex:
+    """
+    Índice as-of por proceso: ticker -> serie de price_usd, y
+    "USD/XXX" -> serie del tipo de cambio (sin repetir valores
+    consecutivos iguales).
+    
+    - Carga perezosa por serie; cargas concurrentes de la misma serie
+      comparten una sola lectura
+    - mark_stale(): la siguiente consulta de cada serie lee solo los
+      ticks con id mayor al último leído
+    - invalidate(): descarta las series; se recargan completas
+    - Los ticks que la retención elimina siguen en memoria hasta el
+      siguiente invalidate (la retención lo provoca al hacer commit)
+    """
+    
+    def __init__(
+        self,
+        refresh_seconds: int,
+        archive: Optional[PriceArchive] = None
+    ):
+        """
+        Args:
+            refresh_seconds: Edad máxima de una serie antes de releer su cola
+            archive: Archivo columnar para cargar el historial sin la DB
+        """
+        self.refresh_seconds = refresh_seconds
+        self.archive = archive
+        self._series: dict[str, _Series] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._version = 0
+        self.loads = 0
+        self.refreshes = 0
+        self.lookups = 0
+    
+    async def get_price(
+        self,
+        db: AsyncSession,
+        ticker: str,
+        at: datetime,
+        max_age: Optional[timedelta] = None
+    ) -> Optional[AsOfPoint]:
+        """
+        Último precio USD de un ticker en o antes de `at`.
+        
+        Args:
+            db: Sesión usada solo si hay que cargar o refrescar la serie
+            ticker: Symbol del activo
+            at: Instante (naive UTC)
+            max_age: Descartar precios más viejos que at - max_age
+        
+        Returns:
+            AsOfPoint o None si no hay precio
+        """
+        batch = await self.get_prices(db, [(ticker, at)], max_age)
+        return self._point(batch)
+    
+    async def get_prices(
+        self,
+        db: AsyncSession,
+        pairs: Sequence[tuple[str, datetime]],
+        max_age: Optional[timedelta] = None
+    ) -> AsOfBatch:
+        """
+        Resuelve muchos pares (ticker, instante) en una llamada.
+        
+        Los pares se agrupan por ticker y cada grupo se resuelve con un
+        solo searchsorted; cada serie se carga o refresca una vez.
+        
+        Args:
+            db: Sesión usada solo si hay que cargar o refrescar series
+            pairs: Pares (ticker, instante naive UTC) en cualquier orden
+            max_age: Descartar precios más viejos que instante - max_age
+        
+        Returns:
+            AsOfBatch alineado con pairs
+        """
+        count = len(pairs)
+        values = np.full(count, np.nan)
+        stamps = np.full(count, _NAT, dtype=np.int64)
+        if not count:
+            return AsOfBatch(values, stamps.view("datetime64[us]"))
+        
+        query_us = to_epoch_us((at for _, at in pairs), count)
+        tickers, inverse = np.unique(
+            np.array([ticker.upper() for ticker, _ in pairs], dtype=object),
+            return_inverse=True
+        )
+        order = np.argsort(inverse, kind="stable")
+        bounds = np.searchsorted(inverse[order], np.arange(len(tickers) + 1))
+        max_age_us = max_age // _MICROSECOND if max_age is not None else None
+        
+        for k, ticker in enumerate(tickers):
+            series = await self._get_series(db, ticker)
+            group = order[bounds[k]:bounds[k + 1]]
+            values[group], stamps[group] = series.resolve(
+                query_us[group], max_age_us
+            )
+        
+        self.lookups += count
+        return AsOfBatch(values, stamps.view("datetime64[us]"))
+    
+    async def get_rate(
+        self,
+        db: AsyncSession,
+        at: datetime,
+        currency: str = "MXN"
+    ) -> Optional[AsOfPoint]:
+        """
+        Tipo de cambio EXCHANGE_RATE_BASE/currency vigente en `at`.
+        
+        El timestamp del resultado es desde cuándo rige ese valor.
+        """
+        return self._point(await self.get_rates(db, [at], currency))
+    
+    async def get_rates(
+        self,
+        db: AsyncSession,
+        timestamps: Sequence[datetime],
+        currency: str = "MXN"
+    ) -> AsOfBatch:
+        """
+        Tipo de cambio EXCHANGE_RATE_BASE/currency vigente en cada instante.
+        
+        Returns:
+            AsOfBatch alineado con timestamps
+        """
+        series = await self._get_series(
+            db, f"{settings.EXCHANGE_RATE_BASE}/{currency.upper()}"
+        )
+        values, stamps = series.resolve(to_epoch_us(timestamps, len(timestamps)))
+        self.lookups += len(timestamps)
+        return AsOfBatch(values, stamps.view("datetime64[us]"))
+    
+    def mark_stale(self) -> None:
+        """Las series cargadas releen sus ticks nuevos en la siguiente consulta"""
+        for series in self._series.values():
+            series.stale = True
+    
+    def invalidate(self) -> None:
+        """Descarta todas las series cargadas"""
+        self._version += 1
+        self._series.clear()
+    
+    def stats(self) -> dict:
+        """Métricas acumuladas desde el arranque del proceso"""
+        return {
+            "series": len(self._series),
+            "points": sum(len(s.timestamp_us) for s in self._series.values()),
+            "bytes": sum(
+                s.timestamp_us.nbytes + s.values.nbytes
+                for s in self._series.values()
+            ),
+            "loads": self.loads,
+            "refreshes": self.refreshes,
+            "lookups": self.lookups,
+        }
+    
+    @staticmethod
+    def _point(batch: AsOfBatch) -> Optional[AsOfPoint]:
+        if not batch.found[0]:
+            return None
+        return AsOfPoint(
+            timestamp=batch.timestamps[0].item(),
+            value=float(batch.values[0])
+        )
+    
+    def _is_current(self, series: _Series) -> bool:
+        return (
+            not series.stale
+            and time.monotonic() - series.checked_at <= self.refresh_seconds
+        )
+    
+    async def _get_series(self, db: AsyncSession, key: str) -> _Series:
+        series = self._series.get(key)
+        if series is not None and self._is_current(series):
+            return series
+        
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            series = self._series.get(key)
+            if series is not None and self._is_current(series):
+                return series
+            
+            version = self._version
+            loaded = series or _Series()
+            if series is None:
+                self._load_archive(key, loaded)
+                self.loads += 1
+            else:
+                self.refreshes += 1
+            # Un commit durante la lectura vuelve a marcar la serie
+            loaded.stale = False
+            loaded.checked_at = time.monotonic()
+            await self._read_tail(db, key, loaded)
+            
+            if version == self._version:
+                self._series[key] = loaded
+            return loaded
+    
+    def _load_archive(self, key: str, series: _Series) -> None:
+        """Historial archivado del ticker (copiado a memoria)"""
+        if self.archive is None or "/" in key:
+            return
+        # meta antes que load: si se publica una versión en medio, los
+        # ticks de más se vuelven a leer de la DB con el mismo valor
+        meta = self.archive.read_meta(key)
+        archived = self.archive.load(key) if meta is not None else None
+        if archived is None:
+            return
+        series.extend(
+            [np.array(archived.timestamp_us)], [np.array(archived.price_usd)]
+        )
+        series.max_id = meta["last_id"]
+    
+    async def _read_tail(self, db: AsyncSession, key: str, series: _Series) -> None:
+        """Lee los ticks con id mayor al último leído"""
+        is_fx = "/" in key
+        if is_fx:
+            base, currency = key.split("/")
+            chunks = ExchangeRateRepository(db).stream_rate_points(
+                base, currency, after_id=series.max_id
+            )
+            column = "rate"
+        else:
+            chunks = PriceRepository(db).stream_price_points(
+                key, after_id=series.max_id
+            )
+            column = "price_usd"
+        
+        timestamp_us: list[np.ndarray] = []
+        values: list[np.ndarray] = []
+        async for chunk in chunks:
+            timestamp_us.append(
+                to_epoch_us((row.timestamp for row in chunk), len(chunk))
+            )
+            values.append(np.fromiter(
+                (float(getattr(row, column)) for row in chunk),
+                dtype=np.float64,
+                count=len(chunk)
+            ))
+            series.max_id = max(series.max_id, max(row.id for row in chunk))
+        series.extend(timestamp_us, values, dedupe=is_fx)
+
+
+# Índice por proceso; el archivo columnar es opcional (load devuelve None)
+asof_index = AsOfIndex(
+    refresh_seconds=settings.ASOF_INDEX_REFRESH_SECONDS,
+    archive=PriceArchive(settings.PRICE_ARCHIVE_DIR)
+)
+
+
+def _mark(session: Session, change: str) -> None:
+    if session.info.get(_DIRTY_KEY) != "reload":
+        session.info[_DIRTY_KEY] = change
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_dirty_on_flush(session: Session, flush_context) -> None:
+    """Marca la sesión si el flush tocó precios o tipos de cambio"""
+    changed = (*session.dirty, *session.deleted)
+    if any(isinstance(obj, _TRACKED_MODELS) for obj in changed):
+        _mark(session, "reload")
+    elif any(isinstance(obj, _TRACKED_MODELS) for obj in session.new):
+        _mark(session, "append")
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_dirty_on_dml(orm_execute_state: ORMExecuteState) -> None:
+    """Marca la sesión en INSERT/UPDATE/DELETE directos sobre esos modelos"""
+    if orm_execute_state.is_select:
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or not issubclass(mapper.class_, _TRACKED_MODELS):
+        return
+    statement = orm_execute_state.statement
+    overwrites = isinstance(
+        getattr(statement, "_post_values_clause", None),
+        (PgDoUpdate, SqliteDoUpdate)
+    )
+    if orm_execute_state.is_insert and not overwrites:
+        _mark(orm_execute_state.session, "append")
+    else:
+        _mark(orm_execute_state.session, "reload")
+
+
+@event.listens_for(Session, "after_commit")
+def _refresh_on_commit(session: Session) -> None:
+    change = session.info.pop(_DIRTY_KEY, None)
+    if change == "reload":
+        asof_index.invalidate()
+    elif change == "append":
+        asof_index.mark_stale()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session: Session) -> None:
+    session.info.pop(_DIRTY_KEY, None)
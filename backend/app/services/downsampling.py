@@ -0,0 +1,91 @@
+"""
+Downsampling de series para gráficas
+
+Largest-Triangle-Three-Buckets (LTTB): reduce una serie a `max_points`
+puntos eligiendo en cada bucket el punto que forma el triángulo de mayor
+área con el punto elegido antes y el promedio del bucket siguiente. Los
+picos y valles que se ven en la gráfica sobreviven; los tramos planos se
+adelgazan.
+
+Principios aplicados:
+- Performance: Una gráfica recibe cientos de puntos, no miles de filas;
+  el cálculo por bucket es vectorizado con NumPy
+- Single Responsibility: Solo elige índices; el caller decide qué filas
+  conservar
+"""
+
+from datetime import datetime
+from typing import Sequence
+
+import numpy as np
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def to_epoch_seconds(timestamps: Sequence[datetime]) -> np.ndarray:
+    """Timestamps naive (UTC) o array datetime64 -> array float64 de segundos"""
+    if isinstance(timestamps, np.ndarray) and timestamps.dtype.kind == "M":
+        micros = timestamps.astype("datetime64[us]").astype(np.int64)
+        return micros / 1_000_000
+    # Convertir datetimes de Python a datetime64 con np.array es ~8x más lento
+    return np.fromiter(
+        ((timestamp - _EPOCH).total_seconds() for timestamp in timestamps),
+        dtype=np.float64,
+        count=len(timestamps)
+    )
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Índices de los puntos que conserva LTTB.
+    
+    El primer y el último punto siempre se conservan; el resto de la
+    serie se divide en max_points - 2 buckets con un punto cada uno.
+    
+    Args:
+        x: Eje x creciente (ej: epoch seconds)
+        y: Valores
+        max_points: Puntos a conservar (>= 2)
+    
+    Returns:
+        Array int64 de índices crecientes (todos si la serie ya cabe)
+    
+    Raises:
+        ValueError: Si max_points < 2 o x e y no tienen el mismo largo
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if len(y) != n:
+        raise ValueError("x e y deben tener el mismo largo")
+    if max_points < 2:
+        raise ValueError("max_points debe ser al menos 2")
+    if n <= max_points:
+        return np.arange(n, dtype=np.int64)
+    if max_points == 2:
+        return np.array([0, n - 1], dtype=np.int64)
+    
+    # Bordes de los buckets interiores: [edges[i], edges[i + 1])
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    
+    # Promedio de cada bucket (y del último punto como "bucket" final)
+    counts = np.diff(edges)
+    avg_x = np.append(np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / counts, x[-1])
+    avg_y = np.append(np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / counts, y[-1])
+    
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(max_points - 2):
+        start, end = edges[i], edges[i + 1]
+        next_x, next_y = avg_x[i + 1], avg_y[i + 1]
+        # Doble del área del triángulo (a, punto, promedio siguiente)
+        area = np.abs(
+            (x[a] - next_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (next_y - y[a])
+        )
+        a = start + int(area.argmax())
+        selected[i + 1] = a
+    return selected
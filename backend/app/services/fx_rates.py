@@ -0,0 +1,226 @@
+"""
+FX Rates
+
+Cache en memoria de la última tabla de tipos de cambio (USD contra todas
+las monedas) y la matriz de tipos cruzados que se deriva de ella.
+
+Principios aplicados:
+- Performance: Un request al provider por intervalo sirve USD/MXN,
+  EUR/MXN, MXN/EUR... sin gastar cuota por par; una conversión es una
+  lectura de la matriz
+- Single Responsibility: Solo almacenamiento y frescura; el fetch es de
+  PriceService y la persistencia de ExchangeRateRepository
+- Fault Tolerance: Si el provider falla se sigue usando la última tabla
+"""
+
+from datetime import datetime, timedelta
+from typing import Optional, Sequence
+
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.providers.base import ExchangeRateSnapshot
+from app.repositories.price_repository import ExchangeRateRepository
+
+logger = get_logger(__name__)
+
+
+class CrossRateMatrix:
+    """
+    Tipos cruzados de todas las monedas de un snapshot.
+    
+    matrix[i, j] = unidades de la moneda j por 1 unidad de la moneda i,
+    derivado de la tabla base: (base -> j) / (base -> i).
+    """
+    
+    def __init__(self, snapshot: ExchangeRateSnapshot):
+        self.base = snapshot.base
+        self.source = snapshot.source
+        self.timestamp = snapshot.timestamp
+        self.currencies = sorted({snapshot.base, *snapshot.rates})
+        self._index = {
+            currency: i for i, currency in enumerate(self.currencies)
+        }
+        per_base = np.array([
+            1.0 if currency == snapshot.base else snapshot.rates[currency]
+            for currency in self.currencies
+        ])
+        self.matrix = per_base[np.newaxis, :] / per_base[:, np.newaxis]
+    
+    def __contains__(self, currency: str) -> bool:
+        return currency.upper() in self._index
+    
+    def _position(self, currency: str) -> int:
+        try:
+            return self._index[currency.upper()]
+        except KeyError:
+            raise ValueError(f"Moneda no disponible: {currency}") from None
+    
+    def rate(self, from_currency: str, to_currency: str) -> float:
+        """
+        Unidades de to_currency por 1 from_currency.
+        
+        Raises:
+            ValueError: Si alguna moneda no está en el snapshot
+        """
+        return float(self.matrix[
+            self._position(from_currency), self._position(to_currency)
+        ])
+    
+    def rates_from(
+        self,
+        from_currency: str,
+        currencies: Optional[Sequence[str]] = None
+    ) -> dict[str, float]:
+        """
+        Fila de la matriz: tipos de from_currency contra cada moneda.
+        
+        Args:
+            from_currency: Moneda base de la fila
+            currencies: Monedas a incluir (default: todas)
+        """
+        row = self.matrix[self._position(from_currency)]
+        if currencies is None:
+            currencies = self.currencies
+        return {
+            currency.upper(): float(row[self._position(currency)])
+            for currency in currencies
+        }
+    
+    def convert(self, amounts, from_currencies, to_currency: str) -> np.ndarray:
+        """
+        Convierte montos en monedas distintas a una sola moneda.
+        
+        Args:
+            amounts: Montos (escalar o array)
+            from_currencies: Moneda de cada monto (o una para todos)
+            to_currency: Moneda destino
+        
+        Returns:
+            Array float64 de montos en to_currency
+        """
+        target = self._position(to_currency)
+        if isinstance(from_currencies, str):
+            rows = self._position(from_currencies)
+        else:
+            rows = np.fromiter(
+                (self._position(currency) for currency in from_currencies),
+                dtype=np.int64,
+                count=len(from_currencies)
+            )
+        return np.asarray(amounts, dtype=np.float64) * self.matrix[rows, target]
+
+
+class FxRateCache:
+    """
+    Última tabla de tipos de cambio del proceso.
+    
+    - fresh: obtenida hace <= max_age, se usa sin llamar al provider
+    - Las tablas obtenidas del provider quedan pendientes de guardar
+      hasta que PriceService las persiste en su transacción
+    - Tras un reinicio se carga la última tabla guardada en la DB
+    """
+    
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._matrix: Optional[CrossRateMatrix] = None
+        self._fetched_at: Optional[datetime] = None
+        self._pending: list[ExchangeRateSnapshot] = []
+        self.fetches = 0
+        self.hits = 0
+    
+    @property
+    def matrix(self) -> Optional[CrossRateMatrix]:
+        """Matriz de la última tabla (fresca o no)"""
+        return self._matrix
+    
+    @property
+    def fetched_at(self) -> Optional[datetime]:
+        return self._fetched_at
+    
+    def is_fresh(self, max_age: Optional[timedelta] = None) -> bool:
+        """True si hay tabla y no supera max_age (default: TTL)"""
+        if max_age is None:
+            max_age = timedelta(seconds=self.ttl_seconds)
+        return (
+            self._matrix is not None
+            and datetime.utcnow() - self._fetched_at <= max_age
+        )
+    
+    def get(self, max_age: Optional[timedelta] = None) -> Optional[CrossRateMatrix]:
+        """Matriz si está fresca; None si hay que pedir una tabla nueva"""
+        if self.is_fresh(max_age):
+            self.hits += 1
+            return self._matrix
+        return None
+    
+    def set(
+        self,
+        snapshot: ExchangeRateSnapshot,
+        fetched_at: Optional[datetime] = None,
+        persist: bool = True
+    ) -> CrossRateMatrix:
+        """
+        Reemplaza la tabla vigente.
+        
+        Args:
+            snapshot: Tabla completa de una moneda base
+            fetched_at: Momento del fetch (default: ahora)
+            persist: Dejarla pendiente de guardar en la DB
+        """
+        self._matrix = CrossRateMatrix(snapshot)
+        self._fetched_at = fetched_at or datetime.utcnow()
+        if persist:
+            self.fetches += 1
+            self._pending.append(snapshot)
+        return self._matrix
+    
+    def take_pending(self) -> list[ExchangeRateSnapshot]:
+        """Tablas obtenidas que aún no se guardan (y las olvida)"""
+        pending, self._pending = self._pending, []
+        return pending
+    
+    def requeue(self, snapshots: list[ExchangeRateSnapshot]) -> None:
+        """Devuelve tablas de take_pending que no se pudieron guardar"""
+        self._pending[:0] = snapshots
+    
+    async def load(self, db: AsyncSession) -> Optional[CrossRateMatrix]:
+        """
+        Matriz vigente; si el proceso no tiene tabla, carga la última
+        guardada (su frescura cuenta desde que se guardó).
+        """
+        if self._matrix is not None:
+            return self._matrix
+        
+        snapshot = await ExchangeRateRepository(db).get_latest_snapshot(
+            settings.EXCHANGE_RATE_BASE
+        )
+        if snapshot is None:
+            return None
+        logger.info(
+            f"Tipos de cambio cargados de la DB: {len(snapshot.rates)} "
+            f"monedas ({snapshot.timestamp})"
+        )
+        return self.set(
+            snapshot,
+            fetched_at=snapshot.stored_at or snapshot.timestamp,
+            persist=False
+        )
+    
+    def stats(self) -> dict:
+        """Métricas acumuladas desde el arranque del proceso"""
+        return {
+            "base": self._matrix.base if self._matrix else None,
+            "currencies": len(self._matrix.currencies) if self._matrix else 0,
+            "timestamp": self._matrix.timestamp if self._matrix else None,
+            "fetched_at": self._fetched_at,
+            "fetches": self.fetches,
+            "hits": self.hits,
+            "pending": len(self._pending),
+        }
+
+
+# Tabla por proceso compartida por PriceService, el scheduler y la API
+fx_rates = FxRateCache(ttl_seconds=settings.EXCHANGE_RATE_CACHE_SECONDS)
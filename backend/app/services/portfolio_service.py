@@ -9,19 +9,51 @@ Principios aplicados:
 - Business Logic Layer: Separado de controllers y data access
 """
 
+from dataclasses import dataclass
+from datetime import datetime
 from decimal import Decimal
+import numpy as np
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from typing import List
+from sqlalchemy.orm import selectinload
+from typing import List, Optional, Sequence
 
 from app.models.portfolio import Portfolio
 from app.models.holding import Holding
+from app.core.config import settings
 from app.core.logging import get_logger
-from app.schemas.portfolio import PortfolioCreate, PortfolioUpdate
+from app.repositories.portfolio_repository import HoldingRepository
+from app.repositories.rollup_repository import PriceRollupRepository
+from app.repositories.transaction_repository import TransactionRepository
+from app.schemas.portfolio import (
+    HoldingResponse,
+    PortfolioCreate,
+    PortfolioSummary,
+    PortfolioUpdate,
+)
+from app.services.asof_index import asof_index
+from app.services.downsampling import lttb_indices, to_epoch_seconds
+from app.services.price_history_service import choose_resolution
+from app.services.valuation import (
+    HoldingsValuation,
+    PortfolioTotals,
+    load_batch_valuation,
+    load_valuation,
+)
+from app.services.valuation_state import valuation_state
 
 logger = get_logger(__name__)
 
 
+@dataclass
+class ValueHistory:
+    """Serie de valor de un portfolio"""
+    resolution: str
+    points: list[tuple[datetime, float]]
+    source_count: int
+    tickers: list[str]
+
+
 class PortfolioService:
     """
     Servicio para gestión de portafolios.
@@ -83,26 +115,33 @@ class PortfolioService:
         
         return portfolio
     
-    async def get_portfolio(self, portfolio_id: int) -> Portfolio | None:
+    async def get_portfolio(
+        self,
+        portfolio_id: int,
+        with_holdings: bool = False
+    ) -> Portfolio | None:
         """
         Obtiene un portafolio por ID.
         
         Args:
             portfolio_id: ID del portafolio
+            with_holdings: Cargar holdings (para serializar PortfolioResponse)
         
         Returns:
             Portafolio o None si no existe
         """
-        result = await self.db.execute(
-            select(Portfolio)
-            .where(Portfolio.id == portfolio_id)
-        )
+        stmt = select(Portfolio).where(Portfolio.id == portfolio_id)
+        if with_holdings:
+            stmt = stmt.options(selectinload(Portfolio.holdings))
+        result = await self.db.execute(stmt)
         return result.scalar_one_or_none()
     
     async def get_all_portfolios(
         self,
         skip: int = 0,
-        limit: int = 100
+        limit: int = 100,
+        active_only: bool = False,
+        with_holdings: bool = False
     ) -> List[Portfolio]:
         """
         Obtiene lista de portafolios con paginación.
@@ -110,12 +149,20 @@ class PortfolioService:
         Args:
             skip: Número de registros a saltar
             limit: Máximo número de registros
+            active_only: Solo portafolios activos
+            with_holdings: Cargar holdings (una query extra para la página)
         
         Returns:
             Lista de portafolios
         """
+        stmt = select(Portfolio)
+        if active_only:
+            stmt = stmt.where(Portfolio.is_active == True)
+        if with_holdings:
+            stmt = stmt.options(selectinload(Portfolio.holdings))
         result = await self.db.execute(
-            select(Portfolio)
+            stmt
+            .order_by(Portfolio.id)
             .offset(skip)
             .limit(limit)
         )
@@ -136,7 +183,7 @@ class PortfolioService:
         Returns:
             Portafolio actualizado o None si no existe
         """
-        portfolio = await self.get_portfolio(portfolio_id)
+        portfolio = await self.get_portfolio(portfolio_id, with_holdings=True)
         
         if not portfolio:
             return None
@@ -183,6 +230,19 @@ class PortfolioService:
         
         return True
     
+    async def get_valuation(self, portfolio_id: int) -> HoldingsValuation:
+        """
+        Valúa los holdings del portafolio con el último precio de cada
+        activo (holdings + precios en una query, tipo de cambio en otra).
+        
+        Args:
+            portfolio_id: ID del portafolio
+        
+        Returns:
+            HoldingsValuation con arrays por holding y totales
+        """
+        return await load_valuation(self.db, [portfolio_id])
+    
     async def get_portfolio_value(self, portfolio_id: int) -> Decimal:
         """
         Calcula el valor total actual del portafolio.
@@ -191,12 +251,10 @@ class PortfolioService:
             portfolio_id: ID del portafolio
         
         Returns:
-            Valor total en USD
-        
-        TODO: Implementar cálculo con precios actuales
+            Valor total en USD (sin los activos que no tienen precio)
         """
-        # Por ahora retorna 0, implementar con PriceService
-        return Decimal("0")
+        totals = await valuation_state.get(self.db, portfolio_id)
+        return Decimal(str(totals.total_value_usd))
     
     async def get_portfolio_distribution(
         self,
@@ -209,8 +267,252 @@ class PortfolioService:
             portfolio_id: ID del portafolio
         
         Returns:
-            Dict con ticker: percentage
+            Dict con ticker: percentage del valor actual
+        """
+        totals = await valuation_state.get(self.db, portfolio_id)
+        distribution = totals.distribution
+        return {
+            ticker: Decimal(str(percent))
+            for ticker, percent in distribution.items()
+        }
+    
+    async def get_valuations(
+        self,
+        portfolio_ids: Sequence[int]
+    ) -> dict[int, PortfolioTotals]:
+        """
+        Valúa muchos portafolios en una pasada desde la DB.
+        
+        Las queries no dependen del número de portafolios: posiciones,
+        últimos precios de la unión de tickers y tipo de cambio. Para
+        lecturas frecuentes usar get_current_totals.
+        
+        Args:
+            portfolio_ids: IDs de los portafolios
+        
+        Returns:
+            Dict portfolio_id -> totales (vacíos si no tiene holdings)
+        """
+        valuation = await load_batch_valuation(self.db, portfolio_ids)
+        totals = valuation.totals()
+        return {
+            portfolio_id: (
+                totals.get(portfolio_id)
+                or valuation.empty_totals(portfolio_id)
+            )
+            for portfolio_id in portfolio_ids
+        }
+    
+    async def get_current_totals(
+        self,
+        portfolio_ids: Sequence[int]
+    ) -> dict[int, PortfolioTotals]:
+        """
+        Totales de portafolios desde el estado de valuación en memoria.
+        
+        Se mantienen con cada precio guardado; solo se consulta la DB en
+        la carga inicial o tras cambios en los holdings.
+        
+        Args:
+            portfolio_ids: IDs de los portafolios
+        
+        Returns:
+            Dict portfolio_id -> totales (vacíos si no tiene holdings)
+        """
+        return await valuation_state.get_many(self.db, portfolio_ids)
+    
+    async def get_portfolio_summaries(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        active_only: bool = True
+    ) -> List[PortfolioSummary]:
+        """
+        Resumen valuado de una página de portafolios.
+        
+        Args:
+            skip: Número de registros a saltar
+            limit: Máximo número de registros
+            active_only: Solo portafolios activos
+        
+        Returns:
+            Lista de PortfolioSummary con valor y ganancia actuales
+        """
+        portfolios = await self.get_all_portfolios(skip, limit, active_only)
+        valuations = await self.get_current_totals(
+            [portfolio.id for portfolio in portfolios]
+        )
+        return [
+            PortfolioSummary(
+                id=portfolio.id,
+                name=portfolio.name,
+                description=portfolio.description,
+                is_active=portfolio.is_active,
+                holdings_count=valuations[portfolio.id].holdings_count,
+                total_value_usd=valuations[portfolio.id].total_value_usd,
+                total_value_mxn=valuations[portfolio.id].total_value_mxn,
+                total_gain_loss_percent=(
+                    valuations[portfolio.id].total_gain_loss_percent
+                ),
+                created_at=portfolio.created_at,
+                updated_at=portfolio.updated_at,
+            )
+            for portfolio in portfolios
+        ]
+    
+    @staticmethod
+    def holding_responses(valuation: HoldingsValuation) -> List[HoldingResponse]:
+        """
+        HoldingResponse de cada holding con sus campos calculados.
+        
+        Args:
+            valuation: Valuación de los holdings
+        """
+        return [
+            HoldingResponse(
+                id=holding.id,
+                portfolio_id=holding.portfolio_id,
+                ticker=holding.ticker,
+                asset_type=holding.asset_type,
+                quantity=float(holding.quantity),
+                average_cost=float(holding.average_buy_price),
+                platform=holding.platform,
+                created_at=holding.created_at,
+                updated_at=holding.updated_at,
+                **valuation.holding_metrics(position)
+            )
+            for position, holding in enumerate(valuation.holdings)
+        ]
+    
+    async def get_value_history(
+        self,
+        portfolio_id: int,
+        start_date: datetime,
+        end_date: datetime,
+        max_points: Optional[int] = None
+    ) -> ValueHistory:
+        """
+        Serie de valor del portfolio en USD para gráficas.
+        
+        Valúa las cantidades actuales de los holdings con el cierre de
+        cada vela (forward fill entre velas de activos distintos). La
+        resolución se elige como en el historial de precios y la serie
+        se reduce a max_points con LTTB.
+        
+        La serie empieza cuando todos los activos con precio en el rango
+        tienen al menos una vela, para no mostrar saltos por activos sin
+        histórico.
+        
+        Args:
+            portfolio_id: ID del portafolio
+            start_date: Fecha inicial
+            end_date: Fecha final
+            max_points: Presupuesto de puntos (default: settings)
+        
+        Returns:
+            ValueHistory con puntos (timestamp, valor USD) ordenados
+        """
+        if max_points is None:
+            max_points = settings.PRICE_HISTORY_MAX_POINTS
+        
+        quantities: dict[str, float] = {}
+        for holding in await HoldingRepository(self.db).get_by_portfolio(
+            portfolio_id
+        ):
+            ticker = holding.ticker.upper()
+            quantities[ticker] = quantities.get(ticker, 0.0) + float(holding.quantity)
+        
+        resolution = choose_resolution(
+            start_date,
+            end_date,
+            max_points * settings.PRICE_HISTORY_LTTB_OVERSAMPLING
+        )
+        if not quantities:
+            return ValueHistory(resolution, [], 0, [])
+        
+        rows = await PriceRollupRepository(self.db).get_close_series(
+            list(quantities), resolution, start_date, end_date
+        )
+        if not rows:
+            return ValueHistory(resolution, [], 0, [])
+        
+        row_tickers = np.array([row.ticker for row in rows])
+        row_times = np.array(
+            [row.bucket_start for row in rows], dtype="datetime64[us]"
+        )
+        row_closes = np.array(
+            [float(row.close_usd) for row in rows], dtype=np.float64
+        )
+        
+        times = np.unique(row_times)
+        values = np.zeros(len(times), dtype=np.float64)
+        first_complete = 0
+        tickers = sorted(set(row_tickers.tolist()))
+        for ticker in tickers:
+            mask = row_tickers == ticker
+            ticker_times = row_times[mask]
+            ticker_closes = row_closes[mask]
+            # Último cierre del ticker en o antes de cada timestamp
+            last = np.searchsorted(ticker_times, times, side="right") - 1
+            values += quantities[ticker] * ticker_closes[np.maximum(last, 0)]
+            first_complete = max(
+                first_complete, int(np.searchsorted(times, ticker_times[0]))
+            )
+        
+        times = times[first_complete:]
+        values = values[first_complete:]
+        source_count = len(times)
+        keep = lttb_indices(to_epoch_seconds(times), values, max_points)
+        
+        points = list(zip(
+            times[keep].astype(datetime).tolist(),
+            values[keep].round(2).tolist()
+        ))
+        return ValueHistory(resolution, points, source_count, tickers)
+    
+    async def fill_transaction_exchange_rates(
+        self,
+        portfolio_id: Optional[int] = None
+    ) -> int:
+        """
+        Completa exchange_rate y total_value_mxn de transacciones que no
+        los tienen, con el tipo de cambio vigente en transaction_date.
+        
+        Todas las fechas se resuelven en un solo batch del índice as-of;
+        un exchange_rate ya capturado se respeta.
         
-        TODO: Implementar con holdings actuales
+        Args:
+            portfolio_id: Solo este portafolio (default: todos)
+        
+        Returns:
+            Transacciones actualizadas (sin tipo de cambio conocido a su
+            fecha quedan igual)
         """
-        return {}
+        transactions = await TransactionRepository(
+            self.db
+        ).get_missing_exchange_rate(portfolio_id)
+        if not transactions:
+            return 0
+        
+        rates = await asof_index.get_rates(
+            self.db, [txn.transaction_date for txn in transactions]
+        )
+        updated = 0
+        for txn, rate in zip(transactions, rates.values.tolist()):
+            if txn.exchange_rate is None:
+                if np.isnan(rate):
+                    continue
+                txn.exchange_rate = rate
+            txn.total_value_mxn = round(txn.total_value * txn.exchange_rate, 2)
+            updated += 1
+        
+        await self.db.commit()
+        logger.info(
+            "Transaction exchange rates filled",
+            extra={
+                "portfolio_id": portfolio_id,
+                "updated": updated,
+                "missing": len(transactions) - updated,
+            }
+        )
+        return updated
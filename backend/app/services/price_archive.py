@@ -0,0 +1,456 @@
+"""
+Price Archive
+
+Archivo columnar del historial de ticks por ticker, fuera de la base de
+datos: un .npy por columna (epoch int64 en microsegundos y float64 para
+precios) que se lee con memory map como arrays de NumPy.
+
+Layout:
+    {PRICE_ARCHIVE_DIR}/{TICKER}/meta.json
+    {PRICE_ARCHIVE_DIR}/{TICKER}/{version:06d}/{columna}.npy
+
+Los .npy de una versión tienen capacidad de sobra (el doble de las filas
+al crearla; el espacio sin escribir es sparse en disco) y meta.json dice
+cuántas filas son válidas. Un export agrega las filas nuevas al final de
+los mismos archivos; solo crea una versión nueva al llenarse la
+capacidad o con rebuild.
+
+Principios aplicados:
+- Performance: Cálculos sobre años de precios sin ORM, sin Decimal y
+  sin cargar los datos en memoria (np.load con mmap_mode="r")
+- Consistency: Las filas se escriben después de las ya publicadas y se
+  publican reemplazando meta.json de forma atómica; un lector solo ve
+  las filas de la meta que leyó y nunca mezcla columnas de versiones
+  distintas
+- Incremental: Solo se exportan los ticks posteriores al último
+  (timestamp, id) archivado, en memoria constante y sin reescribir la
+  serie (copiarla a una versión nueva es amortizado por la capacidad)
+- Fault Tolerance: Un rebuild conserva lo archivado antes del primer
+  tick que queda en la DB (lo que la retención ya borró de prices)
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import time
+from dataclasses import dataclass, fields, replace
+from datetime import datetime, timedelta
+from typing import Optional
+
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.repositories.price_repository import PriceRepository
+
+logger = get_logger(__name__)
+
+# Columna -> dtype en disco (NaN = NULL en las columnas float)
+ARCHIVE_COLUMNS = {
+    "timestamp_us": np.int64,
+    "price_usd": np.float64,
+    "price_mxn": np.float64,
+    "exchange_rate": np.float64,
+    "volume_24h": np.float64,
+}
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+_META_FILE = "meta.json"
+# Filas mínimas de una versión nueva
+_MIN_CAPACITY = 1024
+
+
+def _to_float(value) -> float:
+    return float("nan") if value is None else float(value)
+
+
+def _capacity(rows: int) -> int:
+    """Capacidad de una versión nueva: el doble de sus filas"""
+    return max(2 * rows, _MIN_CAPACITY)
+
+
+@dataclass
+class ArchivedSeries:
+    """
+    Serie archivada de un ticker ordenada por (timestamp, id).
+    
+    Los arrays son memory maps de solo lectura: slicing y operaciones
+    vectorizadas no copian el archivo a memoria.
+    """
+    ticker: str
+    timestamp_us: np.ndarray
+    price_usd: np.ndarray
+    price_mxn: np.ndarray
+    exchange_rate: np.ndarray
+    volume_24h: np.ndarray
+    
+    def __len__(self) -> int:
+        return len(self.timestamp_us)
+    
+    @property
+    def timestamps(self) -> np.ndarray:
+        """Timestamps como datetime64[us] (vista, sin copia)"""
+        return self.timestamp_us.view("datetime64[us]")
+    
+    def between(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> "ArchivedSeries":
+        """
+        Sub-serie en [start_date, end_date] por búsqueda binaria.
+        
+        Returns:
+            ArchivedSeries con vistas de los mismos memory maps
+        """
+        lo, hi = 0, len(self)
+        if start_date is not None:
+            lo = int(np.searchsorted(
+                self.timestamp_us, (start_date - _EPOCH) // _MICROSECOND, "left"
+            ))
+        if end_date is not None:
+            hi = int(np.searchsorted(
+                self.timestamp_us, (end_date - _EPOCH) // _MICROSECOND, "right"
+            ))
+        return replace(self, **{
+            column: getattr(self, column)[lo:hi] for column in ARCHIVE_COLUMNS
+        })
+
+
+@dataclass
+class ArchiveReport:
+    """Resultado de un export del archivo"""
+    tickers: int
+    rows_appended: int
+    duration_seconds: float
+
+
+class PriceArchive:
+    """
+    Lectura y escritura del layout en disco.
+    
+    Sin dependencias de base de datos: un proceso de análisis puede
+    usar solo esta clase.
+    """
+    
+    def __init__(self, root: str):
+        """
+        Args:
+            root: Directorio raíz del archivo
+        """
+        self.root = root
+    
+    def tickers(self) -> list[str]:
+        """Tickers con al menos una versión publicada"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if os.path.isfile(os.path.join(self.root, name, _META_FILE))
+        )
+    
+    def read_meta(self, ticker: str) -> Optional[dict]:
+        """Metadata de la versión publicada (None si no hay)"""
+        path = os.path.join(self.root, ticker.upper(), _META_FILE)
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+    
+    def load(self, ticker: str) -> Optional[ArchivedSeries]:
+        """
+        Serie publicada de un ticker, con memory map.
+        
+        Returns:
+            ArchivedSeries o None si el ticker no está archivado
+        """
+        ticker = ticker.upper()
+        meta = self.read_meta(ticker)
+        if meta is None:
+            return None
+        directory = self._version_dir(ticker, meta["version"])
+        rows = meta["rows"]
+        return ArchivedSeries(
+            ticker=ticker,
+            **{
+                column: np.load(
+                    os.path.join(directory, f"{column}.npy"), mmap_mode="r"
+                )[:rows]
+                for column in ARCHIVE_COLUMNS
+            }
+        )
+    
+    def create_version(
+        self,
+        ticker: str,
+        version: int,
+        rows: int
+    ) -> dict[str, np.memmap]:
+        """Arrays escribibles de una versión nueva (aún no publicada)"""
+        directory = self._version_dir(ticker, version)
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+        return {
+            column: np.lib.format.open_memmap(
+                os.path.join(directory, f"{column}.npy"),
+                mode="w+",
+                dtype=dtype,
+                shape=(rows,)
+            )
+            for column, dtype in ARCHIVE_COLUMNS.items()
+        }
+    
+    def open_version(self, ticker: str, version: int) -> dict[str, np.memmap]:
+        """
+        Arrays escribibles de una versión publicada, con toda su
+        capacidad: solo se debe escribir después de las filas publicadas.
+        """
+        directory = self._version_dir(ticker, version)
+        return {
+            column: np.load(
+                os.path.join(directory, f"{column}.npy"), mmap_mode="r+"
+            )
+            for column in ARCHIVE_COLUMNS
+        }
+    
+    def publish(self, ticker: str, meta: dict) -> None:
+        """
+        Publica una versión reemplazando meta.json de forma atómica y
+        elimina las versiones anteriores.
+        
+        En Windows una versión con memory maps abiertos no se puede
+        borrar; queda para el siguiente publish.
+        """
+        ticker_dir = os.path.join(self.root, ticker)
+        tmp_path = os.path.join(ticker_dir, f"{_META_FILE}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(ticker_dir, _META_FILE))
+        
+        current = f"{meta['version']:06d}"
+        for name in os.listdir(ticker_dir):
+            if name.isdigit() and name != current:
+                shutil.rmtree(os.path.join(ticker_dir, name), ignore_errors=True)
+    
+    def discard_version(self, ticker: str, version: int) -> None:
+        """Elimina una versión que no se llegó a publicar"""
+        shutil.rmtree(self._version_dir(ticker, version), ignore_errors=True)
+    
+    def to_parquet(self, ticker: str, path: str) -> int:
+        """
+        Exporta la serie publicada a un archivo Parquet (para pandas,
+        DuckDB, Spark...). Requiere pyarrow, que es opcional.
+        
+        Returns:
+            Filas escritas
+        
+        Raises:
+            RuntimeError: Si pyarrow no está instalado
+            ValueError: Si el ticker no está archivado
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError("Exportar a Parquet requiere pyarrow") from e
+        
+        series = self.load(ticker)
+        if series is None:
+            raise ValueError(f"{ticker} no está archivado")
+        
+        table = pa.table({
+            "timestamp": pa.array(series.timestamps),
+            **{
+                column: pa.array(getattr(series, column), from_pandas=True)
+                for column in ARCHIVE_COLUMNS if column != "timestamp_us"
+            },
+        })
+        pq.write_table(table, path)
+        return len(series)
+    
+    def _version_dir(self, ticker: str, version: int) -> str:
+        return os.path.join(self.root, ticker, f"{version:06d}")
+
+
+class PriceArchiveService:
+    """Exporta prices de la base de datos al archivo columnar"""
+    
+    def __init__(self, db: AsyncSession, archive: Optional[PriceArchive] = None):
+        """
+        Args:
+            db: Sesión async de SQLAlchemy
+            archive: Archivo destino (default: PRICE_ARCHIVE_DIR)
+        """
+        self.db = db
+        self.archive = archive or PriceArchive(settings.PRICE_ARCHIVE_DIR)
+        self.prices = PriceRepository(db)
+    
+    async def export_ticker(
+        self,
+        ticker: str,
+        rebuild: bool = False,
+        chunk_size: int = 10000
+    ) -> int:
+        """
+        Agrega al archivo los ticks nuevos de un ticker.
+        
+        Los ticks se leen por keyset después del último (timestamp, id)
+        archivado y se escriben directo en los memory maps después de
+        las filas publicadas: la memoria es de un chunk y el costo es el
+        de las filas nuevas. Solo si no caben se copia la serie a una
+        versión nueva con el doble de capacidad. Un tick insertado
+        después con timestamp anterior al último archivado solo entra
+        con rebuild.
+        
+        rebuild reexporta desde la DB a partir de su primer tick del
+        ticker; lo archivado antes de ese tick (ya borrado de prices por
+        la retención) se conserva.
+        
+        Args:
+            ticker: Symbol del activo
+            rebuild: Reexportar el historial que sigue en la DB
+            chunk_size: Filas por chunk leído de la DB
+        
+        Returns:
+            Filas escritas desde la DB
+        """
+        ticker = ticker.upper()
+        meta = self.archive.read_meta(ticker)
+        append = meta is not None and not rebuild
+        position = meta["rows"] if append else 0
+        after = None
+        if append:
+            after = (datetime.fromisoformat(meta["last_timestamp"]), meta["last_id"])
+        
+        new_rows = await self.prices.count_price_history(ticker, after=after)
+        if not new_rows:
+            return 0
+        
+        kept = None
+        arrays = None
+        if append:
+            arrays = self.archive.open_version(ticker, meta["version"])
+            if len(arrays["timestamp_us"]) < position + new_rows:
+                # Sin capacidad: la serie pasa a una versión nueva
+                self._release(arrays)
+                arrays = None
+                kept = self.archive.load(ticker)
+        elif meta is not None:
+            # Retención: lo anterior al primer tick de la DB solo existe
+            # en el archivo
+            first = await self.prices.get_first_timestamp(ticker)
+            kept = self.archive.load(ticker).between(
+                end_date=first - _MICROSECOND
+            )
+            position = len(kept)
+        
+        version = meta["version"] if meta is not None else 0
+        if arrays is None:
+            version += 1
+            arrays = self.archive.create_version(
+                ticker, version, _capacity(position + new_rows)
+            )
+        created = not append or kept is not None
+        
+        start = position
+        last = None
+        try:
+            if kept is not None:
+                await asyncio.to_thread(self._copy_series, kept, arrays)
+                kept = None
+            async for chunk in self.prices.stream_price_history(
+                ticker, after=after, limit=new_rows, chunk_size=chunk_size
+            ):
+                end = position + len(chunk)
+                arrays["timestamp_us"][position:end] = [
+                    (row.timestamp - _EPOCH) // _MICROSECOND for row in chunk
+                ]
+                arrays["price_usd"][position:end] = [
+                    float(row.price_usd) for row in chunk
+                ]
+                for column in ("price_mxn", "exchange_rate", "volume_24h"):
+                    arrays[column][position:end] = [
+                        _to_float(getattr(row, column)) for row in chunk
+                    ]
+                position = end
+                last = chunk[-1]
+            
+            await asyncio.to_thread(self._flush, arrays)
+        except BaseException:
+            self._release(arrays)
+            if created:
+                self.archive.discard_version(ticker, version)
+            raise
+        
+        # Soltar los memory maps antes de borrar versiones viejas (Windows)
+        self._release(arrays)
+        if last is None:
+            # Los ticks se borraron entre el conteo y la lectura
+            if created:
+                self.archive.discard_version(ticker, version)
+            return 0
+        
+        self.archive.publish(ticker, {
+            "version": version,
+            "rows": position,
+            "last_timestamp": last.timestamp.isoformat(),
+            "last_id": last.id,
+            "exported_at": datetime.utcnow().isoformat(),
+            "columns": {
+                column: np.dtype(dtype).str
+                for column, dtype in ARCHIVE_COLUMNS.items()
+            },
+        })
+        return position - start
+    
+    async def export_all(self, rebuild: bool = False) -> ArchiveReport:
+        """
+        Exporta todos los tickers con precio (tabla latest_prices).
+        
+        Args:
+            rebuild: Reexportar todo el historial de cada ticker
+        
+        Returns:
+            ArchiveReport con tickers, filas agregadas y duración
+        """
+        started = time.perf_counter()
+        tickers = [row.ticker for row in await self.prices.get_latest_prices()]
+        appended = 0
+        for ticker in tickers:
+            appended += await self.export_ticker(ticker, rebuild=rebuild)
+        
+        report = ArchiveReport(
+            tickers=len(tickers),
+            rows_appended=appended,
+            duration_seconds=round(time.perf_counter() - started, 3)
+        )
+        logger.info(
+            "Price archive exported",
+            extra={
+                "tickers": report.tickers,
+                "rows_appended": report.rows_appended,
+                "duration_seconds": report.duration_seconds,
+            }
+        )
+        return report
+    
+    @staticmethod
+    def _copy_series(series: ArchivedSeries, arrays: dict[str, np.memmap]) -> None:
+        rows = len(series)
+        for field in fields(series):
+            if field.name in arrays:
+                arrays[field.name][:rows] = getattr(series, field.name)
+    
+    @staticmethod
+    def _flush(arrays: dict[str, np.memmap]) -> None:
+        for array in arrays.values():
+            array.flush()
+    
+    @staticmethod
+    def _release(arrays: dict[str, np.memmap]) -> None:
+        """Suelta las referencias a los memory maps para cerrarlos"""
+        arrays.clear()
@@ -0,0 +1,181 @@
+"""
+Latest Price Cache
+
+Cache en memoria del último precio de cada ticker, con TTL por clase de
+activo y stale-while-revalidate.
+
+Principios aplicados:
+- Performance: Lecturas de precio sin I/O en el request path
+- Fault Tolerance: Si el provider falla se sigue sirviendo el último precio
+- Single Responsibility: Solo almacenamiento y frescura, no obtención
+"""
+
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Iterable, Optional
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.providers.base import PriceData
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class CacheEntry:
+    """Precio cacheado con su clase de activo"""
+    data: PriceData
+    asset_type: str
+    
+    @property
+    def fetched_at(self) -> datetime:
+        return self.data.timestamp
+
+
+class PriceCache:
+    """
+    Cache ticker -> (PriceData, fetched_at).
+    
+    - fresh: edad <= TTL de su clase de activo, se sirve directo
+    - stale: edad > TTL, se sirve igual y se agenda una revalidación
+      en background (una sola por ticker)
+    - miss: el caller debe hacer fetch síncrono
+    """
+    
+    def __init__(self, ttl_seconds: dict[str, int], default_ttl_seconds: int):
+        """
+        Args:
+            ttl_seconds: TTL por asset_type (crypto, stock, etf...)
+            default_ttl_seconds: TTL para asset_types no configurados
+        """
+        self.ttl_seconds = ttl_seconds
+        self.default_ttl_seconds = default_ttl_seconds
+        self._entries: dict[str, CacheEntry] = {}
+        self._revalidating: set[str] = set()
+        self._tasks: set[asyncio.Task] = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+    
+    def _ttl(self, asset_type: str) -> timedelta:
+        return timedelta(
+            seconds=self.ttl_seconds.get(asset_type, self.default_ttl_seconds)
+        )
+    
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        """True si la entrada no superó el TTL de su clase de activo"""
+        return datetime.utcnow() - entry.fetched_at <= self._ttl(entry.asset_type)
+    
+    def __contains__(self, ticker: str) -> bool:
+        """True si el ticker está cacheado (sin afectar métricas)"""
+        return ticker.upper() in self._entries
+    
+    def get(self, ticker: str) -> Optional[CacheEntry]:
+        """
+        Busca un ticker en cache y actualiza las métricas.
+        
+        Returns:
+            CacheEntry (fresca o vieja) o None si no está cacheado
+        """
+        entry = self._entries.get(ticker.upper())
+        if entry is None:
+            self.misses += 1
+        elif self.is_fresh(entry):
+            self.hits += 1
+        else:
+            self.stale_hits += 1
+        return entry
+    
+    def set(self, data: PriceData, asset_type: str) -> None:
+        """Guarda un precio si es más nuevo que el cacheado"""
+        ticker = data.ticker.upper()
+        current = self._entries.get(ticker)
+        if current is None or current.fetched_at <= data.timestamp:
+            self._entries[ticker] = CacheEntry(data=data, asset_type=asset_type)
+    
+    def set_many(
+        self,
+        prices: Iterable[PriceData],
+        asset_types: dict[str, str]
+    ) -> None:
+        """
+        Guarda varios precios.
+        
+        Args:
+            prices: Precios a guardar
+            asset_types: ticker -> asset_type
+        """
+        for data in prices:
+            self.set(data, asset_types.get(data.ticker.upper(), "stock"))
+    
+    def revalidate(
+        self,
+        asset_types: dict[str, str],
+        fetch: Callable[[], Awaitable[list[PriceData]]]
+    ) -> None:
+        """
+        Agenda una revalidación en background para tickers viejos.
+        
+        Tickers que ya tienen una revalidación en curso se ignoran. Si el
+        fetch falla, las entradas viejas se conservan.
+        
+        Args:
+            asset_types: ticker -> asset_type de los tickers a revalidar
+            fetch: Coroutine factory que obtiene los precios
+        """
+        pending = [t for t in asset_types if t not in self._revalidating]
+        if not pending:
+            return
+        self._revalidating.update(pending)
+        
+        async def run() -> None:
+            try:
+                self.set_many(await fetch(), asset_types)
+            except Exception as e:
+                logger.warning(f"Error revalidando precios {pending}: {e}")
+            finally:
+                self._revalidating.difference_update(pending)
+        
+        task = asyncio.create_task(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    def warm(self, prices: Iterable[PriceData], asset_types: dict[str, str]) -> int:
+        """
+        Carga precios persistidos (ej: último precio por ticker en DB).
+        
+        Args:
+            prices: Precios a cargar
+            asset_types: ticker -> asset_type
+        
+        Returns:
+            Número de entradas cargadas
+        """
+        prices = list(prices)
+        self.set_many(prices, asset_types)
+        return len(prices)
+    
+    def clear(self) -> None:
+        self._entries.clear()
+    
+    def stats(self) -> dict:
+        """Métricas acumuladas desde el arranque del proceso"""
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "revalidating": len(self._revalidating),
+        }
+
+
+# Cache por proceso compartido por todas las instancias de PriceService
+price_cache = PriceCache(
+    ttl_seconds={
+        "crypto": settings.PRICE_CACHE_TTL_CRYPTO_SECONDS,
+        "stock": settings.PRICE_CACHE_TTL_STOCK_SECONDS,
+        "etf": settings.PRICE_CACHE_TTL_STOCK_SECONDS,
+    },
+    default_ttl_seconds=settings.PRICE_CACHE_TTL_STOCK_SECONDS,
+)
@@ -0,0 +1,471 @@
+"""
+Price History Service
+
+Lectura del historial de precios en velas OHLC, mantenimiento de las
+tablas de rollup y retención de ticks crudos.
+
+Principios aplicados:
+- Performance: Cada gráfica lee velas de la resolución que cabe en su
+  presupuesto de puntos, no los ticks crudos, y LTTB las reduce a
+  max_points conservando los picos
+- Single Responsibility: Solo historial; el último precio es de PriceService
+- Fault Tolerance: El backfill avanza por chunks con commit, sin
+  bloquear la ingesta, y no borra velas de ticks ya compactados
+- Streaming: La exportación de ticks crudos corre en memoria constante
+  y se reanuda con un cursor (timestamp, id)
+"""
+
+import asyncio
+import base64
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import AsyncIterator, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.db.partitions import PricePartitionManager
+from app.models.price import Price, PriceRollup
+from app.repositories.price_repository import PriceRepository
+from app.repositories.rollup_repository import (
+    PriceRollupRepository,
+    RESOLUTIONS,
+    RESOLUTION_SECONDS,
+    bucket_start,
+    next_bucket_start,
+)
+from app.services.downsampling import lttb_indices, to_epoch_seconds
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class BackfillReport:
+    """Resultado de un backfill de rollups"""
+    ticks_processed: int
+    duration_seconds: float
+    skipped: bool = False
+
+
+@dataclass
+class RetentionReport:
+    """Resultado de una compactación de ticks crudos"""
+    cutoff: datetime
+    days_compacted: int
+    ticks_compacted: int
+    rows_deleted: int
+    delete_batches: int
+    partitions_dropped: list[str]
+    reclaim: str
+    duration_seconds: float
+
+
+def encode_history_cursor(timestamp: datetime, price_id: int) -> str:
+    """Token opaco de paginación para reanudar después de una fila"""
+    raw = f"{timestamp.isoformat()}|{price_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_history_cursor(token: str) -> tuple[datetime, int]:
+    """
+    Decodifica un token de encode_history_cursor.
+    
+    Raises:
+        ValueError: Si el token no es válido
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        timestamp, price_id = raw.split("|")
+        return datetime.fromisoformat(timestamp), int(price_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Cursor inválido: {token}") from e
+
+
+def choose_resolution(
+    start_date: datetime,
+    end_date: datetime,
+    max_points: int,
+    min_resolution: Optional[str] = None
+) -> str:
+    """
+    Resolución más fina cuyo número de velas en el rango cabe en el
+    presupuesto de puntos.
+    
+    Ej: 5 años con max_points=500 -> 1w (~260 velas); 30 días -> 1h (720)
+    no cabe, así que 1d (30).
+    
+    Args:
+        start_date: Inicio del rango
+        end_date: Fin del rango
+        max_points: Presupuesto de puntos de la gráfica
+        min_resolution: Resolución mínima pedida por el cliente (opcional)
+    
+    Returns:
+        Resolución (1h, 1d, 1w, 1m)
+    """
+    candidates = RESOLUTIONS
+    if min_resolution is not None:
+        candidates = RESOLUTIONS[RESOLUTIONS.index(min_resolution):]
+    
+    span_seconds = max((end_date - start_date).total_seconds(), 0)
+    for resolution in candidates:
+        if span_seconds / RESOLUTION_SECONDS[resolution] <= max_points:
+            return resolution
+    return candidates[-1]
+
+
+class PriceHistoryService:
+    """
+    Servicio de historial de precios.
+    
+    Las velas se mantienen en la ingesta (PriceRepository.bulk_upsert);
+    este servicio las lee, las reconstruye y compacta los ticks viejos.
+    """
+    
+    def __init__(self, db: AsyncSession):
+        """
+        Args:
+            db: Sesión async de SQLAlchemy
+        """
+        self.db = db
+        self.rollups = PriceRollupRepository(db)
+    
+    async def get_candles(
+        self,
+        ticker: str,
+        start_date: datetime,
+        end_date: datetime,
+        interval: Optional[str] = None,
+        max_points: Optional[int] = None
+    ) -> tuple[str, list[PriceRollup], int]:
+        """
+        Velas OHLC de un ticker en el rango.
+        
+        Lee la resolución más fina con hasta max_points *
+        PRICE_HISTORY_LTTB_OVERSAMPLING velas en el rango y, si pasan de
+        max_points, conserva las que elige LTTB sobre el cierre: 30 días
+        con max_points=500 se sirven con velas de 1h en lugar de 30
+        velas diarias.
+        
+        Args:
+            ticker: Symbol del activo
+            start_date: Fecha inicial
+            end_date: Fecha final
+            interval: Resolución mínima (opcional, default: la elige el
+                presupuesto de puntos)
+            max_points: Presupuesto de puntos (default: settings)
+        
+        Returns:
+            Tupla (resolución usada, velas ordenadas por bucket, velas en
+            el rango antes del downsampling)
+        """
+        if max_points is None:
+            max_points = settings.PRICE_HISTORY_MAX_POINTS
+        
+        resolution = choose_resolution(
+            start_date,
+            end_date,
+            max_points * settings.PRICE_HISTORY_LTTB_OVERSAMPLING,
+            interval
+        )
+        candles = await self.rollups.get_rollups(
+            ticker, resolution, start_date, end_date
+        )
+        source_count = len(candles)
+        if source_count > max_points:
+            keep = lttb_indices(
+                to_epoch_seconds([c.bucket_start for c in candles]),
+                [float(c.close_usd) for c in candles],
+                max_points
+            )
+            candles = [candles[i] for i in keep]
+        return resolution, candles, source_count
+    
+    async def stream_ticks(
+        self,
+        ticker: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
+        chunk_size: int = 1000
+    ) -> AsyncIterator[List[Row]]:
+        """
+        Ticks crudos de un ticker por chunks, para exportación.
+        
+        Args:
+            ticker: Symbol del activo
+            start_date: Fecha inicial (opcional)
+            end_date: Fecha final (opcional)
+            cursor: Token de la última fila recibida (reanuda después de ella)
+            limit: Máximo de filas (None = todo el rango)
+            chunk_size: Filas por chunk
+        
+        Yields:
+            Listas de filas en orden (timestamp, id)
+        
+        Raises:
+            ValueError: Si el cursor no es válido
+        """
+        after = decode_history_cursor(cursor) if cursor else None
+        async for chunk in PriceRepository(self.db).stream_price_history(
+            ticker, start_date, end_date, after, limit, chunk_size
+        ):
+            yield chunk
+    
+    async def backfill_rollups(
+        self,
+        batch_size: Optional[int] = None,
+        only_if_empty: bool = False
+    ) -> BackfillReport:
+        """
+        Reconstruye las velas desde los ticks que siguen en prices.
+        
+        Recorre prices por keyset sobre id hasta el máximo id al iniciar,
+        con commit por chunk y cediendo el event loop entre chunks. Los
+        ticks que llegan durante el backfill los agrega la ingesta.
+        
+        Si compact_history ya eliminó ticks (hay velas diarias anteriores
+        al tick más viejo), solo se reconstruyen los buckets que empiezan
+        en o después de ese tick: las velas anteriores son la única copia
+        de esa historia y se conservan.
+        
+        Args:
+            batch_size: Ticks por chunk (default: settings)
+            only_if_empty: No hacer nada si ya hay velas
+        
+        Returns:
+            BackfillReport con ticks procesados y duración
+        """
+        if batch_size is None:
+            batch_size = settings.PRICE_ROLLUP_BACKFILL_BATCH_SIZE
+        
+        started = time.perf_counter()
+        if only_if_empty and await self.rollups.has_rollups():
+            return BackfillReport(0, 0.0, skipped=True)
+        
+        # Snapshot del máximo id y borrado en la misma transacción
+        max_id = await self.rollups.get_max_tick_id()
+        if not max_id:
+            return BackfillReport(0, 0.0, skipped=True)
+        floors = await self._rebuild_floors()
+        for resolution in RESOLUTIONS:
+            await self.rollups.delete_rollups(
+                (resolution,), floors.get(resolution)
+            )
+        await self.db.commit()
+        
+        processed = 0
+        last_id = 0
+        while last_id < max_id:
+            ticks = await self.rollups.get_tick_chunk(last_id, max_id, batch_size)
+            if not ticks:
+                break
+            if not floors:
+                await self.rollups.apply_ticks(ticks)
+            else:
+                for resolution, floor in floors.items():
+                    await self.rollups.apply_ticks(
+                        [tick for tick in ticks if tick.timestamp >= floor],
+                        (resolution,)
+                    )
+            await self.db.commit()
+            processed += len(ticks)
+            last_id = ticks[-1].id
+            await asyncio.sleep(0)
+        
+        report = BackfillReport(
+            ticks_processed=processed,
+            duration_seconds=round(time.perf_counter() - started, 3)
+        )
+        logger.info(
+            "Price rollups backfilled",
+            extra={
+                "ticks": report.ticks_processed,
+                "duration_seconds": report.duration_seconds,
+                "floors": {
+                    resolution: floor.isoformat()
+                    for resolution, floor in floors.items()
+                },
+            }
+        )
+        return report
+    
+    async def _rebuild_floors(self) -> dict[str, datetime]:
+        """
+        Primer bucket reconstruible de cada resolución.
+        
+        Vacío si prices conserva toda la historia de las velas. Si hay
+        velas diarias anteriores al día del tick más viejo, la historia
+        se compactó: cada resolución se reconstruye desde el primer
+        bucket que empieza en o después de ese tick (los buckets que lo
+        contienen mezclan ticks eliminados y se conservan como están).
+        """
+        first_tick = await PriceRepository(self.db).get_first_tick_at(
+            None, datetime.max
+        )
+        first_candle = await self.rollups.get_first_bucket_start("1d")
+        if (
+            first_tick is None
+            or first_candle is None
+            or first_candle >= bucket_start(first_tick, "1d")
+        ):
+            return {}
+        return {
+            resolution: next_bucket_start(first_tick, resolution)
+            for resolution in RESOLUTIONS
+        }
+    
+    async def compact_history(
+        self,
+        retention_days: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        reclaim: Optional[str] = None,
+        pause_seconds: Optional[float] = None
+    ) -> RetentionReport:
+        """
+        Compacta ticks crudos más viejos que la retención.
+        
+        1. Recalcula las velas diarias de cada día a eliminar desde sus
+           ticks (idempotente: sobrescribe, no fusiona)
+        2. PostgreSQL: DROP de las particiones mensuales que terminan
+           antes del corte (sin DELETE fila por fila ni VACUUM)
+        3. Elimina los ticks restantes en chunks acotados por keyset sobre
+           id, con commit y una pausa entre chunks para liberar el lock de
+           escritura (en PostgreSQL solo el mes del corte y DEFAULT)
+        4. Libera espacio en disco según `reclaim`
+        
+        El corte se alinea a medianoche UTC para compactar días completos.
+        Las velas 1h/1w/1m ya contienen esos ticks y se conservan.
+        
+        Args:
+            retention_days: Días de ticks crudos a conservar (default: settings)
+            batch_size: Filas por chunk de DELETE (default: settings)
+            reclaim: none, incremental o full (default: settings)
+            pause_seconds: Pausa entre chunks (default: settings)
+        
+        Returns:
+            RetentionReport con ticks compactados, eliminados y duración
+        """
+        if retention_days is None:
+            retention_days = settings.PRICE_RETENTION_DAYS
+        if batch_size is None:
+            batch_size = settings.PRICE_RETENTION_BATCH_SIZE
+        if reclaim is None:
+            reclaim = settings.PRICE_RETENTION_RECLAIM
+        if pause_seconds is None:
+            pause_seconds = settings.PRICE_RETENTION_PAUSE_SECONDS
+        if retention_days <= 0:
+            raise ValueError("retention_days debe ser mayor a 0")
+        
+        started = time.perf_counter()
+        cutoff = bucket_start(
+            datetime.utcnow() - timedelta(days=retention_days), "1d"
+        )
+        prices = PriceRepository(self.db)
+        
+        # 1. Plegar en velas diarias, un día (con ticks) a la vez
+        days_compacted = 0
+        ticks_compacted = 0
+        first_tick = await prices.get_first_tick_at(None, cutoff)
+        while first_tick is not None:
+            day = bucket_start(first_tick, "1d")
+            next_day = day + timedelta(days=1)
+            ticks = await prices.get_ticks_between(day, next_day)
+            await self.rollups.apply_ticks(ticks, ("1d",), replace=True)
+            await self.db.commit()
+            days_compacted += 1
+            ticks_compacted += len(ticks)
+            first_tick = await prices.get_first_tick_at(next_day, cutoff)
+        
+        # 2. Meses completos: DROP de su partición
+        partitions_dropped: list[str] = []
+        if self.rollups.dialect_name == "postgresql":
+            partitions_dropped = await PricePartitionManager(
+                self.db
+            ).drop_partitions_before(cutoff)
+            await self.db.commit()
+        
+        # 3. Resto: eliminar en chunks acotados
+        rows_deleted = 0
+        delete_batches = 0
+        last_id = 0
+        while True:
+            deleted, last_id = await prices.delete_old_prices(
+                cutoff, last_id, batch_size
+            )
+            if not deleted:
+                break
+            await self.db.commit()
+            rows_deleted += deleted
+            delete_batches += 1
+            await asyncio.sleep(pause_seconds)
+        
+        # 4. Liberar espacio
+        reclaimed = "none"
+        if rows_deleted:
+            reclaimed = await self._reclaim_space(reclaim)
+        
+        report = RetentionReport(
+            cutoff=cutoff,
+            days_compacted=days_compacted,
+            ticks_compacted=ticks_compacted,
+            rows_deleted=rows_deleted,
+            delete_batches=delete_batches,
+            partitions_dropped=partitions_dropped,
+            reclaim=reclaimed,
+            duration_seconds=round(time.perf_counter() - started, 3)
+        )
+        logger.info("Price history compacted", extra=asdict(report))
+        return report
+    
+    async def _reclaim_space(self, mode: str) -> str:
+        """
+        Libera el espacio de las filas eliminadas.
+        
+        - SQLite: full = VACUUM; incremental = PRAGMA incremental_vacuum
+          (solo si la DB usa auto_vacuum=INCREMENTAL)
+        - PostgreSQL: full = VACUUM FULL; incremental = VACUUM (el espacio
+          queda reutilizable sin bloquear la tabla)
+        
+        Returns:
+            Operación ejecutada (o "skipped"/"none")
+        """
+        if mode == "none":
+            return "none"
+        if mode not in ("incremental", "full"):
+            raise ValueError(f"Modo de reclaim inválido: {mode}")
+        
+        # VACUUM no puede correr dentro de una transacción
+        engine = self.db.bind
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            
+            if engine.dialect.name == "sqlite":
+                if mode == "full":
+                    await conn.exec_driver_sql("VACUUM")
+                    return "vacuum"
+                auto_vacuum = await conn.scalar(text("PRAGMA auto_vacuum"))
+                if auto_vacuum != 2:  # 2 = INCREMENTAL
+                    logger.info(
+                        "auto_vacuum no es INCREMENTAL, se omite "
+                        "incremental_vacuum"
+                    )
+                    return "skipped"
+                await conn.exec_driver_sql("PRAGMA incremental_vacuum")
+                return "incremental_vacuum"
+            
+            if engine.dialect.name == "postgresql":
+                table = Price.__tablename__
+                if mode == "full":
+                    await conn.exec_driver_sql(f"VACUUM (FULL, ANALYZE) {table}")
+                    return "vacuum_full"
+                await conn.exec_driver_sql(f"VACUUM (ANALYZE) {table}")
+                return "vacuum"
+        
+        return "skipped"
@@ -0,0 +1,449 @@
+"""
+Price Refresh Scheduler
+
+Actualiza precios en background con APScheduler, dentro del proceso de
+la API, para que los requests nunca tengan que esperar a un provider.
+
+Principios aplicados:
+- Single Responsibility: Solo cuándo refrescar; el cómo es de PriceService
+- Fault Tolerance: Un job que falla no detiene a los demás
+- Observability: Estado por job (última ejecución, duración, fallos)
+"""
+
+import time
+from dataclasses import dataclass, asdict, field
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Optional
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.interval import IntervalTrigger
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.db.partitions import PricePartitionManager
+from app.db.session import AsyncSessionLocal, engine
+from app.providers.rate_limiter import RateBudget, get_rate_budgets
+from app.services.fx_rates import fx_rates
+from app.services.price_archive import ArchiveReport, PriceArchiveService
+from app.services.price_history_service import (
+    BackfillReport,
+    PriceHistoryService,
+    RetentionReport,
+)
+from app.services.price_service import PriceService
+from app.services.snapshot_service import (
+    PortfolioSnapshotService,
+    SnapshotReport,
+)
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class RefreshJobStatus:
+    """Estado de un job de refresh"""
+    asset_class: str
+    interval_minutes: int
+    running: bool = False
+    runs: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    skipped_overlaps: int = 0
+    last_started_at: Optional[datetime] = None
+    last_finished_at: Optional[datetime] = None
+    last_duration_seconds: Optional[float] = None
+    last_stored_count: Optional[int] = None
+    last_error: Optional[str] = None
+    last_providers: dict = field(default_factory=dict)
+    next_run_at: Optional[datetime] = None
+
+
+class PriceRefreshScheduler:
+    """
+    Scheduler de refresh de precios por clase de activo.
+    
+    - Un job por clase de activo con su propia cadencia (crypto cotiza
+      24/7 y se refresca más seguido que stocks/ETFs)
+    - Jitter en cada disparo para no sincronizar requests con otros clientes
+    - Sin ejecuciones traslapadas del mismo job (max_instances=1 y guard)
+    - El tipo de cambio se refresca según la cuota mensual restante
+    """
+    
+    # Clase de refresh -> asset_types que incluye
+    ASSET_CLASSES = {
+        "crypto": ("crypto",),
+        "stock": ("stock", "etf"),
+    }
+    
+    def __init__(
+        self,
+        cadences_minutes: dict[str, int],
+        jitter_seconds: int = 30,
+        session_factory=AsyncSessionLocal
+    ):
+        """
+        Args:
+            cadences_minutes: asset_class -> minutos entre refreshes
+            jitter_seconds: Desfase aleatorio máximo por disparo
+            session_factory: Factory de sesiones de DB para cada ejecución
+        """
+        self.cadences_minutes = cadences_minutes
+        self.jitter_seconds = jitter_seconds
+        self.session_factory = session_factory
+        self._scheduler: Optional[AsyncIOScheduler] = None
+        self._jobs: dict[str, RefreshJobStatus] = {
+            asset_class: RefreshJobStatus(asset_class, minutes)
+            for asset_class, minutes in cadences_minutes.items()
+        }
+        self._rollup_backfill: Optional[dict] = None
+        self._retention: Optional[dict] = None
+        self._partitions: Optional[dict] = None
+        self._archive: Optional[dict] = None
+        self._snapshots: Optional[dict] = None
+        self._snapshot_backfill: Optional[dict] = None
+    
+    @property
+    def is_running(self) -> bool:
+        return self._scheduler is not None and self._scheduler.running
+    
+    def start(self) -> None:
+        """Registra los jobs y arranca el scheduler (requiere event loop)"""
+        if self.is_running:
+            return
+        
+        self._scheduler = AsyncIOScheduler(timezone="UTC")
+        now = datetime.utcnow()
+        
+        for index, (asset_class, minutes) in enumerate(
+            self.cadences_minutes.items()
+        ):
+            self._scheduler.add_job(
+                self.run_refresh,
+                trigger=IntervalTrigger(
+                    minutes=minutes,
+                    jitter=self.jitter_seconds,
+                    timezone="UTC"
+                ),
+                args=[asset_class],
+                id=f"price_refresh_{asset_class}",
+                max_instances=1,
+                coalesce=True,
+                misfire_grace_time=minutes * 60,
+                # Primer refresh al arrancar, escalonado por clase de activo
+                next_run_time=now + timedelta(seconds=5 + index * 10),
+            )
+        
+        # Backfill único de velas OHLC si la tabla está vacía (DB previa a
+        # los rollups); corre antes del primer refresh para que la ingesta
+        # no cuente como "ya hay velas"
+        self._scheduler.add_job(
+            self.run_rollup_backfill,
+            id="price_rollup_backfill",
+            max_instances=1,
+            next_run_time=now + timedelta(seconds=1),
+        )
+        
+        # PostgreSQL: particiones mensuales de prices por adelantado
+        if engine.dialect.name == "postgresql":
+            self._scheduler.add_job(
+                self.run_partition_maintenance,
+                trigger=IntervalTrigger(hours=24, timezone="UTC"),
+                id="price_partitions",
+                max_instances=1,
+                coalesce=True,
+                next_run_time=now + timedelta(seconds=2),
+            )
+        
+        # Export incremental al archivo columnar
+        if settings.PRICE_ARCHIVE_INTERVAL_HOURS > 0:
+            self._scheduler.add_job(
+                self.run_archive_export,
+                trigger=IntervalTrigger(
+                    hours=settings.PRICE_ARCHIVE_INTERVAL_HOURS,
+                    jitter=self.jitter_seconds,
+                    timezone="UTC"
+                ),
+                id="price_archive",
+                max_instances=1,
+                coalesce=True,
+                next_run_time=now + timedelta(minutes=5),
+            )
+        
+        # Retención diaria de ticks crudos (compacta en velas diarias)
+        if settings.PRICE_RETENTION_DAYS > 0:
+            self._scheduler.add_job(
+                self.run_retention,
+                trigger=IntervalTrigger(
+                    hours=24,
+                    jitter=self.jitter_seconds,
+                    timezone="UTC"
+                ),
+                id="price_retention",
+                max_instances=1,
+                coalesce=True,
+                next_run_time=now + timedelta(minutes=10),
+            )
+        
+        # Snapshot diario de valor por portfolio; la primera ejecución
+        # reconstruye el histórico si la tabla está vacía, después del
+        # backfill de velas y del primer refresh
+        if settings.PORTFOLIO_SNAPSHOT_INTERVAL_HOURS > 0:
+            self._scheduler.add_job(
+                self.run_snapshots,
+                trigger=IntervalTrigger(
+                    hours=settings.PORTFOLIO_SNAPSHOT_INTERVAL_HOURS,
+                    jitter=self.jitter_seconds,
+                    timezone="UTC"
+                ),
+                id="portfolio_snapshots",
+                max_instances=1,
+                coalesce=True,
+                next_run_time=now + timedelta(minutes=2),
+            )
+        
+        self._scheduler.start()
+        logger.info(
+            "Price refresh scheduler started",
+            extra={"cadences_minutes": self.cadences_minutes}
+        )
+    
+    def shutdown(self) -> None:
+        """Detiene el scheduler sin esperar jobs en curso"""
+        if self.is_running:
+            self._scheduler.shutdown(wait=False)
+        self._scheduler = None
+    
+    async def _tickers_for(
+        self,
+        asset_class: str,
+        service: PriceService
+    ) -> list[str]:
+        """Tickers del universo (holdings + transactions) de una clase"""
+        asset_types = self.ASSET_CLASSES.get(asset_class, (asset_class,))
+        assets = await service.resolve_assets()
+        return [
+            ticker for ticker, asset_type in assets.items()
+            if asset_type in asset_types
+        ]
+    
+    def _fx_interval(self, budget: Optional[RateBudget]) -> timedelta:
+        """
+        Intervalo mínimo entre fetches de tipo de cambio.
+        
+        Reparte la cuota mensual restante en el tiempo que falta para el
+        reset, de modo que nunca se agota antes de fin de mes.
+        """
+        if budget is None or budget.quota_remaining is None:
+            return timedelta(0)
+        
+        seconds_left = (budget.quota_resets_at - datetime.utcnow()).total_seconds()
+        if budget.quota_remaining <= 0:
+            return timedelta(seconds=max(seconds_left, 0))
+        return timedelta(seconds=seconds_left / budget.quota_remaining)
+    
+    async def _exchange_rate(self, service: PriceService) -> Optional[Decimal]:
+        """Tipo de cambio de la tabla vigente mientras no toque refrescarla"""
+        interval = self._fx_interval(
+            service.exchange_rate_provider.rate_budget()
+        )
+        # La tabla es del proceso: un refresh manual también la renueva
+        return await service.get_exchange_rate(
+            max_age=max(interval, timedelta(seconds=fx_rates.ttl_seconds))
+        )
+    
+    async def run_refresh(self, asset_class: str) -> Optional[int]:
+        """
+        Ejecuta un refresh de la clase de activo indicada.
+        
+        Returns:
+            Precios almacenados, o None si se omitió o falló
+        """
+        status = self._jobs[asset_class]
+        if status.running:
+            status.skipped_overlaps += 1
+            logger.warning(f"Refresh de {asset_class} en curso, se omite")
+            return None
+        
+        status.running = True
+        status.last_started_at = datetime.utcnow()
+        started = time.perf_counter()
+        
+        try:
+            async with self.session_factory() as db:
+                service = PriceService(db)
+                tickers = await self._tickers_for(asset_class, service)
+                if not tickers:
+                    status.last_stored_count = 0
+                    status.last_providers = {}
+                    status.last_error = None
+                    status.consecutive_failures = 0
+                    return 0
+                exchange_rate = await self._exchange_rate(service)
+                report = await service.fetch_and_store_prices(
+                    tickers,
+                    exchange_rate=exchange_rate
+                )
+            status.last_stored_count = report.stored_count
+            status.last_providers = {
+                name: asdict(timing)
+                for name, timing in report.providers.items()
+            }
+            status.last_error = None
+            status.consecutive_failures = 0
+            return report.stored_count
+        except Exception as e:
+            status.failures += 1
+            status.consecutive_failures += 1
+            status.last_error = str(e)
+            logger.error(f"Error en refresh de {asset_class}: {e}")
+            return None
+        finally:
+            status.runs += 1
+            status.running = False
+            status.last_finished_at = datetime.utcnow()
+            status.last_duration_seconds = round(
+                time.perf_counter() - started, 3
+            )
+    
+    async def run_rollup_backfill(self) -> Optional[BackfillReport]:
+        """
+        Reconstruye las velas OHLC desde prices si aún no hay ninguna.
+        
+        Returns:
+            BackfillReport, o None si falló
+        """
+        try:
+            async with self.session_factory() as db:
+                report = await PriceHistoryService(db).backfill_rollups(
+                    only_if_empty=True
+                )
+            self._rollup_backfill = asdict(report)
+            return report
+        except Exception as e:
+            self._rollup_backfill = {"error": str(e)}
+            logger.error(f"Error en backfill de rollups: {e}")
+            return None
+    
+    async def run_archive_export(self) -> Optional[ArchiveReport]:
+        """
+        Exporta los ticks nuevos al archivo columnar.
+        
+        Returns:
+            ArchiveReport, o None si falló
+        """
+        try:
+            async with self.session_factory() as db:
+                report = await PriceArchiveService(db).export_all()
+            self._archive = asdict(report)
+            return report
+        except Exception as e:
+            self._archive = {"error": str(e)}
+            logger.error(f"Error exportando el archivo de precios: {e}")
+            return None
+    
+    async def run_retention(self) -> Optional[RetentionReport]:
+        """
+        Compacta y elimina ticks crudos fuera de la retención.
+        
+        Con el archivo columnar activo, primero exporta los ticks nuevos:
+        si el export falla no se elimina nada.
+        
+        Returns:
+            RetentionReport, o None si falló
+        """
+        try:
+            async with self.session_factory() as db:
+                if settings.PRICE_ARCHIVE_INTERVAL_HOURS > 0:
+                    archive = await PriceArchiveService(db).export_all()
+                    self._archive = asdict(archive)
+                report = await PriceHistoryService(db).compact_history()
+            self._retention = asdict(report)
+            return report
+        except Exception as e:
+            self._retention = {"error": str(e)}
+            logger.error(f"Error en retención de precios: {e}")
+            return None
+    
+    async def run_snapshots(self) -> Optional[SnapshotReport]:
+        """
+        Escribe el snapshot del día de los portfolios activos y los días
+        que faltan desde su último snapshot.
+        
+        La primera ejecución del proceso antes reconstruye los snapshots
+        históricos si la tabla está vacía.
+        
+        Returns:
+            SnapshotReport, o None si falló
+        """
+        try:
+            async with self.session_factory() as db:
+                service = PortfolioSnapshotService(db)
+                if self._snapshot_backfill is None:
+                    backfill = await service.backfill(only_if_empty=True)
+                    self._snapshot_backfill = asdict(backfill)
+                report = await service.take_snapshots()
+            self._snapshots = asdict(report)
+            return report
+        except Exception as e:
+            self._snapshots = {"error": str(e)}
+            logger.error(f"Error escribiendo snapshots de portfolios: {e}")
+            return None
+    
+    async def run_partition_maintenance(self) -> Optional[list[str]]:
+        """
+        Crea las particiones de los próximos meses y de los meses con
+        filas en la partición DEFAULT.
+        
+        Returns:
+            Particiones creadas, o None si falló
+        """
+        try:
+            async with self.session_factory() as db:
+                created = await PricePartitionManager(db).ensure_upcoming()
+                await db.commit()
+            self._partitions = {
+                "created": created,
+                "finished_at": datetime.utcnow(),
+            }
+            return created
+        except Exception as e:
+            self._partitions = {"error": str(e)}
+            logger.error(f"Error en mantenimiento de particiones: {e}")
+            return None
+    
+    def status(self) -> dict:
+        """Estado del scheduler, sus jobs y el presupuesto de providers"""
+        jobs = {}
+        for asset_class, job_status in self._jobs.items():
+            if self.is_running:
+                job = self._scheduler.get_job(f"price_refresh_{asset_class}")
+                job_status.next_run_at = job.next_run_time if job else None
+            jobs[asset_class] = asdict(job_status)
+        
+        return {
+            "enabled": settings.ENABLE_AUTO_PRICE_UPDATES,
+            "running": self.is_running,
+            "jobs": jobs,
+            "exchange_rate": fx_rates.stats(),
+            "rollup_backfill": self._rollup_backfill,
+            "retention": self._retention,
+            "archive": self._archive,
+            "partitions": self._partitions,
+            "snapshots": self._snapshots,
+            "snapshot_backfill": self._snapshot_backfill,
+            "rate_budgets": {
+                name: asdict(budget)
+                for name, budget in get_rate_budgets().items()
+            },
+        }
+
+
+# Scheduler por proceso, arrancado desde el lifespan de la app
+price_scheduler = PriceRefreshScheduler(
+    cadences_minutes={
+        "crypto": settings.PRICE_UPDATE_INTERVAL_CRYPTO_MINUTES,
+        "stock": settings.PRICE_UPDATE_INTERVAL_MINUTES,
+    },
+    jitter_seconds=settings.PRICE_UPDATE_JITTER_SECONDS,
+)
@@ -9,20 +9,74 @@ Principios aplicados:
 - Fault Tolerance: Fallback entre providers
 """
 
+import asyncio
+import time
+from dataclasses import dataclass, field
 from decimal import Decimal
-from datetime import datetime
+from datetime import datetime, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Dict
+from typing import Dict, Optional
 
-from app.models.price import Price
+from app.models.price import LatestPrice, Price
+from app.providers.base import BaseProvider, PriceData
+from app.providers.single_flight import price_flight
+from app.repositories.price_repository import (
+    ExchangeRateRepository,
+    PriceRepository,
+)
+from app.services.fx_rates import CrossRateMatrix, fx_rates
+from app.services.price_cache import price_cache
+from app.services.ticker_registry import ticker_registry
 from app.providers.yahoo_finance import YahooFinanceProvider
 from app.providers.coingecko import CoinGeckoProvider
 from app.providers.exchange_rate import ExchangeRateProvider
+from app.core.config import settings
 from app.core.logging import get_logger
 
 logger = get_logger(__name__)
 
 
+def _to_decimal(value: Optional[float]) -> Optional[Decimal]:
+    """float del provider -> Decimal para columnas Numeric"""
+    return Decimal(str(value)) if value is not None else None
+
+
+def _latest_to_price_data(row: LatestPrice) -> PriceData:
+    """Fila de latest_prices -> PriceData para el cache"""
+    return PriceData(
+        ticker=row.ticker,
+        price_usd=float(row.price_usd),
+        source=row.source,
+        timestamp=row.timestamp,
+        volume=float(row.volume_24h) if row.volume_24h else None,
+        market_cap=float(row.market_cap) if row.market_cap else None
+    )
+
+
+def _source_asset_type(source: str) -> str:
+    """asset_type de un precio guardado según el provider que lo dio"""
+    return "crypto" if source == "coingecko" else "stock"
+
+
+@dataclass
+class ProviderTiming:
+    """Resultado de un provider dentro de un refresh"""
+    provider: str
+    status: str  # ok | error | timeout
+    duration_seconds: float
+    fetched: int = 0
+    error: Optional[str] = None
+
+
+@dataclass
+class RefreshReport:
+    """Reporte de un refresh de precios"""
+    stored_count: int
+    exchange_rate: Optional[Decimal]
+    duration_seconds: float
+    providers: Dict[str, ProviderTiming] = field(default_factory=dict)
+
+
 class PriceService:
     """
     Servicio para gestión de precios.
@@ -30,9 +84,9 @@ class PriceService:
     Coordina múltiples providers y almacena histórico.
     """
     
-    # Mapeo de tickers a providers
-    STOCK_TICKERS = ["VOO", "VGT"]
-    CRYPTO_TICKERS = ["BTC", "ETH"]
+    # asset_type para tickers fuera del universo de holdings/transactions
+    # sin precio guardado ni símbolo crypto conocido
+    DEFAULT_ASSET_TYPE = "stock"
     
     def __init__(self, db: AsyncSession):
         """
@@ -46,107 +100,485 @@ class PriceService:
         self.coingecko_provider = CoinGeckoProvider()
         self.exchange_rate_provider = ExchangeRateProvider()
     
-    async def get_latest_prices(
+    def provider_for(self, asset_type: str) -> Optional[BaseProvider]:
+        """Provider que cotiza un asset_type (None si no hay ninguno)"""
+        if asset_type == "crypto":
+            return self.coingecko_provider
+        if asset_type in ("stock", "etf"):
+            return self.yahoo_provider
+        return None
+    
+    async def resolve_assets(
         self,
         tickers: list[str] | None = None
+    ) -> Dict[str, str]:
+        """
+        Resuelve el asset_type de cada ticker con el registry.
+        
+        Los tickers fuera del universo toman el asset_type de su entrada
+        en el cache o de la fuente de su fila en latest_prices; si nunca
+        se cotizaron, los símbolos crypto conocidos de CoinGecko son
+        crypto y el resto DEFAULT_ASSET_TYPE.
+        
+        Args:
+            tickers: Lista de tickers (opcional, default: todo el universo)
+        
+        Returns:
+            Dict ticker -> asset_type
+        """
+        universe = await ticker_registry.get(self.db)
+        if tickers is None:
+            return universe
+        
+        assets = {}
+        unknown = []
+        for ticker in tickers:
+            ticker = ticker.upper()
+            asset_type = universe.get(ticker)
+            if asset_type is None:
+                entry = price_cache.get(ticker)
+                asset_type = entry.asset_type if entry is not None else None
+            if asset_type is None:
+                unknown.append(ticker)
+            else:
+                assets[ticker] = asset_type
+        
+        if unknown:
+            stored = {
+                row.ticker: _source_asset_type(row.source)
+                for row in await PriceRepository(self.db).get_latest_prices(
+                    unknown
+                )
+            }
+            for ticker in unknown:
+                assets[ticker] = stored.get(ticker) or (
+                    "crypto" if ticker in CoinGeckoProvider.TICKER_TO_ID
+                    else self.DEFAULT_ASSET_TYPE
+                )
+        return assets
+    
+    async def _fetch_from_provider(
+        self,
+        provider: BaseProvider,
+        tickers: list[tuple[str, str]]
+    ) -> list[PriceData]:
+        """
+        Obtiene precios de un provider con single-flight coalescing.
+        
+        Llamadas concurrentes para la misma key (provider, ticker) o el
+        mismo batch esperan una sola request externa y comparten el
+        resultado.
+        
+        Args:
+            provider: Provider a consultar
+            tickers: Lista de (ticker, asset_type)
+        
+        Returns:
+            Lista de PriceData obtenidos
+        """
+        if len(tickers) == 1:
+            ticker, asset_type = tickers[0]
+            price = await price_flight.do(
+                (provider.name, ticker),
+                lambda: provider.get_price(ticker, asset_type)
+            )
+            return [price] if price is not None else []
+        
+        return await price_flight.do(
+            (provider.name, frozenset(tickers)),
+            lambda: provider.get_multiple_prices(tickers)
+        )
+    
+    def _provider_groups(
+        self,
+        assets: Dict[str, str]
+    ) -> list[tuple[BaseProvider, Dict[str, str]]]:
+        """
+        Agrupa tickers por provider según su asset_type.
+        
+        Returns:
+            Lista de (provider, {ticker: asset_type}), un grupo por provider
+        """
+        groups: dict[str, tuple[BaseProvider, Dict[str, str]]] = {}
+        for ticker, asset_type in assets.items():
+            provider = self.provider_for(asset_type)
+            if provider is None:
+                logger.debug(f"Sin provider para {ticker} ({asset_type})")
+                continue
+            groups.setdefault(provider.name, (provider, {}))[1][ticker] = asset_type
+        return list(groups.values())
+    
+    async def get_latest_quotes(
+        self,
+        tickers: list[str] | None = None,
+        use_cache: bool = True
+    ) -> Dict[str, PriceData]:
+        """
+        Obtiene el último PriceData de cada activo.
+        
+        Con cache habilitado, los precios frescos se sirven de memoria y
+        los vencidos se sirven igual mientras se revalidan en background.
+        Solo los tickers sin precio cacheado esperan al provider.
+        
+        Args:
+            tickers: Lista de tickers (opcional, default: todo el universo)
+            use_cache: False para forzar fetch a los providers
+        
+        Returns:
+            Dict con ticker: PriceData
+        """
+        assets = await self.resolve_assets(tickers)
+        if use_cache:
+            await self._load_missing_from_db(assets)
+        
+        quotes = {}
+        fetches = []
+        
+        for provider, group in self._provider_groups(assets):
+            to_fetch = group
+            if use_cache:
+                to_fetch, stale = {}, {}
+                for ticker, asset_type in group.items():
+                    entry = price_cache.get(ticker)
+                    if entry is None:
+                        to_fetch[ticker] = asset_type
+                        continue
+                    quotes[ticker] = entry.data
+                    if not price_cache.is_fresh(entry):
+                        stale[ticker] = asset_type
+                
+                if stale:
+                    price_cache.revalidate(
+                        stale,
+                        lambda p=provider, pairs=list(stale.items()): (
+                            self._fetch_from_provider(p, pairs)
+                        )
+                    )
+            
+            if to_fetch:
+                fetches.append(self._fetch_group(provider, to_fetch))
+        
+        # Los providers se consultan en paralelo
+        for fetched in await asyncio.gather(*fetches):
+            quotes.update((data.ticker, data) for data in fetched)
+        
+        return quotes
+    
+    async def _load_missing_from_db(self, assets: Dict[str, str]) -> None:
+        """
+        Carga en el cache, desde latest_prices, los tickers no cacheados.
+        
+        Así un cache frío (ej: otro worker) sirve el último precio
+        persistido y revalida en background en lugar de esperar al
+        provider.
+        """
+        missing = [t for t in assets if t not in price_cache]
+        if not missing:
+            return
+        try:
+            rows = await PriceRepository(self.db).get_latest_prices(missing)
+        except Exception as e:
+            logger.warning(f"Error leyendo latest_prices: {e}")
+            return
+        price_cache.warm((_latest_to_price_data(row) for row in rows), assets)
+    
+    async def get_latest_prices(
+        self,
+        tickers: list[str] | None = None,
+        use_cache: bool = True
     ) -> Dict[str, Decimal]:
         """
         Obtiene precios actuales de todos los activos.
         
         Args:
-            tickers: Lista de tickers (opcional, default: todos)
+            tickers: Lista de tickers (opcional, default: todo el universo)
+            use_cache: False para forzar fetch a los providers
         
         Returns:
             Dict con ticker: precio en USD
         """
-        if tickers is None:
-            tickers = self.STOCK_TICKERS + self.CRYPTO_TICKERS
+        quotes = await self.get_latest_quotes(tickers, use_cache)
+        return {
+            ticker: Decimal(str(data.price_usd))
+            for ticker, data in quotes.items()
+        }
+    
+    async def _fetch_group(
+        self,
+        provider: BaseProvider,
+        assets: Dict[str, str]
+    ) -> list[PriceData]:
+        """
+        Obtiene un grupo de tickers de un provider y actualiza el cache.
         
-        prices = {}
+        Returns:
+            Lista de PriceData (vacía si el provider falla)
+        """
+        try:
+            return await self._fetch_and_cache(provider, assets)
+        except Exception as e:
+            logger.error(f"Error obteniendo precios de {provider.name}: {e}")
+            return []
+    
+    async def _fetch_and_cache(
+        self,
+        provider: BaseProvider,
+        assets: Dict[str, str]
+    ) -> list[PriceData]:
+        """Como _fetch_group, pero propaga los errores del provider"""
+        fetched = await self._fetch_from_provider(provider, list(assets.items()))
+        price_cache.set_many(fetched, assets)
+        logger.debug(
+            f"Precios de {provider.name} obtenidos: "
+            f"{ {data.ticker: data.price_usd for data in fetched} }"
+        )
+        return fetched
+    
+    async def warm_cache(self) -> int:
+        """
+        Carga en el cache el último precio persistido de cada ticker.
         
-        # Obtener precios de stocks
-        for ticker in tickers:
-            if ticker in self.STOCK_TICKERS:
-                try:
-                    price = await self.yahoo_provider.get_price(ticker)
-                    prices[ticker] = price
-                    logger.debug(f"Precio obtenido para {ticker}: ${price}")
-                except Exception as e:
-                    logger.error(f"Error obteniendo precio de {ticker}: {e}")
-        
-        # Obtener precios de crypto
-        crypto_tickers_to_fetch = [
-            t for t in tickers if t in self.CRYPTO_TICKERS
-        ]
-        if crypto_tickers_to_fetch:
-            try:
-                crypto_prices = await self.coingecko_provider.get_prices(
-                    crypto_tickers_to_fetch
+        Llamar en el startup de la app: las entradas viejas se sirven
+        stale y se revalidan en el primer acceso.
+        
+        Returns:
+            Número de precios cargados
+        """
+        repository = PriceRepository(self.db)
+        rows = await repository.get_latest_prices()
+        if not rows:
+            # DB previa a latest_prices: inicializar desde el histórico
+            rebuilt = await repository.rebuild_latest_prices()
+            await self.db.commit()
+            if rebuilt:
+                logger.info(f"latest_prices inicializada con {rebuilt} tickers")
+                rows = await repository.get_latest_prices()
+        
+        # Última tabla de tipos de cambio; una DB previa a exchange_rates
+        # se inicializa con el USD/MXN registrado en cada tick
+        if await fx_rates.load(self.db) is None:
+            backfilled = await ExchangeRateRepository(self.db).backfill_from_prices()
+            await self.db.commit()
+            if backfilled:
+                logger.info(
+                    f"exchange_rates inicializada con {backfilled} tipos de cambio"
                 )
-                prices.update(crypto_prices)
-                logger.debug(f"Precios crypto obtenidos: {crypto_prices}")
-            except Exception as e:
-                logger.error(f"Error obteniendo precios crypto: {e}")
+                await fx_rates.load(self.db)
+        
+        # Tickers fuera del universo: inferir asset_type por la fuente
+        asset_types = {
+            row.ticker: _source_asset_type(row.source) for row in rows
+        }
+        asset_types.update(await self.resolve_assets())
         
-        return prices
+        return price_cache.warm(
+            (_latest_to_price_data(row) for row in rows),
+            asset_types
+        )
+    
+    async def get_exchange_rates(
+        self,
+        max_age: timedelta | None = None
+    ) -> CrossRateMatrix | None:
+        """
+        Matriz de tipos cruzados vigente.
+        
+        Mientras la tabla en memoria sea más nueva que max_age se usa sin
+        llamar al provider; si no, se pide la tabla completa de
+        EXCHANGE_RATE_BASE (una unidad de cuota para todas las monedas) y
+        queda pendiente de guardar con el siguiente batch de precios.
+        
+        Args:
+            max_age: Edad máxima aceptada (default: EXCHANGE_RATE_CACHE_SECONDS)
+        
+        Returns:
+            CrossRateMatrix, la última conocida si el provider falla, o
+            None si nunca se obtuvo una
+        """
+        matrix = fx_rates.get(max_age)
+        if matrix is not None:
+            return matrix
+        
+        base = settings.EXCHANGE_RATE_BASE
+        
+        async def fetch() -> CrossRateMatrix | None:
+            snapshot = await self.exchange_rate_provider.get_rates(base)
+            return fx_rates.set(snapshot) if snapshot else None
+        
+        try:
+            matrix = await price_flight.do(
+                (self.exchange_rate_provider.name, base), fetch
+            )
+        except Exception as e:
+            logger.warning(f"Error obteniendo tipos de cambio: {e}")
+            matrix = None
+        return matrix or fx_rates.matrix
+    
+    async def get_exchange_rate(
+        self,
+        max_age: timedelta | None = None
+    ) -> Decimal | None:
+        """
+        Obtiene el tipo de cambio USD/MXN (de la tabla vigente).
+        
+        Args:
+            max_age: Edad máxima aceptada de la tabla (default: settings)
+        
+        Returns:
+            Tipo de cambio o None si no está disponible
+        """
+        matrix = await self.get_exchange_rates(max_age)
+        if matrix is None or "MXN" not in matrix or "USD" not in matrix:
+            return None
+        return Decimal(str(matrix.rate("USD", "MXN")))
     
     async def fetch_and_store_prices(
         self,
-        tickers: list[str] | None = None
-    ) -> int:
+        tickers: list[str] | None = None,
+        exchange_rate: Decimal | None = None,
+        deadline_seconds: float | None = None
+    ) -> RefreshReport:
         """
         Obtiene precios actuales y los almacena en DB.
         
+        El tipo de cambio, el batch de stocks y el batch de crypto se
+        piden en paralelo con un deadline global. Lo que haya llegado al
+        vencer el deadline se almacena; los providers pendientes se
+        cancelan y quedan marcados como timeout en el reporte.
+        
         Args:
-            tickers: Lista de tickers (opcional)
+            tickers: Lista de tickers (opcional, default: todo el universo)
+            exchange_rate: Tipo de cambio ya conocido (opcional). Si no se
+                proporciona se consulta al provider, que tiene cuota mensual;
+                sin tipo de cambio los ticks se guardan sin price_mxn ni
+                exchange_rate (NULL), nunca con un valor inventado.
+            deadline_seconds: Tiempo máximo total (default: settings)
         
         Returns:
-            Número de precios almacenados
+            RefreshReport con precios almacenados y tiempos por provider
         """
+        assets = await self.resolve_assets(tickers)
+        if deadline_seconds is None:
+            deadline_seconds = settings.PRICE_REFRESH_DEADLINE_SECONDS
+        
+        started = time.perf_counter()
+        timings: Dict[str, ProviderTiming] = {}
+        
+        async def timed(name: str, coro):
+            """Ejecuta un fetch registrando su duración y resultado"""
+            t0 = time.perf_counter()
+            try:
+                result = await coro
+            except asyncio.CancelledError:
+                timings[name] = ProviderTiming(
+                    name, "timeout", round(time.perf_counter() - t0, 3)
+                )
+                raise
+            except Exception as e:
+                timings[name] = ProviderTiming(
+                    name, "error", round(time.perf_counter() - t0, 3),
+                    error=str(e)
+                )
+                raise
+            fetched = (
+                len(result) if isinstance(result, list)
+                else int(result is not None)
+            )
+            timings[name] = ProviderTiming(
+                name, "ok", round(time.perf_counter() - t0, 3), fetched=fetched
+            )
+            return result
+        
+        # Fan-out: tipo de cambio + un batch por provider
+        fx_task = None
+        if exchange_rate is None:
+            fx_task = asyncio.create_task(timed(
+                self.exchange_rate_provider.name,
+                self.get_exchange_rate()
+            ))
+        
+        # Un batch por provider con todos los tickers que cotiza
+        price_tasks = [
+            asyncio.create_task(timed(
+                provider.name,
+                self._fetch_and_cache(provider, group)
+            ))
+            for provider, group in self._provider_groups(assets)
+        ]
+        
+        all_tasks = price_tasks + ([fx_task] if fx_task else [])
+        if all_tasks:
+            _, pending = await asyncio.wait(all_tasks, timeout=deadline_seconds)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            if pending:
+                logger.warning(
+                    f"Refresh de precios: {len(pending)} providers "
+                    f"no respondieron en {deadline_seconds}s"
+                )
+        
         # Obtener tipo de cambio
-        try:
-            exchange_rate = await self.exchange_rate_provider.get_rate("USD", "MXN")
-        except Exception as e:
-            logger.warning(f"Error obteniendo tipo de cambio: {e}")
-            exchange_rate = Decimal("20.0")  # Fallback
+        if (
+            fx_task is not None
+            and not fx_task.cancelled()
+            and fx_task.exception() is None
+        ):
+            exchange_rate = fx_task.result()
+        
+        # Resultados parciales: solo providers que terminaron a tiempo
+        fetched: list[PriceData] = []
+        for task in price_tasks:
+            if not task.cancelled() and task.exception() is None:
+                fetched.extend(task.result())
         
-        # Obtener precios
-        prices = await self.get_latest_prices(tickers)
+        # Almacenar en DB: un INSERT multi-row, sin duplicar (ticker, timestamp)
+        rows = []
+        for data in fetched:
+            price_usd = Decimal(str(data.price_usd))
+            rows.append({
+                "ticker": data.ticker,
+                "price_usd": price_usd,
+                "price_mxn": (
+                    None if exchange_rate is None else price_usd * exchange_rate
+                ),
+                "exchange_rate": exchange_rate,
+                "volume_24h": _to_decimal(data.volume),
+                "market_cap": _to_decimal(data.market_cap),
+                "source": data.source,
+                "timestamp": data.timestamp,
+            })
+        
+        # Tablas de tipos de cambio obtenidas desde el último batch
+        snapshots = fx_rates.take_pending()
         
-        # Almacenar en DB
         stored_count = 0
-        for ticker, price_usd in prices.items():
+        if rows or snapshots:
             try:
-                # Determinar source
-                source = (
-                    "yahoo" if ticker in self.STOCK_TICKERS
-                    else "coingecko"
+                for snapshot in snapshots:
+                    await ExchangeRateRepository(self.db).store_snapshot(snapshot)
+                written = (
+                    await PriceRepository(self.db).bulk_upsert(rows) if rows else []
                 )
-                
-                # Crear registro de precio
-                price = Price.create_from_api(
-                    ticker=ticker,
-                    price_usd=price_usd,
-                    source=source,
-                    exchange_rate=exchange_rate
+                await self.db.commit()
+                stored_count = len(written)
+                logger.info(
+                    f"Almacenados {stored_count} precios "
+                    f"({len(rows) - stored_count} duplicados omitidos) y "
+                    f"{len(snapshots)} tablas de tipos de cambio"
                 )
-                
-                self.db.add(price)
-                stored_count += 1
-                
             except Exception as e:
-                logger.error(f"Error almacenando precio de {ticker}: {e}")
+                logger.error(f"Error almacenando precios: {e}")
+                await self.db.rollback()
+                # Las tablas se reintentan con el siguiente batch
+                fx_rates.requeue(snapshots)
         
-        # Commit
-        try:
-            await self.db.commit()
-            logger.info(f"Almacenados {stored_count} precios")
-        except Exception as e:
-            logger.error(f"Error en commit de precios: {e}")
-            await self.db.rollback()
-            stored_count = 0
-        
-        return stored_count
+        return RefreshReport(
+            stored_count=stored_count,
+            exchange_rate=exchange_rate,
+            duration_seconds=round(time.perf_counter() - started, 3),
+            providers=timings
+        )
     
     async def get_price_history(
         self,
@@ -163,27 +595,44 @@ class PriceService:
             end_date: Fecha final
         
         Returns:
-            Lista de precios ordenados por timestamp
+            Lista de precios (ticks crudos) ordenados por timestamp
         
-        TODO: Implementar query a la base de datos
+        Para gráficas usar PriceHistoryService.get_candles, que lee velas
+        OHLC en lugar de ticks.
         """
-        return []
+        repository = PriceRepository(self.db)
+        return await repository.get_price_history(ticker, start_date, end_date)
     
-    async def get_current_price(self, ticker: str) -> Decimal | None:
+    async def get_current_quote(self, ticker: str) -> PriceData | None:
         """
-        Obtiene el precio más reciente de un ticker.
+        Obtiene el PriceData más reciente de un ticker.
         
-        Primero busca en cache/DB, si no hay, fetch de API.
+        Primero busca en cache, si no hay, fetch de API. Requests
+        concurrentes del mismo ticker comparten un solo fetch externo.
         
         Args:
             ticker: Symbol del activo
         
         Returns:
-            Precio en USD o None si no disponible
+            PriceData (con fuente y timestamp) o None si no disponible
         """
+        ticker = ticker.upper()
         try:
-            prices = await self.get_latest_prices([ticker])
-            return prices.get(ticker)
+            quotes = await self.get_latest_quotes([ticker])
+            return quotes.get(ticker)
         except Exception as e:
             logger.error(f"Error obteniendo precio actual de {ticker}: {e}")
             return None
+    
+    async def get_current_price(self, ticker: str) -> Decimal | None:
+        """
+        Obtiene el precio más reciente de un ticker.
+        
+        Args:
+            ticker: Symbol del activo
+        
+        Returns:
+            Precio en USD o None si no disponible
+        """
+        quote = await self.get_current_quote(ticker)
+        return Decimal(str(quote.price_usd)) if quote else None
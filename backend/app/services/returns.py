@@ -0,0 +1,421 @@
+"""
+Returns Engine
+
+Rendimiento de un portfolio en un rango de días:
+
+- TWR (time-weighted): encadena los rendimientos diarios de los snapshots
+  de valor descontando las aportaciones; mide la inversión sin importar
+  cuándo entró o salió el dinero
+- XIRR (money-weighted): tasa anual que hace cero el valor presente de
+  los flujos del inversionista (transacciones, valor inicial y final)
+
+Los resultados se memorizan por (portfolio, rango) junto con la versión
+de datos del portfolio, que avanza al hacer commit de transacciones o
+snapshots suyos.
+
+Principios aplicados:
+- Performance: Rendimientos diarios, VPN y su derivada son operaciones
+  sobre arrays; recargar un dashboard no recalcula nada
+- Consistency: Un commit que escribe transacciones o snapshots de un
+  portfolio invalida solo sus resultados (session events); lo escrito
+  por otros procesos se ve a lo más RETURNS_CACHE_TTL_SECONDS después
+- Fault Tolerance: Si Newton no converge, la tasa se busca en un bracket
+  con cambio de signo del VPN; sin solución la XIRR es None
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Hashable, Optional
+
+import numpy as np
+from sqlalchemy import event
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.models.portfolio import Portfolio, PortfolioSnapshot
+from app.models.transaction import Transaction
+
+logger = get_logger(__name__)
+
+# Modelos cuyas escrituras cambian los rendimientos de un portfolio
+_TRACKED_MODELS = (Transaction, PortfolioSnapshot)
+_DIRTY_KEY = "returns_cache_portfolios"
+# Marca de escrituras sin portfolio conocido (DML directo)
+_ALL = "all"
+
+# log(1 + tasa) de -99.99% a +14,700% anual para buscar el bracket
+_LOG_RATE_GRID = np.linspace(-9.0, 5.0, 281)
+
+
+def time_weighted_return(
+    values: np.ndarray,
+    flows: np.ndarray,
+    base_value: float = 0.0
+) -> Optional[float]:
+    """
+    TWR encadenado desde valores al cierre de cada periodo.
+    
+    Las aportaciones (flujo > 0) cuentan al inicio del periodo y los
+    retiros (flujo < 0) al final: (V_t) / (V_t-1 + F_t) o
+    (V_t - F_t) / V_t-1. Los periodos sin capital invertido no cuentan.
+    
+    Args:
+        values: Valor al cierre de cada periodo
+        flows: Aportación neta de cada periodo
+        base_value: Valor al cierre del periodo anterior al primero
+    
+    Returns:
+        Rendimiento del rango como fracción, o None si nunca hubo capital
+    """
+    previous = np.concatenate(([base_value], values[:-1]))
+    inflow = flows >= 0
+    start = np.where(inflow, previous + flows, previous)
+    end = np.where(inflow, values, values - flows)
+    invested = start > 1e-9
+    if not invested.any():
+        return None
+    growth = end[invested] / start[invested]
+    return float(np.prod(growth) - 1)
+
+
+def annualize(total_return: Optional[float], days: int) -> Optional[float]:
+    """Rendimiento anual equivalente; None con menos de un año"""
+    if total_return is None or days < 365 or total_return <= -1:
+        return None
+    return float((1 + total_return) ** (365 / days) - 1)
+
+
+def _npv(amounts: np.ndarray, years: np.ndarray, log_rate: float):
+    """VPN y su derivada respecto a log(1 + tasa)"""
+    discounted = amounts * np.exp(-log_rate * years)
+    return discounted.sum(), -(years * discounted).sum()
+
+
+def xirr(
+    amounts: np.ndarray,
+    years: np.ndarray,
+    guess: float = 0.1,
+    tolerance: float = 1e-10,
+    max_iterations: int = 50
+) -> Optional[float]:
+    """
+    Tasa anual que hace cero el VPN de flujos irregulares.
+    
+    Se resuelve en x = log(1 + tasa), donde el VPN es suave y no tiene
+    dominio restringido:
+    
+    1. Newton desde guess, con VPN y derivada vectorizados sobre todos
+       los flujos
+    2. Si no converge: VPN sobre una malla de tasas en una operación de
+       matriz, y bisección en el cambio de signo más cercano a guess
+    
+    Args:
+        amounts: Flujos del inversionista (negativo = aporta)
+        years: Años desde el primer flujo, alineados con amounts
+        guess: Tasa inicial
+        tolerance: Paso mínimo en log(1 + tasa) para converger
+        max_iterations: Iteraciones máximas de Newton
+    
+    Returns:
+        Tasa anual como fracción, o None si los flujos no tienen signos
+        opuestos o no hay solución
+    """
+    if not (amounts > 0).any() or not (amounts < 0).any():
+        return None
+    
+    x = float(np.log1p(guess))
+    with np.errstate(over="ignore", invalid="ignore"):
+        for _ in range(max_iterations):
+            value, slope = _npv(amounts, years, x)
+            if slope == 0 or not np.isfinite(slope):
+                break
+            step = value / slope
+            x -= step
+            if not np.isfinite(x) or abs(x) > 50:
+                break
+            if abs(step) < tolerance:
+                return float(np.expm1(x))
+        
+        grid = (
+            amounts[None, :] * np.exp(-_LOG_RATE_GRID[:, None] * years[None, :])
+        ).sum(axis=1)
+    finite = np.isfinite(grid)
+    sign_changes = np.flatnonzero(
+        (np.signbit(grid[:-1]) != np.signbit(grid[1:]))
+        & finite[:-1] & finite[1:]
+    )
+    if not len(sign_changes):
+        return None
+    
+    nearest = sign_changes[
+        np.argmin(np.abs(_LOG_RATE_GRID[sign_changes] - np.log1p(guess)))
+    ]
+    low, high = _LOG_RATE_GRID[nearest], _LOG_RATE_GRID[nearest + 1]
+    low_negative = np.signbit(grid[nearest])
+    while high - low > tolerance:
+        middle = (low + high) / 2
+        if np.signbit(_npv(amounts, years, middle)[0]) == low_negative:
+            low = middle
+        else:
+            high = middle
+    return float(np.expm1((low + high) / 2))
+
+
+@dataclass
+class PortfolioReturns:
+    """Rendimiento de un portfolio en un rango (None sin datos)"""
+    portfolio_id: int
+    start_date: Optional[date]
+    end_date: Optional[date]
+    days: int
+    start_value_usd: Optional[float]
+    end_value_usd: Optional[float]
+    net_flow_usd: Optional[float]
+    gain_usd: Optional[float]
+    twr_percent: Optional[float]
+    twr_annualized_percent: Optional[float]
+    xirr_percent: Optional[float]
+    
+    @classmethod
+    def empty(cls, portfolio_id: int) -> "PortfolioReturns":
+        return cls(
+            portfolio_id, None, None, 0,
+            None, None, None, None, None, None, None
+        )
+
+
+def _percent(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value * 100, 4)
+
+
+def compute_returns(
+    portfolio_id: int,
+    days: np.ndarray,
+    values: np.ndarray,
+    invested: np.ndarray,
+    base_value: float,
+    base_invested: float,
+    flow_times: np.ndarray,
+    flow_amounts: np.ndarray,
+    start_day: Optional[np.datetime64] = None
+) -> PortfolioReturns:
+    """
+    TWR y XIRR de un rango de snapshots.
+    
+    Args:
+        portfolio_id: ID del portafolio
+        days: Días de los snapshots del rango (datetime64[D], ordenados)
+        values: Valor USD de cada snapshot
+        invested: Aportaciones acumuladas de cada snapshot; su diferencia
+            es el flujo entre snapshots (tolera días sin snapshot)
+        base_value: Valor del último snapshot anterior al rango (0 si el
+            portfolio empezó dentro del rango)
+        base_invested: Aportaciones acumuladas a ese snapshot
+        flow_times: Instantes de las aportaciones del rango
+            (datetime64[us], desde start_day)
+        flow_amounts: Aportación neta de cada transacción (positivo =
+            entra dinero al portfolio)
+        start_day: Primer día del rango (default: days[0]); el valor
+            inicial cuenta como flujo de ese día
+    
+    Returns:
+        PortfolioReturns con los porcentajes redondeados
+    """
+    flows = np.diff(invested, prepend=base_invested)
+    total_return = time_weighted_return(values, flows, base_value)
+    if start_day is None:
+        start_day = days[0]
+    span = int((days[-1] - start_day).astype(np.int64)) + 1
+    
+    # Flujos del inversionista: aporta el valor inicial y las compras,
+    # recibe ventas, dividendos y el valor final
+    start = start_day.astype("datetime64[us]")
+    end = (days[-1] + 1).astype("datetime64[us]")
+    one_year = np.timedelta64(365 * 86400 * 10**6, "us")
+    amounts = np.concatenate(([-base_value], -flow_amounts, [values[-1]]))
+    years = np.concatenate((
+        [0.0],
+        (flow_times - start) / one_year,
+        [(end - start) / one_year],
+    ))
+    money_weighted = xirr(amounts, years)
+    
+    end_value = float(values[-1])
+    net_flow = float(invested[-1] - base_invested)
+    return PortfolioReturns(
+        portfolio_id=portfolio_id,
+        start_date=start_day.item(),
+        end_date=days[-1].item(),
+        days=span,
+        start_value_usd=round(base_value, 2),
+        end_value_usd=round(end_value, 2),
+        net_flow_usd=round(net_flow, 2),
+        gain_usd=round(end_value - base_value - net_flow, 2),
+        twr_percent=_percent(total_return),
+        twr_annualized_percent=_percent(annualize(total_return, span)),
+        xirr_percent=_percent(money_weighted),
+    )
+
+
+class ReturnsCache:
+    """
+    Resultados por (portfolio, inicio, fin) con versión de datos.
+    
+    - Una entrada sirve mientras la versión del portfolio (y la global)
+      no cambie y no supere el TTL
+    - Un cálculo que empezó antes de una invalidación no se guarda
+    - LRU acotado a max_entries
+    """
+    
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: OrderedDict[
+            Hashable, tuple[tuple[int, int], datetime, PortfolioReturns]
+        ] = OrderedDict()
+        self._version = 0
+        self._portfolio_versions: dict[int, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+    
+    def version(self, portfolio_id: int) -> tuple[int, int]:
+        """Versión de datos vigente de un portfolio"""
+        return self._version, self._portfolio_versions.get(portfolio_id, 0)
+    
+    def get(
+        self,
+        portfolio_id: int,
+        start_date: Optional[date],
+        end_date: Optional[date]
+    ) -> Optional[PortfolioReturns]:
+        """Resultado memorizado, o None si no hay uno vigente"""
+        key = (portfolio_id, start_date, end_date)
+        entry = self._entries.get(key)
+        if entry is not None:
+            version, computed_at, result = entry
+            if (
+                version == self.version(portfolio_id)
+                and datetime.utcnow() - computed_at
+                <= timedelta(seconds=self.ttl_seconds)
+            ):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+            del self._entries[key]
+        self.misses += 1
+        return None
+    
+    def put(
+        self,
+        start_date: Optional[date],
+        end_date: Optional[date],
+        version: tuple[int, int],
+        result: PortfolioReturns
+    ) -> None:
+        """
+        Guarda un resultado calculado con la versión leída antes de
+        empezar el cálculo.
+        """
+        if version != self.version(result.portfolio_id):
+            return
+        key = (result.portfolio_id, start_date, end_date)
+        self._entries[key] = (version, datetime.utcnow(), result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def invalidate(self, portfolio_ids) -> None:
+        """Los resultados de esos portfolios dejan de servir"""
+        for portfolio_id in portfolio_ids:
+            self._portfolio_versions[portfolio_id] = (
+                self._portfolio_versions.get(portfolio_id, 0) + 1
+            )
+        self.invalidations += 1
+    
+    def invalidate_all(self) -> None:
+        """Ningún resultado memorizado sirve"""
+        self._version += 1
+        self._entries.clear()
+        self.invalidations += 1
+    
+    def stats(self) -> dict:
+        """Métricas acumuladas desde el arranque del proceso"""
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+
+# Cache por proceso compartido por la API y el job de snapshots
+returns_cache = ReturnsCache(
+    ttl_seconds=settings.RETURNS_CACHE_TTL_SECONDS,
+    max_entries=settings.RETURNS_CACHE_MAX_ENTRIES,
+)
+
+
+def _mark(session: Session, portfolio_ids) -> None:
+    marked = session.info.setdefault(_DIRTY_KEY, set())
+    marked.update(portfolio_ids)
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_dirty_on_flush(session: Session, flush_context) -> None:
+    """Marca los portfolios de las transacciones/snapshots del flush"""
+    changed = (*session.new, *session.dirty, *session.deleted)
+    portfolio_ids = set()
+    for obj in changed:
+        if isinstance(obj, _TRACKED_MODELS):
+            portfolio_ids.add(obj.portfolio_id)
+        elif isinstance(obj, Portfolio) and obj in session.deleted:
+            portfolio_ids.add(obj.id)
+    if portfolio_ids:
+        _mark(session, portfolio_ids - {None})
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_dirty_on_dml(orm_execute_state: ORMExecuteState) -> None:
+    """
+    DML directo: un INSERT con portfolio_id en sus parámetros (upsert de
+    snapshots) marca esos portfolios; cualquier otro marca todos.
+    """
+    if orm_execute_state.is_select:
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None:
+        return
+    if issubclass(mapper.class_, _TRACKED_MODELS):
+        parameters = orm_execute_state.parameters
+        if isinstance(parameters, dict):
+            parameters = [parameters]
+        if (
+            orm_execute_state.is_insert
+            and parameters
+            and all("portfolio_id" in row for row in parameters)
+        ):
+            _mark(
+                orm_execute_state.session,
+                {row["portfolio_id"] for row in parameters}
+            )
+        else:
+            _mark(orm_execute_state.session, {_ALL})
+    elif issubclass(mapper.class_, Portfolio) and orm_execute_state.is_delete:
+        _mark(orm_execute_state.session, {_ALL})
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session: Session) -> None:
+    portfolio_ids = session.info.pop(_DIRTY_KEY, set())
+    if _ALL in portfolio_ids:
+        returns_cache.invalidate_all()
+    elif portfolio_ids:
+        returns_cache.invalidate(portfolio_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session: Session) -> None:
+    session.info.pop(_DIRTY_KEY, None)
@@ -0,0 +1,559 @@
+"""
+Portfolio Snapshot Service
+
+Valor diario (NAV) de cada portfolio precalculado en portfolio_snapshots,
+para que una gráfica de valor sea una consulta de rango y no una
+reconstrucción desde transacciones en cada request.
+
+- Job diario: valúa los portfolios activos con el mismo replay de
+  transacciones y escribe la fila del día con los últimos precios (la
+  última ejecución del día gana) y los días que faltan desde el último
+  snapshot guardado (caídas o ejecuciones fallidas)
+- Backfill: reconstruye el histórico de un portfolio desde transactions
+  y las velas diarias de prices en una pasada vectorizada
+- Rendimientos: TWR y XIRR de un rango desde los snapshots y los flujos
+  de transactions (memorizados en returns_cache)
+
+Principios aplicados:
+- Performance: El backfill de un portfolio son dos queries (eventos y
+  cierres diarios) y operaciones sobre una matriz días × activos; la
+  lectura es una query sobre el índice (portfolio_id, snapshot_date)
+- Consistency: Días backfilled y diarios salen de las mismas
+  transacciones y cierres, sin saltos de valor entre ambos
+- Single Responsibility: Solo calcula y guarda series; los cierres son
+  del rollup de precios
+- Fault Tolerance: Commit por portfolio; un backfill interrumpido
+  conserva los portfolios ya escritos
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Optional, Sequence
+
+import numpy as np
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.models.transaction import TransactionType
+from app.repositories.portfolio_repository import PortfolioRepository
+from app.repositories.rollup_repository import PriceRollupRepository
+from app.repositories.snapshot_repository import PortfolioSnapshotRepository
+from app.repositories.transaction_repository import TransactionRepository
+from app.services.asof_index import asof_index, to_epoch_us
+from app.services.downsampling import lttb_indices, to_epoch_seconds
+from app.services.returns import PortfolioReturns, compute_returns, returns_cache
+
+logger = get_logger(__name__)
+
+# Aportación neta de una transacción = signo × |total_value| + fee:
+# compras y comisiones entran al portfolio, ventas y dividendos salen
+FLOW_SIGNS = {
+    TransactionType.BUY: 1.0,
+    TransactionType.SELL: -1.0,
+    TransactionType.DIVIDEND: -1.0,
+    TransactionType.FEE: 1.0,
+}
+
+# Cambio de cantidad = signo × |quantity|
+QUANTITY_SIGNS = {
+    TransactionType.BUY: 1.0,
+    TransactionType.SELL: -1.0,
+    TransactionType.DIVIDEND: 0.0,
+    TransactionType.FEE: 0.0,
+}
+
+# Cantidades menores cuentan como posición cerrada (residuos de float)
+QUANTITY_EPSILON = 1e-9
+
+
+def _money(value: float) -> Optional[Decimal]:
+    """Float -> Decimal a centavos (None si es NaN)"""
+    return None if value != value else Decimal(f"{value:.2f}")
+
+
+def event_flows(types: Sequence, totals: Sequence, fees: Sequence) -> np.ndarray:
+    """Aportación neta de cada transacción, alineada con los argumentos"""
+    return (
+        np.fromiter((FLOW_SIGNS[t] for t in types), np.float64, len(types))
+        * np.abs(np.array(totals, dtype=np.float64))
+        + np.array(fees, dtype=np.float64)
+    )
+
+
+@dataclass
+class NavSeries:
+    """Serie diaria reconstruida de un portfolio (arrays alineados)"""
+    days: np.ndarray            # datetime64[D]
+    value_usd: np.ndarray
+    value_mxn: np.ndarray       # NaN sin tipo de cambio
+    invested_usd: np.ndarray
+    net_flow_usd: np.ndarray
+    holdings_count: np.ndarray
+    
+    def __len__(self) -> int:
+        return len(self.days)
+    
+    def last_day(self) -> "NavSeries":
+        """Serie con solo el último día"""
+        return self._slice(slice(-1, None))
+    
+    def since(self, day: date) -> "NavSeries":
+        """Serie desde `day` (inclusive)"""
+        start = int(np.searchsorted(self.days, np.datetime64(day, "D")))
+        return self._slice(slice(start, None))
+    
+    def _slice(self, index: slice) -> "NavSeries":
+        return NavSeries(
+            days=self.days[index],
+            value_usd=self.value_usd[index],
+            value_mxn=self.value_mxn[index],
+            invested_usd=self.invested_usd[index],
+            net_flow_usd=self.net_flow_usd[index],
+            holdings_count=self.holdings_count[index],
+        )
+    
+    def to_rows(self, portfolio_id: int, source: str) -> list[dict]:
+        """Filas para PortfolioSnapshotRepository.upsert_many"""
+        now = datetime.utcnow()
+        return [
+            {
+                "portfolio_id": portfolio_id,
+                "snapshot_date": day,
+                "value_usd": _money(value),
+                "value_mxn": _money(value_mxn),
+                "invested_usd": _money(invested),
+                "net_flow_usd": _money(net_flow),
+                "holdings_count": count,
+                "source": source,
+                "created_at": now,
+            }
+            for day, value, value_mxn, invested, net_flow, count in zip(
+                self.days.tolist(),
+                self.value_usd.tolist(),
+                self.value_mxn.tolist(),
+                self.invested_usd.tolist(),
+                self.net_flow_usd.tolist(),
+                self.holdings_count.tolist(),
+            )
+        ]
+
+
+@dataclass
+class SnapshotReport:
+    """Resultado del job de snapshots del día"""
+    snapshot_date: date
+    portfolios: int
+    days_written: int
+    duration_seconds: float
+
+
+@dataclass
+class SnapshotBackfillReport:
+    """Resultado de un backfill de snapshots"""
+    portfolios: int
+    days_written: int
+    duration_seconds: float
+    skipped: bool = False
+
+
+@dataclass
+class SnapshotHistory:
+    """Snapshots de un rango, ya reducidos con LTTB"""
+    points: list[Row]
+    source_count: int
+
+
+class PortfolioSnapshotService:
+    """
+    Escritura y lectura de snapshots diarios de valor por portfolio.
+    """
+    
+    def __init__(self, db: AsyncSession):
+        """
+        Args:
+            db: Sesión async de SQLAlchemy
+        """
+        self.db = db
+        self.snapshots = PortfolioSnapshotRepository(db)
+        self.transactions = TransactionRepository(db)
+    
+    async def take_snapshots(
+        self,
+        as_of: Optional[datetime] = None,
+        portfolio_ids: Optional[Sequence[int]] = None
+    ) -> SnapshotReport:
+        """
+        Escribe el snapshot del día de los portfolios con su valor actual
+        y los días que faltan desde su último snapshot guardado.
+        
+        Las filas salen del mismo replay de transacciones que el
+        backfill, hasta el día de as_of: el cierre del día en la vela 1d
+        es el último precio ingerido, así que el valor del día es el de
+        los últimos precios, y los días backfilled y los diarios no
+        saltan si la tabla holdings difiere de las transacciones. Los
+        días sin ejecución del job (caídas, errores) se escriben como
+        backfill en la siguiente ejecución. Los portfolios sin
+        transacciones no escriben filas. Una segunda ejecución el mismo
+        día reemplaza la fila del día.
+        
+        Args:
+            as_of: Instante del snapshot (default: ahora, UTC)
+            portfolio_ids: Portfolios a escribir (default: activos)
+        
+        Returns:
+            SnapshotReport con día, portfolios y días escritos
+        """
+        started = time.perf_counter()
+        if as_of is None:
+            as_of = datetime.utcnow()
+        day = as_of.date()
+        if portfolio_ids is None:
+            portfolio_ids = await PortfolioRepository(self.db).get_ids(
+                active_only=True
+            )
+        
+        last_dates = await self.snapshots.get_last_dates(portfolio_ids)
+        
+        portfolios = 0
+        rows = []
+        for portfolio_id in portfolio_ids:
+            series = await self.replay(portfolio_id, day)
+            if series is None:
+                continue
+            last = last_dates.get(portfolio_id)
+            if last is not None:
+                series = series.since(min(last + timedelta(days=1), day))
+            rows.extend(series.to_rows(portfolio_id, "backfill")[:-1])
+            rows.extend(series.last_day().to_rows(portfolio_id, "daily"))
+            portfolios += 1
+        await self.snapshots.upsert_many(rows)
+        await self.db.commit()
+        
+        report = SnapshotReport(
+            snapshot_date=day,
+            portfolios=portfolios,
+            days_written=len(rows),
+            duration_seconds=round(time.perf_counter() - started, 3)
+        )
+        logger.info(
+            "Portfolio snapshots written",
+            extra={
+                "snapshot_date": day.isoformat(),
+                "portfolios": report.portfolios,
+                "days": report.days_written,
+                "duration_seconds": report.duration_seconds,
+            }
+        )
+        return report
+    
+    async def replay(
+        self,
+        portfolio_id: int,
+        end_day: date
+    ) -> Optional[NavSeries]:
+        """
+        Reconstruye el valor diario de un portfolio desde sus
+        transacciones hasta end_day, sin escribir nada.
+        
+        1. Cambios de cantidad en una matriz días × activos (np.add.at)
+           y posiciones con cumsum por columna
+        2. Cierres diarios de las velas 1d en una query; los días sin
+           vela usan el precio de la transacción del día y después el
+           último cierre conocido (forward fill)
+        3. Valor = Σ posición × cierre por día, tipo de cambio vigente
+           al cierre del día del índice as-of y aportaciones del día con
+           np.bincount
+        
+        Args:
+            portfolio_id: ID del portafolio
+            end_day: Último día de la serie (inclusive)
+        
+        Returns:
+            NavSeries desde el día de la primera transacción, o None si
+            no hay transacciones hasta end_day
+        """
+        events = await self.transactions.get_events(portfolio_id)
+        if not events:
+            return None
+        
+        tickers, types, quantity, price, total, fee, dates = zip(*events)
+        first_day = np.datetime64(dates[0], "D")
+        days = np.arange(first_day, np.datetime64(end_day, "D") + 1)
+        count = len(days)
+        if not count:
+            return None
+        
+        event_index = (
+            to_epoch_us(dates, len(dates)).view("datetime64[us]")
+            .astype("datetime64[D]") - first_day
+        ).astype(np.int64)
+        keep = event_index < count
+        event_index = event_index[keep]
+        quantity_signs = np.fromiter(
+            (QUANTITY_SIGNS[t] for t in types), np.float64, len(types)
+        )[keep]
+        flows = event_flows(types, total, fee)[keep]
+        names, column = np.unique(
+            np.array([ticker.upper() for ticker in tickers], dtype=object),
+            return_inverse=True
+        )
+        column = column[keep]
+        width = len(names)
+        
+        deltas = np.zeros((count, width))
+        np.add.at(
+            deltas,
+            (event_index, column),
+            quantity_signs * np.abs(np.array(quantity, dtype=np.float64))[keep]
+        )
+        positions = np.cumsum(deltas, axis=0)
+        
+        # Precio de compra/venta como cierre del día; la vela lo reemplaza
+        closes = np.full((count, width), np.nan)
+        traded = quantity_signs != 0
+        closes[event_index[traded], column[traded]] = np.array(
+            price, dtype=np.float64
+        )[keep][traded]
+        rows = await PriceRollupRepository(self.db).get_close_series(
+            names.tolist(),
+            "1d",
+            first_day.astype("datetime64[us]").astype(datetime),
+            np.datetime64(end_day, "us").astype(datetime)
+        )
+        if rows:
+            row_tickers, row_days, row_closes = zip(*rows)
+            row_index = (
+                to_epoch_us(row_days, len(rows)).view("datetime64[us]")
+                .astype("datetime64[D]") - first_day
+            ).astype(np.int64)
+            row_column = np.searchsorted(
+                names, np.array(row_tickers, dtype=object)
+            )
+            closes[row_index, row_column] = np.array(
+                row_closes, dtype=np.float64
+            )
+        
+        # Forward fill por columna: índice del último día con cierre
+        last = np.where(~np.isnan(closes), np.arange(count)[:, None], 0)
+        np.maximum.accumulate(last, axis=0, out=last)
+        closes = closes[last, np.arange(width)]
+        
+        held = positions > QUANTITY_EPSILON
+        value_usd = np.where(
+            held & ~np.isnan(closes), positions * closes, 0.0
+        ).sum(axis=1)
+        net_flow = np.bincount(event_index, weights=flows, minlength=count)
+        
+        # Tipo de cambio vigente al cierre de cada día
+        day_ends = (
+            (days + 1).astype("datetime64[us]") - np.timedelta64(1, "us")
+        ).astype(datetime).tolist()
+        rates = await asof_index.get_rates(self.db, day_ends)
+        
+        return NavSeries(
+            days=days,
+            value_usd=value_usd,
+            value_mxn=value_usd * rates.values,
+            invested_usd=np.cumsum(net_flow),
+            net_flow_usd=net_flow,
+            holdings_count=held.sum(axis=1),
+        )
+    
+    async def backfill(
+        self,
+        portfolio_ids: Optional[Sequence[int]] = None,
+        as_of: Optional[datetime] = None,
+        only_if_empty: bool = False
+    ) -> SnapshotBackfillReport:
+        """
+        Reconstruye los snapshots históricos desde transactions y prices.
+        
+        Escribe un snapshot por día desde la primera transacción de cada
+        portfolio hasta el día anterior a as_of (el del día lo escribe
+        el job diario), reemplazando los que ya existan. Commit por
+        portfolio, cediendo el event loop entre portfolios.
+        
+        Args:
+            portfolio_ids: Portfolios a reconstruir (default: todos)
+            as_of: Instante de referencia (default: ahora, UTC)
+            only_if_empty: No hacer nada si ya hay snapshots
+        
+        Returns:
+            SnapshotBackfillReport con portfolios y días escritos
+        """
+        started = time.perf_counter()
+        if only_if_empty and await self.snapshots.has_snapshots():
+            return SnapshotBackfillReport(0, 0, 0.0, skipped=True)
+        
+        if as_of is None:
+            as_of = datetime.utcnow()
+        end_day = as_of.date() - timedelta(days=1)
+        if portfolio_ids is None:
+            portfolio_ids = await PortfolioRepository(self.db).get_ids()
+        
+        portfolios = 0
+        written = 0
+        for portfolio_id in portfolio_ids:
+            series = await self.replay(portfolio_id, end_day)
+            if series is not None:
+                # Días previos a la primera transacción (si se corrigió)
+                await self.snapshots.delete_by_portfolio(
+                    portfolio_id, before=series.days[0].item()
+                )
+                written += await self.snapshots.upsert_many(
+                    series.to_rows(portfolio_id, "backfill")
+                )
+                await self.db.commit()
+                portfolios += 1
+            await asyncio.sleep(0)
+        
+        report = SnapshotBackfillReport(
+            portfolios=portfolios,
+            days_written=written,
+            duration_seconds=round(time.perf_counter() - started, 3)
+        )
+        logger.info(
+            "Portfolio snapshots backfilled",
+            extra={
+                "portfolios": report.portfolios,
+                "days": report.days_written,
+                "duration_seconds": report.duration_seconds,
+            }
+        )
+        return report
+    
+    async def get_history(
+        self,
+        portfolio_id: int,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        max_points: Optional[int] = None
+    ) -> SnapshotHistory:
+        """
+        Snapshots de un rango de días para gráficas.
+        
+        Una query de rango sobre (portfolio_id, snapshot_date); si hay
+        más de max_points días se conservan los que elige LTTB sobre
+        value_usd.
+        
+        Args:
+            portfolio_id: ID del portafolio
+            start_date: Primer día (inclusive)
+            end_date: Último día (inclusive)
+            max_points: Presupuesto de puntos (default: settings)
+        
+        Returns:
+            SnapshotHistory con filas ordenadas por día
+        """
+        if max_points is None:
+            max_points = settings.PRICE_HISTORY_MAX_POINTS
+        
+        rows = await self.snapshots.get_range(portfolio_id, start_date, end_date)
+        source_count = len(rows)
+        if source_count > max_points:
+            keep = lttb_indices(
+                to_epoch_seconds(
+                    np.array([row.snapshot_date for row in rows], "datetime64[D]")
+                ),
+                np.array([row.value_usd for row in rows], dtype=np.float64),
+                max_points
+            )
+            rows = [rows[index] for index in keep.tolist()]
+        return SnapshotHistory(rows, source_count)
+    
+    async def get_returns(
+        self,
+        portfolio_id: int,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None
+    ) -> PortfolioReturns:
+        """
+        TWR y XIRR del portfolio entre start_date y end_date (inclusive).
+        
+        Un resultado ya calculado para el mismo rango se sirve de memoria
+        mientras no se escriban transacciones o snapshots del portfolio.
+        
+        Args:
+            portfolio_id: ID del portafolio
+            start_date: Primer día (default: desde el primer snapshot)
+            end_date: Último día (default: hoy, UTC)
+        
+        Returns:
+            PortfolioReturns sobre los días con snapshot del rango
+        """
+        if end_date is None:
+            end_date = datetime.utcnow().date()
+        
+        cached = returns_cache.get(portfolio_id, start_date, end_date)
+        if cached is not None:
+            return cached
+        
+        version = returns_cache.version(portfolio_id)
+        result = await self._compute_returns(portfolio_id, start_date, end_date)
+        returns_cache.put(start_date, end_date, version, result)
+        return result
+    
+    async def _compute_returns(
+        self,
+        portfolio_id: int,
+        start_date: Optional[date],
+        end_date: date
+    ) -> PortfolioReturns:
+        rows = await self.snapshots.get_range(portfolio_id, start_date, end_date)
+        if not rows:
+            return PortfolioReturns.empty(portfolio_id)
+        
+        # El último snapshot anterior al rango es el valor inicial, aunque
+        # falten días (fin de semana, caída o rango antes del primer día)
+        base = None
+        if start_date:
+            base = await self.snapshots.get_latest_before(
+                portfolio_id, start_date
+            )
+        base_value = base_invested = 0.0
+        if base is not None:
+            base_value = base.value_usd
+            base_invested = base.invested_usd
+        
+        days, values, _, invested, _, _ = zip(*rows)
+        days = np.array(days, dtype="datetime64[D]")
+        
+        # Flujos de transacciones desde start_date hasta el último día
+        end = (days[-1] + 1).astype("datetime64[us]")
+        events = await self.transactions.get_events(portfolio_id)
+        flow_times = np.zeros(0, dtype="datetime64[us]")
+        flow_amounts = np.zeros(0)
+        if events:
+            _, types, _, _, total, fee, dates = zip(*events)
+            flow_times = to_epoch_us(dates, len(dates)).view("datetime64[us]")
+            flow_amounts = event_flows(types, total, fee)
+            in_range = flow_times < end
+            if start_date:
+                in_range &= flow_times >= np.datetime64(start_date, "us")
+            flow_times = flow_times[in_range]
+            flow_amounts = flow_amounts[in_range]
+        
+        # Con valor inicial el rango empieza en start_date; sin él, en el
+        # primer día con snapshot o con aportación
+        start_day = days[0]
+        if base is not None:
+            start_day = np.datetime64(start_date, "D")
+        elif len(flow_times):
+            start_day = min(start_day, flow_times[0].astype("datetime64[D]"))
+        
+        return compute_returns(
+            portfolio_id,
+            days,
+            np.array(values, dtype=np.float64),
+            np.array(invested, dtype=np.float64),
+            base_value,
+            base_invested,
+            flow_times,
+            flow_amounts,
+            start_day
+        )
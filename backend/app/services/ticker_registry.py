@@ -0,0 +1,145 @@
+"""
+Ticker Registry
+
+Universo de activos a cotizar: pares (ticker, asset_type) distintos en
+holdings y transactions, cacheado en memoria e invalidado al escribir.
+
+Principios aplicados:
+- Single Source of Truth: Se cotiza lo que los usuarios realmente tienen
+- Performance: Una query por TTL, no una por refresh o request
+- Consistency: Invalidación en commit de cualquier escritura a holdings
+  o transactions (ORM o DML)
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.models.holding import Holding
+from app.models.transaction import Transaction
+from app.repositories.portfolio_repository import HoldingRepository
+from app.repositories.transaction_repository import TransactionRepository
+
+logger = get_logger(__name__)
+
+# Modelos cuyas escrituras cambian el universo de tickers
+_TRACKED_MODELS = (Holding, Transaction)
+_DIRTY_KEY = "ticker_registry_dirty"
+
+
+class TickerRegistry:
+    """
+    Cache ticker -> asset_type del universo de activos.
+    
+    - Holdings prevalecen sobre transactions si un ticker aparece con
+      asset_types distintos
+    - invalidate() descarta el snapshot; la siguiente lectura recarga
+    - Una carga que empezó antes de una invalidación no se guarda
+    """
+    
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._assets: Optional[dict[str, str]] = None
+        self._loaded_at: Optional[datetime] = None
+        self._version = 0
+        self._lock = asyncio.Lock()
+        self.loads = 0
+        self.invalidations = 0
+    
+    def _is_fresh(self) -> bool:
+        return (
+            self._assets is not None
+            and datetime.utcnow() - self._loaded_at
+            <= timedelta(seconds=self.ttl_seconds)
+        )
+    
+    async def get(self, db: AsyncSession) -> dict[str, str]:
+        """
+        Universo actual de activos.
+        
+        Args:
+            db: Sesión usada solo si hay que recargar
+        
+        Returns:
+            Dict ticker -> asset_type (stock, etf, crypto, other)
+        """
+        if self._is_fresh():
+            return dict(self._assets)
+        
+        async with self._lock:
+            if self._is_fresh():
+                return dict(self._assets)
+            
+            version = self._version
+            assets = await self._load(db)
+            self.loads += 1
+            if version == self._version:
+                self._assets = assets
+                self._loaded_at = datetime.utcnow()
+            return dict(assets)
+    
+    async def _load(self, db: AsyncSession) -> dict[str, str]:
+        holdings = await HoldingRepository(db).get_distinct_assets()
+        transactions = await TransactionRepository(db).get_distinct_assets()
+        
+        assets: dict[str, str] = {}
+        for ticker, asset_type in holdings + transactions:
+            assets.setdefault(ticker.upper(), asset_type.lower())
+        
+        logger.debug(f"Universo de tickers cargado: {assets}")
+        return assets
+    
+    def invalidate(self) -> None:
+        """Descarta el snapshot cacheado"""
+        self._version += 1
+        self._assets = None
+        self._loaded_at = None
+        self.invalidations += 1
+    
+    def stats(self) -> dict:
+        """Métricas acumuladas desde el arranque del proceso"""
+        return {
+            "tickers": len(self._assets) if self._assets is not None else None,
+            "loaded_at": self._loaded_at,
+            "loads": self.loads,
+            "invalidations": self.invalidations,
+        }
+
+
+# Registro por proceso compartido por PriceService y el scheduler
+ticker_registry = TickerRegistry(ttl_seconds=settings.TICKER_REGISTRY_TTL_SECONDS)
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_dirty_on_flush(session: Session, flush_context) -> None:
+    """Marca la sesión si el flush tocó holdings o transactions"""
+    changed = (*session.new, *session.dirty, *session.deleted)
+    if any(isinstance(obj, _TRACKED_MODELS) for obj in changed):
+        session.info[_DIRTY_KEY] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_dirty_on_dml(orm_execute_state: ORMExecuteState) -> None:
+    """Marca la sesión en INSERT/UPDATE/DELETE directos sobre esos modelos"""
+    if orm_execute_state.is_select:
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and issubclass(mapper.class_, _TRACKED_MODELS):
+        orm_execute_state.session.info[_DIRTY_KEY] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session: Session) -> None:
+    if session.info.pop(_DIRTY_KEY, False):
+        ticker_registry.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session: Session) -> None:
+    session.info.pop(_DIRTY_KEY, None)
@@ -0,0 +1,359 @@
+"""
+Valuation Engine
+
+Valuación de holdings con el último precio de cada activo: valor, costo,
+ganancia/pérdida y pesos calculados como operaciones sobre arrays.
+
+Principios aplicados:
+- Performance: Holdings y últimos precios en una query (LEFT JOIN
+  latest_prices) y el tipo de cambio en otra como máximo; los cálculos
+  son vectorizados en lugar de propiedades Decimal por Holding
+- Scalability: La valuación en lote lee posiciones, los precios de la
+  unión de tickers y el tipo de cambio una sola vez; valuar 10k
+  portfolios cuesta las mismas queries que valuar uno
+- Single Responsibility: Solo valuación; los totales por portfolio se
+  agregan con np.bincount para servir uno o varios portfolios igual
+- Fault Tolerance: Un activo sin precio queda fuera del valor y de los
+  pesos en lugar de contar como pérdida total
+"""
+
+from dataclasses import dataclass, field
+from typing import Optional, Sequence
+
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.logging import get_logger
+from app.models.holding import Holding
+from app.repositories.portfolio_repository import HoldingRepository
+from app.repositories.price_repository import (
+    ExchangeRateRepository,
+    PriceRepository,
+)
+from app.services.fx_rates import fx_rates
+
+logger = get_logger(__name__)
+
+
+def _optional(value: float, digits: int = 2) -> Optional[float]:
+    """NaN -> None, el resto redondeado para la API"""
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+def _column(values: np.ndarray, digits: int = 2) -> list[Optional[float]]:
+    """Array -> lista redondeada con None en lugar de NaN"""
+    return [
+        None if value != value else value
+        for value in np.round(values, digits).tolist()
+    ]
+
+
+@dataclass
+class PortfolioTotals:
+    """Totales de un portfolio (solo holdings con precio)"""
+    portfolio_id: int
+    holdings_count: int
+    total_value_usd: float
+    total_value_mxn: Optional[float]
+    total_cost_usd: float
+    total_gain_loss_usd: float
+    total_gain_loss_percent: Optional[float]
+    distribution: dict[str, float] = field(default_factory=dict)
+    unpriced: list[str] = field(default_factory=list)
+
+
+class HoldingsValuation:
+    """
+    Valuación de los holdings de uno o más portfolios.
+    
+    Todos los arrays tienen una posición por holding; price_usd es NaN
+    para los activos sin precio y con él value_usd, gain_loss_usd,
+    gain_loss_percent y weight_percent.
+    """
+    
+    def __init__(
+        self,
+        portfolio_ids: np.ndarray,
+        tickers: Sequence[str],
+        quantity: np.ndarray,
+        average_cost: np.ndarray,
+        price_usd: np.ndarray,
+        exchange_rate: Optional[float],
+        holdings: Optional[Sequence[Holding]] = None
+    ):
+        """
+        Args:
+            portfolio_ids: Portfolio de cada holding
+            tickers: Ticker de cada holding
+            quantity: Cantidad de cada holding
+            average_cost: Precio promedio de compra en USD
+            price_usd: Último precio en USD (NaN sin precio)
+            exchange_rate: USD/MXN (None si no hay tipo de cambio)
+            holdings: Objetos Holding alineados (solo para respuestas)
+        """
+        self.portfolio_ids = np.asarray(portfolio_ids, dtype=np.int64)
+        self.tickers = list(tickers)
+        self.quantity = np.asarray(quantity, dtype=np.float64)
+        self.average_cost = np.asarray(average_cost, dtype=np.float64)
+        self.price_usd = np.asarray(price_usd, dtype=np.float64)
+        self.exchange_rate = exchange_rate
+        self.holdings = list(holdings) if holdings is not None else []
+        self.priced = ~np.isnan(self.price_usd)
+        
+        self.cost_usd = self.quantity * self.average_cost
+        self.value_usd = self.quantity * self.price_usd
+        self.gain_loss_usd = self.value_usd - self.cost_usd
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.gain_loss_percent = np.where(
+                self.cost_usd > 0,
+                self.gain_loss_usd / self.cost_usd * 100,
+                np.nan
+            )
+        
+        # Agregados por portfolio: índice denso de cada holding
+        self.portfolio_index, self._group = np.unique(
+            self.portfolio_ids, return_inverse=True
+        )
+        groups = len(self.portfolio_index)
+        priced_value = np.where(self.priced, self.value_usd, 0.0)
+        self.group_value_usd = np.bincount(
+            self._group, weights=priced_value, minlength=groups
+        )
+        self.group_cost_usd = np.bincount(
+            self._group,
+            weights=np.where(self.priced, self.cost_usd, 0.0),
+            minlength=groups
+        )
+        group_value = self.group_value_usd[self._group]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.weight_percent = np.where(
+                self.priced & (group_value > 0),
+                priced_value / group_value * 100,
+                np.nan
+            )
+    
+    @classmethod
+    def from_holdings(
+        cls,
+        holdings: Sequence[Holding],
+        prices: Sequence[Optional[float]],
+        exchange_rate: Optional[float]
+    ) -> "HoldingsValuation":
+        """
+        Valuación de objetos Holding (con sus datos para HoldingResponse).
+        
+        Args:
+            holdings: Holdings a valuar
+            prices: Último precio USD de cada holding (None sin precio)
+            exchange_rate: USD/MXN (None si no hay tipo de cambio)
+        """
+        count = len(holdings)
+        return cls(
+            portfolio_ids=np.fromiter(
+                (holding.portfolio_id for holding in holdings),
+                dtype=np.int64, count=count
+            ),
+            tickers=[holding.ticker for holding in holdings],
+            quantity=np.fromiter(
+                (holding.quantity for holding in holdings),
+                dtype=np.float64, count=count
+            ),
+            average_cost=np.fromiter(
+                (holding.average_buy_price for holding in holdings),
+                dtype=np.float64, count=count
+            ),
+            price_usd=np.fromiter(
+                (np.nan if price is None else price for price in prices),
+                dtype=np.float64, count=count
+            ),
+            exchange_rate=exchange_rate,
+            holdings=holdings
+        )
+    
+    @property
+    def value_mxn(self) -> np.ndarray:
+        """Valor de cada holding en MXN (NaN sin tipo de cambio)"""
+        rate = np.nan if self.exchange_rate is None else self.exchange_rate
+        return self.value_usd * rate
+    
+    def holding_metrics(self, position: int) -> dict[str, Optional[float]]:
+        """
+        Campos calculados de HoldingResponse para un holding.
+        
+        Args:
+            position: Posición del holding en `holdings`
+        """
+        return {
+            "current_price": _optional(self.price_usd[position]),
+            "current_value_usd": _optional(self.value_usd[position]),
+            "current_value_mxn": _optional(self.value_mxn[position]),
+            "total_cost_usd": _optional(self.cost_usd[position]),
+            "gain_loss_usd": _optional(self.gain_loss_usd[position]),
+            "gain_loss_percent": _optional(self.gain_loss_percent[position]),
+        }
+    
+    def totals(self) -> dict[int, PortfolioTotals]:
+        """Totales, distribución y activos sin precio por portfolio"""
+        counts = np.bincount(self._group, minlength=len(self.portfolio_index))
+        value_mxn = self.group_value_usd * (
+            np.nan if self.exchange_rate is None else self.exchange_rate
+        )
+        gain_loss = self.group_value_usd - self.group_cost_usd
+        with np.errstate(divide="ignore", invalid="ignore"):
+            gain_loss_percent = np.where(
+                self.group_cost_usd > 0,
+                gain_loss / self.group_cost_usd * 100,
+                np.nan
+            )
+        
+        # Una conversión a listas por columna en lugar de float() por celda
+        columns = zip(
+            self.portfolio_index.tolist(),
+            counts.tolist(),
+            _column(self.group_value_usd),
+            _column(value_mxn),
+            _column(self.group_cost_usd),
+            _column(gain_loss),
+            _column(gain_loss_percent),
+        )
+        totals = {
+            portfolio_id: PortfolioTotals(
+                portfolio_id, count, value, value_mxn, cost, gain, percent
+            )
+            for portfolio_id, count, value, value_mxn, cost, gain, percent
+            in columns
+        }
+        owners = self.portfolio_index[self._group].tolist()
+        holdings = zip(
+            owners, self.tickers, _column(self.weight_percent), self.priced
+        )
+        for owner, ticker, weight, priced in holdings:
+            if not priced:
+                totals[owner].unpriced.append(ticker)
+            elif weight is not None:
+                totals[owner].distribution[ticker] = weight
+        return totals
+    
+    def empty_totals(self, portfolio_id: int) -> PortfolioTotals:
+        """Totales de un portfolio sin holdings"""
+        return PortfolioTotals(
+            portfolio_id=portfolio_id,
+            holdings_count=0,
+            total_value_usd=0.0,
+            total_value_mxn=0.0 if self.exchange_rate is not None else None,
+            total_cost_usd=0.0,
+            total_gain_loss_usd=0.0,
+            total_gain_loss_percent=None,
+        )
+    
+    def portfolio_totals(self, portfolio_id: int) -> PortfolioTotals:
+        """Totales de un portfolio (vacíos si no tiene holdings)"""
+        return self.totals().get(portfolio_id) or self.empty_totals(portfolio_id)
+
+
+async def current_usd_mxn(
+    db: AsyncSession,
+    latest_rates: Sequence[tuple[Optional[float], object]]
+) -> Optional[float]:
+    """
+    Tipo de cambio USD/MXN: la tabla en memoria, si no la última fila de
+    exchange_rates, y si tampoco hay, el más reciente de latest_prices.
+    """
+    matrix = fx_rates.matrix
+    if matrix is not None and "USD" in matrix and "MXN" in matrix:
+        return matrix.rate("USD", "MXN")
+    
+    latest = await ExchangeRateRepository(db).get_latest_rate("USD", "MXN")
+    if latest is not None:
+        return float(latest.rate)
+    
+    stamped = [(at, rate) for rate, at in latest_rates if rate is not None]
+    return float(max(stamped)[1]) if stamped else None
+
+
+async def load_valuation(
+    db: AsyncSession,
+    portfolio_ids: Sequence[int]
+) -> HoldingsValuation:
+    """
+    Valúa los holdings de los portfolios con su último precio.
+    
+    Args:
+        db: Sesión de base de datos
+        portfolio_ids: Portfolios a valuar
+    
+    Returns:
+        HoldingsValuation (vacía si no hay holdings)
+    """
+    rows = await HoldingRepository(db).get_with_latest_prices(portfolio_ids)
+    exchange_rate = await current_usd_mxn(
+        db, [(row.exchange_rate, row.price_timestamp) for row in rows]
+    )
+    valuation = HoldingsValuation.from_holdings(
+        [row.Holding for row in rows],
+        [None if row.price_usd is None else float(row.price_usd) for row in rows],
+        exchange_rate
+    )
+    logger.debug(
+        f"Valuados {len(rows)} holdings de {len(portfolio_ids)} portfolios "
+        f"(USD/MXN={exchange_rate})"
+    )
+    return valuation
+
+
+async def load_batch_valuation(
+    db: AsyncSession,
+    portfolio_ids: Sequence[int]
+) -> HoldingsValuation:
+    """
+    Valúa muchos portfolios a la vez con un número fijo de queries.
+    
+    Las posiciones se leen como columnas (sin objetos Holding), los
+    precios de la unión de tickers en una query y el precio de cada
+    holding se toma del ticker distinto que le corresponde.
+    
+    Args:
+        db: Sesión de base de datos
+        portfolio_ids: Portfolios a valuar
+    
+    Returns:
+        HoldingsValuation sin objetos Holding (solo totales)
+    """
+    rows = await HoldingRepository(db).get_positions(portfolio_ids)
+    count = len(rows)
+    # Filas -> columnas en una pasada
+    owners, holding_tickers, quantity, average_cost = (
+        zip(*rows) if count else ((), (), (), ())
+    )
+    tickers, ticker_index = np.unique(
+        np.array(holding_tickers, dtype=object), return_inverse=True
+    )
+    
+    latest = {
+        price.ticker: price
+        for price in (
+            await PriceRepository(db).get_latest_prices(tickers.tolist())
+            if count else []
+        )
+    }
+    ticker_prices = np.array([
+        float(latest[ticker].price_usd) if ticker in latest else np.nan
+        for ticker in tickers
+    ], dtype=np.float64)
+    exchange_rate = await current_usd_mxn(
+        db, [(price.exchange_rate, price.timestamp) for price in latest.values()]
+    )
+    
+    valuation = HoldingsValuation(
+        portfolio_ids=np.array(owners, dtype=np.int64),
+        tickers=holding_tickers,
+        quantity=np.array(quantity, dtype=np.float64),
+        average_cost=np.array(average_cost, dtype=np.float64),
+        price_usd=ticker_prices[ticker_index],
+        exchange_rate=exchange_rate
+    )
+    logger.debug(
+        f"Valuados {count} holdings de {len(portfolio_ids)} portfolios con "
+        f"{len(tickers)} tickers (USD/MXN={exchange_rate})"
+    )
+    return valuation
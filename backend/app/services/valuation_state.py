@@ -0,0 +1,435 @@
+"""
+Valuation State
+
+Totales de todos los portfolios en memoria, mantenidos con deltas: cuando
+se guarda un precio nuevo solo se suma cantidad × Δprecio a los
+portfolios que tienen ese ticker.
+
+Principios aplicados:
+- Performance: Índice invertido ticker -> (portfolio, cantidad, costo);
+  un tick toca solo a sus tenedores y leer los totales de un portfolio
+  no consulta la DB
+- Consistency: Los precios se aplican en el commit que los guarda y un
+  cambio de holdings invalida solo su portfolio (session events)
+- Fault Tolerance: Recarga completa tras VALUATION_STATE_TTL_SECONDS,
+  que acota la deriva de los deltas y lo escrito por otros procesos
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional, Sequence
+
+import numpy as np
+from sqlalchemy import event, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.models.holding import Holding
+from app.models.portfolio import Portfolio
+from app.repositories.portfolio_repository import HoldingRepository
+from app.repositories.price_repository import (
+    LATEST_PRICES_REBUILT,
+    LATEST_PRICES_WRITTEN,
+    PriceRepository,
+)
+from app.services.fx_rates import fx_rates
+from app.services.valuation import (
+    HoldingsValuation,
+    PortfolioTotals,
+    current_usd_mxn,
+)
+
+logger = get_logger(__name__)
+
+_DIRTY_KEY = "valuation_state_portfolios"
+# Marca de cambios a holdings sin portfolio conocido (DML directo)
+_ALL = "all"
+
+
+class ValuationState:
+    """
+    Totales por portfolio con actualización incremental.
+    
+    - value/cost por slot de portfolio en arrays; el costo solo cuenta
+      holdings con precio, igual que HoldingsValuation
+    - Un tick más viejo que el precio aplicado se ignora
+    - invalidate(ids) recarga solo esos portfolios en la siguiente
+      lectura; invalidate_all() recarga todo
+    """
+    
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._loaded_at: Optional[datetime] = None
+        self._loading = False
+        self._lock = asyncio.Lock()
+        self._version = 0
+        
+        # Slot denso de cada portfolio en los arrays de totales
+        self._slots: dict[int, int] = {}
+        self._value = np.zeros(0)
+        self._cost = np.zeros(0)
+        # portfolio -> ticker -> (cantidad, costo) y su índice invertido
+        self._positions: dict[int, dict[str, tuple[float, float]]] = {}
+        self._holders: dict[str, dict[int, tuple[float, float]]] = {}
+        self._holder_arrays: dict[str, tuple[np.ndarray, ...]] = {}
+        # ticker -> (timestamp, precio USD) aplicado
+        self._prices: dict[str, tuple[datetime, float]] = {}
+        self._exchange_rate: Optional[float] = None
+        self._exchange_rate_at = datetime.min
+        
+        self._dirty: set[int] = set()
+        self._buffered: list[dict[str, dict]] = []
+        self.loads = 0
+        self.reloads = 0
+        self.ticks = 0
+        self.invalidations = 0
+    
+    def _is_fresh(self) -> bool:
+        return (
+            self._loaded_at is not None
+            and datetime.utcnow() - self._loaded_at
+            <= timedelta(seconds=self.ttl_seconds)
+        )
+    
+    async def get(self, db: AsyncSession, portfolio_id: int) -> PortfolioTotals:
+        """Totales actuales de un portfolio"""
+        return (await self.get_many(db, [portfolio_id]))[portfolio_id]
+    
+    async def get_many(
+        self,
+        db: AsyncSession,
+        portfolio_ids: Sequence[int]
+    ) -> dict[int, PortfolioTotals]:
+        """
+        Totales actuales de varios portfolios.
+        
+        Args:
+            db: Sesión usada solo si hay que (re)cargar holdings
+            portfolio_ids: Portfolios a leer
+        
+        Returns:
+            Dict portfolio_id -> totales (vacíos si no tiene holdings)
+        """
+        await self._ensure(db)
+        return {
+            portfolio_id: self._totals(portfolio_id)
+            for portfolio_id in portfolio_ids
+        }
+    
+    async def _ensure(self, db: AsyncSession) -> None:
+        if self._is_fresh() and not self._dirty:
+            return
+        async with self._lock:
+            if not self._is_fresh():
+                await self._load(db)
+            elif self._dirty:
+                await self._reload(db)
+    
+    @property
+    def exchange_rate(self) -> Optional[float]:
+        """USD/MXN con el que se calculan los totales en MXN"""
+        return self._rate()
+    
+    def _rate(self) -> Optional[float]:
+        matrix = fx_rates.matrix
+        if matrix is not None and "USD" in matrix and "MXN" in matrix:
+            return matrix.rate("USD", "MXN")
+        return self._exchange_rate
+    
+    def _totals(self, portfolio_id: int) -> PortfolioTotals:
+        rate = self._rate()
+        slot = self._slots.get(portfolio_id)
+        positions = self._positions.get(portfolio_id)
+        if slot is None or not positions:
+            return PortfolioTotals(
+                portfolio_id=portfolio_id,
+                holdings_count=0,
+                total_value_usd=0.0,
+                total_value_mxn=0.0 if rate is not None else None,
+                total_cost_usd=0.0,
+                total_gain_loss_usd=0.0,
+                total_gain_loss_percent=None,
+            )
+        
+        value = float(self._value[slot])
+        cost = float(self._cost[slot])
+        totals = PortfolioTotals(
+            portfolio_id=portfolio_id,
+            holdings_count=len(positions),
+            total_value_usd=round(value, 2),
+            total_value_mxn=round(value * rate, 2) if rate is not None else None,
+            total_cost_usd=round(cost, 2),
+            total_gain_loss_usd=round(value - cost, 2),
+            total_gain_loss_percent=(
+                round((value - cost) / cost * 100, 2) if cost > 0 else None
+            ),
+        )
+        for ticker, (quantity, _) in positions.items():
+            price = self._prices.get(ticker)
+            if price is None:
+                totals.unpriced.append(ticker)
+            elif value > 0:
+                totals.distribution[ticker] = round(
+                    quantity * price[1] / value * 100, 2
+                )
+        return totals
+    
+    async def _load(self, db: AsyncSession) -> None:
+        """Carga completa: posiciones, últimos precios y tipo de cambio"""
+        self._loading = True
+        self._buffered = []
+        self._dirty = set()
+        version = self._version
+        try:
+            rows = await HoldingRepository(db).get_positions()
+            latest = await PriceRepository(db).get_latest_prices()
+            exchange_rate = await current_usd_mxn(
+                db, [(price.exchange_rate, price.timestamp) for price in latest]
+            )
+        finally:
+            self._loading = False
+        
+        self._prices = {
+            price.ticker: (price.timestamp, float(price.price_usd))
+            for price in latest
+        }
+        self._exchange_rate = exchange_rate
+        self._exchange_rate_at = max(
+            (price.timestamp for price in latest), default=datetime.min
+        )
+        
+        self._positions = {}
+        for portfolio_id, ticker, quantity, average_cost in rows:
+            self._positions.setdefault(portfolio_id, {})[ticker] = (
+                quantity, quantity * average_cost
+            )
+        self._rebuild_holders()
+        
+        # Reducción agrupada de todos los portfolios a la vez
+        count = len(rows)
+        owners, tickers, quantity, average_cost = (
+            zip(*rows) if count else ((), (), (), ())
+        )
+        valuation = HoldingsValuation(
+            portfolio_ids=np.array(owners, dtype=np.int64),
+            tickers=tickers,
+            quantity=np.array(quantity, dtype=np.float64),
+            average_cost=np.array(average_cost, dtype=np.float64),
+            price_usd=np.array([
+                self._prices[ticker][1] if ticker in self._prices else np.nan
+                for ticker in tickers
+            ], dtype=np.float64),
+            exchange_rate=exchange_rate
+        )
+        self._slots = {
+            portfolio_id: slot
+            for slot, portfolio_id in enumerate(valuation.portfolio_index.tolist())
+        }
+        self._value = valuation.group_value_usd.copy()
+        self._cost = valuation.group_cost_usd.copy()
+        
+        self._loaded_at = datetime.utcnow()
+        self.loads += 1
+        if version != self._version:
+            # invalidate_all() durante la carga: la siguiente lectura recarga
+            self._loaded_at = None
+        for updates in self._buffered:
+            self.apply_prices(updates)
+        self._buffered = []
+        logger.info(
+            f"Estado de valuación cargado: {len(self._slots)} portfolios, "
+            f"{count} holdings, {len(self._prices)} precios"
+        )
+    
+    async def _reload(self, db: AsyncSession) -> None:
+        """Relee las posiciones de los portfolios invalidados"""
+        portfolio_ids, self._dirty = sorted(self._dirty), set()
+        rows = await HoldingRepository(db).get_positions(portfolio_ids)
+        
+        for portfolio_id in portfolio_ids:
+            for ticker in self._positions.pop(portfolio_id, {}):
+                self._holders.get(ticker, {}).pop(portfolio_id, None)
+                self._holder_arrays.pop(ticker, None)
+        for portfolio_id, ticker, quantity, average_cost in rows:
+            position = (quantity, quantity * average_cost)
+            self._positions.setdefault(portfolio_id, {})[ticker] = position
+            self._holders.setdefault(ticker, {})[portfolio_id] = position
+            self._holder_arrays.pop(ticker, None)
+        
+        for portfolio_id in portfolio_ids:
+            slot = self._slot(portfolio_id)
+            value = cost = 0.0
+            for ticker, (quantity, position_cost) in self._positions.get(
+                portfolio_id, {}
+            ).items():
+                if ticker in self._prices:
+                    value += quantity * self._prices[ticker][1]
+                    cost += position_cost
+            self._value[slot] = value
+            self._cost[slot] = cost
+        self.reloads += 1
+        logger.debug(f"Estado de valuación: recargados {portfolio_ids}")
+    
+    def _slot(self, portfolio_id: int) -> int:
+        slot = self._slots.get(portfolio_id)
+        if slot is None:
+            slot = self._slots[portfolio_id] = len(self._slots)
+            if slot >= len(self._value):
+                grow = np.zeros(max(16, len(self._value)))
+                self._value = np.concatenate([self._value, grow])
+                self._cost = np.concatenate([self._cost, grow])
+        return slot
+    
+    def _rebuild_holders(self) -> None:
+        self._holders = {}
+        self._holder_arrays = {}
+        for portfolio_id, positions in self._positions.items():
+            for ticker, position in positions.items():
+                self._holders.setdefault(ticker, {})[portfolio_id] = position
+    
+    def _arrays(self, ticker: str) -> tuple[np.ndarray, ...]:
+        """(slots, cantidades, costos) de los tenedores de un ticker"""
+        arrays = self._holder_arrays.get(ticker)
+        if arrays is None:
+            holders = self._holders.get(ticker, {})
+            arrays = self._holder_arrays[ticker] = (
+                np.fromiter(
+                    (self._slots[portfolio_id] for portfolio_id in holders),
+                    dtype=np.int64, count=len(holders)
+                ),
+                np.fromiter(
+                    (quantity for quantity, _ in holders.values()),
+                    dtype=np.float64, count=len(holders)
+                ),
+                np.fromiter(
+                    (cost for _, cost in holders.values()),
+                    dtype=np.float64, count=len(holders)
+                ),
+            )
+        return arrays
+    
+    def apply_prices(self, updates: dict[str, dict]) -> None:
+        """
+        Aplica últimos precios guardados (ticker -> fila de latest_prices).
+        
+        Suma cantidad × Δprecio a los portfolios con el ticker; un ticker
+        sin precio previo suma también su costo.
+        """
+        if self._loading:
+            self._buffered.append(updates)
+            return
+        if self._loaded_at is None:
+            return
+        
+        for ticker, values in updates.items():
+            timestamp = values["timestamp"]
+            current = self._prices.get(ticker)
+            if current is not None and current[0] > timestamp:
+                continue
+            price = float(values["price_usd"])
+            if ticker in self._holders and self._holders[ticker]:
+                slots, quantity, cost = self._arrays(ticker)
+                # Un ticker aparece una vez por portfolio: slots únicos
+                if current is None:
+                    self._value[slots] += quantity * price
+                    self._cost[slots] += cost
+                else:
+                    self._value[slots] += quantity * (price - current[1])
+            self._prices[ticker] = (timestamp, price)
+            self.ticks += 1
+            
+            rate = values.get("exchange_rate")
+            if rate is not None and self._exchange_rate_at <= timestamp:
+                self._exchange_rate = float(rate)
+                self._exchange_rate_at = timestamp
+    
+    def invalidate(self, portfolio_ids) -> None:
+        """Recarga esos portfolios en la siguiente lectura"""
+        self._dirty.update(portfolio_ids)
+        self.invalidations += 1
+    
+    def invalidate_all(self) -> None:
+        """Descarta el estado; la siguiente lectura recarga todo"""
+        self._version += 1
+        self._loaded_at = None
+        self.invalidations += 1
+    
+    def stats(self) -> dict:
+        """Métricas acumuladas desde el arranque del proceso"""
+        return {
+            "portfolios": len(self._slots) if self._loaded_at else None,
+            "tickers": len(self._holders) if self._loaded_at else None,
+            "loaded_at": self._loaded_at,
+            "loads": self.loads,
+            "reloads": self.reloads,
+            "ticks": self.ticks,
+            "invalidations": self.invalidations,
+        }
+
+
+# Estado por proceso compartido por PortfolioService y la API
+valuation_state = ValuationState(
+    ttl_seconds=settings.VALUATION_STATE_TTL_SECONDS
+)
+
+
+def _mark(session: Session, portfolio_ids) -> None:
+    marked = session.info.setdefault(_DIRTY_KEY, set())
+    marked.update(portfolio_ids)
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_dirty_on_flush(session: Session, flush_context) -> None:
+    """Marca los portfolios de los holdings que cambió el flush"""
+    changed = (*session.new, *session.dirty, *session.deleted)
+    portfolio_ids = set()
+    for obj in changed:
+        if isinstance(obj, Holding):
+            portfolio_ids.add(obj.portfolio_id)
+            # Un holding movido de portfolio cambia también el anterior
+            history = inspect(obj).attrs.portfolio_id.history
+            portfolio_ids.update(history.deleted or ())
+        elif isinstance(obj, Portfolio) and obj in session.deleted:
+            portfolio_ids.add(obj.id)
+    if portfolio_ids:
+        _mark(session, portfolio_ids - {None})
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_dirty_on_dml(orm_execute_state: ORMExecuteState) -> None:
+    """
+    DML directo sobre holdings (o DELETE de portfolios): el portfolio
+    afectado no se conoce, se recarga todo.
+    """
+    if orm_execute_state.is_select:
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None:
+        return
+    if issubclass(mapper.class_, Holding) or (
+        issubclass(mapper.class_, Portfolio) and orm_execute_state.is_delete
+    ):
+        _mark(orm_execute_state.session, {_ALL})
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_on_commit(session: Session) -> None:
+    portfolio_ids = session.info.pop(_DIRTY_KEY, set())
+    rebuilt = session.info.pop(LATEST_PRICES_REBUILT, False)
+    written = session.info.pop(LATEST_PRICES_WRITTEN, None)
+    if rebuilt or _ALL in portfolio_ids:
+        valuation_state.invalidate_all()
+        return
+    if written:
+        valuation_state.apply_prices(written)
+    if portfolio_ids:
+        valuation_state.invalidate(portfolio_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session: Session) -> None:
+    session.info.pop(_DIRTY_KEY, None)
+    session.info.pop(LATEST_PRICES_REBUILT, None)
+    session.info.pop(LATEST_PRICES_WRITTEN, None)
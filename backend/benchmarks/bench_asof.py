@@ -0,0 +1,121 @@
+"""
+Benchmark: precio as-of de muchos pares (ticker, instante)
+
+Sobre una DB SQLite temporal con `--ticks` ticks por ticker de
+`--tickers` tickers, resuelve `--pairs` pares (ticker, instante
+aleatorio) como al valuar transacciones en su fecha, con:
+
+- before: una query por par (último tick con timestamp <= T, usando el
+  índice (ticker, timestamp))
+- after:  AsOfIndex.get_prices en un solo batch
+
+La carga inicial del índice se reporta aparte: se paga una vez por
+proceso y luego solo se leen los ticks nuevos.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_asof --tickers 10 --ticks 50000 --pairs 5000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.db.base import Base
+from app.db.session import create_engines
+from app.models.price import Price
+from app.repositories.price_repository import PriceRepository
+from app.services.asof_index import AsOfIndex
+
+
+START = datetime(2020, 1, 1)
+
+
+async def _seed(sessions, tickers: list[str], ticks: int) -> None:
+    async with sessions() as db:
+        for ticker in tickers:
+            for offset in range(0, ticks, 20000):
+                await PriceRepository(db).bulk_upsert([
+                    {
+                        "ticker": ticker,
+                        "price_usd": Decimal(100 + (minute % 97)),
+                        "source": "benchmark",
+                        "timestamp": START + timedelta(minutes=5 * minute),
+                    }
+                    for minute in range(offset, min(offset + 20000, ticks))
+                ])
+                await db.commit()
+
+
+async def _per_pair(sessions, pairs) -> np.ndarray:
+    values = []
+    async with sessions() as db:
+        for ticker, at in pairs:
+            price = await db.scalar(
+                select(Price.price_usd)
+                .where(Price.ticker == ticker, Price.timestamp <= at)
+                .order_by(Price.timestamp.desc())
+                .limit(1)
+            )
+            values.append(float(price) if price is not None else np.nan)
+    return np.array(values)
+
+
+async def main(tickers: int, ticks: int, pairs: int) -> None:
+    names = [f"T{i:03d}" for i in range(tickers)]
+    rng = random.Random(42)
+    span = timedelta(minutes=5 * ticks)
+    queries = [
+        (rng.choice(names), START + span * rng.random())
+        for _ in range(pairs)
+    ]
+    
+    with tempfile.TemporaryDirectory(dir=".") as tmp:
+        engine, _ = create_engines(
+            f"sqlite+aiosqlite:///{os.path.join(tmp, 'asof.db')}"
+        )
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        await _seed(sessions, names, ticks)
+        
+        started = time.perf_counter()
+        before = await _per_pair(sessions, queries)
+        before_ms = (time.perf_counter() - started) * 1000
+        
+        index = AsOfIndex(refresh_seconds=3600)
+        async with sessions() as db:
+            started = time.perf_counter()
+            await index.get_prices(db, [(name, START) for name in names])
+            load_ms = (time.perf_counter() - started) * 1000
+            
+            started = time.perf_counter()
+            after = (await index.get_prices(db, queries)).values
+            after_ms = (time.perf_counter() - started) * 1000
+        await engine.dispose()
+    
+    assert np.array_equal(before, after, equal_nan=True)
+    print(f"tickers={tickers} ticks/ticker={ticks} pairs={pairs}")
+    print(f"before (query por par): {before_ms:10.1f}ms")
+    print(
+        f"after  (batch as-of):   {after_ms:10.1f}ms  "
+        f"(carga inicial {load_ms:.0f}ms)"
+    )
+    print(f"speedup: {before_ms / after_ms:.0f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tickers", type=int, default=10)
+    parser.add_argument("--ticks", type=int, default=50000)
+    parser.add_argument("--pairs", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(main(args.tickers, args.ticks, args.pairs))
@@ -0,0 +1,139 @@
+"""
+Benchmark: valuación de muchos portfolios activos
+
+Sobre una DB SQLite temporal con `--portfolios` portfolios de
+`--holdings` holdings cada uno (tickers de un universo de `--tickers`),
+calcula los totales de todos con:
+
+- before: load_valuation por portfolio (holdings + precios en una query
+  y tipo de cambio en otra, por cada portfolio)
+- after:  PortfolioService.get_valuations (posiciones, precios de la
+  unión de tickers y tipo de cambio una vez; una reducción agrupada)
+
+Reporta tiempo y queries enviadas a la DB.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_batch_valuation --portfolios 10000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import event, insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.db.base import Base
+from app.db.session import create_engines
+from app.models import Holding, Portfolio
+from app.repositories.price_repository import PriceRepository
+from app.services.portfolio_service import PortfolioService
+from app.services.valuation import load_valuation
+
+
+async def _seed(sessions, portfolios: int, holdings: int, tickers: int) -> None:
+    rng = random.Random(42)
+    names = [f"T{i:03d}" for i in range(tickers)]
+    now = datetime.utcnow()
+    async with sessions() as db:
+        await db.execute(insert(Portfolio), [
+            {
+                "name": f"P{i}", "is_active": True,
+                "created_at": now, "updated_at": now,
+            }
+            for i in range(portfolios)
+        ])
+        await db.execute(insert(Holding), [
+            {
+                "portfolio_id": portfolio_id,
+                "ticker": ticker,
+                "asset_type": "stock",
+                "quantity": Decimal(f"{rng.uniform(0.1, 50):.8f}"),
+                "average_buy_price": Decimal(f"{rng.uniform(10, 500):.2f}"),
+                "created_at": now,
+                "updated_at": now,
+            }
+            for portfolio_id in range(1, portfolios + 1)
+            for ticker in rng.sample(names, holdings)
+        ])
+        await PriceRepository(db).bulk_upsert([
+            {
+                "ticker": ticker,
+                "price_usd": Decimal(f"{rng.uniform(10, 500):.2f}"),
+                "exchange_rate": Decimal("17.5"),
+                "source": "benchmark",
+                "timestamp": datetime(2024, 1, 1),
+            }
+            for ticker in names
+        ])
+        await db.commit()
+
+
+async def _per_portfolio(db, portfolio_ids) -> dict[int, float]:
+    values = {}
+    for portfolio_id in portfolio_ids:
+        valuation = await load_valuation(db, [portfolio_id])
+        values[portfolio_id] = (
+            valuation.portfolio_totals(portfolio_id).total_value_usd
+        )
+    return values
+
+
+async def _batch(db, portfolio_ids) -> dict[int, float]:
+    valuations = await PortfolioService(db).get_valuations(portfolio_ids)
+    return {
+        portfolio_id: totals.total_value_usd
+        for portfolio_id, totals in valuations.items()
+    }
+
+
+async def main(portfolios: int, holdings: int, tickers: int) -> None:
+    with tempfile.TemporaryDirectory(dir=".") as tmp:
+        engine, _ = create_engines(
+            f"sqlite+aiosqlite:///{os.path.join(tmp, 'batch.db')}"
+        )
+        queries = [0]
+        
+        @event.listens_for(engine.sync_engine, "before_cursor_execute")
+        def _count(*args):
+            queries[0] += 1
+        
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        await _seed(sessions, portfolios, holdings, tickers)
+        portfolio_ids = list(range(1, portfolios + 1))
+        
+        results = {}
+        for label, run in (("before", _per_portfolio), ("after ", _batch)):
+            async with sessions() as db:
+                queries[0] = 0
+                started = time.perf_counter()
+                values = await run(db, portfolio_ids)
+                results[label] = (
+                    (time.perf_counter() - started) * 1000, queries[0], values
+                )
+        await engine.dispose()
+    
+    assert results["before"][2] == results["after "][2]
+    print(
+        f"portfolios={portfolios} holdings/portfolio={holdings} "
+        f"tickers={tickers}"
+    )
+    for label, (ms, count, _) in results.items():
+        print(f"{label}: {ms:10.1f}ms  queries={count}")
+    print(f"speedup: {results['before'][0] / results['after '][0]:.0f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--portfolios", type=int, default=10000)
+    parser.add_argument("--holdings", type=int, default=5)
+    parser.add_argument("--tickers", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.portfolios, args.holdings, args.tickers))
@@ -0,0 +1,116 @@
+"""
+Benchmark: valuaciones en varias monedas con una tabla de tipos de cambio
+
+Convierte `--valuations` montos en monedas mezcladas (USD, MXN, EUR, ...)
+a `--currencies` monedas destino, con un provider simulado que tarda
+`--latency-ms` por request (la API real: una tabla por request), con:
+
+- before: un get_rate(from, to) por par distinto (el provider descarga la
+  tabla completa y solo conserva una moneda) y conversión monto por monto
+- after:  una sola tabla (PriceService.get_exchange_rates) y la matriz de
+  tipos cruzados, conversión vectorizada
+
+Reporta tiempo y requests a la cuota mensual (1500) por intervalo.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_fx_rates --valuations 20000 --currencies 5
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+import numpy as np
+
+from app.providers.exchange_rate import ExchangeRateProvider
+from app.services.fx_rates import fx_rates
+from app.services.price_service import PriceService
+
+
+TABLE = {
+    "USD": 1.0, "MXN": 18.42, "EUR": 0.92, "GBP": 0.79, "JPY": 149.8,
+    "CAD": 1.37, "BRL": 4.97, "CHF": 0.88, "CNY": 7.31, "COP": 4012.5,
+}
+
+
+def _provider(latency_ms: float) -> tuple[ExchangeRateProvider, list[int]]:
+    """Provider con la red simulada; cuenta requests"""
+    provider = ExchangeRateProvider()
+    requests = [0]
+    
+    async def fake_request(url, *args, **kwargs):
+        requests[0] += 1
+        await asyncio.sleep(latency_ms / 1000)
+        base = url.rsplit("/", 1)[-1]
+        return {
+            "base": base,
+            "time_last_updated": int(time.time()),
+            "rates": {c: rate / TABLE[base] for c, rate in TABLE.items()},
+        }
+    
+    provider._make_request = fake_request
+    return provider, requests
+
+
+async def _per_pair(amounts, sources, targets, latency_ms) -> tuple:
+    provider, requests = _provider(latency_ms)
+    rates: dict[tuple[str, str], float] = {}
+    results = []
+    for target in targets:
+        converted = []
+        for amount, source in zip(amounts, sources):
+            if (source, target) not in rates:
+                rate = await provider.get_rate(source, target)
+                rates[(source, target)] = rate.rate
+            converted.append(amount * rates[(source, target)])
+        results.append(np.array(converted))
+    return results, requests[0]
+
+
+async def _matrix(amounts, sources, targets, latency_ms) -> tuple:
+    provider, requests = _provider(latency_ms)
+    service = PriceService(db=None)
+    service.exchange_rate_provider = provider
+    fx_rates.take_pending()
+    matrix = await service.get_exchange_rates()
+    results = [matrix.convert(amounts, sources, target) for target in targets]
+    return results, requests[0]
+
+
+async def main(valuations: int, currencies: int, latency_ms: float) -> None:
+    rng = random.Random(42)
+    codes = list(TABLE)
+    targets = codes[:currencies]
+    sources = [rng.choice(codes) for _ in range(valuations)]
+    amounts = [rng.uniform(10, 10000) for _ in range(valuations)]
+    
+    results = {}
+    for label, run in (("before", _per_pair), ("after ", _matrix)):
+        fx_rates._matrix = None
+        started = time.perf_counter()
+        converted, requests = await run(amounts, sources, targets, latency_ms)
+        results[label] = (
+            (time.perf_counter() - started) * 1000, requests, converted
+        )
+    
+    for before, after in zip(results["before"][2], results["after "][2]):
+        assert np.allclose(before, after)
+    print(
+        f"valuations={valuations} monedas destino={currencies} "
+        f"latencia={latency_ms:.0f}ms"
+    )
+    for label, (ms, requests, _) in results.items():
+        print(
+            f"{label}: {ms:9.1f}ms  requests={requests:3d}  "
+            f"intervalos por cuota de 1500={1500 // requests}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--valuations", type=int, default=20000)
+    parser.add_argument("--currencies", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=150)
+    args = parser.parse_args()
+    asyncio.run(main(args.valuations, args.currencies, args.latency_ms))
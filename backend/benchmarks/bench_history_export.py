@@ -0,0 +1,124 @@
+"""
+Benchmark: exportación del histórico de ticks de un ticker
+
+Sobre una DB SQLite temporal con `--ticks` ticks de un ticker, genera la
+exportación NDJSON completa y mide tiempo al primer byte, tiempo total
+y pico de memoria (tracemalloc) con:
+
+- before: cargar todos los objetos Price del rango en una lista (como
+  get_price_history sin el tope de 1000) y serializar al final
+- after:  PriceHistoryService.stream_ticks (cursor del servidor, chunks
+  de 1000 filas) serializando cada chunk conforme llega
+
+Uso (desde backend/):
+    python -m benchmarks.bench_history_export --ticks 500000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.api.v1.endpoints.prices import _export_record
+from app.db.base import Base
+from app.db.session import create_engines
+from app.repositories.price_repository import PriceRepository
+from app.services.price_history_service import PriceHistoryService
+
+
+TICKER = "BENCH"
+START = datetime(2020, 1, 1)
+
+
+async def _seed(sessions, ticks: int) -> None:
+    async with sessions() as db:
+        for offset in range(0, ticks, 20000):
+            await PriceRepository(db).bulk_upsert([
+                {
+                    "ticker": TICKER,
+                    "price_usd": Decimal(100 + (minute % 50)) + Decimal("0.5"),
+                    "source": "benchmark",
+                    "timestamp": START + timedelta(minutes=minute),
+                }
+                for minute in range(offset, min(offset + 20000, ticks))
+            ])
+            await db.commit()
+
+
+async def _export_list(sessions):
+    """Todo el rango en memoria antes de emitir el primer byte"""
+    async with sessions() as db:
+        prices = await PriceRepository(db).get_price_history(
+            TICKER, START, None, limit=None
+        )
+        yield "".join(
+            json.dumps(_export_record(price)) + "\n" for price in prices
+        ).encode()
+
+
+async def _export_stream(sessions):
+    """Un bloque de bytes por chunk leído del cursor"""
+    async with sessions() as db:
+        async for chunk in PriceHistoryService(db).stream_ticks(TICKER, START):
+            yield "".join(
+                json.dumps(_export_record(row)) + "\n" for row in chunk
+            ).encode()
+
+
+async def _measure(export, sessions) -> dict:
+    tracemalloc.start()
+    started = time.perf_counter()
+    first_byte = None
+    total_bytes = 0
+    async for block in export(sessions):
+        if first_byte is None:
+            first_byte = time.perf_counter() - started
+        total_bytes += len(block)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "first_byte_ms": first_byte * 1000,
+        "total_s": elapsed,
+        "peak_mib": peak / 1024 / 1024,
+        "mib_out": total_bytes / 1024 / 1024,
+    }
+
+
+async def main(ticks: int) -> None:
+    with tempfile.TemporaryDirectory(dir=".") as tmp:
+        engine, _ = create_engines(
+            f"sqlite+aiosqlite:///{os.path.join(tmp, 'export.db')}"
+        )
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        await _seed(sessions, ticks)
+        
+        results = {
+            "before": await _measure(_export_list, sessions),
+            "after ": await _measure(_export_stream, sessions),
+        }
+        await engine.dispose()
+    
+    print(f"ticks={ticks}")
+    for label, r in results.items():
+        print(
+            f"{label}: primer byte={r['first_byte_ms']:9.1f}ms  "
+            f"total={r['total_s']:7.2f}s  pico memoria={r['peak_mib']:8.1f} MiB  "
+            f"salida={r['mib_out']:.1f} MiB"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ticks", type=int, default=200000)
+    args = parser.parse_args()
+    asyncio.run(main(args.ticks))
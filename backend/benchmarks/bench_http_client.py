@@ -0,0 +1,109 @@
+"""
+Benchmark: HTTP client por request vs pool compartido
+
+Levanta un servidor stub local (aiohttp.web) que imita /simple/price de
+CoinGecko y mide requests/seg con:
+
+- before: una aiohttp.ClientSession nueva por request (comportamiento previo
+  de BaseProvider._make_request)
+- after:  BaseProvider._make_request sobre el HTTPClientPool compartido
+
+Uso (desde backend/):
+    python -m benchmarks.bench_http_client --requests 2000 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import time
+
+import aiohttp
+from aiohttp import web
+
+from app.providers.base import BaseProvider
+from app.providers.http_client import HTTPClientPool
+
+
+STUB_PAYLOAD = {"bitcoin": {"usd": 67234.0, "usd_24h_change": 1.2}}
+
+
+class _StubProvider(BaseProvider):
+    """Provider mínimo para ejercitar _make_request"""
+    
+    @property
+    def name(self) -> str:
+        return "stub"
+    
+    async def get_price(self, ticker, asset_type):
+        return None
+    
+    async def get_multiple_prices(self, tickers):
+        return []
+    
+    async def is_available(self) -> bool:
+        return True
+
+
+async def _start_stub_server() -> tuple[web.AppRunner, str]:
+    """Arranca el servidor stub en un puerto libre"""
+    async def simple_price(request: web.Request) -> web.Response:
+        return web.json_response(STUB_PAYLOAD)
+    
+    app = web.Application()
+    app.router.add_get("/simple/price", simple_price)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/simple/price"
+
+
+async def _run(fetch, total: int, concurrency: int) -> float:
+    """Ejecuta `total` llamadas con `concurrency` workers; retorna req/s"""
+    queue: asyncio.Queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(None)
+    
+    async def worker() -> None:
+        while not queue.empty():
+            queue.get_nowait()
+            result = await fetch()
+            assert result == STUB_PAYLOAD
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return total / (time.perf_counter() - start)
+
+
+async def main(total: int, concurrency: int) -> None:
+    runner, url = await _start_stub_server()
+    try:
+        async def per_request_session() -> dict:
+            async with aiohttp.ClientSession() as session:
+                async with session.get(url) as response:
+                    return await response.json()
+        
+        pool = HTTPClientPool(max_connections_per_host=concurrency)
+        provider = _StubProvider(pool=pool)
+        
+        async def pooled() -> dict:
+            return await provider._make_request(url)
+        
+        before = await _run(per_request_session, total, concurrency)
+        after = await _run(pooled, total, concurrency)
+        await pool.close()
+    finally:
+        await runner.cleanup()
+    
+    print(f"requests={total} concurrency={concurrency}")
+    print(f"before (session por request): {before:10.1f} req/s")
+    print(f"after  (pool compartido):     {after:10.1f} req/s")
+    print(f"speedup: {after / before:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
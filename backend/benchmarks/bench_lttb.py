@@ -0,0 +1,96 @@
+"""
+Benchmark: downsampling LTTB de una serie para gráficas
+
+Genera una serie sintética de `--points` velas (ej: 5 años de velas de
+1h) y mide el tiempo de construir y serializar la respuesta JSON y el
+tamaño del payload con:
+
+- before: todas las velas del rango
+- after:  LTTB a `--max-points` velas (incluye el costo de LTTB)
+
+Uso (desde backend/):
+    python -m benchmarks.bench_lttb --points 43800 --max-points 500
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from app.schemas.price import PriceCandle, PriceCandleHistoryResponse
+from app.services.downsampling import lttb_indices, to_epoch_seconds
+
+
+START = datetime(2020, 1, 1)
+
+
+def _candles(points: int) -> list[dict]:
+    rng = np.random.default_rng(42)
+    closes = 100 + np.cumsum(rng.normal(0, 0.5, points))
+    return [
+        {
+            "bucket_start": START + timedelta(hours=i),
+            "open_usd": float(close),
+            "high_usd": float(close) + 0.5,
+            "low_usd": float(close) - 0.5,
+            "close_usd": float(close),
+            "tick_count": 60,
+        }
+        for i, close in enumerate(closes)
+    ]
+
+
+def _response(candles: list[dict], source_count: int) -> bytes:
+    return PriceCandleHistoryResponse(
+        ticker="BENCH",
+        interval="1h",
+        start_date=candles[0]["bucket_start"],
+        end_date=candles[-1]["bucket_start"],
+        count=len(candles),
+        source_count=source_count,
+        candles=[PriceCandle.model_validate(c) for c in candles]
+    ).model_dump_json().encode()
+
+
+def _full(candles: list[dict], max_points: int) -> bytes:
+    return _response(candles, len(candles))
+
+
+def _lttb(candles: list[dict], max_points: int) -> bytes:
+    keep = lttb_indices(
+        to_epoch_seconds([c["bucket_start"] for c in candles]),
+        [c["close_usd"] for c in candles],
+        max_points
+    )
+    return _response([candles[i] for i in keep], len(candles))
+
+
+def main(points: int, max_points: int, repeat: int) -> None:
+    candles = _candles(points)
+    results = {}
+    for label, build in (("before", _full), ("after ", _lttb)):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            payload = build(candles, max_points)
+        results[label] = (
+            (time.perf_counter() - started) / repeat * 1000,
+            len(payload),
+        )
+    
+    print(f"points={points} max_points={max_points} repeat={repeat}")
+    for label, (ms, size) in results.items():
+        print(f"{label}: {ms:9.2f}ms por respuesta  payload={size / 1024:9.1f} KiB")
+    print(
+        f"speedup: {results['before'][0] / results['after '][0]:.1f}x  "
+        f"payload: {results['before'][1] / results['after '][1]:.1f}x menor"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--points", type=int, default=43800)
+    parser.add_argument("--max-points", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.points, args.max_points, args.repeat)
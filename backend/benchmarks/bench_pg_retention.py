@@ -0,0 +1,159 @@
+"""
+Benchmark: retención de ticks en PostgreSQL (DELETE vs DROP de partición)
+
+Sobre una DB PostgreSQL de pruebas (se borran y recrean las tablas)
+siembra `--months` meses de ticks sintéticos en prices particionada por
+mes y elimina los meses fuera de retención con:
+
+- before: DELETE por chunks con keyset sobre id (PriceRepository.
+  delete_old_prices, el camino de SQLite) seguido de VACUUM
+- after:  DROP de las particiones mensuales completas
+  (PricePartitionManager.drop_partitions_before)
+
+Reporta duración y tamaño en disco de prices tras la retención.
+
+Uso (desde backend/, con un Postgres local):
+    python -m benchmarks.bench_pg_retention \\
+        --database-url postgresql+asyncpg://postgres@localhost/bench
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.db.base import Base
+from app.db.partitions import PricePartitionManager, add_months
+from app.db.session import create_engines
+from app.repositories.price_repository import PriceRepository
+
+
+TICKERS = [f"T{i:03d}" for i in range(20)]
+START = datetime(2024, 1, 1)
+
+
+def _ticks(start: datetime, minutes: int, step_minutes: int) -> list[dict]:
+    """Un tick por ticker cada `step_minutes` desde `start`"""
+    return [
+        {
+            "ticker": ticker,
+            "price_usd": Decimal(100 + (minute % 50)) + Decimal("0.5"),
+            "source": "benchmark",
+            "timestamp": start + timedelta(minutes=minute),
+        }
+        for minute in range(0, minutes, step_minutes)
+        for ticker in TICKERS
+    ]
+
+
+async def _seed(engine, sessions, months: int, step_minutes: int) -> int:
+    """Recrea el esquema y siembra `months` meses de ticks"""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        await PricePartitionManager(conn).ensure_months(
+            add_months(START, i) for i in range(months)
+        )
+    
+    rows = 0
+    async with sessions() as db:
+        for i in range(months):
+            month = add_months(START, i)
+            minutes = int((add_months(month, 1) - month).total_seconds() // 60)
+            # Por día para acotar el tamaño de cada executemany
+            for day in range(0, minutes, 1440):
+                batch = _ticks(month + timedelta(minutes=day), 1440, step_minutes)
+                await PriceRepository(db).bulk_upsert(batch)
+                rows += len(batch)
+            await db.commit()
+    
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.exec_driver_sql("VACUUM (ANALYZE) prices")
+    return rows
+
+
+async def _table_bytes(engine) -> int:
+    """Tamaño total de prices (todas sus particiones)"""
+    async with engine.connect() as conn:
+        return await conn.scalar(text(
+            "SELECT coalesce(sum(pg_total_relation_size(inhrelid)), 0) "
+            "FROM pg_inherits WHERE inhparent = 'prices'::regclass"
+        ))
+
+
+async def _delete_chunks(engine, sessions, cutoff: datetime) -> None:
+    async with sessions() as db:
+        last_id = 0
+        while True:
+            deleted, last_id = await PriceRepository(db).delete_old_prices(
+                cutoff, last_id, 5000
+            )
+            if not deleted:
+                break
+            await db.commit()
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.exec_driver_sql("VACUUM (ANALYZE) prices")
+
+
+async def _drop_partitions(engine, sessions, cutoff: datetime) -> None:
+    async with sessions() as db:
+        await PricePartitionManager(db).drop_partitions_before(cutoff)
+        await db.commit()
+
+
+async def main(
+    database_url: str,
+    months: int,
+    keep_months: int,
+    step_minutes: int
+) -> None:
+    engine, _ = create_engines(database_url)
+    if engine.dialect.name != "postgresql":
+        raise SystemExit("Este benchmark requiere una URL de PostgreSQL")
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    cutoff = add_months(START, months - keep_months)
+    
+    results = {}
+    for label, retention in (
+        ("before", _delete_chunks),
+        ("after ", _drop_partitions),
+    ):
+        rows = await _seed(engine, sessions, months, step_minutes)
+        started = time.perf_counter()
+        await retention(engine, sessions, cutoff)
+        results[label] = (
+            time.perf_counter() - started,
+            await _table_bytes(engine),
+        )
+    
+    await engine.dispose()
+    
+    print(
+        f"months={months} keep_months={keep_months} "
+        f"tickers={len(TICKERS)} seed_ticks={rows}"
+    )
+    for label, (seconds, size) in results.items():
+        print(
+            f"{label}: {seconds:8.3f}s  "
+            f"tamaño final={size / 1024 / 1024:8.1f} MiB"
+        )
+    speedup = results["before"][0] / results["after "][0]
+    print(f"speedup retención: {speedup:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--months", type=int, default=6)
+    parser.add_argument("--keep-months", type=int, default=2)
+    parser.add_argument("--step-minutes", type=int, default=15)
+    args = parser.parse_args()
+    asyncio.run(main(
+        args.database_url, args.months, args.keep_months, args.step_minutes
+    ))
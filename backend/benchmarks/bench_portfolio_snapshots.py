@@ -0,0 +1,144 @@
+"""
+Benchmark: gráfica de valor diario de un portfolio
+
+Sobre una DB SQLite temporal con un portfolio de `--transactions`
+compras y ventas de `--tickers` activos repartidas en `--years` años
+(con velas diarias de cada activo), sirve `--requests` veces la serie
+de valor diario completa con:
+
+- before: reconstruirla en cada request desde transactions y las velas
+  diarias (PortfolioSnapshotService.replay)
+- after:  leer los snapshots precalculados con una query de rango
+  (PortfolioSnapshotService.get_history)
+
+Reporta también lo que cuesta escribir los snapshots (backfill).
+
+Uso (desde backend/):
+    python -m benchmarks.bench_portfolio_snapshots --years 10
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.db.base import Base
+from app.db.session import create_engines
+from app.models import Portfolio, PriceRollup, Transaction, TransactionType
+from app.services.snapshot_service import PortfolioSnapshotService
+
+
+async def _seed(sessions, years: int, tickers: int, transactions: int) -> date:
+    rng = random.Random(42)
+    names = [f"T{i:03d}" for i in range(tickers)]
+    first = datetime(2000, 1, 1)
+    count = years * 365
+    rows = []
+    for ticker in names:
+        price = rng.uniform(10, 500)
+        for day in range(count):
+            price *= 1 + rng.gauss(0, 0.01)
+            close = Decimal(f"{price:.2f}")
+            bucket = first + timedelta(days=day)
+            rows.append({
+                "ticker": ticker, "resolution": "1d", "bucket_start": bucket,
+                "open_usd": close, "high_usd": close, "low_usd": close,
+                "close_usd": close, "open_at": bucket, "close_at": bucket,
+                "tick_count": 1,
+            })
+    
+    async with sessions() as db:
+        portfolio = Portfolio(name="benchmark")
+        db.add(portfolio)
+        await db.flush()
+        await db.execute(insert(PriceRollup), rows)
+        await db.execute(insert(Transaction), [
+            {
+                "portfolio_id": portfolio.id,
+                "transaction_type": (
+                    TransactionType.BUY if rng.random() < 0.7
+                    else TransactionType.SELL
+                ),
+                "ticker": rng.choice(names),
+                "asset_type": "stock",
+                "quantity": 1.0,
+                "price_per_unit": 100.0,
+                "total_value": 100.0,
+                "fee": 0.0,
+                "transaction_date": first + timedelta(
+                    days=rng.randrange(count), hours=15
+                ),
+                "created_at": first,
+            }
+            for _ in range(transactions)
+        ])
+        await db.commit()
+    return (first + timedelta(days=count - 1)).date()
+
+
+async def main(years: int, tickers: int, transactions: int, requests: int) -> None:
+    with tempfile.TemporaryDirectory(dir=".") as tmp:
+        engine, _ = create_engines(
+            f"sqlite+aiosqlite:///{os.path.join(tmp, 'snapshots.db')}"
+        )
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        end_day = await _seed(sessions, years, tickers, transactions)
+        
+        async with sessions() as db:
+            service = PortfolioSnapshotService(db)
+            
+            # El backfill llega hasta el día anterior a as_of
+            as_of = datetime.combine(end_day, datetime.min.time())
+            started = time.perf_counter()
+            report = await service.backfill(
+                [1], as_of=as_of + timedelta(days=1)
+            )
+            backfill_ms = (time.perf_counter() - started) * 1000
+            
+            started = time.perf_counter()
+            for _ in range(requests):
+                series = await service.replay(1, end_day)
+            before_ms = (time.perf_counter() - started) * 1000 / requests
+            
+            started = time.perf_counter()
+            for _ in range(requests):
+                history = await service.get_history(
+                    1, max_points=len(series)
+                )
+            after_ms = (time.perf_counter() - started) * 1000 / requests
+        await engine.dispose()
+    
+    assert history.source_count == len(series) == report.days_written
+    assert all(
+        abs(row.value_usd - value) < 0.01
+        for row, value in zip(history.points, series.value_usd.tolist())
+    )
+    print(
+        f"años={years} tickers={tickers} transacciones={transactions} "
+        f"días={len(series)}"
+    )
+    print(f"backfill (una vez):            {backfill_ms:9.1f}ms")
+    print(f"before (reconstruir/request):  {before_ms:9.1f}ms")
+    print(f"after  (query de rango):       {after_ms:9.1f}ms")
+    print(f"speedup: {before_ms / after_ms:.0f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--tickers", type=int, default=20)
+    parser.add_argument("--transactions", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(
+        main(args.years, args.tickers, args.transactions, args.requests)
+    )
@@ -0,0 +1,116 @@
+"""
+Benchmark: cálculos de riesgo sobre años de ticks (DB vs archivo)
+
+Sobre una DB SQLite temporal con `--ticks` ticks de un ticker, calcula
+retorno total, volatilidad de log-retornos y max drawdown con:
+
+- before: leer el historial de prices con el ORM (objetos Price con
+  Numeric -> Decimal) y convertir a float
+- after:  PriceArchive.load (memory map de los .npy exportados por
+  PriceArchiveService) y NumPy directo
+
+El tiempo del export inicial se reporta aparte: se paga una vez y los
+siguientes exports solo agregan los ticks nuevos.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_price_archive --ticks 500000
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.db.base import Base
+from app.db.session import create_engines
+from app.repositories.price_repository import PriceRepository
+from app.services.price_archive import PriceArchive, PriceArchiveService
+
+
+TICKER = "BENCH"
+START = datetime(2020, 1, 1)
+
+
+def _risk(prices: np.ndarray) -> tuple[float, float, float]:
+    """(retorno total, volatilidad de log-retornos, max drawdown)"""
+    log_returns = np.diff(np.log(prices))
+    drawdown = prices / np.maximum.accumulate(prices) - 1
+    return prices[-1] / prices[0] - 1, float(log_returns.std()), float(drawdown.min())
+
+
+async def _seed(sessions, ticks: int) -> None:
+    async with sessions() as db:
+        price = 100.0
+        for offset in range(0, ticks, 20000):
+            batch = []
+            for minute in range(offset, min(offset + 20000, ticks)):
+                price *= 1 + ((minute * 7919) % 201 - 100) / 100000
+                batch.append({
+                    "ticker": TICKER,
+                    "price_usd": Decimal(f"{price:.2f}"),
+                    "source": "benchmark",
+                    "timestamp": START + timedelta(minutes=minute),
+                })
+            await PriceRepository(db).bulk_upsert(batch)
+            await db.commit()
+
+
+async def _from_db(sessions) -> tuple:
+    async with sessions() as db:
+        prices = await PriceRepository(db).get_price_history(
+            TICKER, START, None, limit=None
+        )
+        return _risk(np.array([float(p.price_usd) for p in prices]))
+
+
+def _from_archive(archive: PriceArchive) -> tuple:
+    return _risk(archive.load(TICKER).price_usd)
+
+
+async def main(ticks: int, repeat: int) -> None:
+    with tempfile.TemporaryDirectory(dir=".") as tmp:
+        engine, _ = create_engines(
+            f"sqlite+aiosqlite:///{os.path.join(tmp, 'archive.db')}"
+        )
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        await _seed(sessions, ticks)
+        
+        archive = PriceArchive(os.path.join(tmp, "archive"))
+        started = time.perf_counter()
+        async with sessions() as db:
+            await PriceArchiveService(db, archive).export_ticker(TICKER)
+        export_seconds = time.perf_counter() - started
+        
+        started = time.perf_counter()
+        for _ in range(repeat):
+            db_result = await _from_db(sessions)
+        db_ms = (time.perf_counter() - started) / repeat * 1000
+        
+        started = time.perf_counter()
+        for _ in range(repeat):
+            archive_result = _from_archive(archive)
+        archive_ms = (time.perf_counter() - started) / repeat * 1000
+        
+        await engine.dispose()
+    
+    assert np.allclose(db_result, archive_result)
+    print(f"ticks={ticks} repeat={repeat} export inicial={export_seconds:.2f}s")
+    print(f"before (ORM):     {db_ms:10.2f}ms por cálculo")
+    print(f"after  (archivo): {archive_ms:10.2f}ms por cálculo")
+    print(f"speedup: {db_ms / archive_ms:.0f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ticks", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.ticks, args.repeat))
@@ -0,0 +1,140 @@
+"""
+Benchmark: ingesta de precios ORM vs bulk upsert
+
+Genera ticks sintéticos (ticker, timestamp) y mide filas/seg en una DB
+SQLite temporal con:
+
+- before: Price.create_from_api + db.add por fila (comportamiento previo
+  de PriceService.fetch_and_store_prices)
+- after:  PriceRepository.bulk_upsert (INSERT multi-row ON CONFLICT)
+
+Al final re-inserta una porción de ticks ya escritos para verificar que
+los duplicados se omiten sin abortar el batch.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_price_ingest --ticks 1000000 --orm-ticks 50000
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.models.price import Price
+from app.repositories.price_repository import PriceRepository
+
+
+TICKERS = ["VOO", "VGT", "QQQ", "SPY", "AAPL", "MSFT", "BTC", "ETH", "SOL", "ADA"]
+EXCHANGE_RATE = Decimal("17.2500")
+START = datetime(2020, 1, 1)
+
+
+def _ticks(count: int, offset: int = 0):
+    """Ticks sintéticos: un timestamp por minuto, rotando tickers"""
+    for i in range(offset, offset + count):
+        ticker = TICKERS[i % len(TICKERS)]
+        price_usd = Decimal(100 + (i % 997)) + Decimal("0.25")
+        yield {
+            "ticker": ticker,
+            "price_usd": price_usd,
+            "price_mxn": price_usd * EXCHANGE_RATE,
+            "exchange_rate": EXCHANGE_RATE,
+            "source": "benchmark",
+            "timestamp": START + timedelta(minutes=i // len(TICKERS)),
+        }
+
+
+async def _make_session_factory(path: str) -> async_sessionmaker:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Price.__table__.create)
+    return async_sessionmaker(engine, expire_on_commit=False)
+
+
+async def _count(session_factory: async_sessionmaker) -> int:
+    async with session_factory() as db:
+        return await db.scalar(select(func.count(Price.id)))
+
+
+async def _ingest_orm(
+    session_factory: async_sessionmaker,
+    count: int,
+    commit_every: int
+) -> float:
+    """db.add por fila; retorna filas/seg"""
+    start = time.perf_counter()
+    async with session_factory() as db:
+        for i, row in enumerate(_ticks(count), start=1):
+            db.add(Price.create_from_api(
+                ticker=row["ticker"],
+                price_usd=row["price_usd"],
+                source=row["source"],
+                exchange_rate=row["exchange_rate"],
+                timestamp=row["timestamp"],
+            ))
+            if i % commit_every == 0:
+                await db.commit()
+        await db.commit()
+    return count / (time.perf_counter() - start)
+
+
+async def _ingest_bulk(
+    session_factory: async_sessionmaker,
+    count: int,
+    commit_every: int,
+    offset: int = 0
+) -> tuple[float, int]:
+    """bulk_upsert por bloques; retorna (filas/seg, filas escritas)"""
+    written = 0
+    rows = list(_ticks(count, offset))
+    start = time.perf_counter()
+    async with session_factory() as db:
+        repository = PriceRepository(db)
+        for block in range(0, count, commit_every):
+            written += len(
+                await repository.bulk_upsert(rows[block:block + commit_every])
+            )
+            await db.commit()
+    return count / (time.perf_counter() - start), written
+
+
+async def main(ticks: int, orm_ticks: int, commit_every: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        orm_db = await _make_session_factory(os.path.join(tmp, "orm.db"))
+        bulk_db = await _make_session_factory(os.path.join(tmp, "bulk.db"))
+        
+        before = await _ingest_orm(orm_db, orm_ticks, commit_every)
+        after, written = await _ingest_bulk(bulk_db, ticks, commit_every)
+        assert written == ticks == await _count(bulk_db)
+        
+        # Re-ingesta con la mitad de ticks duplicados
+        overlap = min(ticks, commit_every) // 2
+        _, rewritten = await _ingest_bulk(
+            bulk_db, overlap * 2, commit_every, offset=ticks - overlap
+        )
+        assert rewritten == overlap
+        
+        for factory in (orm_db, bulk_db):
+            await factory.kw["bind"].dispose()
+    
+    print(f"ticks={ticks} orm_ticks={orm_ticks} commit_every={commit_every}")
+    print(f"before (ORM db.add):       {before:12.1f} filas/s")
+    print(f"after  (bulk_upsert):      {after:12.1f} filas/s")
+    print(f"speedup: {after / before:.2f}x")
+    print(f"re-ingesta: {overlap * 2} ticks, {rewritten} escritos, "
+          f"{overlap * 2 - rewritten} duplicados omitidos")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ticks", type=int, default=1_000_000)
+    parser.add_argument("--orm-ticks", type=int, default=50_000)
+    parser.add_argument("--commit-every", type=int, default=10_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.ticks, args.orm_ticks, args.commit_every))
@@ -0,0 +1,152 @@
+"""
+Benchmark: rendimientos TWR / XIRR de un dashboard
+
+Sobre una DB SQLite temporal con un portfolio de `--transactions`
+transacciones en `--years` años (snapshots diarios reconstruidos con el
+backfill), sirve `--loads` cargas de un dashboard que pide TWR y XIRR de
+6 rangos (1M, 3M, 6M, 1A, 5A, todo) con:
+
+- before: calcular cada rango en cada carga (snapshots + transacciones
+  y solver)
+- after:  PortfolioSnapshotService.get_returns (memorizado por
+  portfolio, rango y versión de datos; se reporta aparte la primera
+  carga, que calcula)
+
+Mide también la XIRR de todos los flujos del portfolio con un Newton en
+Python puro (un loop sobre los flujos por iteración) contra el solver
+vectorizado.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_returns --years 10 --loads 50
+"""
+
+import argparse
+import asyncio
+import math
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.db.base import Base
+from app.db.session import create_engines
+from app.services.returns import returns_cache, xirr
+from app.services.snapshot_service import PortfolioSnapshotService
+from benchmarks.bench_portfolio_snapshots import _seed
+
+
+RANGES_DAYS = (30, 91, 182, 365, 5 * 365, None)
+
+
+def _python_xirr(amounts: list, years: list, guess: float = 0.1) -> float:
+    rate = guess
+    for _ in range(100):
+        value = sum(a / (1 + rate) ** t for a, t in zip(amounts, years))
+        slope = sum(
+            -t * a / (1 + rate) ** (t + 1) for a, t in zip(amounts, years)
+        )
+        step = value / slope
+        rate -= step
+        if abs(step) < 1e-10:
+            return rate
+    return math.nan
+
+
+async def _dashboard(service, end_day, cached: bool) -> list:
+    results = []
+    for days in RANGES_DAYS:
+        start = end_day - timedelta(days=days) if days else None
+        if cached:
+            results.append(await service.get_returns(1, start, end_day))
+        else:
+            results.append(await service._compute_returns(1, start, end_day))
+    return results
+
+
+async def main(years: int, tickers: int, transactions: int, loads: int) -> None:
+    with tempfile.TemporaryDirectory(dir=".") as tmp:
+        engine, _ = create_engines(
+            f"sqlite+aiosqlite:///{os.path.join(tmp, 'returns.db')}"
+        )
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        end_day = await _seed(sessions, years, tickers, transactions)
+        
+        async with sessions() as db:
+            service = PortfolioSnapshotService(db)
+            await service.backfill(
+                [1],
+                as_of=datetime.combine(end_day, datetime.min.time())
+                + timedelta(days=1)
+            )
+            
+            started = time.perf_counter()
+            for _ in range(loads):
+                before = await _dashboard(service, end_day, cached=False)
+            before_ms = (time.perf_counter() - started) * 1000 / loads
+            
+            # Primera carga: calcula y memoriza los rangos
+            returns_cache.invalidate_all()
+            started = time.perf_counter()
+            await _dashboard(service, end_day, cached=True)
+            first_ms = (time.perf_counter() - started) * 1000
+            started = time.perf_counter()
+            for _ in range(loads):
+                after = await _dashboard(service, end_day, cached=True)
+            after_ms = (time.perf_counter() - started) * 1000 / loads
+            
+            # Flujos de todo el rango para comparar solvers
+            events = await service.transactions.get_events(1)
+            first = events[0].transaction_date
+            amounts = np.array([
+                -abs(event.total_value) if event.transaction_type.value == "buy"
+                else abs(event.total_value)
+                for event in events
+            ] + [before[-1].end_value_usd])
+            flow_years = np.array([
+                (event.transaction_date - first).days / 365 for event in events
+            ] + [(end_day - first.date()).days / 365])
+        await engine.dispose()
+    
+    assert before == after
+    
+    started = time.perf_counter()
+    expected = _python_xirr(amounts.tolist(), flow_years.tolist())
+    python_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    rate = xirr(amounts, flow_years)
+    numpy_ms = (time.perf_counter() - started) * 1000
+    assert math.isnan(expected) or abs(rate - expected) < 1e-6
+    
+    print(
+        f"años={years} transacciones={transactions} "
+        f"rangos/carga={len(RANGES_DAYS)} cargas={loads}"
+    )
+    print(f"dashboard before (calcular):   {before_ms:9.2f}ms por carga")
+    print(
+        f"dashboard after  (memorizado): {after_ms:9.3f}ms por carga  "
+        f"(primera carga {first_ms:.0f}ms)"
+    )
+    print(f"xirr Python puro:              {python_ms:9.2f}ms")
+    print(f"xirr vectorizado:              {numpy_ms:9.2f}ms")
+    for days, result in zip(RANGES_DAYS, after):
+        print(
+            f"  {days or 'todo'}: twr={result.twr_percent}% "
+            f"xirr={result.xirr_percent}%"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--tickers", type=int, default=20)
+    parser.add_argument("--transactions", type=int, default=2000)
+    parser.add_argument("--loads", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(
+        main(args.years, args.tickers, args.transactions, args.loads)
+    )
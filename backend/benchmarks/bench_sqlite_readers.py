@@ -0,0 +1,238 @@
+"""
+Benchmark: lectores concurrentes durante un refresh (SQLite)
+
+Sobre una DB SQLite temporal con histórico sintético, corre N procesos
+lectores (últimos precios + velas diarias, como un dashboard servido por
+varios workers) mientras un writer ingiere ticks continuamente con
+PriceRepository.bulk_upsert, y mide lecturas/seg, latencias y errores
+"database is locked" con:
+
+- before: perfil development (StaticPool: una conexión compartida por
+  proceso, rollback journal por defecto)
+- after:  perfil production (WAL, pool de lectores read-only y un writer
+  serializado)
+
+Uso (desde backend/):
+    python -m benchmarks.bench_sqlite_readers --readers 4 --seconds 10
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.db.base import Base
+from app.db.session import create_engines
+from app.repositories.price_repository import PriceRepository
+from app.repositories.rollup_repository import PriceRollupRepository
+
+
+TICKERS = [f"T{i:03d}" for i in range(50)]
+START = datetime(2024, 1, 1)
+
+
+def _ticks(step: int, count: int) -> list[dict]:
+    """`count` ticks por ticker a partir del paso `step` (uno por minuto)"""
+    return [
+        {
+            "ticker": ticker,
+            "price_usd": Decimal(100 + (minute % 50)) + Decimal("0.5"),
+            "source": "benchmark",
+            "timestamp": START + timedelta(minutes=minute),
+        }
+        for minute in range(step, step + count)
+        for ticker in TICKERS
+    ]
+
+
+def _reader_process(
+    path: str,
+    profile: str,
+    ticker: str,
+    start_at: float,
+    deadline: float,
+    results
+) -> None:
+    """Lector en su propio proceso (como un worker de uvicorn)"""
+    async def run() -> None:
+        _, reader_engine = create_engines(
+            f"sqlite+aiosqlite:///{path}", sqlite_profile=profile
+        )
+        read_sessions = async_sessionmaker(reader_engine, expire_on_commit=False)
+        latencies: list[float] = []
+        errors = 0
+        
+        await asyncio.sleep(max(start_at - time.time(), 0))
+        while time.time() < deadline:
+            t0 = time.perf_counter()
+            try:
+                async with read_sessions() as db:
+                    await PriceRepository(db).get_latest_prices()
+                    await PriceRollupRepository(db).get_rollups(ticker, "1d")
+            except OperationalError:
+                errors += 1  # database is locked
+                continue
+            latencies.append(time.perf_counter() - t0)
+        
+        await reader_engine.dispose()
+        results.put((latencies, errors))
+    
+    asyncio.run(run())
+
+
+async def _seed(path: str, profile: str, seed_minutes: int) -> None:
+    """Crea el esquema y el histórico inicial"""
+    writer_engine, reader_engine = create_engines(
+        f"sqlite+aiosqlite:///{path}", sqlite_profile=profile
+    )
+    async with writer_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    
+    write_sessions = async_sessionmaker(writer_engine, expire_on_commit=False)
+    async with write_sessions() as db:
+        for step in range(0, seed_minutes, 100):
+            await PriceRepository(db).bulk_upsert(_ticks(step, 100))
+            await db.commit()
+    
+    await writer_engine.dispose()
+    if reader_engine is not writer_engine:
+        await reader_engine.dispose()
+
+
+async def _write_until(
+    path: str,
+    profile: str,
+    step: int,
+    write_minutes: int,
+    start_at: float,
+    deadline: float
+) -> int:
+    """Ingesta continua tipo refresh; retorna filas escritas"""
+    writer_engine, reader_engine = create_engines(
+        f"sqlite+aiosqlite:///{path}", sqlite_profile=profile
+    )
+    write_sessions = async_sessionmaker(writer_engine, expire_on_commit=False)
+    rows_written = 0
+    
+    await asyncio.sleep(max(start_at - time.time(), 0))
+    while time.time() < deadline:
+        rows = _ticks(step, write_minutes)
+        async with write_sessions() as db:
+            await PriceRepository(db).bulk_upsert(rows)
+            await db.commit()
+        rows_written += len(rows)
+        step += write_minutes
+    
+    await writer_engine.dispose()
+    if reader_engine is not writer_engine:
+        await reader_engine.dispose()
+    return rows_written
+
+
+async def _run_profile(
+    path: str,
+    profile: str,
+    readers: int,
+    seconds: float,
+    seed_minutes: int,
+    write_minutes: int
+) -> dict:
+    await _seed(path, profile, seed_minutes)
+    
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    start_at = time.time() + 1.0
+    deadline = start_at + seconds
+    processes = [
+        context.Process(
+            target=_reader_process,
+            args=(
+                path, profile, TICKERS[i % len(TICKERS)],
+                start_at, deadline, results
+            )
+        )
+        for i in range(readers)
+    ]
+    for process in processes:
+        process.start()
+    
+    rows_written = await _write_until(
+        path, profile, seed_minutes, write_minutes, start_at, deadline
+    )
+    
+    latencies: list[float] = []
+    errors = 0
+    for _ in processes:
+        process_latencies, process_errors = results.get()
+        latencies.extend(process_latencies)
+        errors += process_errors
+    for process in processes:
+        process.join()
+    
+    latencies.sort()
+    return {
+        "reads_per_second": len(latencies) / seconds,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "locked_errors": errors,
+        "rows_written_per_second": rows_written / seconds,
+    }
+
+
+async def main(
+    readers: int,
+    seconds: float,
+    seed_minutes: int,
+    write_minutes: int
+) -> None:
+    results = {}
+    # En disco (no tmpfs): el costo de fsync en commit es parte de la prueba
+    with tempfile.TemporaryDirectory(dir=".") as tmp:
+        for profile in ("development", "production"):
+            results[profile] = await _run_profile(
+                os.path.join(tmp, f"{profile}.db"),
+                profile,
+                readers,
+                seconds,
+                seed_minutes,
+                write_minutes
+            )
+    
+    print(
+        f"readers={readers} seconds={seconds} tickers={len(TICKERS)} "
+        f"seed_ticks={seed_minutes * len(TICKERS)} "
+        f"write_batch={write_minutes * len(TICKERS)}"
+    )
+    for label, profile in (("before", "development"), ("after ", "production")):
+        r = results[profile]
+        print(
+            f"{label} ({profile:11}): {r['reads_per_second']:8.1f} lecturas/s  "
+            f"p50={r['p50_ms']:7.2f}ms  p99={r['p99_ms']:8.2f}ms  "
+            f"locked={r['locked_errors']:5d}  "
+            f"ingesta={r['rows_written_per_second']:8.1f} filas/s"
+        )
+    speedup = (
+        results["production"]["reads_per_second"]
+        / results["development"]["reads_per_second"]
+    )
+    print(f"speedup lecturas: {speedup:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--seed-minutes", type=int, default=2000)
+    parser.add_argument("--write-minutes", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(
+        args.readers, args.seconds, args.seed_minutes, args.write_minutes
+    ))
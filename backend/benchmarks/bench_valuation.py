@@ -0,0 +1,136 @@
+"""
+Benchmark: valuación de un portfolio con precios actuales
+
+Sobre una DB SQLite temporal con un portfolio de `--holdings` holdings
+(cada uno con su último precio), calcula `--requests` veces el resumen
+del portfolio (valor, costo, ganancia/pérdida y pesos) con:
+
+- before: holdings con get_by_portfolio, una query de último precio por
+  holding y aritmética Decimal por Holding (total_invested)
+- after:  load_valuation (holdings + últimos precios en una query) y
+  cálculos vectorizados en HoldingsValuation
+
+Uso (desde backend/):
+    python -m benchmarks.bench_valuation --holdings 500 --requests 20
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.db.base import Base
+from app.db.session import create_engines
+from app.models import Holding, Portfolio
+from app.repositories.portfolio_repository import HoldingRepository
+from app.repositories.price_repository import PriceRepository
+from app.services.valuation import load_valuation
+
+
+async def _seed(sessions, holdings: int) -> int:
+    rng = random.Random(42)
+    async with sessions() as db:
+        portfolio = Portfolio(name="benchmark")
+        db.add(portfolio)
+        await db.flush()
+        tickers = [f"T{i:04d}" for i in range(holdings)]
+        db.add_all([
+            Holding(
+                portfolio_id=portfolio.id,
+                ticker=ticker,
+                asset_type="stock",
+                quantity=Decimal(f"{rng.uniform(0.1, 50):.8f}"),
+                average_buy_price=Decimal(f"{rng.uniform(10, 500):.2f}"),
+            )
+            for ticker in tickers
+        ])
+        await PriceRepository(db).bulk_upsert([
+            {
+                "ticker": ticker,
+                "price_usd": Decimal(f"{rng.uniform(10, 500):.2f}"),
+                "exchange_rate": Decimal("17.5"),
+                "source": "benchmark",
+                "timestamp": datetime(2024, 1, 1),
+            }
+            for ticker in tickers
+        ])
+        await db.commit()
+        return portfolio.id
+
+
+async def _per_holding(db, portfolio_id: int) -> tuple[Decimal, Decimal, dict]:
+    holdings = await HoldingRepository(db).get_by_portfolio(portfolio_id)
+    prices = PriceRepository(db)
+    value = cost = Decimal("0")
+    values = {}
+    for holding in holdings:
+        latest = await prices.get_latest_price(holding.ticker)
+        if latest is None:
+            continue
+        values[holding.ticker] = (
+            Decimal(str(holding.quantity)) * Decimal(str(latest.price_usd))
+        )
+        value += values[holding.ticker]
+        cost += holding.total_invested
+    weights = {ticker: held / value * 100 for ticker, held in values.items()}
+    return value, value - cost, weights
+
+
+async def _vectorized(db, portfolio_id: int) -> tuple[float, float, dict]:
+    totals = (await load_valuation(db, [portfolio_id])).portfolio_totals(
+        portfolio_id
+    )
+    return (
+        totals.total_value_usd, totals.total_gain_loss_usd, totals.distribution
+    )
+
+
+async def main(holdings: int, requests: int) -> None:
+    with tempfile.TemporaryDirectory(dir=".") as tmp:
+        engine, _ = create_engines(
+            f"sqlite+aiosqlite:///{os.path.join(tmp, 'valuation.db')}"
+        )
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        portfolio_id = await _seed(sessions, holdings)
+        
+        results = {}
+        for label, run in (("before", _per_holding), ("after ", _vectorized)):
+            async with sessions() as db:
+                started = time.perf_counter()
+                for _ in range(requests):
+                    totals = await run(db, portfolio_id)
+                results[label] = (
+                    (time.perf_counter() - started) * 1000 / requests, totals
+                )
+        await engine.dispose()
+    
+    before, after = results["before"][1], results["after "][1]
+    assert abs(float(before[0]) - after[0]) < 0.01
+    assert abs(float(before[1]) - after[1]) < 0.01
+    assert all(
+        abs(float(weight) - after[2][ticker]) < 0.01
+        for ticker, weight in before[2].items()
+    )
+    print(f"holdings={holdings} requests={requests}")
+    for label, (ms, (value, gain_loss, _)) in results.items():
+        print(
+            f"{label}: {ms:8.1f}ms por resumen  valor={float(value):,.2f} "
+            f"ganancia={float(gain_loss):,.2f}"
+        )
+    print(f"speedup: {results['before'][0] / results['after '][0]:.0f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--holdings", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.holdings, args.requests))
@@ -0,0 +1,130 @@
+"""
+Benchmark: totales de portfolios al día con cada refresh de precios
+
+Sobre una DB SQLite temporal con `--portfolios` portfolios de 5
+holdings (universo de 50 tickers), guarda `--refreshes` refreshes que
+mueven `--moved` tickers cada uno y mantiene los totales al día con:
+
+- before: tras cada commit, recalcular todos los portfolios desde la
+  DB (PortfolioService.get_valuations)
+- after:  el commit aplica cantidad × Δprecio solo a los tenedores de
+  los tickers movidos (valuation_state)
+
+Después mide `--reads` lecturas del resumen de un portfolio: una
+valuación desde la DB contra una lectura del estado en memoria.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_valuation_state --portfolios 10000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.db.base import Base
+from app.db.session import create_engines
+from app.repositories.price_repository import PriceRepository
+from app.services.portfolio_service import PortfolioService
+from app.services.valuation import load_valuation
+from app.services.valuation_state import valuation_state
+from benchmarks.bench_batch_valuation import _seed
+
+
+TICKERS = [f"T{i:03d}" for i in range(50)]
+
+
+async def _refresh(db, rng, moved: int, step: int) -> None:
+    await PriceRepository(db).bulk_upsert([
+        {
+            "ticker": ticker,
+            "price_usd": Decimal(f"{rng.uniform(10, 500):.2f}"),
+            "exchange_rate": Decimal("17.5"),
+            "source": "benchmark",
+            "timestamp": datetime(2024, 1, 1) + timedelta(minutes=step),
+        }
+        for ticker in rng.sample(TICKERS, moved)
+    ])
+    await db.commit()
+
+
+async def main(portfolios: int, refreshes: int, moved: int, reads: int) -> None:
+    with tempfile.TemporaryDirectory(dir=".") as tmp:
+        engine, _ = create_engines(
+            f"sqlite+aiosqlite:///{os.path.join(tmp, 'state.db')}"
+        )
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        await _seed(sessions, portfolios, 5, len(TICKERS))
+        portfolio_ids = list(range(1, portfolios + 1))
+        
+        async with sessions() as db:
+            service = PortfolioService(db)
+            rng = random.Random(42)
+            
+            valuation_state.invalidate_all()
+            started = time.perf_counter()
+            for step in range(1, refreshes + 1):
+                await _refresh(db, rng, moved, step)
+                before = await service.get_valuations(portfolio_ids)
+            before_ms = (time.perf_counter() - started) * 1000 / refreshes
+            
+            started = time.perf_counter()
+            await service.get_current_totals(portfolio_ids)
+            load_ms = (time.perf_counter() - started) * 1000
+            started = time.perf_counter()
+            for step in range(refreshes + 1, 2 * refreshes + 1):
+                await _refresh(db, rng, moved, step)
+            after_ms = (time.perf_counter() - started) * 1000 / refreshes
+            
+            expected = await service.get_valuations(portfolio_ids)
+            after = await service.get_current_totals(portfolio_ids)
+            assert all(
+                abs(after[i].total_value_usd - expected[i].total_value_usd) < 0.02
+                for i in portfolio_ids
+            )
+            assert before.keys() == after.keys()
+            
+            targets = [rng.choice(portfolio_ids) for _ in range(reads)]
+            started = time.perf_counter()
+            for portfolio_id in targets:
+                (await load_valuation(db, [portfolio_id])).portfolio_totals(
+                    portfolio_id
+                )
+            read_before_ms = (time.perf_counter() - started) * 1000 / reads
+            started = time.perf_counter()
+            for portfolio_id in targets:
+                await valuation_state.get(db, portfolio_id)
+            read_after_ms = (time.perf_counter() - started) * 1000 / reads
+        await engine.dispose()
+    
+    print(
+        f"portfolios={portfolios} refreshes={refreshes} "
+        f"tickers movidos/refresh={moved}"
+    )
+    print(f"refresh before (recalcular todo): {before_ms:9.1f}ms")
+    print(
+        f"refresh after  (deltas):          {after_ms:9.1f}ms  "
+        f"(carga inicial {load_ms:.0f}ms)"
+    )
+    print(f"lectura before (DB):              {read_before_ms:9.3f}ms")
+    print(f"lectura after  (memoria):         {read_after_ms:9.3f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--portfolios", type=int, default=10000)
+    parser.add_argument("--refreshes", type=int, default=20)
+    parser.add_argument("--moved", type=int, default=5)
+    parser.add_argument("--reads", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(
+        main(args.portfolios, args.refreshes, args.moved, args.reads)
+    )
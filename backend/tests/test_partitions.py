@@ -0,0 +1,142 @@
+"""
+Tests: particiones mensuales de prices (PostgreSQL)
+
+Cubren el DDL que solo existe en PostgreSQL: la PK (id, timestamp) que
+agrega el hook @compiles, la partición DEFAULT de create_all, el
+desprendimiento/movimiento/adjunto de DEFAULT en ensure_months y el DROP
+de meses completos de drop_partitions_before.
+
+Se saltan salvo que DATABASE_URL apunte a un Postgres de pruebas (se
+borran y recrean las tablas):
+    DATABASE_URL=postgresql+asyncpg://postgres@localhost/test \\
+        python -m pytest tests/test_partitions.py
+"""
+
+import os
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import insert, text
+
+from app.db.base import Base
+from app.db.partitions import DEFAULT_PARTITION, PricePartitionManager
+from app.db.session import create_engines
+from app.models import Price
+
+DATABASE_URL = os.environ.get("DATABASE_URL", "")
+
+pytestmark = pytest.mark.skipif(
+    not DATABASE_URL.startswith("postgresql"),
+    reason="requiere DATABASE_URL de PostgreSQL"
+)
+
+
+def _ticks(*timestamps: datetime) -> list[dict]:
+    return [
+        {
+            "ticker": "VOO",
+            "price_usd": Decimal("100.5"),
+            "source": "test",
+            "timestamp": timestamp,
+        }
+        for timestamp in timestamps
+    ]
+
+
+async def _count(conn, table: str) -> int:
+    return await conn.scalar(text(f"SELECT count(*) FROM {table}"))
+
+
+async def _children(conn) -> set[str]:
+    result = await conn.execute(text(
+        "SELECT inhrelid::regclass::text FROM pg_inherits "
+        "WHERE inhparent = 'prices'::regclass"
+    ))
+    return {name for (name,) in result.all()}
+
+
+@pytest_asyncio.fixture
+async def engine():
+    engine, read_engine = create_engines(DATABASE_URL)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    await engine.dispose()
+    await read_engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_create_all_partitions_prices(engine):
+    async with engine.connect() as conn:
+        strategy = await conn.scalar(text(
+            "SELECT partstrat FROM pg_partitioned_table "
+            "WHERE partrelid = 'prices'::regclass"
+        ))
+        result = await conn.execute(text(
+            "SELECT a.attname FROM pg_index i "
+            "JOIN pg_attribute a ON a.attrelid = i.indrelid "
+            "AND a.attnum = ANY(i.indkey) "
+            "WHERE i.indrelid = 'prices'::regclass AND i.indisprimary"
+        ))
+        primary_key = {name for (name,) in result.all()}
+        children = await _children(conn)
+    
+    assert strategy == "r"
+    assert primary_key == {"id", "timestamp"}
+    assert children == {DEFAULT_PARTITION}
+
+
+@pytest.mark.asyncio
+async def test_ensure_months_moves_default_rows(engine):
+    async with engine.begin() as conn:
+        await conn.execute(insert(Price), _ticks(
+            datetime(2024, 1, 5), datetime(2024, 1, 31, 23, 59),
+            datetime(2024, 2, 1), datetime(2024, 3, 10)
+        ))
+        created = await PricePartitionManager(conn).ensure_months(
+            [datetime(2024, 1, 20), datetime(2024, 2, 1)]
+        )
+    
+    assert created == ["prices_y2024m01", "prices_y2024m02"]
+    async with engine.begin() as conn:
+        assert await _children(conn) == {
+            DEFAULT_PARTITION, "prices_y2024m01", "prices_y2024m02"
+        }
+        assert await _count(conn, "prices_y2024m01") == 2
+        assert await _count(conn, "prices_y2024m02") == 1
+        assert await _count(conn, DEFAULT_PARTITION) == 1
+        assert await _count(conn, "prices") == 4
+        
+        # DEFAULT sigue adjunta: un mes sin partición no falla
+        await conn.execute(insert(Price), _ticks(datetime(2024, 4, 1)))
+        assert await _count(conn, DEFAULT_PARTITION) == 2
+        
+        # Repetir no crea nada
+        assert await PricePartitionManager(conn).ensure_months(
+            [datetime(2024, 1, 1)]
+        ) == []
+
+
+@pytest.mark.asyncio
+async def test_drop_partitions_before_keeps_cutoff_month(engine):
+    january = datetime(2024, 1, 1)
+    async with engine.begin() as conn:
+        manager = PricePartitionManager(conn)
+        await manager.ensure_months(
+            [january, datetime(2024, 2, 1), datetime(2024, 3, 1)]
+        )
+        await conn.execute(insert(Price), _ticks(*(
+            january + timedelta(days=day) for day in range(0, 90, 10)
+        )))
+        dropped = await manager.drop_partitions_before(datetime(2024, 3, 15))
+    
+    assert dropped == ["prices_y2024m01", "prices_y2024m02"]
+    async with engine.connect() as conn:
+        assert await _children(conn) == {DEFAULT_PARTITION, "prices_y2024m03"}
+        oldest = await conn.scalar(text("SELECT min(timestamp) FROM prices"))
+        assert oldest >= datetime(2024, 3, 1)
@@ -0,0 +1,104 @@
+"""
+Tests: TWR / XIRR de un rango de snapshots
+
+El valor inicial de un rango es el último snapshot anterior a su primer
+día aunque falten días entre ambos (fin de semana, caída del job o un
+rango que empieza antes del primer snapshot).
+"""
+
+import os
+import tempfile
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.db.base import Base
+from app.db.session import create_engines
+from app.models import Portfolio, Transaction, TransactionType
+from app.repositories.snapshot_repository import PortfolioSnapshotRepository
+from app.services.snapshot_service import PortfolioSnapshotService
+
+# Compra de 100 USD el 1 de enero; sin snapshots el 3 y 4 de enero
+SNAPSHOTS = {
+    date(2024, 1, 1): 100,
+    date(2024, 1, 2): 110,
+    date(2024, 1, 5): 121,
+    date(2024, 1, 6): 121,
+}
+
+
+@pytest_asyncio.fixture
+async def service():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, _ = create_engines(
+            f"sqlite+aiosqlite:///{os.path.join(tmp, 'returns.db')}"
+        )
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        
+        async with sessions() as db:
+            portfolio = Portfolio(name="test")
+            db.add(portfolio)
+            await db.flush()
+            await db.execute(insert(Transaction), [{
+                "portfolio_id": portfolio.id,
+                "transaction_type": TransactionType.BUY,
+                "ticker": "VOO",
+                "asset_type": "stock",
+                "quantity": 1.0,
+                "price_per_unit": 100.0,
+                "total_value": 100.0,
+                "fee": 0.0,
+                "transaction_date": datetime(2024, 1, 1, 15),
+                "created_at": datetime(2024, 1, 1, 15),
+            }])
+            await PortfolioSnapshotRepository(db).upsert_many([
+                {
+                    "portfolio_id": portfolio.id,
+                    "snapshot_date": day,
+                    "value_usd": Decimal(value),
+                    "value_mxn": None,
+                    "invested_usd": Decimal(100),
+                    "net_flow_usd": Decimal(100 if day.day == 1 else 0),
+                    "holdings_count": 1,
+                    "source": "daily",
+                    "created_at": datetime(2024, 1, 7),
+                }
+                for day, value in SNAPSHOTS.items()
+            ])
+            await db.commit()
+            yield PortfolioSnapshotService(db)
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_range_starting_on_missing_day_uses_earlier_snapshot(service):
+    result = await service._compute_returns(
+        1, date(2024, 1, 4), date(2024, 1, 6)
+    )
+    
+    assert result.start_date == date(2024, 1, 4)
+    assert result.days == 3
+    assert result.start_value_usd == 110
+    assert result.net_flow_usd == 0
+    assert result.gain_usd == 11
+    assert result.twr_percent == pytest.approx(10.0)
+    assert result.xirr_percent is not None and result.xirr_percent > 0
+
+
+@pytest.mark.asyncio
+async def test_range_before_first_snapshot_counts_initial_flow(service):
+    result = await service._compute_returns(
+        1, date(2023, 12, 1), date(2024, 1, 6)
+    )
+    
+    assert result.start_date == date(2024, 1, 1)
+    assert result.start_value_usd == 0
+    assert result.net_flow_usd == 100
+    assert result.twr_percent == pytest.approx(21.0)
+    assert result.xirr_percent is not None and result.xirr_percent > 0
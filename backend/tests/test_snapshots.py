@@ -0,0 +1,86 @@
+"""
+Tests: job diario de snapshots de portfolios
+
+El job escribe el día de hoy y rellena los días que faltan desde el
+último snapshot guardado (días en que el job no corrió).
+"""
+
+import os
+import tempfile
+from datetime import date, datetime
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.db.base import Base
+from app.db.session import create_engines
+from app.models import Portfolio, PortfolioSnapshot, Transaction, TransactionType
+from app.services.snapshot_service import PortfolioSnapshotService
+
+
+@pytest_asyncio.fixture
+async def service():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, _ = create_engines(
+            f"sqlite+aiosqlite:///{os.path.join(tmp, 'snapshots.db')}"
+        )
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        
+        async with sessions() as db:
+            portfolio = Portfolio(name="test")
+            db.add(portfolio)
+            await db.flush()
+            await db.execute(insert(Transaction), [{
+                "portfolio_id": portfolio.id,
+                "transaction_type": TransactionType.BUY,
+                "ticker": "VOO",
+                "asset_type": "stock",
+                "quantity": 2.0,
+                "price_per_unit": 50.0,
+                "total_value": 100.0,
+                "fee": 0.0,
+                "transaction_date": datetime(2024, 1, 1, 15),
+                "created_at": datetime(2024, 1, 1, 15),
+            }])
+            await db.commit()
+            yield PortfolioSnapshotService(db)
+        await engine.dispose()
+
+
+async def _stored(service) -> dict[date, str]:
+    result = await service.db.execute(
+        select(PortfolioSnapshot.snapshot_date, PortfolioSnapshot.source)
+        .order_by(PortfolioSnapshot.snapshot_date)
+    )
+    return dict(result.all())
+
+
+@pytest.mark.asyncio
+async def test_take_snapshots_fills_missed_days(service):
+    first = await service.take_snapshots(as_of=datetime(2024, 1, 1, 23))
+    # El job no corrió del 2 al 4 de enero
+    report = await service.take_snapshots(as_of=datetime(2024, 1, 5, 23))
+    
+    assert first.days_written == 1
+    assert report.portfolios == 1
+    assert report.days_written == 4
+    assert await _stored(service) == {
+        date(2024, 1, 1): "daily",
+        date(2024, 1, 2): "backfill",
+        date(2024, 1, 3): "backfill",
+        date(2024, 1, 4): "backfill",
+        date(2024, 1, 5): "daily",
+    }
+
+
+@pytest.mark.asyncio
+async def test_take_snapshots_same_day_rewrites_only_today(service):
+    await service.take_snapshots(as_of=datetime(2024, 1, 3, 10))
+    report = await service.take_snapshots(as_of=datetime(2024, 1, 3, 23))
+    
+    assert report.days_written == 1
+    assert len(await _stored(service)) == 3